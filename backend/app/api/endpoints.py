@@ -6,28 +6,39 @@ PRODUCTION-GRADE: Robust preprocessing, multi-shot enrollment, dynamic matching,
 """
 from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
 import uuid
 import traceback
 import numpy as np
 
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
 
 from app.db.supabase_client import get_supabase
+from app.db.record_cache import get_record_cache
 from app.models.schemas import (
     EnrollRequest, EnrollResponse,
-    StartSessionResponse,
+    SessionReferenceRequest, StartSessionResponse,
     VerifyRequest, VerifyResponse,
     ResendOTPRequest, ResendOTPResponse,
     ReportResponse, AttendanceRecord, AttendanceStatistics
 )
 from app.services.face_recognition_service import get_face_recognition_service
 from app.services.otp_service import get_otp_service
+from app.services.anomaly_service import get_anomaly_service
 from app.services.preprocess import get_preprocessor
 from app.services.enrollment_engine import get_enrollment_engine
 from app.services.matcher import get_matcher
 from app.services.vector_search import get_vector_search
 from app.services.geofence_service import get_geofence_service
+from app.services.sensor_validation_service import get_sensor_validation_service
+from app.services.session_reference import SessionReference, get_session_reference_registry
+from app.services.motion_image_correlator import get_motion_image_correlator, CorrelationResult, MotionData
+from app.services.inference_executor import run_inference
 from app.services.emotion_service import get_emotion_service
+from app.services.blob_store import get_blob_store
+from app.services.websocket_manager import get_connection_manager
+from app.utils.embedding_codec import encode_embedding, embedding_from_row, to_postgrest
+from app.utils.motion_codec import decode_motion, MotionCodecError
 from app.core.config import settings
 
 router = APIRouter(prefix="/api/v1", tags=["ISAVS"])
@@ -35,6 +46,43 @@ router = APIRouter(prefix="/api/v1", tags=["ISAVS"])
 
 # ============== Enrollment Endpoints ==============
 
+def embedding_columns(embedding: np.ndarray, legacy: bool = False) -> dict:
+    """
+    Student row columns holding the embedding (binary plus the vector search
+    engine's own column, or float8[] for unmigrated databases).
+    """
+    if legacy:
+        return {'facial_embedding': embedding.tolist()}
+    return {
+        'facial_embedding_bin': to_postgrest(encode_embedding(embedding, settings.EMBEDDING_STORAGE_DTYPE)),
+        **get_vector_search().row_columns(embedding)
+    }
+
+
+def insert_student_row(supabase, student_data: dict, embedding: np.ndarray):
+    """
+    Insert a students row, falling back to a legacy row (float8[] embedding,
+    no photo digest) on databases without the face_image_hash /
+    facial_embedding_bin columns.
+    """
+    try:
+        return supabase.table('students').insert(student_data).execute()
+    except Exception as e:
+        if 'facial_embedding_vec' in str(e) and 'facial_embedding_vec' in student_data:
+            print("⚠️ facial_embedding_vec column not found (run migration_pgvector_search.sql), storing row without vector")
+            row = {key: value for key, value in student_data.items() if key != 'facial_embedding_vec'}
+            return insert_student_row(supabase, row, embedding)
+        if 'face_image_hash' not in str(e) and 'facial_embedding_bin' not in str(e):
+            raise
+        print("⚠️ face_image_hash/facial_embedding_bin columns not found, storing legacy row")
+        row = {
+            key: value for key, value in student_data.items()
+            if key not in ('face_image_hash', 'facial_embedding_bin', 'facial_embedding_vec')
+        }
+        row.update(embedding_columns(embedding, legacy=True))
+        return supabase.table('students').insert(row).execute()
+
+
 @router.post("/enroll", response_model=EnrollResponse)
 async def enroll_student(request: EnrollRequest):
     """
@@ -97,38 +145,47 @@ async def enroll_student(request: EnrollRequest):
             )
         
         # Step 4: Check for duplicate face (prevents fraud)
-        all_students = supabase.table('students').select('id, name, facial_embedding').execute()
-        
-        for s in (all_students.data or []):
-            if s.get('facial_embedding'):
-                stored_emb = np.array(s['facial_embedding'])
-                similarity = ai_service.cosine_similarity(embedding, stored_emb)
-                
-                # Duplicate threshold: 0.90
-                if similarity >= 0.90:
-                    raise HTTPException(
-                        status_code=status.HTTP_409_CONFLICT,
-                        detail=f"Identity already exists: {s['name']} (similarity: {similarity:.2f})"
-                    )
+        if settings.VECTOR_SEARCH_BACKEND == 'pgvector':
+            # One indexed nearest-neighbour query instead of scanning every embedding
+            # (search similarity is cosine rescaled to [0, 1], so 0.90 cosine -> 0.95)
+            is_duplicate, match = get_vector_search().check_duplicate(embedding, threshold=(0.90 + 1) / 2)
+            if is_duplicate:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Identity already exists: {match.student_name} (similarity: {1 - match.distance:.2f})"
+                )
+        else:
+            try:
+                all_students = supabase.table('students').select(
+                    'id, name, facial_embedding_bin, facial_embedding'
+                ).execute()
+            except Exception as col_error:
+                if 'facial_embedding_bin' not in str(col_error):
+                    raise
+                all_students = supabase.table('students').select('id, name, facial_embedding').execute()
+            
+            for s in (all_students.data or []):
+                stored_emb = embedding_from_row(s)
+                if stored_emb is not None:
+                    similarity = ai_service.cosine_similarity(embedding, stored_emb)
+                    
+                    # Duplicate threshold: 0.90
+                    if similarity >= 0.90:
+                        raise HTTPException(
+                            status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Identity already exists: {s['name']} (similarity: {similarity:.2f})"
+                        )
         
         # Step 5: Store in database
         student_data = {
             'name': request.name,
             'student_id_card_number': request.student_id_card_number,
-            'facial_embedding': embedding.tolist()
+            **embedding_columns(embedding)
         }
         
-        # Try to store image if column exists
-        try:
-            student_data['face_image_base64'] = request.face_image
-            result = supabase.table('students').insert(student_data).execute()
-        except Exception as img_error:
-            if 'face_image_base64' in str(img_error):
-                print("⚠️ face_image_base64 column not found, storing without image")
-                del student_data['face_image_base64']
-                result = supabase.table('students').insert(student_data).execute()
-            else:
-                raise
+        # Photo goes to the blob store; the row only keeps its digest
+        student_data['face_image_hash'] = get_blob_store().put_image_base64(request.face_image)
+        result = insert_student_row(supabase, student_data, embedding)
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -137,16 +194,19 @@ async def enroll_student(request: EnrollRequest):
             )
         
         student_id = result.data[0]['id']
-        
-        # Step 6: Add to FAISS vector index for fast search (optional)
-        try:
-            vector_search = get_vector_search()
-            vector_search.add_embedding(student_id, request.name, embedding)
-            vector_search.save()
-            print(f"✓ Added student {student_id} to FAISS index")
-        except Exception as e:
-            print(f"⚠️ Failed to add to FAISS index: {e}")
-            # Don't fail enrollment if FAISS fails
+        get_record_cache().invalidate_student(card_number=request.student_id_card_number)
+        
+        # Step 6: Add to the FAISS index for fast search (optional);
+        # pgvector rows already carry their vector from the insert
+        if settings.VECTOR_SEARCH_BACKEND != 'pgvector':
+            try:
+                vector_search = get_vector_search()
+                vector_search.add_embedding(student_id, request.name, embedding)
+                vector_search.save()
+                print(f"✓ Added student {student_id} to FAISS index")
+            except Exception as e:
+                print(f"⚠️ Failed to add to FAISS index: {e}")
+                # Don't fail enrollment if the vector index fails
         
         return EnrollResponse(
             success=True,
@@ -167,9 +227,13 @@ async def enroll_student(request: EnrollRequest):
 # ============== Session Management Endpoints ==============
 
 @router.post("/session/start/{class_id}", response_model=StartSessionResponse)
-async def start_attendance_session(class_id: str):
+async def start_attendance_session(class_id: str, reference: Optional[SessionReferenceRequest] = None):
     """
     Start an attendance session for a class.
+    
+    The optional body carries the teacher's GPS fix, beacon UUID and
+    barometric pressure; /verify checks students against these for the
+    session's lifetime. Readings left out fall back to CLASSROOM_* settings.
     """
     try:
         supabase = get_supabase()
@@ -197,16 +261,31 @@ async def start_attendance_session(class_id: str):
         expires_at = datetime.utcnow() + timedelta(seconds=settings.OTP_TTL_SECONDS)
         
         # Create attendance session record
-        supabase.table('attendance_sessions').insert({
+        session_insert = supabase.table('attendance_sessions').insert({
             'session_id': session_id,
             'class_id': class_db_id,
             'expires_at': expires_at.isoformat(),
             'status': 'active'
         }).execute()
         
-        # Generate OTPs for all students
-        if student_ids:
-            await otp_service.generate_class_otps(session_id, student_ids)
+        # Prime the record cache so the first /verify doesn't have to look it up
+        if session_insert.data:
+            get_record_cache().put_session(session_insert.data[0])
+        
+        # Register the classroom reference so sensor checks never hit the database
+        reference = reference or SessionReferenceRequest()
+        await get_session_reference_registry().register(SessionReference.from_readings(
+            session_id,
+            latitude=reference.latitude,
+            longitude=reference.longitude,
+            gps_accuracy=reference.gps_accuracy,
+            beacon_uuid=reference.beacon_uuid,
+            pressure_hpa=reference.barometric_pressure
+        ))
+        
+        # Generate OTPs for all students (in derived mode this also creates the
+        # session secret, so it runs even for an empty class)
+        await otp_service.generate_class_otps(session_id, student_ids)
         
         return StartSessionResponse(
             success=True,
@@ -224,55 +303,74 @@ async def start_attendance_session(class_id: str):
         )
 
 
+@router.post("/session/{session_id}/end")
+async def end_attendance_session(session_id: str):
+    """
+    End an attendance session: mark it completed and revoke its classroom
+    reference so no later check is made against the teacher's readings.
+    """
+    try:
+        supabase = get_supabase()
+        
+        result = supabase.table('attendance_sessions').update({
+            'status': 'completed'
+        }).eq('session_id', session_id).execute()
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+        
+        get_record_cache().invalidate_session(session_id)
+        await get_session_reference_registry().remove(session_id)
+        
+        return {"message": "Session ended successfully", "session_id": session_id}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to end session: {str(e)}"
+        )
+
+
 @router.get("/session/{session_id}/otp/{student_id}")
 async def get_student_otp(session_id: str, student_id: str):
     """
     Get OTP for a specific student. If no OTP exists, generate one.
     """
-    supabase = get_supabase()
+    record_cache = get_record_cache()
     otp_service = get_otp_service()
     
     # First check if student exists
-    student_result = supabase.table('students').select('id, name, student_id_card_number').eq(
-        'student_id_card_number', student_id
-    ).execute()
+    student = record_cache.get_student(student_id)
     
-    if not student_result.data or len(student_result.data) == 0:
+    if student is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found. Please check your Student ID."
         )
     
-    student = student_result.data[0]
-    
     # Check if session exists
-    session_result = supabase.table('attendance_sessions').select('id, status').eq(
-        'session_id', session_id
-    ).execute()
-    
-    if not session_result.data or len(session_result.data) == 0:
+    if record_cache.get_session(session_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found. Please check the Session ID."
         )
     
-    # Get OTP from cache
-    key = f"otp:{session_id}:{student_id}"
-    otp = await otp_service.cache.get(key)
-    
-    # If no OTP exists, generate one for this student
+    # Get OTP (generated on demand if this student doesn't have one yet)
+    otp, remaining_seconds = await otp_service.get_or_create_otp(session_id, student_id)
     if otp is None:
-        otp = otp_service.generate_otp()
-        await otp_service.cache.set(key, otp, settings.OTP_TTL_SECONDS)
-        # Initialize resend counter
-        resend_key = f"otp_resend:{session_id}:{student_id}"
-        await otp_service.cache.set(resend_key, 0, settings.OTP_TTL_SECONDS * 10)
-    
-    ttl = await otp_service.get_remaining_ttl(session_id, student_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session expired. Please ask your teacher to start a new session."
+        )
     
     return {
         "otp": otp,
-        "remaining_seconds": ttl if ttl > 0 else settings.OTP_TTL_SECONDS,
+        "remaining_seconds": remaining_seconds,
         "student_id": student_id,
         "student_name": student['name']
     }
@@ -280,6 +378,50 @@ async def get_student_otp(session_id: str, student_id: str):
 
 # ============== Verification Endpoints ==============
 
+def motion_liveness_check(request: VerifyRequest, ai_service) -> Optional[CorrelationResult]:
+    """
+    Correlate the request's camera frames with its motion samples (the binary
+    motion_payload if present, else the JSON lists). Blocking (decoding +
+    optical flow) - run it in the inference executor.
+    
+    Returns:
+        CorrelationResult, or None if the device sent no frames or motion data
+    """
+    if not request.frames_base64 or not request.frame_timestamps:
+        return None
+    
+    if request.motion_payload:
+        try:
+            motion_data = decode_motion(request.motion_payload)
+        except MotionCodecError as e:
+            return CorrelationResult(
+                correlation_coefficient=0.0,
+                p_value=1.0,
+                is_live=False,
+                message=f"Invalid motion payload: {e}",
+                optical_flow_magnitude=[],
+                motion_magnitude=[]
+            )
+    else:
+        motion_series = [
+            request.motion_timestamps,
+            request.accelerometer_x, request.accelerometer_y, request.accelerometer_z,
+            request.gyroscope_x, request.gyroscope_y, request.gyroscope_z
+        ]
+        if any(not series for series in motion_series):
+            return None
+        motion_data = MotionData(*motion_series)
+    
+    frames, frame_timestamps = [], []
+    for timestamp, frame_b64 in zip(request.frame_timestamps, request.frames_base64):
+        frame = ai_service.decode_base64_image(frame_b64)
+        if frame is not None:
+            frames.append(frame)
+            frame_timestamps.append(timestamp)
+    
+    return get_motion_image_correlator().verify_liveness(frames, frame_timestamps, motion_data)
+
+
 @router.post("/verify", response_model=VerifyResponse)
 async def verify_attendance(request: VerifyRequest):
     """
@@ -288,10 +430,13 @@ async def verify_attendance(request: VerifyRequest):
     - CLAHE preprocessing for lighting normalization
     - Cosine similarity with 0.6 threshold
     - Geofencing (50-meter radius)
+    - BLE proximity / barometer checks before any model runs
+    - Face embedding and motion-image liveness in parallel (inference executor)
     - Proxy detection with account locking
     """
     try:
         supabase = get_supabase()
+        record_cache = get_record_cache()
         otp_service = get_otp_service()
         geofence_service = get_geofence_service()
         cache = otp_service.cache
@@ -300,12 +445,10 @@ async def verify_attendance(request: VerifyRequest):
         from app.services.ai_service import get_ai_service
         ai_service = get_ai_service()
         
-        # Step 1: Verify student exists
-        student_result = supabase.table('students').select('*').eq(
-            'student_id_card_number', request.student_id
-        ).execute()
+        # Step 1: Verify student exists (projected row from read-through cache)
+        student = record_cache.get_student(request.student_id)
         
-        if not student_result.data or len(student_result.data) == 0:
+        if student is None:
             return VerifyResponse(
                 success=False,
                 factors={
@@ -319,15 +462,14 @@ async def verify_attendance(request: VerifyRequest):
                 message="Student not found"
             )
         
-        student = student_result.data[0]
         student_id = student['id']
         student_name = student['name']
         
         # Step 1.5: Check if student is approved
-        approval_status = student.get('approval_status', 'approved')  # Default to approved for existing students
+        approval_status = student['approval_status']
         if approval_status != 'approved':
             if approval_status == 'rejected':
-                rejection_reason = student.get('rejection_reason', 'No reason provided')
+                rejection_reason = student['rejection_reason'] or 'No reason provided'
                 return VerifyResponse(
                     success=False,
                     factors={
@@ -356,10 +498,9 @@ async def verify_attendance(request: VerifyRequest):
         
         # Step 2: Check if account is locked
         lock_key = f"account_locked:{request.student_id}"
-        is_locked = await cache.get(lock_key)
+        lock_ttl = await cache.ttl(lock_key)  # -2 = not locked; one round trip either way
         
-        if is_locked:
-            lock_ttl = await cache.ttl(lock_key)
+        if lock_ttl != -2:
             minutes_remaining = max(1, lock_ttl // 60)
             return VerifyResponse(
                 success=False,
@@ -384,21 +525,21 @@ async def verify_attendance(request: VerifyRequest):
         )
         otp_verified = otp_result.valid
         
-        # Step 4: Verify Geofence (if coordinates provided)
+        # Step 4: Verify Geofence (if coordinates provided) against the
+        # session's reference, held in memory since the session started
+        reference = await get_session_reference_registry().resolve(request.session_id)
         geofence_verified = True
         distance_meters = None
         
         if request.latitude is not None and request.longitude is not None:
-            # Get classroom coordinates from settings
-            from app.core.config import settings
-            
-            if settings.CLASSROOM_LATITUDE and settings.CLASSROOM_LONGITUDE:
-                is_within, distance = geofence_service.is_within_geofence(
+            if reference.has_location:
+                radius_meters = reference.geofence_radius(settings.GEOFENCE_RADIUS_METERS)
+                is_within, distance, _ = geofence_service.check_location(
                     request.latitude,
                     request.longitude,
-                    settings.CLASSROOM_LATITUDE,
-                    settings.CLASSROOM_LONGITUDE,
-                    settings.GEOFENCE_RADIUS_METERS
+                    reference.latitude,
+                    reference.longitude,
+                    radius_meters
                 )
                 geofence_verified = is_within
                 distance_meters = distance
@@ -415,46 +556,50 @@ async def verify_attendance(request: VerifyRequest):
                             'geofence_verified': False,
                             'distance_meters': distance_meters
                         },
-                        message=f"Location verification failed. You are {distance:.0f}m from classroom (max 50m)."
+                        message=f"Location verification failed. You are {distance:.0f}m from classroom (max {radius_meters:.0f}m)."
                     )
         
+        # Step 4.5: BLE proximity and barometer - cheap, so a spoofed location
+        # is rejected before the face model or optical flow runs
+        sensor_check = get_sensor_validation_service().validate_classroom_sensors(
+            ble_rssi=request.ble_rssi,
+            ble_beacon_uuid=request.ble_beacon_uuid,
+            student_pressure=request.barometric_pressure,
+            reference=reference
+        )
+        sensor_factors = {}
+        if sensor_check.ble_result is not None:
+            sensor_factors['ble_verified'] = sensor_check.ble_result.passed
+            sensor_factors['ble_rssi'] = request.ble_rssi
+        if sensor_check.barometer_result is not None:
+            sensor_factors['barometer_verified'] = sensor_check.barometer_result.passed
+            sensor_factors['pressure_difference_hpa'] = sensor_check.barometer_result.value
+        
+        if sensor_check.failed_sensors:
+            failures = [
+                result.message for result in (sensor_check.ble_result, sensor_check.barometer_result)
+                if result is not None and not result.passed
+            ]
+            return VerifyResponse(
+                success=False,
+                factors={
+                    'face_verified': False,
+                    'face_confidence': 0.0,
+                    'liveness_passed': False,
+                    'id_verified': id_verified,
+                    'otp_verified': otp_verified,
+                    'geofence_verified': geofence_verified,
+                    'distance_meters': distance_meters,
+                    **sensor_factors
+                },
+                message=f"Proximity verification failed: {'; '.join(failures)}"
+            )
+        
         # Step 5: Emotion-based Liveness Check (Smile-to-Verify)
         emotion_detected = None
         emotion_confidence = None
         liveness_passed = True  # Default to true if emotion check disabled
         
-        if settings.REQUIRE_SMILE:
-            emotion_service = get_emotion_service()
-            
-            if emotion_service.is_available():
-                # Decode image for emotion check
-                image = ai_service.decode_base64_image(request.face_image)
-                
-                if image is not None:
-                    is_smiling, smile_conf, emotions = emotion_service.check_smile(image)
-                    dominant_emotion, emotion_conf = emotion_service.get_dominant_emotion(emotions)
-                    
-                    emotion_detected = dominant_emotion
-                    emotion_confidence = emotion_conf
-                    liveness_passed = is_smiling
-                    
-                    if not is_smiling:
-                        feedback = emotion_service.format_emotion_feedback(emotions)
-                        return VerifyResponse(
-                            success=False,
-                            factors={
-                                'face_verified': False,
-                                'face_confidence': 0.0,
-                                'liveness_passed': False,
-                                'id_verified': id_verified,
-                                'otp_verified': otp_verified,
-                                'geofence_verified': geofence_verified,
-                                'distance_meters': distance_meters
-                            },
-                            message=f"Liveness check failed: {feedback}"
-                        )
-        
-        # Step 6: Extract face embedding using modern AI (128-d)
         image = ai_service.decode_base64_image(request.face_image)
         if image is None:
             return VerifyResponse(
@@ -466,13 +611,75 @@ async def verify_attendance(request: VerifyRequest):
                     'id_verified': id_verified,
                     'otp_verified': otp_verified,
                     'geofence_verified': geofence_verified,
-                    'distance_meters': distance_meters
+                    'distance_meters': distance_meters,
+                    **sensor_factors
                 },
                 message="Invalid image format"
             )
         
-        # Extract 128-dimensional embedding with CLAHE preprocessing
-        current_embedding = ai_service.extract_128d_embedding(image)
+        # One landmarker pass (landmarks + blendshapes) shared by the smile
+        # check and face alignment
+        face = await run_inference(get_preprocessor().analyze, image)
+        
+        if settings.REQUIRE_SMILE:
+            emotion_service = get_emotion_service()
+            
+            if emotion_service.is_available():
+                # face is this frame's landmarker result: no face fails at once
+                is_smiling, smile_conf, emotions = await run_inference(
+                    emotion_service.check_smile, image, face, analyzed=True
+                )
+                dominant_emotion, emotion_conf = emotion_service.get_dominant_emotion(emotions)
+                
+                emotion_detected = dominant_emotion
+                emotion_confidence = emotion_conf
+                liveness_passed = is_smiling
+                
+                if not is_smiling:
+                    feedback = emotion_service.format_emotion_feedback(emotions)
+                    return VerifyResponse(
+                        success=False,
+                        factors={
+                            'face_verified': False,
+                            'face_confidence': 0.0,
+                            'liveness_passed': False,
+                            'id_verified': id_verified,
+                            'otp_verified': otp_verified,
+                            'geofence_verified': geofence_verified,
+                            'distance_meters': distance_meters,
+                            **sensor_factors
+                        },
+                        message=f"Liveness check failed: {feedback}"
+                    )
+        
+        # Step 6: Extract face embedding using modern AI (128-d)
+        # Extract the 128-d embedding (CLAHE preprocessing) and run the
+        # motion-image liveness check side by side in the inference executor
+        current_embedding, motion_result = await asyncio.gather(
+            run_inference(ai_service.extract_128d_embedding, image, face),
+            run_inference(motion_liveness_check, request, ai_service)
+        )
+        
+        if motion_result is not None:
+            correlation = motion_result.correlation_coefficient
+            sensor_factors['motion_correlation_verified'] = motion_result.is_live
+            sensor_factors['motion_correlation'] = correlation if np.isfinite(correlation) else 0.0
+            
+            if not motion_result.is_live:
+                return VerifyResponse(
+                    success=False,
+                    factors={
+                        'face_verified': False,
+                        'face_confidence': 0.0,
+                        'liveness_passed': False,
+                        'id_verified': id_verified,
+                        'otp_verified': otp_verified,
+                        'geofence_verified': geofence_verified,
+                        'distance_meters': distance_meters,
+                        **sensor_factors
+                    },
+                    message=f"Liveness check failed: {motion_result.message}"
+                )
         
         if current_embedding is None:
             return VerifyResponse(
@@ -484,16 +691,17 @@ async def verify_attendance(request: VerifyRequest):
                     'id_verified': id_verified,
                     'otp_verified': otp_verified,
                     'geofence_verified': geofence_verified,
-                    'distance_meters': distance_meters
+                    'distance_meters': distance_meters,
+                    **sensor_factors
                 },
                 message="Face extraction failed - no face detected"
             )
         
         # Step 7: Verify face using cosine similarity (threshold: 0.6)
-        stored_embedding = np.array(student['facial_embedding'])
+        stored_embedding = student['embedding']
         
         # Verify dimensions match
-        if len(stored_embedding) != 128:
+        if stored_embedding is None or len(stored_embedding) != 128:
             return VerifyResponse(
                 success=False,
                 factors={
@@ -503,9 +711,10 @@ async def verify_attendance(request: VerifyRequest):
                     'id_verified': id_verified,
                     'otp_verified': otp_verified,
                     'geofence_verified': geofence_verified,
-                    'distance_meters': distance_meters
+                    'distance_meters': distance_meters,
+                    **sensor_factors
                 },
-                message=f"Invalid stored embedding dimension: {len(stored_embedding)}"
+                message=f"Invalid stored embedding dimension: {0 if stored_embedding is None else len(stored_embedding)}"
             )
         
         # Use cosine similarity with 0.6 threshold
@@ -515,18 +724,16 @@ async def verify_attendance(request: VerifyRequest):
             threshold=0.6
         )
         
+        # Session row is needed by both the proxy and the attendance paths
+        session_row = record_cache.get_session(request.session_id)
+        session_db_id = session_row['id'] if session_row else None
+        
         # Step 8: Detect proxy attempt (OTP valid but face doesn't match)
         if otp_verified and not face_verified:
             # This is a proxy attempt - someone else is trying to mark attendance
             # Lock the account for 60 minutes
             await cache.set(lock_key, "locked", 3600)  # 3600 seconds = 60 minutes
             
-            # Get session ID from database
-            session_result = supabase.table('attendance_sessions').select('id').eq(
-                'session_id', request.session_id
-            ).execute()
-            session_db_id = session_result.data[0]['id'] if session_result.data else None
-            
             # Log critical security anomaly
             if session_db_id:
                 supabase.table('anomalies').insert({
@@ -546,6 +753,19 @@ async def verify_attendance(request: VerifyRequest):
                     'otp_verified': otp_verified
                 }).execute()
             
+            # Notify the class/session dashboards and the anomaly feed (on every worker)
+            dashboards = get_connection_manager()
+            class_id = session_row.get('class_id') if session_row else None
+            await dashboards.broadcast_attendance_update(
+                student_id, student_name, request.student_id, 'failed', face_confidence,
+                is_biometric_mismatch=True, class_id=class_id, session_id=request.session_id
+            )
+            await dashboards.broadcast_anomaly_alert(
+                student_id, student_name, 'proxy_attempt',
+                f"OTP verified but face mismatch (confidence: {face_confidence:.2f})",
+                face_confidence=face_confidence, class_id=class_id, session_id=request.session_id
+            )
+            
             return VerifyResponse(
                 success=False,
                 factors={
@@ -555,7 +775,8 @@ async def verify_attendance(request: VerifyRequest):
                     'id_verified': id_verified,
                     'otp_verified': otp_verified,
                     'geofence_verified': geofence_verified,
-                    'distance_meters': distance_meters
+                    'distance_meters': distance_meters,
+                    **sensor_factors
                 },
                 message="SECURITY ALERT: Proxy attempt detected. Account locked for 60 minutes. Contact administrator."
             )
@@ -563,13 +784,7 @@ async def verify_attendance(request: VerifyRequest):
         # Step 9: Determine overall success (now includes liveness)
         success = id_verified and otp_verified and face_verified and geofence_verified and liveness_passed
         
-        # Step 10: Get session ID from database
-        session_result = supabase.table('attendance_sessions').select('id').eq(
-            'session_id', request.session_id
-        ).execute()
-        session_db_id = session_result.data[0]['id'] if session_result.data else None
-        
-        # Step 11: Record attendance with emotion data
+        # Step 10: Record attendance with emotion data
         if session_db_id:
             # Check if attendance already exists for this student+session
             existing_attendance = supabase.table('attendance').select('id, verification_status').eq(
@@ -589,7 +804,8 @@ async def verify_attendance(request: VerifyRequest):
                             'id_verified': id_verified,
                             'otp_verified': otp_verified,
                             'geofence_verified': geofence_verified,
-                            'distance_meters': distance_meters
+                            'distance_meters': distance_meters,
+                            **sensor_factors
                         },
                         message="Attendance already recorded for this session. You cannot verify twice."
                     )
@@ -640,6 +856,22 @@ async def verify_attendance(request: VerifyRequest):
                     'anomaly_type': anomaly_type,
                     'face_confidence': face_confidence
                 }).execute()
+            
+            # Notify the class/session dashboards (on every worker)
+            dashboards = get_connection_manager()
+            class_id = session_row.get('class_id')
+            await dashboards.broadcast_attendance_update(
+                student_id, student_name, request.student_id,
+                'verified' if success else 'failed', face_confidence,
+                class_id=class_id, session_id=request.session_id
+            )
+            if not success and not (otp_verified and not face_verified):
+                await dashboards.broadcast_anomaly_alert(
+                    student_id, student_name, 'verification_failed',
+                    f"Face: {face_verified}, OTP: {otp_verified}, Geofence: {geofence_verified}",
+                    face_confidence=face_confidence, distance_meters=distance_meters,
+                    class_id=class_id, session_id=request.session_id
+                )
         
         # Build success message
         if success:
@@ -665,7 +897,8 @@ async def verify_attendance(request: VerifyRequest):
                 'id_verified': id_verified,
                 'otp_verified': otp_verified,
                 'geofence_verified': geofence_verified,
-                'distance_meters': distance_meters
+                'distance_meters': distance_meters,
+                **sensor_factors
             },
             message=message
         )
@@ -722,7 +955,8 @@ async def get_reports(
         
         # Get attendance records with student info
         query = supabase.table('attendance').select(
-            '*, students(id, name, student_id_card_number)'
+            'id, timestamp, verification_status, face_confidence, otp_verified, '
+            'students(id, name, student_id_card_number)'
         ).order('timestamp', desc=True).limit(100)
         
         if session_id:
@@ -745,7 +979,7 @@ async def get_reports(
             ))
         
         # Get statistics
-        total_students = len(supabase.table('students').select('id').execute().data or [])
+        total_students = supabase.table('students').select('id', count='exact').limit(1).execute().count or 0
         verified_count = len([r for r in records if r.verification_status == 'verified'])
         failed_count = len([r for r in records if r.verification_status == 'failed'])
         
@@ -785,7 +1019,8 @@ async def get_anomalies(
         supabase = get_supabase()
         
         query = supabase.table('anomalies').select(
-            '*, students(id, name)'
+            'id, student_id, session_id, reason, anomaly_type, face_confidence, timestamp, reviewed, '
+            'students(id, name)'
         ).order('timestamp', desc=True).limit(limit)
         
         if session_id:
@@ -824,21 +1059,89 @@ async def get_anomalies(
 
 # ============== Student Management Endpoints ==============
 
+def face_image_url(http_request: Request, digest: Optional[str], thumbnail: bool = False) -> Optional[str]:
+    """Signed, expiring URL of a stored face image (or its thumbnail), None if the student has none."""
+    if not digest:
+        return None
+    route = 'get_face_thumbnail' if thumbnail else 'get_face_image'
+    url = http_request.url_for(route, digest=digest)
+    return str(url.include_query_params(**get_blob_store().sign(digest)))
+
+
+def is_approved(student: dict) -> bool:
+    """Rows from before the approval workflow have no status and count as approved."""
+    return student.get('approval_status') in (None, 'approved')
+
+
+def require_blob_signature(digest: str, expires: Optional[int], sig: Optional[str]) -> int:
+    """Reject blob requests without a valid signature; returns seconds until the URL expires."""
+    if not get_blob_store().verify(digest, expires, sig):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired image link"
+        )
+    return max(0, expires - int(datetime.now().timestamp()))
+
+
+@router.get("/blobs/{digest}", name="get_face_image")
+async def get_face_image(digest: str, expires: Optional[int] = None, sig: Optional[str] = None):
+    """
+    Serve an enrollment photo from the blob store.
+    Requires the signature from face_image_url; cacheable privately until it expires.
+    """
+    max_age = require_blob_signature(digest, expires, sig)
+    blob_store = get_blob_store()
+    data = blob_store.get(digest)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    return Response(
+        content=data,
+        media_type=blob_store.media_type(data),
+        headers={"Cache-Control": f"private, max-age={max_age}"}
+    )
+
+
+@router.get("/blobs/{digest}/thumbnail", name="get_face_thumbnail")
+async def get_face_thumbnail(digest: str, expires: Optional[int] = None, sig: Optional[str] = None):
+    """
+    Serve a JPEG thumbnail of an enrollment photo (signed like get_face_image).
+    """
+    max_age = require_blob_signature(digest, expires, sig)
+    data = get_blob_store().get_thumbnail(digest)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    return Response(
+        content=data,
+        media_type="image/jpeg",
+        headers={"Cache-Control": f"private, max-age={max_age}"}
+    )
+
+
 @router.get("/students")
 async def list_students(
+    http_request: Request,
     limit: int = Query(100, le=500),
-    include_images: bool = Query(False, description="Include face images in response")
+    include_images: bool = Query(False, description="Include face thumbnail URLs in response")
 ):
     """
     List all enrolled students.
-    Set include_images=true to get face photos (larger response).
+    Set include_images=true to get face thumbnail URLs (approved students only;
+    pending photos are only shown to admins via /admin/students/pending).
     """
     try:
         supabase = get_supabase()
         
         # Select fields based on whether images are requested
         if include_images:
-            fields = 'id, name, student_id_card_number, face_image_base64, created_at'
+            fields = 'id, name, student_id_card_number, face_image_hash, approval_status, created_at'
         else:
             fields = 'id, name, student_id_card_number, created_at'
         
@@ -852,8 +1155,9 @@ async def list_students(
                 "student_id_card_number": s['student_id_card_number'],
                 "created_at": s['created_at']
             }
-            if include_images and 'face_image_base64' in s:
-                student_data['face_image'] = s['face_image_base64']
+            if include_images:
+                digest = s.get('face_image_hash') if is_approved(s) else None
+                student_data['face_image'] = face_image_url(http_request, digest, thumbnail=True)
             students.append(student_data)
         
         return {"students": students, "count": len(students)}
@@ -869,18 +1173,19 @@ async def list_students(
 @router.get("/students/{student_id}")
 async def get_student(
     student_id: int,
-    include_image: bool = Query(False, description="Include face image in response")
+    http_request: Request,
+    include_image: bool = Query(False, description="Include face image URL in response")
 ):
     """
     Get student details by ID.
-    Set include_image=true to get face photo.
+    Set include_image=true to get the face photo URL (approved students only).
     """
     try:
         supabase = get_supabase()
         
         # Select fields based on whether image is requested
         if include_image:
-            fields = '*'
+            fields = 'id, name, student_id_card_number, face_image_hash, approval_status, created_at, updated_at'
         else:
             fields = 'id, name, student_id_card_number, created_at, updated_at'
         
@@ -901,8 +1206,9 @@ async def get_student(
             "updated_at": student.get('updated_at')
         }
         
-        if include_image and 'face_image_base64' in student:
-            response['face_image'] = student['face_image_base64']
+        if include_image:
+            digest = student.get('face_image_hash') if is_approved(student) else None
+            response['face_image'] = face_image_url(http_request, digest)
         
         return response
         
@@ -932,6 +1238,7 @@ async def delete_student(student_id: int):
             )
         
         supabase.table('students').delete().eq('id', student_id).execute()
+        get_record_cache().invalidate_student(student_id=student_id)
         
         return {"message": "Student deleted successfully"}
         
@@ -991,15 +1298,11 @@ async def unlock_session(session_key: str, faculty_id: int):
     Unlock a locked verification session (faculty action).
     """
     try:
-        supabase = get_supabase()
-        
-        result = supabase.table('verification_sessions').update({
-            'locked': False,
-            'unlocked_by': faculty_id,
-            'unlocked_at': datetime.utcnow().isoformat()
-        }).eq('id', session_key).eq('locked', True).execute()
+        # Clears the cached strikes and lock, drops any queued lock write and
+        # upserts the unlock into the audit row
+        was_locked = await get_anomaly_service().unlock_session(None, session_key, faculty_id)
         
-        if not result.data:
+        if not was_locked:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found or not locked"
@@ -1028,18 +1331,15 @@ async def unlock_student_account(student_id: str):
         
         lock_key = f"account_locked:{student_id}"
         
-        # Check if account is locked
-        is_locked = await cache.get(lock_key)
+        # Unlock the account (delete_many reports whether a lock existed)
+        removed = await cache.delete_many([lock_key])
         
-        if not is_locked:
+        if not removed:
             return {
                 "success": False,
                 "message": "Account is not locked"
             }
         
-        # Unlock the account
-        await cache.delete(lock_key)
-        
         return {
             "success": True,
             "message": f"Account {student_id} unlocked successfully"
@@ -1178,13 +1478,13 @@ async def register_student(request: RegisterRequest, current_user: dict = Depend
         student_data = {
             "name": request.name,
             "student_id_card_number": request.student_id_card_number,
-            "facial_embedding": embedding.tolist(),
-            "face_image_base64": request.face_image,
+            **embedding_columns(embedding),
+            "face_image_hash": get_blob_store().put_image_base64(request.face_image),
             "user_id": user["id"],
             "approval_status": "pending"
         }
         
-        student_response = supabase.table('students').insert(student_data).execute()
+        student_response = insert_student_row(supabase, student_data, embedding)
         
         if not student_response.data or len(student_response.data) == 0:
             raise HTTPException(
@@ -1193,6 +1493,7 @@ async def register_student(request: RegisterRequest, current_user: dict = Depend
             )
         
         student_id = student_response.data[0]["id"]
+        get_record_cache().invalidate_student(card_number=request.student_id_card_number)
         
         return RegisterResponse(
             success=True,
@@ -1312,7 +1613,7 @@ async def update_teacher(teacher_id: int, request: UpdateTeacherRequest, current
 
 
 @router.get("/admin/students/pending", response_model=List[PendingStudentResponse])
-async def list_pending_students(current_user: dict = Depends(require_admin)):
+async def list_pending_students(http_request: Request, current_user: dict = Depends(require_admin)):
     """
     List pending student registrations (admin only)
     """
@@ -1320,6 +1621,9 @@ async def list_pending_students(current_user: dict = Depends(require_admin)):
         admin_service = get_admin_service()
         students = await admin_service.list_pending_students()
         
+        for student in students:
+            student['face_image_url'] = face_image_url(http_request, student.pop('face_image_hash', None), thumbnail=True)
+        
         return [PendingStudentResponse(**student) for student in students]
         
     except Exception as e:
@@ -1340,6 +1644,7 @@ async def approve_student(student_id: int, current_user: dict = Depends(require_
             student_id=student_id,
             admin_id=current_user["id"]
         )
+        get_record_cache().invalidate_student(student_id=student_id)
         
         return StudentApprovalResponse(
             success=True,
@@ -1367,6 +1672,7 @@ async def reject_student(student_id: int, request: RejectStudentRequest, current
             admin_id=current_user["id"],
             reason=request.reason
         )
+        get_record_cache().invalidate_student(student_id=request.student_id)
         
         return StudentApprovalResponse(
             success=True,
@@ -1499,6 +1805,7 @@ async def update_student_profile(request: UpdateStudentProfileRequest, current_u
             student_id=student["id"],
             name=request.name
         )
+        get_record_cache().invalidate_student(student_id=student["id"])
         
         # Get full profile
         student = await student_service.get_student_by_user_id(current_user["id"])
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.orm import Session
 from ..database import get_db
+from ..services.session_reference import SessionReference, get_session_reference_registry
 from ..utils.geofencing import GeofencingService
 import logging
 
@@ -42,11 +43,18 @@ class LocationVerificationRequest(BaseModel):
     wifi_ssid: Optional[str] = None
 
 
+async def get_session_location(session_id: str) -> SessionReference:
+    """Session's registered reference; 404 unless it is active and has a location."""
+    reference = await get_session_reference_registry().get(session_id)
+    if reference is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    if not reference.has_location:
+        raise HTTPException(status_code=404, detail="No classroom location registered for this session")
+    return reference
+
+
 @router.post("/verify-gps")
-async def verify_gps_location(
-    request: GPSVerificationRequest,
-    db: Session = Depends(get_db)
-):
+async def verify_gps_location(request: GPSVerificationRequest):
     """
     Verify student location using GPS coordinates.
     
@@ -56,39 +64,27 @@ async def verify_gps_location(
         - message: str
     """
     try:
-        # Get session from database
-        session = db.execute(
-            """
-            SELECT s.id, s.session_id, 
-                   u.id as teacher_id,
-                   -- Mock teacher location (in production, store with session)
-                   28.6139 as teacher_lat,
-                   77.2090 as teacher_lon
-            FROM attendance_sessions s
-            LEFT JOIN users u ON s.teacher_id = u.id
-            WHERE s.session_id = :session_id AND s.status = 'active'
-            """,
-            {"session_id": request.session_id}
-        ).fetchone()
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found or expired")
+        # Teacher location registered when the session started (no DB round trip)
+        reference = await get_session_location(request.session_id)
         
         # Verify geofence
+        max_distance = reference.geofence_radius(GeofencingService.MAX_DISTANCE_METERS)
         if request.accuracy:
             result = GeofencingService.verify_with_accuracy(
                 request.latitude,
                 request.longitude,
-                session.teacher_lat,
-                session.teacher_lon,
-                request.accuracy
+                reference.latitude,
+                reference.longitude,
+                request.accuracy,
+                max_distance
             )
         else:
             result = GeofencingService.verify_geofence(
                 request.latitude,
                 request.longitude,
-                session.teacher_lat,
-                session.teacher_lon
+                reference.latitude,
+                reference.longitude,
+                max_distance
             )
         
         logger.info(f"GPS verification for {request.student_id}: {result}")
@@ -166,23 +162,8 @@ async def verify_location_comprehensive(
     3. Return verification result with method used
     """
     try:
-        # Get session and teacher location
-        session = db.execute(
-            """
-            SELECT s.id, s.session_id, 
-                   u.id as teacher_id,
-                   -- Mock teacher location (in production, store with session)
-                   28.6139 as teacher_lat,
-                   77.2090 as teacher_lon
-            FROM attendance_sessions s
-            LEFT JOIN users u ON s.teacher_id = u.id
-            WHERE s.session_id = :session_id AND s.status = 'active'
-            """,
-            {"session_id": request.session_id}
-        ).fetchone()
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found or expired")
+        # Teacher location registered when the session started (no DB round trip)
+        reference = await get_session_location(request.session_id)
         
         # Get whitelisted WiFi SSIDs
         whitelisted = db.execute(
@@ -197,12 +178,13 @@ async def verify_location_comprehensive(
         result = GeofencingService.verify_location(
             request.latitude,
             request.longitude,
-            session.teacher_lat,
-            session.teacher_lon,
+            reference.latitude,
+            reference.longitude,
             request.accuracy,
             request.gps_failure_count,
             request.wifi_ssid,
-            whitelisted_ssids
+            whitelisted_ssids,
+            reference.geofence_radius(GeofencingService.MAX_DISTANCE_METERS)
         )
         
         logger.info(f"Location verification for {request.student_id}: {result}")
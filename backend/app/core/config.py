@@ -17,32 +17,83 @@ class Settings(BaseSettings):
     SUPABASE_ANON_KEY: Optional[str] = None
     SUPABASE_SERVICE_KEY: Optional[str] = None
     SUPABASE_JWT_SECRET: Optional[str] = None  # For JWT verification
+    SUPABASE_JWKS_URL: Optional[str] = None  # Defaults to <SUPABASE_URL>/auth/v1/.well-known/jwks.json
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    JWKS_CACHE_SECONDS: int = 600
+    JWT_LEEWAY_SECONDS: int = 10
+    USER_PROFILE_CACHE_TTL_SECONDS: int = 60
     
     # Redis Cache (optional - falls back to in-memory)
     REDIS_URL: str = "redis://localhost:6379/0"
     USE_REDIS: bool = False
     
+    # In-process L1 in front of Redis, invalidated across workers via pub/sub
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10_000
+    CACHE_L1_TTL_SECONDS: float = 2.0
+    CACHE_INVALIDATION_CHANNEL: str = "isavs:cache:invalidate"
+    
+    # In-memory cache (used when USE_REDIS=false)
+    MEMORY_CACHE_MAX_ENTRIES: int = 100_000
+    MEMORY_CACHE_SHARDS: int = 16
+    MEMORY_CACHE_SWEEP_INTERVAL_SECONDS: float = 1.0
+    
+    # Read-through record cache for /verify (student and session rows)
+    STUDENT_CACHE_TTL_SECONDS: int = 300
+    SESSION_CACHE_TTL_SECONDS: int = 120
+    
+    # Face image blob store (content-addressed, local filesystem)
+    BLOB_STORE_DIR: str = "blob_store"
+    FACE_THUMBNAIL_SIZE: int = 160  # Longest side in pixels
+    BLOB_URL_TTL_SECONDS: int = 3600  # Lifetime of signed face image URLs
+    
     # OTP Settings
     OTP_TTL_SECONDS: int = 60  # 60 seconds as per 2026 spec
     OTP_MAX_RESEND_ATTEMPTS: int = 2
+    OTP_MODE: str = "stored"  # "stored" (per-student cache entries) or "derived" (HMAC of one session secret)
+    OTP_SESSION_TTL_SECONDS: int = 3600  # Lifetime of a derived-mode session secret
     
     # Face Recognition (Cosine Similarity with 0.6 threshold)
     FACE_SIMILARITY_THRESHOLD: float = 0.6
+    EMBEDDING_STORAGE_DTYPE: str = "float32"  # float32 or float16 (facial_embedding_bin)
+    EMBEDDING_DIMENSION: int = 128  # DeepFace Facenet
+    
+    # Vector search engine: "faiss" (per-process index) or "pgvector" (shared, in Postgres)
+    VECTOR_SEARCH_BACKEND: str = "faiss"
     
     # Geofencing
     GEOFENCE_RADIUS_METERS: float = 50.0  # 50 meter radius
+    GEOFENCE_MAX_ACCURACY_MARGIN_METERS: float = 100.0  # Cap on widening by the teacher's GPS accuracy
+    GEOFENCE_GRID_CELL_METERS: float = 25.0  # Spatial index cell size for polygon geofences
     CLASSROOM_LATITUDE: Optional[float] = None  # Set in .env
     CLASSROOM_LONGITUDE: Optional[float] = None  # Set in .env
+    CLASSROOM_BEACON_UUID: Optional[str] = None  # BLE beacon checked by /verify when set
+    CLASSROOM_PRESSURE_HPA: Optional[float] = None  # Reference pressure checked by /verify when set
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     
+    # Dashboard WebSocket fan-out
+    WS_SEND_QUEUE_SIZE: int = 100  # Messages buffered per connection
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # "drop_oldest" or "disconnect"
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    EVENT_BUS_CHANNEL: str = "isavs:dashboard:events"  # Redis pub/sub channel (USE_REDIS=true)
+    LIVE_SESSION_TICK_SECONDS: float = 0.25  # Coalescing interval for "live:<session_id>" deltas
+    LIVE_SESSION_RECENT_EVENTS: int = 20  # Events kept per session for snapshots
+    LIVE_SESSION_IDLE_SECONDS: float = 10800  # Drop aggregates untouched this long
+    
     # Three-Strike Policy
     MAX_CONSECUTIVE_FAILURES: int = 3
+    STRIKE_STATE_TTL_SECONDS: int = 86400  # Cached strike counts / locks per session key
+    
+    # Thread pool for face embedding / optical flow (shared by all requests)
+    INFERENCE_WORKERS: int = 4
     
     # Emotion-based Liveness Detection (2026 Standard)
     REQUIRE_SMILE: bool = False  # Disabled for easier testing
     SMILE_CONFIDENCE_THRESHOLD: float = 0.7
+    EMOTION_BACKEND: str = "blendshape"  # "blendshape" (landmarker mouthSmile scores), "onnx" or "deepface"
+    EMOTION_ONNX_MODEL: str = "emotion-ferplus-8.onnx"  # FER+-style expression model for the onnx backend
     
     # CORS Origins (Dual Portal System: Teacher Port 2001, Student Port 2002)
     CORS_ORIGINS: str = "http://localhost:2001,http://localhost:2002,http://localhost:3000,http://localhost:5173"
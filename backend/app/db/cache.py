@@ -1,12 +1,18 @@
 """
 Cache Backend for OTP Storage
-Supports Redis or in-memory dict for development.
+Supports Redis or in-memory dict for development, and an in-process L1 in
+front of Redis for multi-worker deployments.
 """
 import asyncio
+import heapq
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List, Tuple
 import json
+import math
 
 from app.core.config import settings
 
@@ -19,6 +25,11 @@ class CacheBackend(ABC):
         """Set a value with TTL."""
         pass
     
+    @abstractmethod
+    async def add(self, key: str, value: Any, ttl_seconds: int) -> bool:
+        """Set a value with TTL only if the key is absent. Returns True if it was stored."""
+        pass
+    
     @abstractmethod
     async def get(self, key: str) -> Optional[Any]:
         """Get a value by key."""
@@ -38,48 +49,151 @@ class CacheBackend(ABC):
     async def ttl(self, key: str) -> int:
         """Get remaining TTL in seconds."""
         pass
+    
+    @abstractmethod
+    async def mset_with_ttl(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        """Set many values sharing one TTL in a single round trip."""
+        pass
+    
+    @abstractmethod
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values in a single round trip (None for missing keys)."""
+        pass
+    
+    @abstractmethod
+    async def incr_with_ttl(self, key: str, amount: int, ttl_seconds: int) -> int:
+        """
+        Atomically add to an integer counter and return the new value.
+        A counter created by this call expires after ttl_seconds; an existing
+        counter keeps its expiry.
+        """
+        pass
+    
+    @abstractmethod
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete many keys in a single round trip. Returns how many existed."""
+        pass
+    
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[Any], int]:
+        """Get a value and its remaining TTL (-2 if missing, -1 if no expiry)."""
+        return await self.get(key), await self.ttl(key)
+
+
+class _Shard:
+    """One slice of the in-memory keyspace with its own lock, LRU order and expiry heap."""
+    
+    __slots__ = ("lock", "entries", "expiry_heap")
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (expires_at_monotonic, value); order is least -> most recently used
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # (expires_at_monotonic, key); may hold stale items for overwritten/deleted keys
+        self.expiry_heap: List[Tuple[float, str]] = []
 
 
 class InMemoryCache(CacheBackend):
     """
     In-memory cache implementation for development/testing.
-    Thread-safe using asyncio locks.
+    
+    Features:
+    - Keyspace split across shards, each behind a short-held lock
+    - Monotonic-clock expiry, values stored as-is (no JSON round trip)
+    - Heap-based background sweeper so expired keys don't accumulate
+    - Per-shard LRU eviction once max_entries is reached
+    - Hit/miss/eviction/expiration counters
     """
     
-    def __init__(self):
-        self._store: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        shards: Optional[int] = None,
+        sweep_interval_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries or settings.MEMORY_CACHE_MAX_ENTRIES
+        self.sweep_interval_seconds = sweep_interval_seconds or settings.MEMORY_CACHE_SWEEP_INTERVAL_SECONDS
+        shard_count = max(1, shards or settings.MEMORY_CACHE_SHARDS)
+        self._shards = [_Shard() for _ in range(shard_count)]
+        self._max_per_shard = max(1, self.max_entries // shard_count)
+        self._clock = clock
+        self._sweeper: Optional[asyncio.Task] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
     
     async def set(self, key: str, value: Any, ttl_seconds: int) -> None:
         """Set a value with TTL."""
-        async with self._lock:
-            expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
-            self._store[key] = {
-                "value": json.dumps(value) if not isinstance(value, str) else value,
-                "expires_at": expires_at
-            }
+        shard = self._shard(key)
+        if ttl_seconds <= 0:
+            with shard.lock:
+                shard.entries.pop(key, None)
+            return
+        
+        expires_at = self._clock() + ttl_seconds
+        with shard.lock:
+            self._store_locked(shard, key, value, expires_at)
+    
+    async def add(self, key: str, value: Any, ttl_seconds: int) -> bool:
+        """Set a value with TTL unless a live entry exists."""
+        if ttl_seconds <= 0:
+            return False
+        
+        shard = self._shard(key)
+        with shard.lock:
+            if self._live_entry_locked(shard, key) is not None:
+                return False
+            self._store_locked(shard, key, value, self._clock() + ttl_seconds)
+            return True
+    
+    def _store_locked(self, shard: _Shard, key: str, value: Any, expires_at: float) -> None:
+        """Insert/replace an entry. Caller holds shard.lock."""
+        shard.entries[key] = (expires_at, value)
+        shard.entries.move_to_end(key)
+        heapq.heappush(shard.expiry_heap, (expires_at, key))
+        
+        # Bound memory: drop least recently used keys
+        while len(shard.entries) > self._max_per_shard:
+            shard.entries.popitem(last=False)
+            self.evictions += 1
+        
+        # Overwrites leave stale heap items behind - compact if they dominate
+        if len(shard.expiry_heap) > 2 * len(shard.entries) + 64:
+            shard.expiry_heap = [(exp, k) for k, (exp, _) in shard.entries.items()]
+            heapq.heapify(shard.expiry_heap)
+    
+    def _live_entry_locked(self, shard: _Shard, key: str) -> Optional[Tuple[float, Any]]:
+        """Return the entry if present and unexpired, dropping it if expired. Caller holds shard.lock."""
+        entry = shard.entries.get(key)
+        if entry is not None and entry[0] <= self._clock():
+            del shard.entries[key]
+            self.expirations += 1
+            return None
+        return entry
     
     async def get(self, key: str) -> Optional[Any]:
         """Get a value by key, returns None if expired or not found."""
-        async with self._lock:
-            if key not in self._store:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = self._live_entry_locked(shard, key)
+            if entry is None:
+                self.misses += 1
                 return None
             
-            entry = self._store[key]
-            if datetime.utcnow() > entry["expires_at"]:
-                del self._store[key]
-                return None
-            
-            value = entry["value"]
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            shard.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
     
     async def delete(self, key: str) -> None:
         """Delete a key."""
-        async with self._lock:
-            self._store.pop(key, None)
+        shard = self._shard(key)
+        with shard.lock:
+            shard.entries.pop(key, None)
     
     async def exists(self, key: str) -> bool:
         """Check if key exists and is not expired."""
@@ -87,40 +201,135 @@ class InMemoryCache(CacheBackend):
     
     async def ttl(self, key: str) -> int:
         """Get remaining TTL in seconds."""
-        async with self._lock:
-            if key not in self._store:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = self._live_entry_locked(shard, key)
+            if entry is None:
                 return -2  # Key doesn't exist
             
-            entry = self._store[key]
-            remaining = (entry["expires_at"] - datetime.utcnow()).total_seconds()
-            
-            if remaining <= 0:
-                del self._store[key]
-                return -2
-            
-            return int(remaining)
+            return int(entry[0] - self._clock())
+    
+    async def mset_with_ttl(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        """Set many values sharing one TTL."""
+        if ttl_seconds <= 0:
+            await self.delete_many(list(items))
+            return
+        
+        expires_at = self._clock() + ttl_seconds
+        for key, value in items.items():
+            shard = self._shard(key)
+            with shard.lock:
+                self._store_locked(shard, key, value, expires_at)
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values (None for missing keys)."""
+        return [await self.get(key) for key in keys]
+    
+    async def incr_with_ttl(self, key: str, amount: int, ttl_seconds: int) -> int:
+        """Atomically add to an integer counter and return the new value."""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = self._live_entry_locked(shard, key)
+            if entry is None:
+                value = amount
+                expires_at = self._clock() + ttl_seconds
+            else:
+                value = int(entry[1]) + amount
+                expires_at = entry[0]
+            self._store_locked(shard, key, value, expires_at)
+            return value
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete many keys. Returns how many existed."""
+        removed = 0
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                if self._live_entry_locked(shard, key) is not None:
+                    del shard.entries[key]
+                    removed += 1
+        return removed
     
     async def cleanup_expired(self) -> int:
         """Remove all expired entries. Returns count of removed entries."""
-        async with self._lock:
-            now = datetime.utcnow()
-            expired_keys = [
-                key for key, entry in self._store.items()
-                if now > entry["expires_at"]
-            ]
-            for key in expired_keys:
-                del self._store[key]
-            return len(expired_keys)
+        now = self._clock()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                heap = shard.expiry_heap
+                while heap and heap[0][0] <= now:
+                    expires_at, key = heapq.heappop(heap)
+                    entry = shard.entries.get(key)
+                    # Skip stale heap items (key re-set with a later expiry, or already gone)
+                    if entry is not None and entry[0] == expires_at:
+                        del shard.entries[key]
+                        removed += 1
+        self.expirations += removed
+        return removed
+    
+    def start_sweeper(self) -> None:
+        """Start the background task that purges expired keys."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+    
+    async def stop_sweeper(self) -> None:
+        """Stop the background sweeper."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+    
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            await self.cleanup_expired()
+    
+    def clear(self) -> None:
+        """Drop every entry."""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.expiry_heap.clear()
+    
+    def size(self) -> int:
+        """Number of stored entries (including expired ones not yet swept)."""
+        return sum(len(shard.entries) for shard in self._shards)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics."""
+        return {
+            "entries": self.size(),
+            "max_entries": self.max_entries,
+            "shards": len(self._shards),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
 
 
 class RedisCache(CacheBackend):
     """
     Redis cache implementation for production.
+    Bulk operations use pipelines (one round trip) and a Lua script for incr_with_ttl.
+    """
+    
+    # INCRBY + EXPIRE-if-new as one atomic server-side step
+    INCR_WITH_TTL_SCRIPT = """
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if redis.call('TTL', KEYS[1]) < 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    return value
     """
     
     def __init__(self, redis_url: str):
         self._redis_url = redis_url
         self._redis = None
+        self._incr_script = None
     
     async def _get_redis(self):
         """Lazy initialization of Redis connection."""
@@ -135,10 +344,14 @@ class RedisCache(CacheBackend):
         serialized = json.dumps(value) if not isinstance(value, str) else value
         await r.setex(key, ttl_seconds, serialized)
     
-    async def get(self, key: str) -> Optional[Any]:
-        """Get a value by key."""
+    async def add(self, key: str, value: Any, ttl_seconds: int) -> bool:
+        """Set a value with TTL only if absent (SET NX EX)."""
         r = await self._get_redis()
-        value = await r.get(key)
+        serialized = json.dumps(value) if not isinstance(value, str) else value
+        return bool(await r.set(key, serialized, ex=ttl_seconds, nx=True))
+    
+    @staticmethod
+    def _decode(value: Optional[str]) -> Optional[Any]:
         if value is None:
             return None
         try:
@@ -146,6 +359,20 @@ class RedisCache(CacheBackend):
         except (json.JSONDecodeError, TypeError):
             return value
     
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a value by key."""
+        r = await self._get_redis()
+        return self._decode(await r.get(key))
+    
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[Any], int]:
+        """Get a value and its remaining TTL in a single pipelined round trip."""
+        r = await self._get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.ttl(key)
+            value, ttl = await pipe.execute()
+        return self._decode(value), ttl
+    
     async def delete(self, key: str) -> None:
         """Delete a key."""
         r = await self._get_redis()
@@ -161,12 +388,330 @@ class RedisCache(CacheBackend):
         r = await self._get_redis()
         return await r.ttl(key)
     
+    async def mset_with_ttl(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        """Set many values sharing one TTL in a single pipelined round trip."""
+        if not items:
+            return
+        r = await self._get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                serialized = json.dumps(value) if not isinstance(value, str) else value
+                pipe.setex(key, ttl_seconds, serialized)
+            await pipe.execute()
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values in a single round trip."""
+        if not keys:
+            return []
+        r = await self._get_redis()
+        return [self._decode(value) for value in await r.mget(keys)]
+    
+    async def incr_with_ttl(self, key: str, amount: int, ttl_seconds: int) -> int:
+        """Atomically add to a counter, setting the TTL only when it's created."""
+        r = await self._get_redis()
+        if self._incr_script is None:
+            self._incr_script = r.register_script(self.INCR_WITH_TTL_SCRIPT)
+        return int(await self._incr_script(keys=[key], args=[amount, ttl_seconds]))
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete many keys in a single round trip."""
+        if not keys:
+            return 0
+        r = await self._get_redis()
+        return await r.delete(*keys)
+    
     async def close(self) -> None:
         """Close Redis connection."""
         if self._redis:
             await self._redis.close()
 
 
+# Marks a key known to be absent from L2 (negative L1 entry)
+_MISSING = object()
+
+
+class TieredCache(CacheBackend):
+    """
+    Redis (L2) fronted by a bounded in-process L1 for multi-worker deployments.
+    
+    - Reads are served from L1 when possible. An L1 miss fetches value and TTL
+      from Redis in one round trip and keeps it for at most l1_ttl_seconds,
+      never past the Redis expiry. Absent keys are cached as well, so the
+      per-request lock check doesn't go to Redis.
+    - Writes and deletes go to Redis first, then the keys are published on a
+      pub/sub channel and every other worker drops them from its L1.
+    - L1 is only used while the invalidation subscription is live; a worker
+      that has lost pub/sub reads straight from Redis until it resubscribes.
+    - Per-tier hit/miss counters via get_stats().
+    """
+    
+    def __init__(
+        self,
+        l2: RedisCache,
+        l1: Optional[InMemoryCache] = None,
+        l1_ttl_seconds: Optional[float] = None,
+        channel: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.l2 = l2
+        self.l1 = l1 or InMemoryCache(max_entries=settings.CACHE_L1_MAX_ENTRIES, clock=clock)
+        self.l1_ttl_seconds = l1_ttl_seconds or settings.CACHE_L1_TTL_SECONDS
+        self.channel = channel or settings.CACHE_INVALIDATION_CHANNEL
+        self._clock = clock
+        self._origin = uuid.uuid4().hex
+        # Bumped on every invalidation; an L2 read only fills L1 if it didn't change meanwhile
+        self._epoch = 0
+        self._listening = False
+        self._listener: Optional[asyncio.Task] = None
+        
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.invalidations_published = 0
+        self.invalidations_received = 0
+    
+    # ==================== Reads ====================
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a value by key."""
+        entry = await self._l1_entry(key)
+        if entry is not None:
+            self.l1_hits += 1
+            return None if entry[0] is _MISSING else entry[0]
+        value, _ = await self._read_through(key)
+        return value
+    
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[Any], int]:
+        """Get a value and its remaining TTL."""
+        entry = await self._l1_entry(key)
+        if entry is not None and (entry[0] is _MISSING or entry[1] is not None):
+            self.l1_hits += 1
+            if entry[0] is _MISSING:
+                return None, -2
+            return entry[0], self._remaining(entry[1])
+        return await self._read_through(key)
+    
+    async def exists(self, key: str) -> bool:
+        """Check if key exists."""
+        return await self.get(key) is not None
+    
+    async def ttl(self, key: str) -> int:
+        """Get remaining TTL in seconds."""
+        _, ttl = await self.get_with_ttl(key)
+        return ttl
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values; only L1 misses go to Redis, in one round trip."""
+        results: List[Optional[Any]] = [None] * len(keys)
+        pending: List[int] = []
+        for i, key in enumerate(keys):
+            entry = await self._l1_entry(key)
+            if entry is None:
+                pending.append(i)
+                continue
+            self.l1_hits += 1
+            results[i] = None if entry[0] is _MISSING else entry[0]
+        
+        if pending:
+            epoch = self._epoch
+            values = await self.l2.mget([keys[i] for i in pending])
+            for i, value in zip(pending, values):
+                results[i] = value
+                self._count_l2(value)
+                # mget doesn't return TTLs, so the L1 copy is bounded by l1_ttl_seconds only
+                await self._fill(keys[i], value, None, epoch)
+        return results
+    
+    # ==================== Writes ====================
+    
+    async def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        """Set a value with TTL."""
+        await self.l2.set(key, value, ttl_seconds)
+        await self._after_write({key: value}, ttl_seconds)
+    
+    async def add(self, key: str, value: Any, ttl_seconds: int) -> bool:
+        """Set a value in Redis only if absent; L1 is only touched when it was stored."""
+        stored = await self.l2.add(key, value, ttl_seconds)
+        if stored:
+            await self._after_write({key: value}, ttl_seconds)
+        return stored
+    
+    async def mset_with_ttl(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        """Set many values sharing one TTL."""
+        if not items:
+            return
+        await self.l2.mset_with_ttl(items, ttl_seconds)
+        await self._after_write(items, ttl_seconds)
+    
+    async def incr_with_ttl(self, key: str, amount: int, ttl_seconds: int) -> int:
+        """Atomically add to a counter in Redis; cached copies are invalidated."""
+        value = await self.l2.incr_with_ttl(key, amount, ttl_seconds)
+        await self._invalidate([key])
+        return value
+    
+    async def delete(self, key: str) -> None:
+        """Delete a key."""
+        await self.l2.delete(key)
+        await self._invalidate([key])
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete many keys. Returns how many existed in Redis."""
+        if not keys:
+            return 0
+        removed = await self.l2.delete_many(keys)
+        await self._invalidate(keys)
+        return removed
+    
+    # ==================== Invalidation ====================
+    
+    def start_invalidation_listener(self) -> None:
+        """Start the pub/sub listener and the L1 expiry sweeper."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        self.l1.start_sweeper()
+    
+    async def stop_invalidation_listener(self) -> None:
+        """Stop the listener; L1 is bypassed from here on."""
+        self._listening = False
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.l1.stop_sweeper()
+    
+    async def _listen(self) -> None:
+        """Apply invalidations from other workers, resubscribing after errors."""
+        while True:
+            pubsub = None
+            try:
+                r = await self.l2._get_redis()
+                pubsub = r.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Anything cached before (re)subscribing may have missed invalidations
+                self.l1.clear()
+                self._epoch += 1
+                self._listening = True
+                print(f"✅ Subscribed to cache invalidations on {self.channel}")
+                
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self._handle_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cache invalidation listener error: {e}, retrying")
+            finally:
+                self._listening = False
+                if pubsub is not None:
+                    try:
+                        await pubsub.reset()
+                    except Exception:
+                        pass
+            await asyncio.sleep(1.0)
+    
+    async def _handle_invalidation(self, data: str) -> None:
+        try:
+            message = json.loads(data)
+        except (json.JSONDecodeError, TypeError):
+            return
+        if message.get("origin") == self._origin:
+            return  # Our own write - L1 is already up to date
+        self._epoch += 1
+        self.invalidations_received += 1
+        await self.l1.delete_many(message.get("keys", []))
+    
+    async def _publish(self, keys: List[str]) -> None:
+        try:
+            r = await self.l2._get_redis()
+            await r.publish(self.channel, json.dumps({"origin": self._origin, "keys": keys}))
+            self.invalidations_published += 1
+        except Exception as e:
+            # Other workers fall back to their (short) L1 TTL
+            print(f"⚠️ Cache invalidation publish failed: {e}")
+    
+    # ==================== Helpers ====================
+    
+    async def _l1_entry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """L1 entry (value or _MISSING, L2 expiry) - None when L1 can't be trusted or has no copy."""
+        if not self._listening:
+            return None
+        return await self.l1.get(key)
+    
+    async def _read_through(self, key: str) -> Tuple[Optional[Any], int]:
+        epoch = self._epoch
+        value, ttl = await self.l2.get_with_ttl(key)
+        self._count_l2(value)
+        await self._fill(key, value, ttl, epoch)
+        return value, ttl
+    
+    async def _fill(self, key: str, value: Optional[Any], l2_ttl: Optional[int], epoch: int) -> None:
+        """Cache an L2 read in L1 unless an invalidation arrived while it was in flight."""
+        if not self._listening or epoch != self._epoch:
+            return
+        
+        l1_ttl = self.l1_ttl_seconds
+        if value is None:
+            entry = (_MISSING, None)
+        elif l2_ttl is None:
+            entry = (value, None)  # L2 expiry unknown
+        elif l2_ttl == -1:
+            entry = (value, math.inf)  # No expiry in L2
+        elif l2_ttl > 0:
+            l1_ttl = min(l1_ttl, l2_ttl)
+            entry = (value, self._clock() + l2_ttl)
+        else:
+            return  # Expiring right now
+        await self.l1.set(key, entry, l1_ttl)
+    
+    async def _after_write(self, items: Dict[str, Any], ttl_seconds: int) -> None:
+        self._epoch += 1
+        if self._listening:
+            l1_ttl = min(self.l1_ttl_seconds, ttl_seconds)
+            expires_at = self._clock() + ttl_seconds
+            await self.l1.mset_with_ttl({key: (value, expires_at) for key, value in items.items()}, l1_ttl)
+        await self._publish(list(items))
+    
+    async def _invalidate(self, keys: List[str]) -> None:
+        self._epoch += 1
+        await self.l1.delete_many(keys)
+        await self._publish(keys)
+    
+    def _remaining(self, expires_at: float) -> int:
+        if expires_at == math.inf:
+            return -1
+        return max(0, int(expires_at - self._clock()))
+    
+    def _count_l2(self, value: Optional[Any]) -> None:
+        if value is None:
+            self.misses += 1
+        else:
+            self.l2_hits += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tier cache statistics."""
+        reads = self.l1_hits + self.l2_hits + self.misses
+        l2_reads = self.l2_hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "l1_hit_rate": round(self.l1_hits / reads, 4) if reads else 0.0,
+            "l2_hit_rate": round(self.l2_hits / l2_reads, 4) if l2_reads else 0.0,
+            "invalidations_published": self.invalidations_published,
+            "invalidations_received": self.invalidations_received,
+            "listening": self._listening,
+            "l1": self.l1.get_stats()
+        }
+    
+    async def close(self) -> None:
+        """Stop the listener and close the Redis connection."""
+        await self.stop_invalidation_listener()
+        await self.l2.close()
+
+
 # Global cache instance - use InMemoryCache for development
 _cache: Optional[CacheBackend] = None
 
@@ -179,7 +724,11 @@ def get_cache() -> CacheBackend:
         if settings.USE_REDIS:
             try:
                 _cache = RedisCache(settings.REDIS_URL)
-                print("✅ Using Redis cache")
+                if settings.CACHE_L1_ENABLED:
+                    _cache = TieredCache(_cache)
+                    print("✅ Using Redis cache with in-process L1")
+                else:
+                    print("✅ Using Redis cache")
             except Exception as e:
                 print(f"⚠️ Redis connection failed: {e}, using in-memory cache")
                 _cache = InMemoryCache()
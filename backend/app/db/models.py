@@ -4,7 +4,7 @@ SQLAlchemy ORM Models for ISAVS
 from datetime import datetime
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, DateTime, 
-    ForeignKey, ARRAY, CheckConstraint, UniqueConstraint
+    ForeignKey, ARRAY, CheckConstraint, UniqueConstraint, LargeBinary
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -18,7 +18,8 @@ class StudentORM(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     student_id_card_number = Column(String(50), unique=True, nullable=False, index=True)
-    facial_embedding = Column(ARRAY(Float), nullable=False)
+    facial_embedding = Column(ARRAY(Float), nullable=True)  # Legacy float8[]; superseded by facial_embedding_bin
+    facial_embedding_bin = Column(LargeBinary, nullable=True)  # See app.utils.embedding_codec
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
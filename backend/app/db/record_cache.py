@@ -0,0 +1,217 @@
+"""
+Read-Through Record Cache for the Verification Hot Path
+Keeps projected student rows and attendance session rows in process memory
+so steady-state /verify requests don't touch the database.
+"""
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+
+from app.core.config import settings
+from app.utils.embedding_codec import embedding_from_row
+
+
+# Columns needed by /verify - never select('*') on the hot path.
+# facial_embedding is only non-null on rows not yet moved to facial_embedding_bin.
+STUDENT_COLUMNS = [
+    'id', 'name', 'student_id_card_number', 'approval_status', 'rejection_reason',
+    'facial_embedding_bin', 'facial_embedding'
+]
+# Columns that older databases may not have yet
+OPTIONAL_STUDENT_COLUMNS = ('approval_status', 'rejection_reason', 'facial_embedding_bin')
+SESSION_COLUMNS = 'id, session_id, class_id, status, expires_at'
+
+
+class RecordCache:
+    """
+    Read-through cache of student and session rows.
+    
+    Features:
+    - Student rows keyed by ID card number, projected to the columns /verify uses
+    - Stored embedding decoded once to float32
+    - Session rows keyed by session UUID
+    - Per-kind TTLs plus explicit invalidation from write endpoints
+    """
+    
+    def __init__(
+        self,
+        supabase=None,
+        student_ttl_seconds: Optional[int] = None,
+        session_ttl_seconds: Optional[int] = None
+    ):
+        self._supabase = supabase
+        self.student_ttl_seconds = student_ttl_seconds or settings.STUDENT_CACHE_TTL_SECONDS
+        self.session_ttl_seconds = session_ttl_seconds or settings.SESSION_CACHE_TTL_SECONDS
+        
+        # key -> (expires_at_monotonic, row)
+        self._students: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._sessions: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # student database id -> ID card number (for invalidation by id)
+        self._card_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def supabase(self):
+        """Lazily resolve the Supabase client."""
+        if self._supabase is None:
+            from app.db.supabase_client import get_supabase
+            self._supabase = get_supabase()
+        return self._supabase
+    
+    # ==================== Students ====================
+    
+    def get_student(self, card_number: str) -> Optional[Dict[str, Any]]:
+        """
+        Get projected student row by ID card number.
+        
+        Returns:
+            Dict with id, name, student_id_card_number, approval_status,
+            rejection_reason and embedding (float32 ndarray), or None if not found
+        """
+        cached = self._lookup(self._students, card_number)
+        if cached is not None:
+            return cached
+        
+        row = self._fetch_student(card_number)
+        if row is None:
+            return None
+        
+        student = self._project_student(row)
+        with self._lock:
+            self._students[card_number] = (time.monotonic() + self.student_ttl_seconds, student)
+            self._card_by_id[student['id']] = card_number
+        return student
+    
+    def _fetch_student(self, card_number: str) -> Optional[Dict[str, Any]]:
+        """Fetch a single student row with explicit column projection."""
+        columns = list(STUDENT_COLUMNS)
+        while True:
+            try:
+                result = self.supabase.table('students').select(', '.join(columns)).eq(
+                    'student_id_card_number', card_number
+                ).limit(1).execute()
+                break
+            except Exception as e:
+                # Databases that predate a migration lack some columns - drop them and retry
+                missing = [c for c in OPTIONAL_STUDENT_COLUMNS if c in columns and c in str(e)]
+                if not missing:
+                    raise
+                columns = [c for c in columns if c not in missing]
+        
+        if not result.data:
+            return None
+        return result.data[0]
+    
+    @staticmethod
+    def _project_student(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce a student row to what verification needs."""
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'student_id_card_number': row['student_id_card_number'],
+            # Default to approved for students enrolled before the approval workflow
+            'approval_status': row.get('approval_status') or 'approved',
+            'rejection_reason': row.get('rejection_reason'),
+            'embedding': embedding_from_row(row)
+        }
+    
+    def invalidate_student(
+        self,
+        card_number: Optional[str] = None,
+        student_id: Optional[int] = None
+    ) -> None:
+        """Drop a cached student row by ID card number and/or database id."""
+        with self._lock:
+            if student_id is not None:
+                mapped = self._card_by_id.pop(student_id, None)
+                if mapped is not None:
+                    self._students.pop(mapped, None)
+            if card_number is not None:
+                entry = self._students.pop(card_number, None)
+                if entry is not None:
+                    self._card_by_id.pop(entry[1]['id'], None)
+    
+    # ==================== Sessions ====================
+    
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get attendance session row by session UUID.
+        
+        Returns:
+            Dict with id, session_id, class_id, status, expires_at or None
+        """
+        cached = self._lookup(self._sessions, session_id)
+        if cached is not None:
+            return cached
+        
+        result = self.supabase.table('attendance_sessions').select(SESSION_COLUMNS).eq(
+            'session_id', session_id
+        ).limit(1).execute()
+        
+        if not result.data:
+            return None
+        
+        session = result.data[0]
+        self.put_session(session)
+        return session
+    
+    def put_session(self, session: Dict[str, Any]) -> None:
+        """Prime the cache with a session row (e.g. right after creating it)."""
+        with self._lock:
+            self._sessions[session['session_id']] = (
+                time.monotonic() + self.session_ttl_seconds, session
+            )
+    
+    def invalidate_session(self, session_id: str) -> None:
+        """Drop a cached session row."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    # ==================== Helpers ====================
+    
+    def _lookup(
+        self,
+        store: Dict[str, Tuple[float, Dict[str, Any]]],
+        key: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return a live entry, evicting it if expired."""
+        with self._lock:
+            entry = store.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.hits += 1
+                    return entry[1]
+                del store[key]
+            self.misses += 1
+            return None
+    
+    def clear(self) -> None:
+        """Drop everything."""
+        with self._lock:
+            self._students.clear()
+            self._sessions.clear()
+            self._card_by_id.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics."""
+        return {
+            "students": len(self._students),
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Singleton instance
+_record_cache: Optional[RecordCache] = None
+
+
+def get_record_cache() -> RecordCache:
+    """Get or create record cache instance."""
+    global _record_cache
+    if _record_cache is None:
+        _record_cache = RecordCache()
+    return _record_cache
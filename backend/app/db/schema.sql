@@ -9,8 +9,10 @@ CREATE TABLE IF NOT EXISTS students (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     student_id_card_number VARCHAR(50) UNIQUE NOT NULL,
-    facial_embedding FLOAT8[] NOT NULL,
+    facial_embedding FLOAT8[],
+    facial_embedding_bin BYTEA,
     face_image_base64 TEXT,
+    face_image_hash VARCHAR(64),
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -3,15 +3,24 @@ ISAVS FastAPI Application Entry Point
 Enhanced with robust CORS, error handling, and health checks
 """
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import json
 import logging
 
 from app.api import endpoints
 from app.db.database import init_db, close_db
+from app.db.cache import get_cache, InMemoryCache, TieredCache
 from app.core.config import settings
 from app.services.websocket_manager import get_connection_manager
+from app.services.anomaly_service import get_anomaly_service
+from app.services.live_session_service import get_live_session_service
+from app.services.inference_executor import run_inference, shutdown_inference_executor
+from app.services.preprocess import get_preprocessor
+from app.services.session_reference import get_session_reference_registry
+from app.services.geofence_store import get_geofence_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,9 +35,33 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("✅ Database initialized")
     logger.info(f"🌐 CORS Origins: {settings.CORS_ORIGINS}")
+    cache = get_cache()
+    if isinstance(cache, InMemoryCache):
+        cache.start_sweeper()
+        logger.info("✅ Cache expiry sweeper started")
+    elif isinstance(cache, TieredCache):
+        cache.start_invalidation_listener()
+        logger.info("✅ Cache invalidation listener started")
+    await get_connection_manager().start_relay()
+    get_live_session_service().start()
+    landmarkers = get_preprocessor().landmarkers
+    if landmarkers is not None:
+        # One warmed landmarker per inference thread before the first request
+        await run_inference(landmarkers.prewarm)
+        logger.info(f"✅ {landmarkers.size} face landmarkers warmed up")
+    # Build the polygon geofence index before the first /verify needs it
+    await asyncio.to_thread(get_geofence_store)
     yield
     # Shutdown
     logger.info("🛑 Shutting down...")
+    if isinstance(cache, InMemoryCache):
+        await cache.stop_sweeper()
+    elif isinstance(cache, TieredCache):
+        await cache.stop_invalidation_listener()
+    await get_anomaly_service().flush_pending()
+    await get_live_session_service().stop()
+    await get_connection_manager().stop_relay()
+    shutdown_inference_executor()
     await close_db()
     logger.info("✅ Cleanup complete")
 
@@ -81,6 +114,8 @@ async def health_check():
     Enhanced health check endpoint.
     Returns system status and configuration info.
     """
+    cache = get_cache()
+    landmarkers = get_preprocessor().landmarkers
     return {
         "status": "healthy",
         "service": "ISAVS 2026",
@@ -88,7 +123,13 @@ async def health_check():
         "backend_port": 6000,
         "frontend_port": 2000,
         "cors_enabled": True,
-        "database": "connected"
+        "database": "connected",
+        "cache": cache.get_stats() if hasattr(cache, "get_stats") else None,
+        "websocket": get_connection_manager().get_stats(),
+        "live_sessions": get_live_session_service().get_stats(),
+        "landmarkers": landmarkers.get_stats() if landmarkers is not None else None,
+        "session_references": get_session_reference_registry().get_stats(),
+        "geofence_polygons": get_geofence_store().get_stats()
     }
 
 
@@ -107,32 +148,69 @@ async def root():
 
 
 @app.websocket("/ws/dashboard")
-async def websocket_dashboard(websocket: WebSocket):
+async def websocket_dashboard(websocket: WebSocket, topics: str = None):
     """
     WebSocket endpoint for real-time dashboard updates.
     
     Pushes attendance_update and anomaly_alert messages to connected clients.
     
+    Topics ("class:<id>", "session:<id>", "anomalies") can be given as a
+    comma-separated ?topics= query parameter or changed at any time with
+        {"action": "subscribe" | "unsubscribe", "topics": [...]}
+    which is answered with {"type": "subscriptions", "topics": [...]}.
+    A client that never subscribes receives every event.
+    
+    "live:<session_id>" is answered with a session_snapshot (present, failed,
+    anomalies, recent events) and then session_delta messages at most once
+    per LIVE_SESSION_TICK_SECONDS, instead of one message per verification.
+    
     Message format:
     {
-        "type": "attendance_update" | "anomaly_alert",
+        "type": "attendance_update" | "anomaly_alert" | "session_snapshot" | "session_delta",
         "data": {...},
         "timestamp": "ISO8601"
     }
     """
     manager = get_connection_manager()
-    await manager.connect(websocket)
+    live = get_live_session_service()
+    initial_topics = [t.strip() for t in topics.split(",") if t.strip()] if topics else None
+    await manager.connect(websocket, initial_topics)
+    for topic in initial_topics or []:
+        if topic.startswith(live.TOPIC_PREFIX) and manager.is_valid_topic(topic):
+            await live.send_snapshot(websocket, topic[len(live.TOPIC_PREFIX):])
     
     try:
         # Keep connection alive and listen for client messages
         while True:
-            # Wait for any message from client (ping/pong for keep-alive)
+            # Wait for any message from client (ping/pong for keep-alive, or subscription changes)
             data = await websocket.receive_text()
             
-            # Echo back for keep-alive
+            # Echo back for keep-alive (through the send queue, so it never races a broadcast)
             if data == "ping":
-                await websocket.send_text("pong")
+                await manager.send_personal_message("pong", websocket)
+                continue
+            
+            try:
+                command = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(command, dict) or not isinstance(command.get("topics"), list):
+                continue
             
+            if command.get("action") == "subscribe":
+                current = manager.subscribe(websocket, command["topics"])
+            elif command.get("action") == "unsubscribe":
+                current = manager.unsubscribe(websocket, command["topics"])
+            else:
+                continue
+            await manager.send_personal_message(json.dumps({"type": "subscriptions", "topics": current}), websocket)
+            
+            # Newly watched live sessions start from a full snapshot
+            if command["action"] == "subscribe":
+                for topic in command["topics"]:
+                    if topic in current and topic.startswith(live.TOPIC_PREFIX):
+                        await live.send_snapshot(websocket, topic[len(live.TOPIC_PREFIX):])
+    
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         print("WebSocket client disconnected")
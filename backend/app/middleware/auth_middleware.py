@@ -154,7 +154,9 @@ async def require_approved_student(current_user: dict = Depends(require_student)
         supabase = auth_service.supabase
         
         # Get student record
-        response = supabase.table("students").select("*").eq("user_id", current_user["id"]).execute()
+        response = supabase.table("students").select(
+            "id, name, student_id_card_number, user_id, approval_status, rejection_reason"
+        ).eq("user_id", current_user["id"]).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
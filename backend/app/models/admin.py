@@ -51,7 +51,7 @@ class PendingStudentResponse(BaseModel):
     name: str
     student_id_card_number: str
     email: Optional[str]
-    face_image_base64: Optional[str]
+    face_image_url: Optional[str] = None  # Thumbnail URL served from the blob store
     created_at: datetime
     approval_status: str
     
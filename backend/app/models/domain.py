@@ -136,6 +136,7 @@ class LivenessResult(BaseModel):
     blink_detected: bool
     confidence: float
     message: str
+    frames_processed: int = 0  # Frames analyzed before a decision (sequences stop early)
 
 
 class QualityResult(BaseModel):
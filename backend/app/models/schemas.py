@@ -29,6 +29,15 @@ class StartSessionRequest(BaseModel):
     class_id: str = Field(..., min_length=1, max_length=50)
 
 
+class SessionReferenceRequest(BaseModel):
+    """Teacher-side sensor readings captured when a session starts (all optional)."""
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Teacher's GPS latitude")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Teacher's GPS longitude")
+    gps_accuracy: Optional[float] = Field(None, ge=0, le=500, description="Teacher's GPS accuracy in meters")
+    beacon_uuid: Optional[str] = Field(None, description="UUID of the classroom BLE beacon")
+    barometric_pressure: Optional[float] = Field(None, ge=900, le=1100, description="Teacher's barometric pressure in hPa")
+
+
 class StartSessionResponse(BaseModel):
     """Response model for starting an attendance session."""
     success: bool
@@ -66,6 +75,10 @@ class VerifyRequest(BaseModel):
     gyroscope_x: Optional[List[float]] = Field(None, description="Gyroscope X-axis (rad/s)")
     gyroscope_y: Optional[List[float]] = Field(None, description="Gyroscope Y-axis (rad/s)")
     gyroscope_z: Optional[List[float]] = Field(None, description="Gyroscope Z-axis (rad/s)")
+    motion_payload: Optional[str] = Field(
+        None,
+        description="Base64 binary motion envelope (app/utils/motion_codec.py); replaces the seven lists above"
+    )
     
     # Camera frame data (for motion-image correlation)
     frame_timestamps: Optional[List[float]] = Field(None, description="Frame timestamps (Unix seconds)")
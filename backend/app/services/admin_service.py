@@ -74,6 +74,7 @@ class AdminService:
                 
                 # User exists but not a teacher - update role
                 self.supabase.table("users").update({"role": "teacher"}).eq("id", existing_user["id"]).execute()
+                await self.auth_service.invalidate_user(existing_user.get("supabase_user_id"))
                 user_id = existing_user["id"]
             else:
                 # Create new user
@@ -177,7 +178,7 @@ class AdminService:
         """
         try:
             response = self.supabase.table("students").select(
-                "*, users(email)"
+                "id, name, student_id_card_number, face_image_hash, created_at, approval_status, users(email)"
             ).eq("approval_status", "pending").execute()
             
             students = []
@@ -187,7 +188,7 @@ class AdminService:
                     "name": student["name"],
                     "student_id_card_number": student["student_id_card_number"],
                     "email": student.get("users", {}).get("email") if student.get("users") else None,
-                    "face_image_base64": student.get("face_image_base64"),
+                    "face_image_hash": student.get("face_image_hash"),
                     "created_at": student["created_at"],
                     "approval_status": student["approval_status"]
                 })
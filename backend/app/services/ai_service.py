@@ -20,7 +20,7 @@ except ImportError:
     DEEPFACE_AVAILABLE = False
     print("⚠️ DeepFace not available")
 
-from app.services.preprocess import get_preprocessor
+from app.services.preprocess import FaceLandmarks, get_preprocessor
 
 
 class AIService:
@@ -52,10 +52,15 @@ class AIService:
             print(f"Error decoding image: {e}")
             return None
     
-    def extract_128d_embedding(self, image: np.ndarray) -> Optional[np.ndarray]:
+    def extract_128d_embedding(
+        self,
+        image: np.ndarray,
+        face: Optional[FaceLandmarks] = None
+    ) -> Optional[np.ndarray]:
         """
         Extract 128-dimensional face embedding using DeepFace with Facenet model.
         Facenet produces 128-dimensional embeddings, perfect for our use case.
+        Pass `face` (from preprocessor.analyze) to align without a second landmarker run.
         
         Returns: 128-dimensional numpy array or None if no face detected
         """
@@ -65,7 +70,7 @@ class AIService:
         
         try:
             # First try with preprocessing
-            preprocessed = self.preprocessor.preprocess(image)
+            preprocessed = self.preprocessor.preprocess(image, face)
             
             # If preprocessing fails, try with original image
             if preprocessed is None:
@@ -1,13 +1,19 @@
 """
 Anomaly Service
 Handles anomaly detection, recording, and three-strike policy.
+
+Strike counts and session locks live in the cache (atomic INCR with TTL and
+a lock flag); verification_sessions rows are written in the background for
+audit and only read the first time a session key is seen.
 """
+import asyncio
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, and_
 
+from app.db.cache import CacheBackend, get_cache
 from app.db.models import AnomalyORM, VerificationSessionORM, StudentORM
 from app.models.domain import Anomaly
 from app.core.config import settings
@@ -18,6 +24,14 @@ class AnomalyService:
     
     MAX_CONSECUTIVE_FAILURES = settings.MAX_CONSECUTIVE_FAILURES  # 3 strikes
     
+    def __init__(self, cache: CacheBackend = None, persist: bool = True):
+        self.cache = cache or get_cache()
+        self.persist = persist
+        self.state_ttl_seconds = settings.STRIKE_STATE_TTL_SECONDS
+        # session_key -> (student_id, changed fields) waiting to be written
+        self._pending: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._writer: Optional[asyncio.Task] = None
+    
     async def record_anomaly(
         self,
         db: AsyncSession,
@@ -113,7 +127,7 @@ class AnomalyService:
         session_key: str,
         student_id: int
     ) -> VerificationSessionORM:
-        """Get or create a verification session for tracking strikes."""
+        """Get or create a verification session row (audit record of strikes)."""
         result = await db.execute(
             select(VerificationSessionORM).where(
                 VerificationSessionORM.id == session_key
@@ -133,6 +147,53 @@ class AnomalyService:
         
         return session
     
+    # ==================== Three-strike state (cache) ====================
+    
+    @staticmethod
+    def _strike_key(session_key: str) -> str:
+        return f"strikes:{session_key}"
+    
+    @staticmethod
+    def _lock_key(session_key: str) -> str:
+        return f"session_locked:{session_key}"
+    
+    async def begin_attempt(
+        self,
+        db: Optional[AsyncSession],
+        session_key: str,
+        student_id: int
+    ) -> Tuple[bool, int]:
+        """
+        Reserve a verification attempt before any factor is checked.
+        
+        The attempt is counted as a strike up front (atomic INCR), so two
+        racing requests can never both get an attempt past the limit. The
+        caller must settle it: record_failure keeps the strike,
+        reset_failure_count clears the count on success, and release_attempt
+        hands it back when the attempt ends without a verdict (an error).
+        
+        Returns:
+            Tuple of (allowed, attempt_number)
+        """
+        if await self.cache.exists(self._lock_key(session_key)):
+            return False, 0
+        
+        attempt = await self.cache.incr_with_ttl(self._strike_key(session_key), 1, self.state_ttl_seconds)
+        
+        if attempt == 1 and await self._load_persisted_lock(db, session_key):
+            # Locked before this cache knew about the key (restart / eviction)
+            await self.cache.set(self._lock_key(session_key), True, self.state_ttl_seconds)
+            return False, 0
+        
+        return attempt <= self.MAX_CONSECUTIVE_FAILURES, attempt
+    
+    async def release_attempt(self, session_key: str) -> None:
+        """Undo a begin_attempt reservation that never reached a verdict."""
+        key = self._strike_key(session_key)
+        if await self.cache.incr_with_ttl(key, -1, self.state_ttl_seconds) < 0:
+            # The count expired meanwhile - don't leave a negative one behind
+            await self.cache.delete(key)
+    
     async def increment_failure_count(
         self,
         db: AsyncSession,
@@ -143,10 +204,18 @@ class AnomalyService:
         Increment failure count for a session.
         Returns new failure count.
         """
-        session = await self.get_or_create_verification_session(db, session_key, student_id)
-        session.failure_count += 1
-        await db.flush()
-        return session.failure_count
+        count = await self.cache.incr_with_ttl(self._strike_key(session_key), 1, self.state_ttl_seconds)
+        self._schedule_persist(session_key, student_id, failure_count=count)
+        return count
+    
+    async def record_failure(
+        self,
+        session_key: str,
+        student_id: int,
+        attempt: int
+    ) -> None:
+        """Persist a failed attempt already counted by begin_attempt."""
+        self._schedule_persist(session_key, student_id, failure_count=attempt)
     
     async def check_strike_count(
         self,
@@ -154,17 +223,8 @@ class AnomalyService:
         session_key: str
     ) -> int:
         """Get current failure count for session."""
-        result = await db.execute(
-            select(VerificationSessionORM).where(
-                VerificationSessionORM.id == session_key
-            )
-        )
-        session = result.scalar_one_or_none()
-        
-        if session is None:
-            return 0
-        
-        return session.failure_count
+        count = await self.cache.get(self._strike_key(session_key))
+        return int(count) if count is not None else 0
     
     async def lock_session(
         self,
@@ -174,18 +234,11 @@ class AnomalyService:
         attendance_session_id: int
     ) -> None:
         """Lock session after three strikes."""
-        result = await db.execute(
-            select(VerificationSessionORM).where(
-                VerificationSessionORM.id == session_key
-            )
-        )
-        session = result.scalar_one_or_none()
+        await self.cache.set(self._lock_key(session_key), True, self.state_ttl_seconds)
+        self._schedule_persist(session_key, student_id, locked=True, locked_at=datetime.utcnow())
         
-        if session:
-            session.locked = True
-            session.locked_at = datetime.utcnow()
-            
-            # Record anomaly for session lock
+        # Record anomaly for session lock
+        if db is not None:
             await self.record_anomaly(
                 db=db,
                 student_id=student_id,
@@ -193,8 +246,6 @@ class AnomalyService:
                 reason="Session locked due to three consecutive failed verification attempts",
                 anomaly_type="session_locked"
             )
-            
-            await db.flush()
     
     async def is_session_locked(
         self,
@@ -202,62 +253,171 @@ class AnomalyService:
         session_key: str
     ) -> bool:
         """Check if session is locked."""
-        result = await db.execute(
-            select(VerificationSessionORM).where(
-                VerificationSessionORM.id == session_key
-            )
-        )
-        session = result.scalar_one_or_none()
-        
-        if session is None:
-            return False
-        
-        return session.locked
+        return await self.cache.exists(self._lock_key(session_key))
+    
+    async def clear_strike_state(self, session_key: str) -> bool:
+        """Drop cached strikes and lock. Returns True if the session was locked."""
+        lock_key = self._lock_key(session_key)
+        locked = await self.cache.exists(lock_key)
+        await self.cache.delete_many([self._strike_key(session_key), lock_key])
+        return locked
     
     async def unlock_session(
         self,
-        db: AsyncSession,
+        db: Optional[AsyncSession],
         session_key: str,
         faculty_id: int
     ) -> bool:
         """
         Faculty unlock of locked session.
-        Returns True if successfully unlocked.
+        
+        A queued audit write is dropped and one in flight waited out first, so
+        a lock written just before the unlock can't land after it and re-lock
+        the row. Without a db session the unlock is upserted by the audit writer.
+        
+        Returns True if the session was locked (in the cache, queued or persisted).
         """
-        result = await db.execute(
-            select(VerificationSessionORM).where(
-                VerificationSessionORM.id == session_key
+        pending = self._pending.pop(session_key, None)
+        await self.flush_pending()
+        
+        locked = await self.clear_strike_state(session_key)
+        if pending is not None and pending[1].get('locked'):
+            locked = True
+        
+        fields = {
+            'locked': False,
+            'failure_count': 0,  # Reset failure count
+            'unlocked_by': faculty_id,
+            'unlocked_at': datetime.utcnow()
+        }
+        
+        if db is not None:
+            result = await db.execute(
+                select(VerificationSessionORM).where(
+                    VerificationSessionORM.id == session_key
+                )
             )
-        )
-        session = result.scalar_one_or_none()
+            session = result.scalar_one_or_none()
+            if session is not None and (locked or session.locked):
+                for name, value in fields.items():
+                    setattr(session, name, value)
+                await db.flush()
+                return True
+            return locked
         
-        if session is None or not session.locked:
+        if not self.persist:
+            return locked
+        if not locked and not await self._read_persisted_lock(session_key):
             return False
         
-        session.locked = False
-        session.unlocked_by = faculty_id
-        session.unlocked_at = datetime.utcnow()
-        session.failure_count = 0  # Reset failure count
-        
-        await db.flush()
+        student_id = pending[0] if pending is not None else self._student_from_key(session_key)
+        await self._write_verification_session(session_key, student_id, fields)
         return True
     
     async def reset_failure_count(
         self,
         db: AsyncSession,
-        session_key: str
+        session_key: str,
+        student_id: Optional[int] = None
     ) -> None:
         """Reset failure count after successful verification."""
-        result = await db.execute(
-            select(VerificationSessionORM).where(
-                VerificationSessionORM.id == session_key
+        await self.cache.delete(self._strike_key(session_key))
+        if student_id is not None:
+            self._schedule_persist(session_key, student_id, failure_count=0)
+    
+    # ==================== Audit persistence (background) ====================
+    
+    async def _load_persisted_lock(self, db: Optional[AsyncSession], session_key: str) -> bool:
+        """One-time read of the audit row, so a lock survives a cache restart."""
+        if db is None:
+            return False
+        try:
+            result = await db.execute(
+                select(VerificationSessionORM.locked).where(
+                    VerificationSessionORM.id == session_key
+                )
             )
+            return bool(result.scalar_one_or_none())
+        except Exception as e:
+            print(f"⚠️ Could not read persisted lock for {session_key}: {e}")
+            return False
+    
+    async def _read_persisted_lock(self, session_key: str) -> bool:
+        """Lock flag of the audit row, read outside a request's db session."""
+        from app.db import database
+        
+        if database.async_session_maker and not database.USE_SUPABASE_REST:
+            async with database.async_session_maker() as db:
+                return await self._load_persisted_lock(db, session_key)
+        
+        from app.db.supabase_client import get_supabase
+        result = await asyncio.to_thread(
+            lambda: get_supabase().table('verification_sessions').select('locked').eq('id', session_key).execute()
         )
-        session = result.scalar_one_or_none()
+        return bool(result.data and result.data[0].get('locked'))
+    
+    @staticmethod
+    def _student_from_key(session_key: str) -> Optional[int]:
+        """Student id from a '<session_id>:<student_id>' key, None if it has another shape."""
+        try:
+            return int(session_key.rsplit(':', 1)[1])
+        except (IndexError, ValueError):
+            return None
+    
+    def _schedule_persist(self, session_key: str, student_id: int, **fields) -> None:
+        """
+        Queue a verification_sessions update. Updates for the same key are
+        merged and written in order by a single writer task.
+        """
+        if not self.persist:
+            return
+        _, pending_fields = self._pending.get(session_key, (student_id, {}))
+        pending_fields.update(fields)
+        self._pending[session_key] = (student_id, pending_fields)
         
-        if session:
-            session.failure_count = 0
-            await db.flush()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain_pending())
+    
+    async def _drain_pending(self) -> None:
+        while self._pending:
+            session_key = next(iter(self._pending))
+            student_id, fields = self._pending.pop(session_key)
+            try:
+                await self._write_verification_session(session_key, student_id, fields)
+            except Exception as e:
+                print(f"⚠️ Failed to persist strike state for {session_key}: {e}")
+    
+    async def _write_verification_session(self, session_key: str, student_id: int, fields: Dict[str, Any]) -> None:
+        """Upsert a verification_sessions row via SQLAlchemy, or Supabase REST in REST mode."""
+        from app.db import database
+        
+        if database.async_session_maker and not database.USE_SUPABASE_REST:
+            async with database.async_session_maker() as db:
+                session = await db.get(VerificationSessionORM, session_key)
+                if session is None:
+                    session = VerificationSessionORM(id=session_key, student_id=student_id, failure_count=0, locked=False)
+                    db.add(session)
+                for name, value in fields.items():
+                    setattr(session, name, value)
+                await db.commit()
+            return
+        
+        from app.db.supabase_client import get_supabase
+        row = {'id': session_key}
+        if student_id is not None:
+            row['student_id'] = student_id
+        row.update({
+            name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in fields.items()
+        })
+        await asyncio.to_thread(
+            lambda: get_supabase().table('verification_sessions').upsert(row).execute()
+        )
+    
+    async def flush_pending(self) -> None:
+        """Wait for queued audit writes (shutdown and tests)."""
+        if self._writer is not None:
+            await self._writer
     
     async def get_anomalies_by_student(
         self,
@@ -1,21 +1,91 @@
 """
 Authentication Service
 Handles user authentication and authorization with Supabase
+
+Access tokens are verified locally (HS256 with SUPABASE_JWT_SECRET, or
+asymmetric keys from the project's JWKS endpoint, cached and refetched on
+rotation). The remote auth.get_user call is only a fallback when neither is
+configured. Resolved user rows are cached per subject for a short TTL.
 """
+import asyncio
 from typing import Optional, Dict
 from supabase import create_client, Client
 from app.core.config import settings
+from app.db.cache import CacheBackend, get_cache
 from app.db.supabase_client import get_supabase
 import logging
 
+try:
+    import jwt
+    from jwt import PyJWKClient
+    PYJWT_AVAILABLE = True
+except ImportError:
+    PYJWT_AVAILABLE = False
+    print("⚠️ PyJWT not available, tokens will be verified remotely")
+
 logger = logging.getLogger(__name__)
 
 
 class AuthService:
     """Service for authentication operations"""
     
-    def __init__(self):
-        self.supabase: Client = get_supabase()
+    ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+    
+    def __init__(self, supabase: Client = None, cache: CacheBackend = None):
+        self.supabase: Client = supabase or get_supabase()
+        self.cache = cache or get_cache()
+        self._jwks_client = None
+    
+    # ==================== Token verification ====================
+    
+    def _get_jwks_client(self):
+        """JWKS client; keys are cached for JWKS_CACHE_SECONDS and refetched for unknown key ids."""
+        if self._jwks_client is None:
+            jwks_url = settings.SUPABASE_JWKS_URL
+            if not jwks_url and settings.SUPABASE_URL:
+                jwks_url = f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+            if not jwks_url:
+                return None
+            self._jwks_client = PyJWKClient(jwks_url, cache_keys=True, lifespan=settings.JWKS_CACHE_SECONDS)
+        return self._jwks_client
+    
+    async def _decode_locally(self, token: str) -> Optional[Dict]:
+        """
+        Verify signature, expiry and audience without a network call.
+        
+        Returns:
+            Token claims, or None if local verification isn't configured for this token
+        
+        Raises:
+            jwt.InvalidTokenError if the token is invalid
+        """
+        if not PYJWT_AVAILABLE:
+            return None
+        
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        options = {"require": ["exp", "sub"]}
+        
+        if algorithm == "HS256":
+            if not settings.SUPABASE_JWT_SECRET:
+                return None
+            key = settings.SUPABASE_JWT_SECRET
+        elif algorithm in self.ASYMMETRIC_ALGORITHMS:
+            jwks_client = self._get_jwks_client()
+            if jwks_client is None:
+                return None
+            # Usually served from the key cache; a fetch (new kid / expired cache) is blocking I/O
+            key = (await asyncio.to_thread(jwks_client.get_signing_key_from_jwt, token)).key
+        else:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+        
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            leeway=settings.JWT_LEEWAY_SECONDS,
+            options=options
+        )
     
     async def verify_token(self, token: str) -> Dict:
         """
@@ -31,7 +101,15 @@ class AuthService:
             Exception if token is invalid
         """
         try:
-            # Get user from Supabase using the token
+            claims = await self._decode_locally(token)
+            if claims is not None:
+                return {
+                    "supabase_user_id": claims["sub"],
+                    "email": claims.get("email"),
+                    "email_verified": self._email_verified(claims)
+                }
+            
+            # Local verification not configured - ask Supabase Auth
             user_response = self.supabase.auth.get_user(token)
             
             if not user_response or not user_response.user:
@@ -49,21 +127,56 @@ class AuthService:
             logger.error(f"Token verification failed: {str(e)}")
             raise Exception(f"Token verification failed: {str(e)}")
     
+    @staticmethod
+    def _email_verified(claims: Dict) -> bool:
+        """
+        Email confirmation from token claims, matching the remote path
+        (email_confirmed_at): unverified unless a claim says otherwise.
+        """
+        if "email_verified" in claims:
+            return bool(claims["email_verified"])
+        if "email_confirmed_at" in claims:
+            return claims["email_confirmed_at"] is not None
+        metadata = claims.get("user_metadata") or {}
+        return bool(metadata.get("email_verified", False))
+    
+    # ==================== User profiles ====================
+    
+    @staticmethod
+    def _profile_key(supabase_id: str) -> str:
+        return f"user_profile:{supabase_id}"
+    
+    async def invalidate_user(self, supabase_id: Optional[str]) -> None:
+        """Drop a cached user profile (call after changing a user's role or identity)."""
+        if supabase_id:
+            await self.cache.delete(self._profile_key(supabase_id))
+    
     async def get_user_by_supabase_id(self, supabase_id: str) -> Optional[Dict]:
         """
         Get user from database by Supabase user ID
         
+        Served from a short-TTL cache keyed by subject; unregistered users
+        aren't cached so a registration is visible immediately.
+        
         Args:
             supabase_id: Supabase user UUID
             
         Returns:
             User dict or None if not found
         """
+        key = self._profile_key(supabase_id)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            # Callers add fields (e.g. "student") to the dict they get back
+            return dict(cached)
+        
         try:
             response = self.supabase.table("users").select("*").eq("supabase_user_id", supabase_id).execute()
             
             if response.data and len(response.data) > 0:
-                return response.data[0]
+                user = response.data[0]
+                await self.cache.set(key, user, settings.USER_PROFILE_CACHE_TTL_SECONDS)
+                return dict(user)
             return None
             
         except Exception as e:
@@ -115,6 +228,7 @@ class AuthService:
             response = self.supabase.table("users").insert(user_data).execute()
             
             if response.data and len(response.data) > 0:
+                await self.invalidate_user(supabase_id)
                 return response.data[0]
             else:
                 raise Exception("Failed to create user")
@@ -140,6 +254,7 @@ class AuthService:
             }).eq("id", user_id).execute()
             
             if response.data and len(response.data) > 0:
+                await self.invalidate_user(supabase_id)
                 return response.data[0]
             else:
                 raise Exception("Failed to update user")
@@ -0,0 +1,205 @@
+"""
+Content-Addressed Blob Store for Face Images
+Keeps enrollment photos out of the students row. Blobs are addressed by the
+SHA-256 of their bytes, so identical uploads are stored once. Face photos
+are biometric data, so they are only served through short-lived signed URLs.
+The local filesystem backend stands in for object storage.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class LocalBlobStore:
+    """
+    Filesystem-backed content-addressed store.
+    
+    Layout:
+        <root>/originals/ab/abcdef...   original bytes
+        <root>/thumbs/ab/abcdef....jpg  JPEG thumbnail of the original
+    """
+    
+    def __init__(self, root: Optional[str] = None, thumbnail_size: Optional[int] = None):
+        self.root = root or settings.BLOB_STORE_DIR
+        self.thumbnail_size = thumbnail_size or settings.FACE_THUMBNAIL_SIZE
+    
+    # ==================== Write ====================
+    
+    def put(self, data: bytes) -> str:
+        """
+        Store bytes and return their digest.
+        
+        Writing is idempotent - an existing blob is never rewritten.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._original_path(digest)
+        if not os.path.exists(path):
+            self._atomic_write(path, data)
+        return digest
+    
+    def put_image_base64(self, image_base64: str) -> Optional[str]:
+        """
+        Store a base64 (optionally data-URL prefixed) image and its thumbnail.
+        
+        Returns:
+            Digest of the decoded image bytes, or None if the payload isn't a decodable image
+        """
+        try:
+            if ',' in image_base64 and image_base64.startswith('data:'):
+                image_base64 = image_base64.split(',', 1)[1]
+            data = base64.b64decode(image_base64)
+        except Exception:
+            return None
+        if not data:
+            return None
+        
+        thumbnail = self._make_thumbnail(data)
+        if thumbnail is None:
+            return None
+        
+        digest = self.put(data)
+        thumb_path = self._thumbnail_path(digest)
+        if not os.path.exists(thumb_path):
+            self._atomic_write(thumb_path, thumbnail)
+        return digest
+    
+    # ==================== Read ====================
+    
+    def get(self, digest: str) -> Optional[bytes]:
+        """Get original bytes by digest."""
+        return self._read(self._original_path(digest)) if self.is_valid_digest(digest) else None
+    
+    def get_thumbnail(self, digest: str) -> Optional[bytes]:
+        """Get JPEG thumbnail by digest, regenerating it if missing."""
+        if not self.is_valid_digest(digest):
+            return None
+        
+        thumbnail = self._read(self._thumbnail_path(digest))
+        if thumbnail is not None:
+            return thumbnail
+        
+        data = self.get(digest)
+        if data is None:
+            return None
+        thumbnail = self._make_thumbnail(data)
+        if thumbnail is not None:
+            self._atomic_write(self._thumbnail_path(digest), thumbnail)
+        return thumbnail
+    
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is stored."""
+        return self.is_valid_digest(digest) and os.path.exists(self._original_path(digest))
+    
+    def delete(self, digest: str) -> None:
+        """Remove a blob and its thumbnail."""
+        if not self.is_valid_digest(digest):
+            return
+        for path in (self._original_path(digest), self._thumbnail_path(digest)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    # ==================== Signed URLs ====================
+    
+    @staticmethod
+    def sign(digest: str, ttl_seconds: Optional[int] = None) -> dict:
+        """Query parameters granting read access to a blob until they expire."""
+        expires = int(time.time()) + (ttl_seconds or settings.BLOB_URL_TTL_SECONDS)
+        return {"expires": expires, "sig": LocalBlobStore._signature(digest, expires)}
+    
+    @staticmethod
+    def verify(digest: str, expires: Optional[int], sig: Optional[str]) -> bool:
+        """Check a signature from sign() and that it has not expired."""
+        if expires is None or not sig or expires < time.time():
+            return False
+        return hmac.compare_digest(sig, LocalBlobStore._signature(digest, expires))
+    
+    @staticmethod
+    def _signature(digest: str, expires: int) -> str:
+        message = f"{digest}:{expires}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+    
+    @staticmethod
+    def is_valid_digest(digest: str) -> bool:
+        """Digests are lowercase hex SHA-256; anything else never touches the filesystem."""
+        return bool(digest) and DIGEST_PATTERN.match(digest) is not None
+    
+    @staticmethod
+    def media_type(data: bytes) -> str:
+        """Sniff the image type of stored bytes."""
+        if data.startswith(b'\x89PNG'):
+            return "image/png"
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return "image/webp"
+        return "image/jpeg"
+    
+    # ==================== Helpers ====================
+    
+    def _original_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'originals', digest[:2], digest)
+    
+    def _thumbnail_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'thumbs', digest[:2], f"{digest}.jpg")
+    
+    def _make_thumbnail(self, data: bytes) -> Optional[bytes]:
+        """Downscale to fit thumbnail_size (longest side) and encode as JPEG."""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        
+        h, w = image.shape[:2]
+        scale = self.thumbnail_size / max(h, w)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return encoded.tobytes() if ok else None
+    
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        """Write via temp file + rename so readers never see partial blobs."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# Singleton instance
+_blob_store: Optional[LocalBlobStore] = None
+
+
+def get_blob_store() -> LocalBlobStore:
+    """Get or create blob store instance."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = LocalBlobStore()
+    return _blob_store
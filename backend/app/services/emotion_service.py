@@ -1,12 +1,20 @@
 """
 Emotion Detection Service for Liveness Verification
-Uses DeepFace for emotion recognition (smile detection)
+The smile check runs on the EMOTION_BACKEND:
+- "blendshape": the landmarker's mouthSmile scores from the shared landmark
+  pass (no extra model)
+- "onnx": a small FER+-style expression model on the aligned face crop
+- "deepface": full DeepFace emotion analysis
+When the configured backend is unavailable the other fast one is tried,
+and DeepFace is the last resort.
 """
 import numpy as np
 import cv2
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, List, Tuple
 import os
 
+from app.core.config import settings
+
 # Suppress warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
@@ -17,6 +25,18 @@ except ImportError:
     DEEPFACE_AVAILABLE = False
     print("⚠️ DeepFace not available for emotion detection")
 
+try:
+    from app.services.preprocess import FaceLandmarks, get_preprocessor
+    LANDMARKER_AVAILABLE = True
+except ImportError:
+    LANDMARKER_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 
 class EmotionService:
     """
@@ -24,7 +44,7 @@ class EmotionService:
     
     Features:
     - Detect 7 emotions: Happy, Sad, Angry, Surprise, Fear, Disgust, Neutral
-    - Smile-to-verify liveness check
+    - Smile-to-verify liveness check (blendshape / ONNX backends, DeepFace fallback)
     - Confidence thresholds
     - Fallback to neutral if detection fails
     """
@@ -32,20 +52,84 @@ class EmotionService:
     # Emotion labels
     EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
     
-    def __init__(self, smile_threshold: float = 0.7):
+    # Landmarker blendshapes scoring a smile (0 .. 1)
+    SMILE_BLENDSHAPES = ('mouthSmileLeft', 'mouthSmileRight')
+    
+    # Output order of FER+ expression models, mapped to EMOTIONS names
+    ONNX_LABELS = ['neutral', 'happy', 'surprise', 'sad', 'angry', 'disgust', 'fear', 'contempt']
+    
+    BACKENDS = ('blendshape', 'onnx', 'deepface')
+    
+    def __init__(
+        self,
+        smile_threshold: float = 0.7,
+        backend: Optional[str] = None,
+        onnx_model_path: Optional[str] = None
+    ):
         """
         Initialize emotion service.
         
         Args:
             smile_threshold: Minimum confidence for "happy" emotion (default 0.7)
+            backend: Preferred smile backend (defaults to EMOTION_BACKEND)
+            onnx_model_path: Expression model for the onnx backend (defaults to EMOTION_ONNX_MODEL)
         """
         self.smile_threshold = smile_threshold
         self.available = DEEPFACE_AVAILABLE
+        self.backend = (backend or settings.EMOTION_BACKEND).lower()
+        if self.backend not in self.BACKENDS:
+            print(f"⚠️ Unknown EMOTION_BACKEND '{self.backend}', using blendshape")
+            self.backend = 'blendshape'
+        self.onnx_model_path = onnx_model_path or settings.EMOTION_ONNX_MODEL
+        self._onnx_session = None
+        self._onnx_failed = False
     
     def is_available(self) -> bool:
-        """Check if emotion detection is available."""
+        """Check if smile detection is available on any backend."""
+        return self.active_backend() is not None
+    
+    def backend_order(self) -> List[str]:
+        """Configured backend first, then the other fast one, DeepFace last."""
+        fast = [b for b in ('blendshape', 'onnx') if b != self.backend]
+        return [self.backend] + [b for b in fast + ['deepface'] if b != self.backend]
+    
+    def active_backend(self) -> Optional[str]:
+        """First backend in backend_order() that can run here."""
+        for backend in self.backend_order():
+            if self.backend_ready(backend):
+                return backend
+        return None
+    
+    def backend_ready(self, backend: str) -> bool:
+        """Whether one backend can run here (model loaded / package installed)."""
+        if backend == 'blendshape':
+            return self._landmarker_ready()
+        if backend == 'onnx':
+            return self._get_onnx_session() is not None
         return self.available
     
+    def _landmarker_ready(self) -> bool:
+        return LANDMARKER_AVAILABLE and get_preprocessor().landmarkers is not None
+    
+    def _get_onnx_session(self):
+        """Load the expression model once; None if onnxruntime or the file is missing."""
+        if self._onnx_session is None and not self._onnx_failed:
+            if not ONNX_AVAILABLE or not os.path.exists(self.onnx_model_path):
+                self._onnx_failed = True
+                return None
+            try:
+                options = onnxruntime.SessionOptions()
+                # Each inference thread runs its own request; don't oversubscribe cores
+                options.intra_op_num_threads = 1
+                self._onnx_session = onnxruntime.InferenceSession(
+                    self.onnx_model_path, options, providers=['CPUExecutionProvider']
+                )
+                print(f"✓ ONNX expression model loaded: {self.onnx_model_path}")
+            except Exception as e:
+                print(f"⚠️ Failed to load ONNX expression model: {e}")
+                self._onnx_failed = True
+        return self._onnx_session
+    
     def detect_emotion(self, image: np.ndarray) -> Optional[Dict[str, float]]:
         """
         Detect emotion from face image.
@@ -57,7 +141,7 @@ class EmotionService:
             Dictionary with emotion probabilities
             Example: {'happy': 0.85, 'neutral': 0.10, 'sad': 0.05, ...}
         """
-        if not self.is_available():
+        if not self.available:
             print("⚠️ DeepFace not available for emotion detection")
             return None
         
@@ -95,17 +179,38 @@ class EmotionService:
             print(f"❌ Emotion detection error: {e}")
             return None
     
-    def check_smile(self, image: np.ndarray) -> Tuple[bool, float, Dict[str, float]]:
+    def check_smile(
+        self,
+        image: np.ndarray,
+        face: Optional["FaceLandmarks"] = None,
+        analyzed: bool = False
+    ) -> Tuple[bool, float, Dict[str, float]]:
         """
         Check if person is smiling (for liveness detection).
         
         Args:
             image: BGR image (OpenCV format)
+            face: Landmarks already computed for this image (skips the landmarker)
+            analyzed: face is the landmarker's result for this image, so None
+                means no face was found rather than "not computed yet"
         
         Returns:
             (is_smiling, happy_confidence, all_emotions)
         """
-        emotions = self.detect_emotion(image)
+        backend = self.active_backend()
+        if face is None and backend in ('blendshape', 'onnx') and self._landmarker_ready():
+            if not analyzed:
+                face = get_preprocessor().analyze(image)
+            if face is None:
+                # Landmarker saw no face; another model would only guess
+                return False, 0.0, {'neutral': 1.0}
+        
+        if backend == 'blendshape' and face is not None and face.blendshapes:
+            emotions = self.blendshape_emotions(face)
+        elif backend == 'onnx':
+            emotions = self.onnx_emotions(get_preprocessor().preprocess(image, face))
+        else:
+            emotions = self.detect_emotion(image)
         
         if emotions is None:
             # Return neutral if detection fails
@@ -119,6 +224,32 @@ class EmotionService:
         
         return is_smiling, happy_score, emotions
     
+    def blendshape_emotions(self, face: "FaceLandmarks") -> Dict[str, float]:
+        """Smile score from mouthSmile blendshapes as a happy/neutral split."""
+        happy_score = face.score(*self.SMILE_BLENDSHAPES)
+        return {'happy': happy_score, 'neutral': 1.0 - happy_score}
+    
+    def onnx_emotions(self, aligned_face: Optional[np.ndarray]) -> Optional[Dict[str, float]]:
+        """
+        Run the ONNX expression model on an aligned face crop.
+        
+        Args:
+            aligned_face: Output of FacePreprocessor.preprocess (aligned, CLAHE)
+        
+        Returns:
+            Emotion probabilities keyed like EMOTIONS, or None
+        """
+        session = self._get_onnx_session()
+        if session is None or aligned_face is None:
+            return None
+        try:
+            model_input = session.get_inputs()[0]
+            logits = session.run(None, {model_input.name: onnx_input(aligned_face, model_input.shape)})[0]
+            return emotions_from_logits(np.asarray(logits).reshape(-1), self.ONNX_LABELS)
+        except Exception as e:
+            print(f"❌ ONNX emotion detection error: {e}")
+            return None
+    
     def get_dominant_emotion(self, emotions: Dict[str, float]) -> Tuple[str, float]:
         """
         Get the dominant emotion from emotion dictionary.
@@ -187,6 +318,29 @@ class EmotionService:
             return f"Detected: {dominant} ({confidence:.0%})"
 
 
+def onnx_input(aligned_face: np.ndarray, shape) -> np.ndarray:
+    """
+    Grayscale NCHW float32 tensor for an expression model.
+    
+    Args:
+        aligned_face: Aligned crop (grayscale or 3-channel)
+        shape: Model input shape, e.g. [1, 1, 64, 64] (symbolic dims default to 64)
+    """
+    height = shape[2] if isinstance(shape[2], int) else 64
+    width = shape[3] if isinstance(shape[3], int) else 64
+    gray = aligned_face if aligned_face.ndim == 2 else cv2.cvtColor(aligned_face, cv2.COLOR_RGB2GRAY)
+    resized = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+    # FER+ takes raw 0-255 intensities
+    return resized.astype(np.float32)[np.newaxis, np.newaxis]
+
+
+def emotions_from_logits(logits: np.ndarray, labels: List[str]) -> Dict[str, float]:
+    """Softmax the model output (numerically stable) and key it by label."""
+    logits = np.asarray(logits, dtype=np.float64)[:len(labels)]
+    exp = np.exp(logits - np.max(logits))
+    return {label: float(p) for label, p in zip(labels, exp / exp.sum())}
+
+
 # Singleton instance
 _emotion_service: Optional[EmotionService] = None
 
@@ -195,5 +349,5 @@ def get_emotion_service() -> EmotionService:
     """Get or create emotion service instance."""
     global _emotion_service
     if _emotion_service is None:
-        _emotion_service = EmotionService()
+        _emotion_service = EmotionService(smile_threshold=settings.SMILE_CONFIDENCE_THRESHOLD)
     return _emotion_service
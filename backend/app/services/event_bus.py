@@ -0,0 +1,152 @@
+"""
+Dashboard Event Bus
+Carries dashboard events (attendance updates, anomaly alerts) between API
+workers. Every worker publishes to the bus and relays what it receives to
+its own WebSocket connections, so a dashboard sees verifications handled by
+any worker.
+
+- InProcessEventBus: single-node; publish hands the event straight to the
+  local handlers.
+- RedisEventBus: Redis pub/sub; every worker (including the publisher)
+  receives each event once from the channel.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+
+
+# handler(topics, message)
+EventHandler = Callable[[List[str], str], Awaitable[None]]
+
+
+class EventBus(ABC):
+    """Abstract dashboard event bus."""
+    
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+    
+    def subscribe(self, handler: EventHandler) -> None:
+        """Register a handler for every event delivered to this worker."""
+        self._handlers.append(handler)
+    
+    async def _deliver(self, topics: List[str], message: str) -> None:
+        for handler in self._handlers:
+            try:
+                await handler(topics, message)
+            except Exception as e:
+                print(f"⚠️ Dashboard event handler failed: {e}")
+    
+    @abstractmethod
+    async def publish(self, topics: List[str], message: str) -> None:
+        """Publish a serialized event to the given topics on every worker."""
+        pass
+    
+    async def start(self) -> None:
+        """Start receiving events (no-op for the in-process bus)."""
+        pass
+    
+    async def stop(self) -> None:
+        """Stop receiving events."""
+        pass
+
+
+class InProcessEventBus(EventBus):
+    """Single-process bus: events go straight to the local handlers."""
+    
+    async def publish(self, topics: List[str], message: str) -> None:
+        await self._deliver(topics, message)
+
+
+class RedisEventBus(EventBus):
+    """Redis pub/sub bus shared by all workers."""
+    
+    def __init__(self, redis_url: str, channel: Optional[str] = None):
+        super().__init__()
+        self._redis_url = redis_url
+        self.channel = channel or settings.EVENT_BUS_CHANNEL
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+        
+        self.published = 0
+        self.received = 0
+        self.publish_failures = 0
+    
+    async def _get_redis(self):
+        """Lazy initialization of Redis connection."""
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self._redis_url, decode_responses=True)
+        return self._redis
+    
+    async def publish(self, topics: List[str], message: str) -> None:
+        try:
+            r = await self._get_redis()
+            await r.publish(self.channel, json.dumps({"topics": topics, "message": message}))
+            self.published += 1
+        except Exception as e:
+            # A lost dashboard update must never fail the request that produced it
+            self.publish_failures += 1
+            print(f"⚠️ Dashboard event publish failed: {e}")
+    
+    async def start(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+    
+    async def _listen(self) -> None:
+        """Relay channel events to local handlers, resubscribing after errors."""
+        while True:
+            pubsub = None
+            try:
+                r = await self._get_redis()
+                pubsub = r.pubsub()
+                await pubsub.subscribe(self.channel)
+                print(f"✅ Subscribed to dashboard events on {self.channel}")
+                
+                async for event in pubsub.listen():
+                    if event.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(event["data"])
+                    except (json.JSONDecodeError, TypeError):
+                        continue
+                    self.received += 1
+                    await self._deliver(payload.get("topics", []), payload.get("message", ""))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Dashboard event listener error: {e}, retrying")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.reset()
+                    except Exception:
+                        pass
+            await asyncio.sleep(1.0)
+
+
+# Singleton instance
+_event_bus: Optional[EventBus] = None
+
+
+def get_event_bus() -> EventBus:
+    """Get or create the event bus (Redis when USE_REDIS, else in-process)."""
+    global _event_bus
+    if _event_bus is None:
+        if settings.USE_REDIS:
+            _event_bus = RedisEventBus(settings.REDIS_URL)
+            print("✅ Using Redis dashboard event bus")
+        else:
+            _event_bus = InProcessEventBus()
+    return _event_bus
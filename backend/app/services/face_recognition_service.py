@@ -21,10 +21,11 @@ except ImportError:
     print("⚠️ DeepFace not available, using fallback method")
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
 
 from app.db.models import StudentORM
 from app.models.domain import StudentMatch, FaceVerificationResult
+from app.utils.embedding_codec import load_embedding
 from app.core.config import settings
 
 
@@ -282,7 +283,9 @@ class FaceRecognitionService:
         
         # Query all students with embeddings
         result = await db.execute(
-            select(StudentORM).where(StudentORM.facial_embedding.isnot(None))
+            select(StudentORM).where(
+                or_(StudentORM.facial_embedding_bin.isnot(None), StudentORM.facial_embedding.isnot(None))
+            )
         )
         students = result.scalars().all()
         
@@ -290,7 +293,7 @@ class FaceRecognitionService:
         best_similarity = threshold
         
         for student in students:
-            stored_embedding = np.array(student.facial_embedding, dtype=np.float64)
+            stored_embedding = load_embedding(student.facial_embedding_bin, student.facial_embedding)
             similarity = self.cosine_similarity(embedding, stored_embedding)
             
             if similarity > best_similarity:
@@ -342,7 +345,7 @@ class FaceRecognitionService:
             )
         
         # Compare embeddings
-        stored_embedding = np.array(student.facial_embedding, dtype=np.float64)
+        stored_embedding = load_embedding(student.facial_embedding_bin, student.facial_embedding)
         is_match, similarity = self.compare_embeddings(embedding, stored_embedding)
         
         return FaceVerificationResult(
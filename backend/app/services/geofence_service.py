@@ -1,6 +1,7 @@
 """
 Geofencing Service
-Validates student location is within 50 meters of classroom
+Validates student location is within 50 meters of classroom, or inside the
+same polygon geofence (room/building) as the classroom
 """
 from math import radians, sin, cos, sqrt, atan2
 from typing import Tuple, Optional
@@ -81,6 +82,39 @@ class GeofenceService:
         
         return is_within, distance
     
+    @staticmethod
+    def check_location(
+        student_lat: float,
+        student_lon: float,
+        classroom_lat: float,
+        classroom_lon: float,
+        radius_meters: float = DEFAULT_RADIUS_METERS
+    ) -> Tuple[bool, float, Optional[str]]:
+        """
+        Radius check, widened to polygon geofences: a student outside the
+        radius still passes when they are in the same room/building polygon
+        as the classroom point.
+        
+        Returns:
+            (is_within, distance_meters, shared_zone_name or None)
+        """
+        is_within, distance = GeofenceService.is_within_geofence(
+            student_lat, student_lon,
+            classroom_lat, classroom_lon,
+            radius_meters
+        )
+        if is_within:
+            return True, distance, None
+        
+        from app.services.geofence_store import get_geofence_store
+        store = get_geofence_store()
+        if not store.polygons:
+            return False, distance, None
+        zone = store.locate(classroom_lat, classroom_lon)
+        if zone is not None and store.locate(student_lat, student_lon) == zone:
+            return True, distance, zone
+        return False, distance, None
+    
     @staticmethod
     def validate_coordinates(lat: float, lon: float) -> bool:
         """
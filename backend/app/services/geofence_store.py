@@ -0,0 +1,348 @@
+"""
+Polygon Geofence Store
+Per-room / per-building polygon geofences for campuses where one circle
+around the teacher is not enough.
+
+Polygons are rows of the geofence_config table keyed "polygon:<name>" whose
+value is JSON: a list of [latitude, longitude] vertices (a simple ring, no
+holes). See migration_geofence_polygons.sql.
+
+Vertices are projected once to local meters (equirectangular around the
+campus centre - well under a meter of error across a few kilometers) and
+bucketed into a uniform grid of GEOFENCE_GRID_CELL_METERS cells. Each cell
+knows which polygons cover it entirely and which have an edge crossing it,
+so a lookup is one cell read plus a ray-cast against only the polygons whose
+boundary passes through that cell.
+"""
+import json
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+POLYGON_KEY_PREFIX = "polygon:"
+EARTH_RADIUS_METERS = 6371000
+# Cells are coarsened past GEOFENCE_GRID_CELL_METERS if the grid would exceed this
+MAX_GRID_CELLS = 1 << 20
+
+
+@dataclass
+class GeofencePolygon:
+    """One named geofence: vertices as (latitude, longitude) pairs."""
+    name: str
+    vertices: np.ndarray  # (n, 2) latitude, longitude
+
+
+def parse_polygon(config_key: str, config_value: str) -> GeofencePolygon:
+    """
+    Build a polygon from a geofence_config row.
+    
+    Raises:
+        ValueError: The value is not a list of at least 3 [lat, lon] pairs
+    """
+    try:
+        vertices = np.asarray(json.loads(config_value), dtype=np.float64)
+    except TypeError as e:
+        raise ValueError(f"not a list of coordinates ({e})")
+    if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+        raise ValueError("expected a list of at least 3 [latitude, longitude] pairs")
+    if not (np.all(np.abs(vertices[:, 0]) <= 90) and np.all(np.abs(vertices[:, 1]) <= 180)):
+        raise ValueError("coordinates out of range")
+    if np.array_equal(vertices[0], vertices[-1]):
+        vertices = vertices[:-1]  # GeoJSON-style closed ring
+    return GeofencePolygon(name=config_key[len(POLYGON_KEY_PREFIX):], vertices=vertices)
+
+
+def point_in_ring(x: float, y: float, ring: List[Tuple[float, float]]) -> bool:
+    """Even-odd ray-cast of one point against one ring (projected coordinates)."""
+    inside = False
+    ax, ay = ring[-1]
+    for bx, by in ring:
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+        ax, ay = bx, by
+    return inside
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """
+    Even-odd ray-cast of many points against one ring (projected coordinates).
+    Loops over the ring's edges; each edge is tested against every point at once.
+    """
+    inside = np.zeros(len(x), dtype=bool)
+    x1, y1 = ring[:, 0], ring[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    for ax, ay, bx, by in zip(x1, y1, x2, y2):
+        crosses = (ay > y) != (by > y)
+        if not crosses.any():
+            continue
+        # crosses implies ay != by, so the division is safe where it matters
+        x_at_y = ax + (y[crosses] - ay) * (bx - ax) / (by - ay)
+        inside[crosses] ^= x[crosses] < x_at_y
+    return inside
+
+
+class PolygonGeofenceStore:
+    """
+    Grid-indexed polygon geofences.
+    
+    Overlapping polygons are fine (a room inside its building): lookups
+    report the smallest polygon containing the point.
+    """
+    
+    def __init__(self, supabase=None, cell_meters: Optional[float] = None):
+        self._supabase = supabase
+        self.base_cell_meters = cell_meters or settings.GEOFENCE_GRID_CELL_METERS
+        self.build([])
+    
+    @property
+    def supabase(self):
+        """Lazily resolve the Supabase client."""
+        if self._supabase is None:
+            from app.db.supabase_client import get_supabase
+            self._supabase = get_supabase()
+        return self._supabase
+    
+    # ==================== Loading ====================
+    
+    def load(self) -> int:
+        """
+        (Re)load polygons from geofence_config.
+        
+        Returns:
+            Number of polygons loaded (the previous set is kept on failure)
+        """
+        try:
+            result = self.supabase.table('geofence_config').select('config_key, config_value').like(
+                'config_key', f'{POLYGON_KEY_PREFIX}%'
+            ).execute()
+        except Exception as e:
+            print(f"⚠️ Failed to load geofence polygons: {e}")
+            return len(self.polygons)
+        
+        polygons = []
+        for row in result.data or []:
+            try:
+                polygons.append(parse_polygon(row['config_key'], row['config_value']))
+            except ValueError as e:
+                print(f"⚠️ Skipping geofence {row['config_key']}: {e}")
+        self.build(polygons)
+        print(f"✓ Geofence polygons loaded ({len(polygons)} polygons, {self.grid_shape[0] * self.grid_shape[1]} grid cells)")
+        return len(polygons)
+    
+    def build(self, polygons: Sequence[GeofencePolygon]) -> None:
+        """Project the polygons and build the grid index."""
+        # Smallest first, so the lowest index containing a point is the most specific zone
+        polygons = list(polygons)
+        if polygons:
+            self.origin = np.concatenate([p.vertices for p in polygons]).mean(axis=0)
+        else:
+            self.origin = np.zeros(2)
+        rings = [self._project_ring(p.vertices) for p in polygons]
+        areas = [abs(self._ring_area(ring)) for ring in rings]
+        order = sorted(range(len(polygons)), key=lambda i: areas[i])
+        self.polygons: List[GeofencePolygon] = [polygons[i] for i in order]
+        self.rings: List[np.ndarray] = [rings[i] for i in order]
+        self._ring_lists = [[tuple(v) for v in ring.tolist()] for ring in self.rings]
+        self.names = np.array([p.name for p in self.polygons] + [""], dtype=object)
+        
+        if not self.rings:
+            self.cell_meters = self.base_cell_meters
+            self.grid_min = np.zeros(2)
+            self.grid_shape = (0, 0)
+            self.covered_by = np.full(0, -1, dtype=np.int64)
+            self.edge_ptr = np.zeros(1, dtype=np.int64)
+            self.edge_ids = np.zeros(0, dtype=np.int64)
+            return
+        
+        everything = np.concatenate(self.rings)
+        self.grid_min = everything.min(axis=0)
+        extent = everything.max(axis=0) - self.grid_min
+        self.cell_meters = max(self.base_cell_meters, math.sqrt(float(np.prod(extent + 1)) / MAX_GRID_CELLS))
+        nx, ny = np.floor(extent / self.cell_meters).astype(int) + 1
+        self.grid_shape = (int(nx), int(ny))
+        n_cells = self.grid_shape[0] * self.grid_shape[1]
+        
+        # Lowest polygon index covering each cell entirely (-1 none)
+        covered_by = np.full(n_cells, -1, dtype=np.int64)
+        edge_cells: List[Tuple[np.ndarray, int]] = []
+        for index in range(len(self.rings) - 1, -1, -1):
+            boundary, interior = self._classify_cells(self.rings[index])
+            covered_by[interior] = index
+            edge_cells.append((boundary, index))
+        
+        # CSR: cell -> polygons whose boundary crosses it (ascending index)
+        cells = np.concatenate([c for c, _ in edge_cells])
+        owners = np.concatenate([np.full(len(c), i, dtype=np.int64) for c, i in edge_cells])
+        order = np.lexsort((owners, cells))
+        self.edge_ids = owners[order]
+        self.edge_ptr = np.zeros(n_cells + 1, dtype=np.int64)
+        np.add.at(self.edge_ptr, cells + 1, 1)
+        self.edge_ptr = np.cumsum(self.edge_ptr)
+        self.covered_by = covered_by
+    
+    # ==================== Lookups ====================
+    
+    def locate_many(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Index of the smallest polygon containing each point, -1 where none does.
+        
+        Args:
+            latitudes, longitudes: Array-likes of the same length
+        """
+        x, y = self._project(np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64))
+        result = np.full(len(x), -1, dtype=np.int64)
+        if not self.rings or len(x) == 0:
+            return result
+        
+        ix = np.floor((x - self.grid_min[0]) / self.cell_meters).astype(np.int64)
+        iy = np.floor((y - self.grid_min[1]) / self.cell_meters).astype(np.int64)
+        on_grid = np.flatnonzero((ix >= 0) & (ix < self.grid_shape[0]) & (iy >= 0) & (iy < self.grid_shape[1]))
+        cells = iy[on_grid] * self.grid_shape[0] + ix[on_grid]
+        
+        # Cells wholly inside a polygon need no geometry
+        covered = self.covered_by[cells]
+        best = np.where(covered >= 0, covered, len(self.rings))
+        
+        # Expand (point, candidate polygon) pairs for cells a boundary passes through,
+        # skipping candidates that can't beat the covering polygon
+        starts, counts = self.edge_ptr[cells], self.edge_ptr[cells + 1] - self.edge_ptr[cells]
+        point_of_pair = np.repeat(np.arange(len(cells)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        polygon_of_pair = self.edge_ids[np.repeat(starts, counts) + offsets]
+        keep = polygon_of_pair < best[point_of_pair]
+        point_of_pair, polygon_of_pair = point_of_pair[keep], polygon_of_pair[keep]
+        
+        for index in np.unique(polygon_of_pair):
+            members = point_of_pair[polygon_of_pair == index]
+            points = on_grid[members]
+            hit = points_in_polygon(x[points], y[points], self.rings[index])
+            best[members[hit]] = np.minimum(best[members[hit]], index)
+        
+        found = best < len(self.rings)
+        result[on_grid[found]] = best[found]
+        return result
+    
+    def contains_many(self, latitudes, longitudes) -> np.ndarray:
+        """Boolean mask: which points fall inside any geofence polygon."""
+        return self.locate_many(latitudes, longitudes) >= 0
+    
+    def zone_names(self, latitudes, longitudes) -> np.ndarray:
+        """Name of the smallest containing polygon per point ("" where none)."""
+        return self.names[self.locate_many(latitudes, longitudes)]
+    
+    def locate(self, latitude: float, longitude: float) -> Optional[str]:
+        """
+        Name of the smallest polygon containing the point, or None.
+        Scalar twin of locate_many - plain Python is faster for one point.
+        """
+        if not self.rings:
+            return None
+        lat0, lon0 = self.origin
+        x = math.radians(longitude - lon0) * EARTH_RADIUS_METERS * math.cos(math.radians(lat0))
+        y = math.radians(latitude - lat0) * EARTH_RADIUS_METERS
+        ix = math.floor((x - self.grid_min[0]) / self.cell_meters)
+        iy = math.floor((y - self.grid_min[1]) / self.cell_meters)
+        if not (0 <= ix < self.grid_shape[0] and 0 <= iy < self.grid_shape[1]):
+            return None
+        
+        cell = iy * self.grid_shape[0] + ix
+        best = int(self.covered_by[cell])
+        for index in self.edge_ids[self.edge_ptr[cell]:self.edge_ptr[cell + 1]].tolist():
+            if best >= 0 and index >= best:
+                break  # candidates are in ascending index order
+            if point_in_ring(x, y, self._ring_lists[index]):
+                best = index
+                break
+        return self.polygons[best].name if best >= 0 else None
+    
+    # ==================== Helpers ====================
+    
+    def _project(self, latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Equirectangular projection to meters east/north of the store's origin."""
+        lat0, lon0 = self.origin
+        x = np.radians(longitudes - lon0) * EARTH_RADIUS_METERS * math.cos(math.radians(lat0))
+        y = np.radians(latitudes - lat0) * EARTH_RADIUS_METERS
+        return x, y
+    
+    def _project_ring(self, vertices: np.ndarray) -> np.ndarray:
+        return np.column_stack(self._project(vertices[:, 0], vertices[:, 1]))
+    
+    @staticmethod
+    def _ring_area(ring: np.ndarray) -> float:
+        x, y = ring[:, 0], ring[:, 1]
+        return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    
+    def _classify_cells(self, ring: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Flat ids of the cells an edge may pass through, and of the cells
+        lying wholly inside the ring.
+        """
+        nx = self.grid_shape[0]
+        lo = np.floor((ring.min(axis=0) - self.grid_min) / self.cell_meters).astype(int)
+        hi = np.floor((ring.max(axis=0) - self.grid_min) / self.cell_meters).astype(int)
+        hi = np.minimum(hi, np.array(self.grid_shape) - 1)
+        
+        # Every cell touched by an edge's bounding box (a superset of the cells it crosses)
+        boundary = set()
+        for (ax, ay), (bx, by) in zip(ring, np.roll(ring, -1, axis=0)):
+            x0, x1 = sorted(((ax - self.grid_min[0]) / self.cell_meters, (bx - self.grid_min[0]) / self.cell_meters))
+            y0, y1 = sorted(((ay - self.grid_min[1]) / self.cell_meters, (by - self.grid_min[1]) / self.cell_meters))
+            cx = np.arange(int(x0), min(int(x1), nx - 1) + 1)
+            cy = np.arange(int(y0), min(int(y1), self.grid_shape[1] - 1) + 1)
+            if len(cx) > 1 and len(cy) > 1:
+                cx, cy = self._segment_cells(ax, ay, bx, by, cx, cy)
+            else:
+                cx, cy = [a.ravel() for a in np.meshgrid(cx, cy)]
+            boundary.update((cy * nx + cx).tolist())
+        boundary = np.array(sorted(boundary), dtype=np.int64)
+        
+        # Remaining cells in the bounding box are all-in or all-out: test their centres
+        gx, gy = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1))
+        flat = (gy * nx + gx).ravel()
+        candidates = flat[~np.isin(flat, boundary)]
+        centres_x = self.grid_min[0] + ((candidates % nx) + 0.5) * self.cell_meters
+        centres_y = self.grid_min[1] + ((candidates // nx) + 0.5) * self.cell_meters
+        interior = candidates[points_in_polygon(centres_x, centres_y, ring)]
+        return boundary, interior
+    
+    def _segment_cells(self, ax, ay, bx, by, cx, cy) -> Tuple[np.ndarray, np.ndarray]:
+        """Cells of the box whose square the segment actually passes through (slab test)."""
+        gx, gy = [a.ravel() for a in np.meshgrid(cx, cy)]
+        x_lo = self.grid_min[0] + gx * self.cell_meters
+        y_lo = self.grid_min[1] + gy * self.cell_meters
+        x_hi, y_hi = x_lo + self.cell_meters, y_lo + self.cell_meters
+        
+        # Parametric range of the segment inside each cell's x- and y-slab
+        dx, dy = bx - ax, by - ay
+        tx0, tx1 = (x_lo - ax) / dx, (x_hi - ax) / dx
+        ty0, ty1 = (y_lo - ay) / dy, (y_hi - ay) / dy
+        t_enter = np.maximum.reduce([np.minimum(tx0, tx1), np.minimum(ty0, ty1), np.zeros_like(tx0)])
+        t_exit = np.minimum.reduce([np.maximum(tx0, tx1), np.maximum(ty0, ty1), np.ones_like(tx0)])
+        hit = t_enter <= t_exit + 1e-9
+        return gx[hit], gy[hit]
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "polygons": len(self.polygons),
+            "grid_cells": self.grid_shape[0] * self.grid_shape[1],
+            "covered_cells": int((self.covered_by >= 0).sum()),
+            "boundary_entries": len(self.edge_ids)
+        }
+
+
+# Singleton instance
+_geofence_store: Optional[PolygonGeofenceStore] = None
+
+
+def get_geofence_store() -> PolygonGeofenceStore:
+    """Get or create polygon geofence store instance (loads on first use)."""
+    global _geofence_store
+    if _geofence_store is None:
+        _geofence_store = PolygonGeofenceStore()
+        _geofence_store.load()
+    return _geofence_store
@@ -0,0 +1,42 @@
+"""
+Inference Executor
+One bounded thread pool for CPU-heavy model work (face embedding, optical
+flow) so it runs off the event loop, and independent checks for a request
+can run side by side. INFERENCE_WORKERS caps how many run at once across
+all requests.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+
+# Singleton instance
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Get or create the inference thread pool."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_WORKERS,
+            thread_name_prefix="inference"
+        )
+    return _executor
+
+
+async def run_inference(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call in the inference pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_inference_executor() -> None:
+    """Stop the pool (waits for running jobs)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,155 @@
+"""
+Bounded Instance Pool
+Hands out model instances that must not be called from two threads at
+once (MediaPipe landmarker graphs). Instances are created and warmed up on
+first demand up to `size` (INFERENCE_WORKERS by default, so every
+inference thread can hold one), then reused; a checkout blocks while all
+of them are busy.
+"""
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+
+class InstancePool(Generic[T]):
+    """Thread-safe checkout/return pool of lazily created instances."""
+    
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        size: Optional[int] = None,
+        warm_up: Optional[Callable[[T], None]] = None,
+        close: Optional[Callable[[T], None]] = None
+    ):
+        """
+        Args:
+            factory: Creates one instance (may raise)
+            size: Maximum instances (defaults to INFERENCE_WORKERS)
+            warm_up: Run once on each new instance before its first checkout
+            close: Releases an instance when the pool is closed
+        """
+        self.size = max(1, size or settings.INFERENCE_WORKERS)
+        self._factory = factory
+        self._warm_up = warm_up
+        self._close = close
+        
+        # LIFO so the most recently used (cache-warm) instance goes out first
+        self._idle: "queue.LifoQueue[T]" = queue.LifoQueue()
+        self._instances: List[T] = []
+        self._creating = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        self.checkouts = 0
+        self.waits = 0
+    
+    def acquire(self, timeout: Optional[float] = None) -> T:
+        """
+        Take an idle instance, create one if under `size`, or wait for a return.
+        
+        Raises:
+            TimeoutError: No instance came back within `timeout` seconds
+            RuntimeError: The pool is closed
+        """
+        if self._closed:
+            raise RuntimeError("Instance pool is closed")
+        
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            instance = self._create_or_wait(timeout)
+        with self._lock:
+            self.checkouts += 1
+        return instance
+    
+    def release(self, instance: T) -> None:
+        """Return a checked-out instance."""
+        if self._closed:
+            if self._close is not None:
+                self._close(instance)
+            return
+        self._idle.put(instance)
+    
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[T]:
+        """`with pool.checkout() as instance:` - returned even if the body raises."""
+        instance = self.acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+    
+    def _create_or_wait(self, timeout: Optional[float]) -> T:
+        with self._lock:
+            can_create = len(self._instances) + self._creating < self.size
+            if can_create:
+                self._creating += 1
+            else:
+                self.waits += 1
+        
+        if not can_create:
+            try:
+                return self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No pooled instance free after {timeout}s")
+        
+        try:
+            instance = self._factory()
+            if self._warm_up is not None:
+                self._warm_up(instance)
+        except BaseException:
+            with self._lock:
+                self._creating -= 1
+            raise
+        with self._lock:
+            self._creating -= 1
+            self._instances.append(instance)
+        return instance
+    
+    def prewarm(self, count: Optional[int] = None) -> int:
+        """
+        Create and warm instances up front so first requests skip graph setup.
+        
+        Returns:
+            Number of instances now in the pool
+        """
+        target = min(self.size, count or self.size)
+        taken = []
+        try:
+            while len(self._instances) < target:
+                taken.append(self.acquire(timeout=0))
+        except TimeoutError:
+            pass
+        finally:
+            for instance in taken:
+                self.release(instance)
+        return len(self._instances)
+    
+    def close(self) -> None:
+        """Close idle instances; ones still checked out are closed on return."""
+        self._closed = True
+        while True:
+            try:
+                instance = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._close is not None:
+                try:
+                    self._close(instance)
+                except Exception as e:
+                    print(f"⚠️ Failed to close pooled instance: {e}")
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "created": len(self._instances),
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "waits": self.waits
+        }
@@ -0,0 +1,333 @@
+"""
+Live Session Aggregates for Dashboards
+Keeps a per-session aggregate - present, failed, anomalies and the last few
+events - in memory, updated from the dashboard event bus as verifications
+happen on any worker.
+
+Dashboards subscribe to "live:<session_id>". They get one full snapshot on
+subscribe and then at most one delta per tick (LIVE_SESSION_TICK_SECONDS),
+however many verifications landed in between. A delta carries only the
+totals that changed (as absolute values) and the new events. Every event has
+a per-session "seq" and snapshots/deltas carry the latest one, so a client
+ignores anything at or below the seq it already has.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.websocket_manager import ConnectionManager, get_connection_manager
+
+
+# loader(session_id) -> {"class_id", "statuses": {student_id: status}, "anomalies": int} or None
+SessionLoader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class SessionAggregate:
+    """Running totals and recent events for one attendance session."""
+    
+    __slots__ = (
+        "session_id", "class_id", "statuses", "anomalies", "events",
+        "pending_events", "sent_totals", "seq", "seeded", "last_activity"
+    )
+    
+    def __init__(self, session_id: str, recent_events: int, now: float):
+        self.session_id = session_id
+        self.class_id: Optional[str] = None
+        # student_id -> latest verification status (one attendance row per student)
+        self.statuses: Dict[Any, str] = {}
+        self.anomalies = 0
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=recent_events)
+        self.pending_events: List[Dict[str, Any]] = []
+        self.sent_totals: Dict[str, int] = {}
+        self.seq = 0
+        self.seeded = False
+        self.last_activity = now
+    
+    def totals(self) -> Dict[str, int]:
+        present = sum(1 for status in self.statuses.values() if status == "verified")
+        return {
+            "present": present,
+            "failed": len(self.statuses) - present,
+            "anomalies": self.anomalies
+        }
+
+
+class LiveSessionService:
+    """Maintains live session aggregates and pushes coalesced deltas."""
+    
+    TOPIC_PREFIX = "live:"
+    
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        tick_seconds: Optional[float] = None,
+        recent_events: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        loader: Optional[SessionLoader] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.manager = manager
+        self.tick_seconds = tick_seconds or settings.LIVE_SESSION_TICK_SECONDS
+        self.recent_events = recent_events or settings.LIVE_SESSION_RECENT_EVENTS
+        self.idle_seconds = idle_seconds or settings.LIVE_SESSION_IDLE_SECONDS
+        self._loader = loader or load_session_totals
+        self._clock = clock
+        
+        self._sessions: Dict[str, SessionAggregate] = {}
+        self._dirty: Set[str] = set()
+        self._seeding: Dict[str, asyncio.Task] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        
+        self.events_applied = 0
+        self.deltas_sent = 0
+        self.snapshots_sent = 0
+        
+        # Same bus the manager relays, so every worker builds the same aggregates
+        manager.event_bus.subscribe(self.handle_event)
+    
+    @classmethod
+    def topic(cls, session_id: str) -> str:
+        return f"{cls.TOPIC_PREFIX}{session_id}"
+    
+    # ==================== Event intake ====================
+    
+    async def handle_event(self, topics: List[str], message: str) -> None:
+        """Fold an attendance_update / anomaly_alert into its session's aggregate."""
+        session_id = _topic_value(topics, "session:")
+        if session_id is None:
+            return
+        try:
+            payload = json.loads(message)
+        except (json.JSONDecodeError, TypeError):
+            return
+        if not isinstance(payload, dict):
+            return
+        message_type = payload.get("type")
+        data = payload.get("data") or {}
+        
+        if message_type == "attendance_update":
+            event = {
+                "type": "attendance",
+                "student_id": data.get("student_id"),
+                "student_name": data.get("student_name"),
+                "status": data.get("verification_status"),
+                "timestamp": data.get("timestamp")
+            }
+        elif message_type == "anomaly_alert":
+            event = {
+                "type": "anomaly",
+                "student_id": data.get("student_id"),
+                "student_name": data.get("student_name"),
+                "anomaly_type": data.get("anomaly_type"),
+                "timestamp": data.get("timestamp")
+            }
+        else:
+            return
+        
+        aggregate = self._get_or_create(session_id)
+        aggregate.seq += 1
+        event["seq"] = aggregate.seq
+        if aggregate.class_id is None:
+            aggregate.class_id = _topic_value(topics, "class:")
+        if event["type"] == "attendance":
+            aggregate.statuses[event["student_id"]] = event["status"]
+        else:
+            aggregate.anomalies += 1
+        aggregate.events.append(event)
+        aggregate.pending_events.append(event)
+        aggregate.last_activity = self._clock()
+        self._dirty.add(session_id)
+        self.events_applied += 1
+    
+    def _get_or_create(self, session_id: str) -> SessionAggregate:
+        aggregate = self._sessions.get(session_id)
+        if aggregate is None:
+            aggregate = SessionAggregate(session_id, self.recent_events, self._clock())
+            self._sessions[session_id] = aggregate
+        return aggregate
+    
+    # ==================== Snapshots ====================
+    
+    async def snapshot(self, session_id: str) -> Dict[str, Any]:
+        """Full state of a session, seeded from the database the first time it is asked for."""
+        aggregate = self._get_or_create(session_id)
+        if not aggregate.seeded:
+            await self._seed(aggregate)
+        aggregate.last_activity = self._clock()
+        return {
+            "session_id": session_id,
+            "class_id": aggregate.class_id,
+            "seq": aggregate.seq,
+            **aggregate.totals(),
+            "events": list(aggregate.events)
+        }
+    
+    async def send_snapshot(self, websocket, session_id: str) -> None:
+        """Queue a session snapshot for one socket (call right after it subscribes)."""
+        message = json.dumps({"type": "session_snapshot", "data": await self.snapshot(session_id)})
+        await self.manager.send_personal_message(message, websocket)
+        self.snapshots_sent += 1
+    
+    async def _seed(self, aggregate: SessionAggregate) -> None:
+        """Load totals recorded before this worker saw the session; concurrent callers share one load."""
+        task = self._seeding.get(aggregate.session_id)
+        if task is None:
+            task = asyncio.create_task(self._load(aggregate))
+            self._seeding[aggregate.session_id] = task
+        await asyncio.shield(task)
+    
+    async def _load(self, aggregate: SessionAggregate) -> None:
+        try:
+            stored = await self._loader(aggregate.session_id)
+        except Exception as e:
+            print(f"⚠️ Could not load live totals for session {aggregate.session_id}: {e}")
+            stored = None
+        finally:
+            self._seeding.pop(aggregate.session_id, None)
+        
+        if stored:
+            # Rows are written before their event is published, so stored rows
+            # are never older than the events already applied; events win per
+            # student and the anomaly count takes the larger side.
+            statuses = dict(stored.get("statuses") or {})
+            statuses.update(aggregate.statuses)
+            aggregate.statuses = statuses
+            aggregate.anomalies = max(aggregate.anomalies, int(stored.get("anomalies") or 0))
+            if aggregate.class_id is None and stored.get("class_id") is not None:
+                aggregate.class_id = str(stored["class_id"])
+        aggregate.seeded = True
+        aggregate.sent_totals = aggregate.totals()
+    
+    # ==================== Deltas ====================
+    
+    async def flush(self) -> int:
+        """
+        Push one delta per changed session to its "live:<id>" subscribers.
+        
+        Returns:
+            Number of deltas sent
+        """
+        dirty, self._dirty = self._dirty, set()
+        sent = 0
+        for session_id in dirty:
+            aggregate = self._sessions.get(session_id)
+            if aggregate is None:
+                continue
+            events, aggregate.pending_events = aggregate.pending_events, []
+            
+            totals = aggregate.totals()
+            changed = {k: v for k, v in totals.items() if aggregate.sent_totals.get(k) != v}
+            aggregate.sent_totals = totals
+            
+            # Nobody watching: keep the state for the next snapshot, skip the message
+            if not self.manager.has_subscribers(self.topic(session_id)):
+                continue
+            
+            await self.manager.publish([self.topic(session_id)], json.dumps({
+                "type": "session_delta",
+                "data": {
+                    "session_id": session_id,
+                    "seq": aggregate.seq,
+                    **changed,
+                    "events": events
+                }
+            }))
+            sent += 1
+        self.deltas_sent += sent
+        return sent
+    
+    def evict_idle(self) -> int:
+        """Drop sessions with no events or snapshots for LIVE_SESSION_IDLE_SECONDS."""
+        cutoff = self._clock() - self.idle_seconds
+        idle = [
+            session_id for session_id, aggregate in self._sessions.items()
+            if aggregate.last_activity < cutoff and session_id not in self._dirty
+            and not self.manager.has_subscribers(self.topic(session_id))
+        ]
+        for session_id in idle:
+            del self._sessions[session_id]
+        return len(idle)
+    
+    def start(self) -> None:
+        """Start the delta ticker."""
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._tick())
+    
+    async def stop(self) -> None:
+        """Stop the ticker after pushing any pending deltas."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        await self.flush()
+    
+    async def _tick(self) -> None:
+        ticks = 0
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self.flush()
+                ticks += 1
+                if ticks % 240 == 0:
+                    self.evict_idle()
+            except Exception as e:
+                print(f"⚠️ Live session tick failed: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "tick_seconds": self.tick_seconds,
+            "events_applied": self.events_applied,
+            "deltas_sent": self.deltas_sent,
+            "snapshots_sent": self.snapshots_sent
+        }
+
+
+def _topic_value(topics: List[str], prefix: str) -> Optional[str]:
+    for topic in topics:
+        if topic.startswith(prefix) and len(topic) > len(prefix):
+            return topic[len(prefix):]
+    return None
+
+
+async def load_session_totals(session_id: str) -> Optional[Dict[str, Any]]:
+    """Read a session's attendance statuses and anomaly count from Supabase."""
+    from app.db.record_cache import get_record_cache
+    from app.db.supabase_client import get_supabase
+    
+    def load():
+        session_row = get_record_cache().get_session(session_id)
+        if not session_row:
+            return None
+        supabase = get_supabase()
+        attendance = supabase.table('attendance').select('student_id, verification_status').eq(
+            'session_id', session_row['id']
+        ).execute()
+        anomalies = supabase.table('anomalies').select('id', count='exact').eq(
+            'session_id', session_row['id']
+        ).limit(1).execute()
+        return {
+            "class_id": session_row.get('class_id'),
+            "statuses": {row['student_id']: row['verification_status'] for row in attendance.data or []},
+            "anomalies": anomalies.count or 0
+        }
+    
+    return await asyncio.to_thread(load)
+
+
+# Singleton instance
+_service: Optional[LiveSessionService] = None
+
+
+def get_live_session_service() -> LiveSessionService:
+    """Get or create the live session service (bound to the connection manager)."""
+    global _service
+    if _service is None:
+        _service = LiveSessionService(get_connection_manager())
+    return _service
@@ -1,13 +1,24 @@
 """
 Liveness Detection Service
 Detects eye blinks to verify live person presence.
+Uses the shared FacePreprocessor landmarker (blendshape eyeBlink scores,
+EAR as a fallback) instead of running a separate FaceMesh graph.
+
+Frame sequences go through a VIDEO-mode landmarker: the face is detected on
+the first frame, later frames are cropped to the tracked face and only
+tracked, and the scan stops as soon as a close-then-open blink is seen.
 """
 from typing import List, Optional, Tuple
 import numpy as np
 
+from app.services.instance_pool import InstancePool
+
 try:
     import cv2
     import mediapipe as mp
+    from app.services.preprocess import (
+        FaceLandmarks, FacePreprocessor, face_landmarks_from_result, get_preprocessor
+    )
     MEDIAPIPE_AVAILABLE = True
 except ImportError:
     MEDIAPIPE_AVAILABLE = False
@@ -15,41 +26,86 @@ except ImportError:
 from app.models.domain import LivenessResult
 
 
+class BlinkCounter:
+    """Close-then-open state machine fed one frame at a time."""
+    
+    def __init__(self, consecutive_frames: int):
+        self.consecutive_frames = consecutive_frames
+        self.closed_count = 0
+        self.was_open = False
+    
+    def update(self, eyes_closed: bool) -> bool:
+        """Feed one frame; True once eyes reopen after enough closed frames."""
+        if not eyes_closed:
+            # Eyes were closed and now open = blink
+            blink = self.closed_count >= self.consecutive_frames
+            self.was_open = True
+            self.closed_count = 0
+            return blink
+        if self.was_open:
+            self.closed_count += 1
+        return False
+
+
+class VideoTracker:
+    """A VIDEO-mode landmarker plus the last timestamp it was fed (must keep increasing)."""
+    
+    def __init__(self, landmarker):
+        self.landmarker = landmarker
+        self.last_timestamp_ms = 0  # Warm-up frame
+    
+    def close(self):
+        self.landmarker.close()
+
+
 class LivenessService:
     """Service for liveness detection using blink detection."""
     
-    # Eye landmark indices for MediaPipe Face Mesh
+    # Eye landmark indices (FaceMesh topology, same for the Tasks landmarker)
     LEFT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
     RIGHT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
     
+    # Landmarker blendshapes scoring eye closure (0 open .. 1 closed)
+    BLINK_BLENDSHAPES = ('eyeBlinkLeft', 'eyeBlinkRight')
+    
+    # Sequence tracking (VIDEO running mode)
+    SEQUENCE_MAX_WIDTH = 480  # Detection frame is downscaled to this width
+    SEQUENCE_ROI_SIZE = 256  # Tracked frames: square face crop resized to this side
+    SEQUENCE_ROI_MARGIN = 0.5  # Crop extends this fraction of the face size on each side
+    FRAME_INTERVAL_MS = 33  # Assumed frame spacing when no timestamps are given
+    
     def __init__(
         self,
         ear_threshold: float = 0.25,
-        consecutive_frames: int = 2
+        consecutive_frames: int = 2,
+        blink_score_threshold: float = 0.5,
+        preprocessor: Optional["FacePreprocessor"] = None
     ):
         """
         Initialize liveness service.
         
         Args:
-            ear_threshold: Eye Aspect Ratio threshold for blink detection
+            ear_threshold: Eye Aspect Ratio threshold, used when blendshapes are missing
             consecutive_frames: Number of consecutive frames with closed eyes to detect blink
+            blink_score_threshold: Mean eyeBlink blendshape score above which eyes count as closed
+            preprocessor: Landmarker owner (defaults to the shared preprocessor)
         """
         self.ear_threshold = ear_threshold
         self.consecutive_frames = consecutive_frames
-        self._face_mesh = None
+        self.blink_score_threshold = blink_score_threshold
+        self._preprocessor = None
+        
+        # VIDEO-mode landmarkers are stateful: each runs one sequence at a
+        # time, so sequences on different threads check out their own
+        self._trackers: Optional[InstancePool] = None
         
         if MEDIAPIPE_AVAILABLE:
-            self._init_face_mesh()
-    
-    def _init_face_mesh(self):
-        """Initialize MediaPipe Face Mesh."""
-        mp_face_mesh = mp.solutions.face_mesh
-        self._face_mesh = mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+            self._preprocessor = preprocessor or get_preprocessor()
+            if self._preprocessor.model_path is not None:
+                self._trackers = InstancePool(
+                    lambda: VideoTracker(self._preprocessor.create_video_landmarker()),
+                    close=VideoTracker.close
+                )
     
     def calculate_eye_aspect_ratio(self, eye_landmarks: np.ndarray) -> float:
         """
@@ -79,66 +135,46 @@ class LivenessService:
         ear = (v1 + v2) / (2.0 * h)
         return float(ear)
     
-    def _get_eye_landmarks(
-        self, 
-        landmarks, 
-        indices: List[int],
-        image_width: int,
-        image_height: int
-    ) -> np.ndarray:
-        """Extract eye landmarks from face mesh results."""
-        points = []
-        for idx in indices:
-            lm = landmarks[idx]
-            x = lm.x * image_width
-            y = lm.y * image_height
-            points.append([x, y])
-        return np.array(points)
-    
-    def detect_blink_in_frame(self, image: np.ndarray) -> Tuple[bool, float, float]:
+    def detect_blink_in_frame(
+        self,
+        image: np.ndarray,
+        face: Optional["FaceLandmarks"] = None
+    ) -> Tuple[bool, float, float]:
         """
         Detect if eyes are closed (potential blink) in a single frame.
         
+        Args:
+            image: BGR frame
+            face: Landmarks already computed for this frame (skips the landmarker)
+        
         Returns:
             Tuple of (eyes_closed, left_ear, right_ear)
         """
-        if not MEDIAPIPE_AVAILABLE or self._face_mesh is None:
-            # Mock response for testing
-            return False, 0.3, 0.3
+        if face is None:
+            if self._preprocessor is None or self._preprocessor.landmarkers is None:
+                # Mock response for testing
+                return False, 0.3, 0.3
+            face = self._preprocessor.analyze(image)
+        
+        if face is None:
+            return False, 0.0, 0.0
         
         try:
-            # Convert to RGB if needed
-            if len(image.shape) == 3 and image.shape[2] == 3:
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            else:
-                rgb_image = image
-            
-            results = self._face_mesh.process(rgb_image)
-            
-            if not results.multi_face_landmarks:
-                return False, 0.0, 0.0
-            
-            landmarks = results.multi_face_landmarks[0].landmark
-            h, w = image.shape[:2]
-            
-            # Get eye landmarks
-            left_eye = self._get_eye_landmarks(landmarks, self.LEFT_EYE_INDICES, w, h)
-            right_eye = self._get_eye_landmarks(landmarks, self.RIGHT_EYE_INDICES, w, h)
-            
             # Calculate EAR for both eyes
-            left_ear = self.calculate_eye_aspect_ratio(left_eye)
-            right_ear = self.calculate_eye_aspect_ratio(right_eye)
-            
-            # Average EAR
-            avg_ear = (left_ear + right_ear) / 2.0
-            
-            # Eyes are closed if EAR is below threshold
-            eyes_closed = avg_ear < self.ear_threshold
-            
-            return eyes_closed, left_ear, right_ear
-            
-        except Exception:
+            left_ear = self.calculate_eye_aspect_ratio(face.points[self.LEFT_EYE_INDICES])
+            right_ear = self.calculate_eye_aspect_ratio(face.points[self.RIGHT_EYE_INDICES])
+        except (IndexError, TypeError):
             return False, 0.0, 0.0
+        
+        if face.blendshapes:
+            # Blendshapes are trained on closure directly and hold up better
+            # than EAR for small or turned faces
+            eyes_closed = face.score(*self.BLINK_BLENDSHAPES) >= self.blink_score_threshold
+        else:
+            # Eyes are closed if average EAR is below threshold
+            eyes_closed = (left_ear + right_ear) / 2.0 < self.ear_threshold
+        
+        return eyes_closed, left_ear, right_ear
     
     def detect_blink(self, frames: List[np.ndarray]) -> bool:
         """
@@ -156,31 +192,147 @@ class LivenessService:
         if len(frames) < self.consecutive_frames + 1:
             return False
         
-        closed_count = 0
-        was_open = False
-        blink_detected = False
-        
+        counter = BlinkCounter(self.consecutive_frames)
         for frame in frames:
             eyes_closed, _, _ = self.detect_blink_in_frame(frame)
+            if counter.update(eyes_closed):
+                return True
+        
+        return False
+    
+    def detect_blink_sequence(
+        self,
+        frames: List[np.ndarray],
+        timestamps_ms: Optional[List[float]] = None
+    ) -> Tuple[Optional[bool], int]:
+        """
+        Detect a blink over consecutive frames with landmark tracking.
+        
+        The face is located once on a downscaled first frame. Later frames
+        are cut to a fixed square window around it (resized to
+        SEQUENCE_ROI_SIZE) and fed to the VIDEO landmarker, which tracks
+        from its previous landmarks instead of detecting again. The window
+        only moves when the face nears its edge or is lost, since a moving
+        window would break the landmarker's own tracking.
+        
+        Args:
+            frames: BGR frames in capture order
+            timestamps_ms: Capture times in milliseconds (default FRAME_INTERVAL_MS apart)
+        
+        Returns:
+            (blink_detected, frames_processed); blink_detected is None when
+            no VIDEO landmarker is available
+        """
+        if len(frames) < self.consecutive_frames + 1:
+            return False, 0
+        
+        if self._trackers is None:
+            return None, 0
+        try:
+            tracker = self._trackers.acquire()
+        except Exception as e:
+            print(f"⚠️ Video landmarker unavailable: {e}")
+            return None, 0
+        
+        try:
+            if timestamps_ms is None:
+                timestamps_ms = [i * self.FRAME_INTERVAL_MS for i in range(len(frames))]
+            start = tracker.last_timestamp_ms + 1 - int(timestamps_ms[0])
             
-            if not eyes_closed:
-                if closed_count >= self.consecutive_frames:
-                    # Eyes were closed and now open = blink
-                    blink_detected = True
-                was_open = True
-                closed_count = 0
-            else:
-                if was_open:
-                    closed_count += 1
-        
-        return blink_detected
-    
-    def check_liveness(self, frames: List[np.ndarray]) -> LivenessResult:
+            counter = BlinkCounter(self.consecutive_frames)
+            roi = None
+            for processed, (frame, captured_ms) in enumerate(zip(frames, timestamps_ms), start=1):
+                timestamp_ms = max(start + int(captured_ms), tracker.last_timestamp_ms + 1)
+                tracker.last_timestamp_ms = timestamp_ms
+                
+                if roi is None:
+                    roi = self._locate_face(frame)
+                    if roi is None:
+                        continue
+                
+                face = self._track_frame(tracker.landmarker, frame, roi, timestamp_ms)
+                if face is None:
+                    # Locate again on the next frame; skip this one for blink state
+                    roi = None
+                    continue
+                if self._near_edge(face.points, roi):
+                    roi = self._face_roi(face.points, frame.shape)
+                
+                eyes_closed, _, _ = self.detect_blink_in_frame(frame, face)
+                if counter.update(eyes_closed):
+                    return True, processed
+            
+            return False, len(frames)
+        finally:
+            self._trackers.release(tracker)
+    
+    def _locate_face(self, frame: np.ndarray) -> Optional[Tuple[int, int, int]]:
+        """One IMAGE-mode detection on a downscaled frame; returns the tracking window."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.SEQUENCE_MAX_WIDTH / w)
+        small = frame
+        if scale < 1.0:
+            small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        face = self._preprocessor.analyze(small)
+        if face is None:
+            return None
+        return self._face_roi(face.points / scale, frame.shape)
+    
+    def _track_frame(
+        self,
+        landmarker,
+        frame: np.ndarray,
+        roi: Tuple[int, int, int],
+        timestamp_ms: int
+    ) -> Optional["FaceLandmarks"]:
+        """Run the VIDEO landmarker on the window, downscaled; landmarks come back in frame pixels."""
+        x0, y0, side = roi
+        crop = frame[y0:y0 + side, x0:x0 + side]
+        if side != self.SEQUENCE_ROI_SIZE:
+            crop = cv2.resize(crop, (self.SEQUENCE_ROI_SIZE, self.SEQUENCE_ROI_SIZE), interpolation=cv2.INTER_AREA)
+        if crop.ndim == 2:
+            rgb = cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
+        else:
+            rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        
+        try:
+            result = landmarker.detect_for_video(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb), timestamp_ms)
+        except Exception as e:
+            print(f"⚠️ Landmark tracking error: {e}")
+            return None
+        return face_landmarks_from_result(result, side, side, offset=(x0, y0))
+    
+    def _face_roi(self, points: np.ndarray, shape: Tuple[int, ...]) -> Tuple[int, int, int]:
+        """Square (x0, y0, side) around the landmarks plus margin, kept inside the frame."""
+        h, w = shape[:2]
+        (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+        face_size = max(max_x - min_x, max_y - min_y)
+        side = int(min(face_size * (1 + 2 * self.SEQUENCE_ROI_MARGIN), w, h))
+        side = max(side, 1)
+        cx, cy = (min_x + max_x) / 2, (min_y + max_y) / 2
+        # Round (not truncate) so the centre stays inside even a 1px window
+        x0 = int(np.clip(round(cx - side / 2), 0, w - side))
+        y0 = int(np.clip(round(cy - side / 2), 0, h - side))
+        return x0, y0, side
+    
+    def _near_edge(self, points: np.ndarray, roi: Tuple[int, int, int]) -> bool:
+        """True when the face has drifted to within a tenth of the window's edge."""
+        x0, y0, side = roi
+        pad = side * 0.1
+        (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+        return bool(min_x < x0 + pad or min_y < y0 + pad or max_x > x0 + side - pad or max_y > y0 + side - pad)
+    
+    def check_liveness(
+        self,
+        frames: List[np.ndarray],
+        timestamps_ms: Optional[List[float]] = None
+    ) -> LivenessResult:
         """
         Perform complete liveness check on a sequence of frames.
         
         Args:
             frames: List of image frames for liveness detection
+            timestamps_ms: Optional capture times (milliseconds) for tracking
             
         Returns:
             LivenessResult with detection status
@@ -193,7 +345,11 @@ class LivenessService:
                 message="No frames provided for liveness check"
             )
         
-        blink_detected = self.detect_blink(frames)
+        blink_detected, frames_processed = self.detect_blink_sequence(frames, timestamps_ms)
+        if blink_detected is None:
+            # No VIDEO landmarker: analyze frames one by one
+            blink_detected = self.detect_blink(frames)
+            frames_processed = len(frames)
         
         # Calculate confidence based on frame quality and detection
         confidence = 0.9 if blink_detected else 0.1
@@ -202,13 +358,16 @@ class LivenessService:
             is_live=blink_detected,
             blink_detected=blink_detected,
             confidence=confidence,
-            message="Liveness verified" if blink_detected else "No blink detected - please blink naturally"
+            message="Liveness verified" if blink_detected else "No blink detected - please blink naturally",
+            frames_processed=frames_processed
         )
     
     def close(self):
-        """Release resources."""
-        if self._face_mesh:
-            self._face_mesh.close()
+        """Release resources (the IMAGE landmarkers belong to the shared preprocessor)."""
+        if self._trackers is not None:
+            self._trackers.close()
+            self._trackers = None
+        self._preprocessor = None
 
 
 # Singleton instance
@@ -3,16 +3,22 @@ Motion-Image Correlator Service
 Correlates accelerometer/gyroscope motion data with optical flow from camera frames
 for liveness detection (anti-spoofing).
 """
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional, Union
+import math
+import threading
 import numpy as np
 import cv2
 from dataclasses import dataclass
-from scipy.stats import pearsonr
+from scipy.stats import norm, t as t_dist
+
+
+# Sample series: Python lists or float32/float64 arrays
+FloatSeries = Union[List[float], np.ndarray]
 
 
 @dataclass
 class MotionData:
-    """Motion sensor data from mobile device"""
+    """Motion sensor data from mobile device (lists or float arrays)"""
     timestamps: List[float]  # Unix timestamps in seconds
     accelerometer_x: List[float]  # m/s²
     accelerometer_y: List[float]
@@ -38,6 +44,100 @@ class CorrelationResult:
     message: str
     optical_flow_magnitude: List[float]
     motion_magnitude: List[float]
+    samples: int = 0  # Aligned pairs used (fewer than available when decided early)
+    confidence_interval: Optional[Tuple[float, float]] = None
+
+
+class StreamingCorrelation:
+    """
+    Online Pearson correlation of (flow, motion) pairs.
+    
+    Keeps Welford-style running means and co-moments, so pairs can be added
+    one at a time or in batches (Chan et al. merge) without storing them,
+    and r is numerically stable for any scale. The Fisher z-transform gives
+    a confidence interval, from which decision() calls the threshold as soon
+    as the interval clears it.
+    """
+    
+    def __init__(self, min_samples: int = 10, confidence: float = 0.95):
+        self.min_samples = min_samples
+        self.z_critical = float(norm.ppf(0.5 + confidence / 2))
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+    
+    def update(self, x: float, y: float) -> None:
+        """Add one pair."""
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+    
+    def update_many(self, xs: FloatSeries, ys: FloatSeries) -> None:
+        """Add a batch of pairs in one vectorized step."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n_b = len(xs)
+        if n_b == 0:
+            return
+        mean_xb, mean_yb = float(xs.mean()), float(ys.mean())
+        dxb, dyb = xs - mean_xb, ys - mean_yb
+        
+        n = self.n + n_b
+        dx, dy = mean_xb - self.mean_x, mean_yb - self.mean_y
+        weight = self.n * n_b / n
+        self.m2_x += float(dxb @ dxb) + dx * dx * weight
+        self.m2_y += float(dyb @ dyb) + dy * dy * weight
+        self.c_xy += float(dxb @ dyb) + dx * dy * weight
+        self.mean_x += dx * n_b / n
+        self.mean_y += dy * n_b / n
+        self.n = n
+    
+    @property
+    def r(self) -> float:
+        """Current correlation (0.0 while either series has no variance)."""
+        if self.n < 2 or self.m2_x <= 0.0 or self.m2_y <= 0.0:
+            return 0.0
+        return max(-1.0, min(1.0, self.c_xy / math.sqrt(self.m2_x * self.m2_y)))
+    
+    def p_value(self) -> float:
+        """Two-sided p-value for r != 0 (as scipy.stats.pearsonr)."""
+        if self.n < 3:
+            return 1.0
+        r = self.r
+        if abs(r) >= 1.0:
+            return 0.0
+        t_stat = r * math.sqrt((self.n - 2) / (1.0 - r * r))
+        return float(2 * t_dist.sf(abs(t_stat), self.n - 2))
+    
+    def confidence_interval(self) -> Tuple[float, float]:
+        """Fisher-z interval for r; (-1, 1) until there are enough pairs."""
+        if self.n <= 3:
+            return -1.0, 1.0
+        z = math.atanh(max(-0.999999, min(0.999999, self.r)))
+        half_width = self.z_critical / math.sqrt(self.n - 3)
+        return math.tanh(z - half_width), math.tanh(z + half_width)
+    
+    def decision(self, threshold: float) -> Optional[bool]:
+        """
+        True/False once the interval lies wholly above/below the threshold
+        (and at least min_samples pairs were seen); None while undecided.
+        """
+        if self.n < self.min_samples:
+            return None
+        low, high = self.confidence_interval()
+        if low >= threshold:
+            return True
+        if high < threshold:
+            return False
+        return None
 
 
 class MotionImageCorrelator:
@@ -45,9 +145,10 @@ class MotionImageCorrelator:
     Service for correlating motion sensor data with optical flow from camera frames.
     
     Features:
-    - Lucas-Kanade optical flow extraction
-    - Pearson correlation coefficient calculation
-    - Timestamp alignment (±20ms tolerance)
+    - Lucas-Kanade optical flow, features tracked across frames on a
+      downscaled, face-excluded background ROI
+    - Streaming Pearson correlation with early pass/fail decision
+    - Timestamp alignment (±20ms tolerance, vectorized nearest-neighbour search)
     - Liveness verification (0.7 correlation threshold)
     
     Anti-spoofing: Detects if someone is holding a photo/video by verifying
@@ -58,6 +159,7 @@ class MotionImageCorrelator:
     CORRELATION_THRESHOLD = 0.7  # Minimum correlation for liveness
     TIMESTAMP_TOLERANCE_MS = 20  # ±20ms tolerance for alignment
     MIN_SAMPLES = 10  # Minimum samples for correlation
+    CORRELATION_CONFIDENCE = 0.95  # Confidence interval used for early decisions
     
     # Lucas-Kanade optical flow parameters
     LK_PARAMS = dict(
@@ -66,6 +168,11 @@ class MotionImageCorrelator:
         criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
     )
     
+    # Tracking: downscale frames to this width, re-seed below this many points
+    FLOW_MAX_WIDTH = 320
+    MIN_TRACKED_POINTS = 20
+    FACE_MARGIN = 0.25  # Fraction of the face box also excluded on each side
+    
     # Shi-Tomasi corner detection parameters
     FEATURE_PARAMS = dict(
         maxCorners=100,
@@ -76,23 +183,31 @@ class MotionImageCorrelator:
     
     def __init__(self):
         """Initialize motion-image correlator"""
-        pass
+        self._local = threading.local()  # Per-thread face cascade (inference executor)
     
     def extract_optical_flow(
         self,
         frames: List[np.ndarray],
-        timestamps: List[float]
+        timestamps: List[float],
+        face_box: Optional[Tuple[int, int, int, int]] = None
     ) -> Tuple[List[float], List[float]]:
         """
         Extract optical flow magnitude from consecutive frames using Lucas-Kanade method.
         
+        Features are detected once and tracked through the sequence, re-seeding
+        only when fewer than MIN_TRACKED_POINTS survive. Each frame is converted
+        to gray and downscaled (FLOW_MAX_WIDTH) exactly once, and the face is
+        masked out so the flow follows the background - i.e. the camera.
+        
         Args:
-            frames: List of grayscale frames (numpy arrays)
+            frames: List of frames (BGR or grayscale numpy arrays)
             timestamps: Frame timestamps in seconds
+            face_box: Face (x, y, w, h) in frame pixels; detected on the first
+                frame when omitted
         
         Returns:
             (flow_magnitudes, flow_timestamps)
-            - flow_magnitudes: List of average optical flow magnitudes
+            - flow_magnitudes: Average optical flow magnitude per frame pair (full-resolution pixels)
             - flow_timestamps: Timestamps for each flow measurement (midpoint between frames)
         """
         if len(frames) < 2:
@@ -100,152 +215,232 @@ class MotionImageCorrelator:
         
         flow_magnitudes = []
         flow_timestamps = []
+        for magnitude, timestamp in self.iter_optical_flow(frames, timestamps, face_box):
+            flow_magnitudes.append(magnitude)
+            flow_timestamps.append(timestamp)
+        return flow_magnitudes, flow_timestamps
+    
+    def iter_optical_flow(
+        self,
+        frames: List[np.ndarray],
+        timestamps: List[float],
+        face_box: Optional[Tuple[int, int, int, int]] = None
+    ) -> Iterator[Tuple[float, float]]:
+        """
+        Yield (flow_magnitude, timestamp) per frame pair, computing each pair
+        only when asked for - callers that stop early skip the remaining frames.
+        See extract_optical_flow.
+        """
+        if len(frames) < 2:
+            raise ValueError("Need at least 2 frames for optical flow")
         
-        for i in range(len(frames) - 1):
-            prev_frame = frames[i]
-            next_frame = frames[i + 1]
-            
-            # Convert to grayscale if needed
-            if len(prev_frame.shape) == 3:
-                prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-            else:
-                prev_gray = prev_frame
-            
-            if len(next_frame.shape) == 3:
-                next_gray = cv2.cvtColor(next_frame, cv2.COLOR_BGR2GRAY)
-            else:
-                next_gray = next_frame
-            
-            # Detect features in first frame using Shi-Tomasi corner detection
-            p0 = cv2.goodFeaturesToTrack(prev_gray, mask=None, **self.FEATURE_PARAMS)
-            
-            if p0 is None or len(p0) == 0:
-                # No features detected, use zero flow
-                flow_magnitudes.append(0.0)
-                flow_timestamps.append((timestamps[i] + timestamps[i + 1]) / 2)
-                continue
-            
-            # Calculate optical flow using Lucas-Kanade method
-            p1, status, err = cv2.calcOpticalFlowPyrLK(
-                prev_gray, next_gray, p0, None, **self.LK_PARAMS
-            )
-            
-            if p1 is None:
-                flow_magnitudes.append(0.0)
-                flow_timestamps.append((timestamps[i] + timestamps[i + 1]) / 2)
-                continue
-            
-            # Select good points
-            good_new = p1[status == 1]
-            good_old = p0[status == 1]
-            
-            if len(good_new) == 0:
-                flow_magnitudes.append(0.0)
-                flow_timestamps.append((timestamps[i] + timestamps[i + 1]) / 2)
-                continue
-            
-            # Calculate flow vectors
-            flow_vectors = good_new - good_old
-            
-            # Calculate magnitude of each flow vector
-            magnitudes = np.sqrt(flow_vectors[:, 0]**2 + flow_vectors[:, 1]**2)
+        scale = min(1.0, self.FLOW_MAX_WIDTH / frames[0].shape[1])
+        prev_gray = self._prepare_frame(frames[0], scale)
+        
+        if face_box is None:
+            face_box = self._detect_face(prev_gray)
+        elif scale != 1.0:
+            face_box = tuple(int(round(v * scale)) for v in face_box)
+        mask = self._background_mask(prev_gray.shape, face_box)
+        
+        points = self._seed_points(prev_gray, mask)
+        
+        for i in range(1, len(frames)):
+            next_gray = self._prepare_frame(frames[i], scale)
+            magnitude = 0.0
             
-            # Average magnitude across all tracked points
-            avg_magnitude = np.mean(magnitudes)
+            if points is not None:
+                p1, status, err = cv2.calcOpticalFlowPyrLK(
+                    prev_gray, next_gray, points, None, **self.LK_PARAMS
+                )
+                if p1 is not None:
+                    tracked = status.reshape(-1) == 1
+                    good_new = p1.reshape(-1, 2)[tracked]
+                    good_old = points.reshape(-1, 2)[tracked]
+                    
+                    if len(good_new):
+                        # Average magnitude across tracked points, back in full-resolution pixels
+                        magnitude = float(np.linalg.norm(good_new - good_old, axis=1).mean() / scale)
+                    
+                    # Keep points that are still on the background
+                    points = good_new[self._on_mask(good_new, mask)].reshape(-1, 1, 2)
+                else:
+                    points = None
             
-            flow_magnitudes.append(float(avg_magnitude))
+            if points is None or len(points) < self.MIN_TRACKED_POINTS:
+                points = self._seed_points(next_gray, mask)
+            prev_gray = next_gray
             
             # Timestamp is midpoint between frames
-            flow_timestamps.append((timestamps[i] + timestamps[i + 1]) / 2)
-        
-        return flow_magnitudes, flow_timestamps
+            yield magnitude, (timestamps[i - 1] + timestamps[i]) / 2
+    
+    @staticmethod
+    def _prepare_frame(frame: np.ndarray, scale: float) -> np.ndarray:
+        """Grayscale and downscale one frame."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return gray
+    
+    def _detect_face(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Largest face in a (downscaled) gray frame, or None."""
+        cascade = getattr(self._local, "face_cascade", None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+            )
+            self._local.face_cascade = cascade
+        faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(20, 20))
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return int(x), int(y), int(w), int(h)
+    
+    def _background_mask(
+        self,
+        shape: Tuple[int, int],
+        face_box: Optional[Tuple[int, int, int, int]]
+    ) -> np.ndarray:
+        """Feature mask: everything except the face box (plus FACE_MARGIN on each side)."""
+        mask = np.full(shape, 255, dtype=np.uint8)
+        if face_box is not None:
+            x, y, w, h = face_box
+            dx, dy = int(w * self.FACE_MARGIN), int(h * self.FACE_MARGIN)
+            mask[max(0, y - dy):y + h + dy, max(0, x - dx):x + w + dx] = 0
+            # A face filling the frame leaves nothing to track - fall back to the whole frame
+            if not mask.any():
+                mask[:] = 255
+        return mask
+    
+    def _seed_points(self, gray: np.ndarray, mask: np.ndarray) -> Optional[np.ndarray]:
+        points = cv2.goodFeaturesToTrack(gray, mask=mask, **self.FEATURE_PARAMS)
+        if points is None or len(points) == 0:
+            return None
+        return points
+    
+    @staticmethod
+    def _on_mask(points: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Which points lie inside the frame and on the mask."""
+        h, w = mask.shape
+        xs = np.round(points[:, 0]).astype(np.intp)
+        ys = np.round(points[:, 1]).astype(np.intp)
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        keep = np.zeros(len(points), dtype=bool)
+        keep[inside] = mask[ys[inside], xs[inside]] > 0
+        return keep
     
     def calculate_motion_magnitude(
         self,
         motion_data: MotionData
-    ) -> Tuple[List[float], List[float]]:
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Calculate motion magnitude from accelerometer and gyroscope data.
         
         Combines linear acceleration and angular velocity into a single magnitude metric.
+        Works on whole arrays; the series may be lists or float32/float64 arrays.
         
         Args:
             motion_data: MotionData object with sensor readings
         
         Returns:
-            (motion_magnitudes, timestamps)
+            (motion_magnitudes, timestamps) as arrays
         """
-        if len(motion_data.timestamps) == 0:
+        timestamps = np.asarray(motion_data.timestamps, dtype=np.float64)
+        n = len(timestamps)
+        if n == 0:
             raise ValueError("Motion data is empty")
         
-        motion_magnitudes = []
+        def axes(*series):
+            stacked = [np.asarray(values)[:n] for values in series]
+            if any(len(values) < n for values in stacked):
+                raise ValueError("Motion axes are shorter than the timestamps")
+            return stacked
         
-        for i in range(len(motion_data.timestamps)):
-            # Calculate linear acceleration magnitude (m/s²)
-            accel_mag = np.sqrt(
-                motion_data.accelerometer_x[i]**2 +
-                motion_data.accelerometer_y[i]**2 +
-                motion_data.accelerometer_z[i]**2
-            )
-            
-            # Calculate angular velocity magnitude (rad/s)
-            gyro_mag = np.sqrt(
-                motion_data.gyroscope_x[i]**2 +
-                motion_data.gyroscope_y[i]**2 +
-                motion_data.gyroscope_z[i]**2
-            )
-            
-            # Combine both (weighted sum)
-            # Weight gyroscope more heavily as it's more relevant for camera motion
-            combined_magnitude = 0.3 * accel_mag + 0.7 * gyro_mag
-            
-            motion_magnitudes.append(float(combined_magnitude))
+        ax, ay, az = axes(motion_data.accelerometer_x, motion_data.accelerometer_y, motion_data.accelerometer_z)
+        gx, gy, gz = axes(motion_data.gyroscope_x, motion_data.gyroscope_y, motion_data.gyroscope_z)
+        
+        # Linear acceleration magnitude (m/s²) and angular velocity magnitude (rad/s)
+        accel_mag = np.sqrt(ax * ax + ay * ay + az * az)
+        gyro_mag = np.sqrt(gx * gx + gy * gy + gz * gz)
         
-        return motion_magnitudes, motion_data.timestamps
+        # Combine both (weighted sum)
+        # Weight gyroscope more heavily as it's more relevant for camera motion
+        motion_magnitudes = 0.3 * accel_mag + 0.7 * gyro_mag
+        
+        return motion_magnitudes, timestamps
     
     def align_timestamps(
         self,
-        flow_magnitudes: List[float],
-        flow_timestamps: List[float],
-        motion_magnitudes: List[float],
-        motion_timestamps: List[float]
-    ) -> Tuple[List[float], List[float]]:
+        flow_magnitudes: FloatSeries,
+        flow_timestamps: FloatSeries,
+        motion_magnitudes: FloatSeries,
+        motion_timestamps: FloatSeries
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Align optical flow and motion data by timestamps.
         
-        For each flow timestamp, finds the closest motion sample within tolerance.
+        For each flow timestamp, finds the closest motion sample within tolerance
+        (binary search over the sorted motion timestamps: O((F + M) log M)).
+        On a tie the earlier motion sample wins.
         
         Args:
             flow_magnitudes: Optical flow magnitudes
             flow_timestamps: Flow timestamps
             motion_magnitudes: Motion magnitudes
-            motion_timestamps: Motion timestamps
+            motion_timestamps: Motion timestamps (need not be sorted)
         
         Returns:
-            (aligned_flow, aligned_motion) - Lists of same length with aligned samples
+            (aligned_flow, aligned_motion) - Arrays of same length with aligned samples
+        
+        Magnitudes may be float32; timestamps are handled as float64, since
+        float32 cannot resolve milliseconds at Unix-epoch scale.
         """
-        aligned_flow = []
-        aligned_motion = []
+        flow_magnitudes = np.asarray(flow_magnitudes)
+        motion_magnitudes = np.asarray(motion_magnitudes)
+        flow_ts = np.asarray(flow_timestamps, dtype=np.float64)
+        motion_ts = np.asarray(motion_timestamps, dtype=np.float64)
         
-        tolerance_sec = self.TIMESTAMP_TOLERANCE_MS / 1000.0
+        if len(flow_ts) == 0 or len(motion_ts) == 0:
+            return flow_magnitudes[:0], motion_magnitudes[:0]
         
-        for i, flow_ts in enumerate(flow_timestamps):
-            # Find closest motion sample
-            time_diffs = [abs(flow_ts - motion_ts) for motion_ts in motion_timestamps]
-            min_diff_idx = np.argmin(time_diffs)
-            min_diff = time_diffs[min_diff_idx]
-            
-            # Check if within tolerance
-            if min_diff <= tolerance_sec:
-                aligned_flow.append(flow_magnitudes[i])
-                aligned_motion.append(motion_magnitudes[min_diff_idx])
+        nearest, within = self._nearest_motion(flow_ts, *self._motion_index(motion_ts))
+        return flow_magnitudes[within], motion_magnitudes[nearest[within]]
+    
+    @staticmethod
+    def _motion_index(motion_ts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Stable sort order and sorted copy of the motion timestamps."""
+        order = np.argsort(motion_ts, kind="stable")
+        return order, motion_ts[order]
+    
+    def _nearest_motion(
+        self,
+        flow_ts: np.ndarray,
+        order: np.ndarray,
+        sorted_ts: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Index of the nearest motion sample per flow timestamp, and whether it is within tolerance."""
+        # Nearest neighbours: last sample below and first sample at/after each flow timestamp
+        right = np.searchsorted(sorted_ts, flow_ts, side="left")
+        left = np.maximum(right - 1, 0)
+        # Among equal timestamps the first (in input order) is the one argmin would pick
+        left = np.searchsorted(sorted_ts, sorted_ts[left], side="left")
+        right = np.minimum(right, len(sorted_ts) - 1)
+        
+        left_diff = np.abs(flow_ts - sorted_ts[left])
+        right_diff = np.abs(flow_ts - sorted_ts[right])
+        left_idx, right_idx = order[left], order[right]
+        use_right = (right_diff < left_diff) | ((right_diff == left_diff) & (right_idx < left_idx))
+        
+        nearest = np.where(use_right, right_idx, left_idx)
+        min_diff = np.where(use_right, right_diff, left_diff)
         
-        return aligned_flow, aligned_motion
+        # Check if within tolerance
+        return nearest, min_diff <= self.TIMESTAMP_TOLERANCE_MS / 1000.0
     
     def calculate_correlation(
         self,
-        flow_magnitudes: List[float],
-        motion_magnitudes: List[float]
+        flow_magnitudes: FloatSeries,
+        motion_magnitudes: FloatSeries
     ) -> Tuple[float, float]:
         """
         Calculate Pearson correlation coefficient between optical flow and motion.
@@ -264,25 +459,33 @@ class MotionImageCorrelator:
             raise ValueError("Flow and motion arrays must have same length")
         
         # Calculate Pearson correlation
-        correlation, p_value = pearsonr(flow_magnitudes, motion_magnitudes)
+        stream = StreamingCorrelation(self.MIN_SAMPLES, self.CORRELATION_CONFIDENCE)
+        stream.update_many(flow_magnitudes, motion_magnitudes)
         
-        return float(correlation), float(p_value)
+        return stream.r, stream.p_value()
     
     def verify_liveness(
         self,
         frames: List[np.ndarray],
         frame_timestamps: List[float],
         motion_data: MotionData,
-        threshold: Optional[float] = None
+        threshold: Optional[float] = None,
+        face_box: Optional[Tuple[int, int, int, int]] = None
     ) -> CorrelationResult:
         """
         Verify liveness by correlating optical flow with motion sensor data.
         
+        Frame pairs are processed in order and the correlation is updated as
+        each aligned pair arrives; as soon as its confidence interval lies
+        wholly above or below the threshold (after MIN_SAMPLES pairs) the
+        decision is made and the remaining frames are skipped.
+        
         Args:
             frames: List of camera frames
             frame_timestamps: Frame timestamps
             motion_data: Motion sensor data
             threshold: Correlation threshold (default 0.7)
+            face_box: Face (x, y, w, h) excluded from optical flow (detected if omitted)
         
         Returns:
             CorrelationResult with verification details
@@ -291,44 +494,45 @@ class MotionImageCorrelator:
             threshold = self.CORRELATION_THRESHOLD
         
         try:
-            # Step 1: Extract optical flow
-            flow_magnitudes, flow_timestamps = self.extract_optical_flow(
-                frames, frame_timestamps
-            )
-            
-            # Step 2: Calculate motion magnitude
+            # Step 1: Calculate motion magnitude and index it for alignment
             motion_magnitudes, motion_timestamps = self.calculate_motion_magnitude(
                 motion_data
             )
+            motion_index = self._motion_index(motion_timestamps)
             
-            # Step 3: Align timestamps
-            aligned_flow, aligned_motion = self.align_timestamps(
-                flow_magnitudes, flow_timestamps,
-                motion_magnitudes, motion_timestamps
-            )
+            # Steps 2-4: Extract optical flow pair by pair, align each sample and
+            # update the running correlation, stopping once it is decisive
+            stream = StreamingCorrelation(self.MIN_SAMPLES, self.CORRELATION_CONFIDENCE)
+            flow_magnitudes = []
+            decision = None
+            for magnitude, timestamp in self.iter_optical_flow(frames, frame_timestamps, face_box):
+                flow_magnitudes.append(magnitude)
+                nearest, within = self._nearest_motion(np.array([timestamp]), *motion_index)
+                if within[0]:
+                    stream.update(magnitude, float(motion_magnitudes[nearest[0]]))
+                    decision = stream.decision(threshold)
+                    if decision is not None:
+                        break
             
-            if len(aligned_flow) < self.MIN_SAMPLES:
+            if stream.n < self.MIN_SAMPLES:
                 return CorrelationResult(
                     correlation_coefficient=0.0,
                     p_value=1.0,
                     is_live=False,
-                    message=f"Insufficient aligned samples: {len(aligned_flow)} < {self.MIN_SAMPLES}",
+                    message=f"Insufficient aligned samples: {stream.n} < {self.MIN_SAMPLES}",
                     optical_flow_magnitude=flow_magnitudes,
-                    motion_magnitude=motion_magnitudes
+                    motion_magnitude=motion_magnitudes.tolist(),
+                    samples=stream.n
                 )
             
-            # Step 4: Calculate correlation
-            correlation, p_value = self.calculate_correlation(
-                aligned_flow, aligned_motion
-            )
-            
-            # Step 5: Determine liveness
-            is_live = correlation >= threshold
+            # Step 5: Determine liveness (point estimate if the capture ran out undecided)
+            correlation, p_value = stream.r, stream.p_value()
+            is_live = decision if decision is not None else correlation >= threshold
             
             if is_live:
-                message = f"Liveness verified (r={correlation:.3f}, p={p_value:.4f})"
+                message = f"Liveness verified (r={correlation:.3f}, p={p_value:.4f}, n={stream.n})"
             else:
-                message = f"Motion-image mismatch detected (r={correlation:.3f} < {threshold})"
+                message = f"Motion-image mismatch detected (r={correlation:.3f} < {threshold}, n={stream.n})"
             
             return CorrelationResult(
                 correlation_coefficient=correlation,
@@ -336,7 +540,9 @@ class MotionImageCorrelator:
                 is_live=is_live,
                 message=message,
                 optical_flow_magnitude=flow_magnitudes,
-                motion_magnitude=motion_magnitudes
+                motion_magnitude=motion_magnitudes.tolist(),
+                samples=stream.n,
+                confidence_interval=stream.confidence_interval()
             )
             
         except Exception as e:
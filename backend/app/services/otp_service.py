@@ -1,9 +1,20 @@
 """
 OTP Service
 Handles generation, storage, and verification of one-time passwords.
+
+Two modes (settings.OTP_MODE):
+- "stored":  a random OTP per student is written to the cache at session start
+- "derived": the session stores one secret; each student's OTP is
+             HMAC(secret, student, time window, nonce), so nothing per-student
+             is written until a resend or invalidation bumps the nonce
 """
+import hashlib
+import hmac
 import random
+import secrets
 import string
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import asyncio
@@ -23,9 +34,15 @@ class OTPService:
     OTP_TTL_SECONDS = 60  # 60 seconds (2026 spec)
     MAX_RESEND_ATTEMPTS = 2  # 2 resend attempts
     
-    def __init__(self, cache: CacheBackend = None):
+    # Derived mode: session secrets are immutable, so workers keep a local copy
+    SECRET_CACHE_SIZE = 1024
+    
+    def __init__(self, cache: CacheBackend = None, mode: str = None):
         self.cache = cache or get_cache()
+        self.mode = mode or settings.OTP_MODE
         self._lock = asyncio.Lock()
+        # session_id -> (secret, expires_at_monotonic)
+        self._secrets: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
     
     def generate_otp(self) -> str:
         """Generate a random 4-digit OTP."""
@@ -39,6 +56,123 @@ class OTPService:
         """Generate cache key for resend tracking."""
         return f"otp_resend:{session_id}:{student_id}"
     
+    def _get_secret_key(self, session_id: str) -> str:
+        """Generate cache key for a session's OTP secret (derived mode)."""
+        return f"otp_secret:{session_id}"
+    
+    def _get_nonce_key(self, session_id: str, student_id: str) -> str:
+        """Generate cache key for a student's OTP nonce (derived mode)."""
+        return f"otp_nonce:{session_id}:{student_id}"
+    
+    # ==================== Derived Mode ====================
+    
+    def derive_otp(self, secret: bytes, student_id: str, window: int, nonce: int = 0) -> str:
+        """
+        Derive a 4-digit OTP from the session secret (HOTP-style dynamic truncation).
+        
+        Args:
+            secret: Session secret
+            student_id: Student ID card number
+            window: Time window index (unix time // OTP_TTL_SECONDS)
+            nonce: Bumped on resend/invalidation to change the code
+        """
+        message = f"{student_id}:{window}:{nonce}".encode()
+        digest = hmac.new(secret, message, hashlib.sha256).digest()
+        offset = digest[-1] & 0x0F
+        value = int.from_bytes(digest[offset:offset + 4], 'big') & 0x7FFFFFFF
+        return str(value % 10000).zfill(4)
+    
+    def _current_window(self) -> Tuple[int, int]:
+        """Return (window index, seconds until it ends)."""
+        now = time.time()
+        window = int(now // self.OTP_TTL_SECONDS)
+        remaining = int((window + 1) * self.OTP_TTL_SECONDS - now)
+        return window, max(1, remaining)
+    
+    async def create_session_secret(self, session_id: str) -> bytes:
+        """
+        Create and store the single per-session secret (derived mode).
+        
+        The secret is only written if none exists, so a repeated call (or a
+        racing worker) adopts the stored secret instead of replacing it and
+        invalidating codes already handed out.
+        """
+        key = self._get_secret_key(session_id)
+        secret = secrets.token_bytes(32)
+        if not await self.cache.add(key, secret.hex(), settings.OTP_SESSION_TTL_SECONDS):
+            stored = await self.cache.get(key)
+            if stored is not None:
+                secret = bytes.fromhex(stored)
+            else:
+                # Expired between the two calls - nothing left to preserve
+                await self.cache.set(key, secret.hex(), settings.OTP_SESSION_TTL_SECONDS)
+        self._remember_secret(session_id, secret)
+        return secret
+    
+    async def _get_session_secret(self, session_id: str) -> Optional[bytes]:
+        """Get the session secret, from the local copy when possible."""
+        entry = self._secrets.get(session_id)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                return entry[0]
+            del self._secrets[session_id]
+        
+        stored = await self.cache.get(self._get_secret_key(session_id))
+        if stored is None:
+            return None
+        
+        secret = bytes.fromhex(stored)
+        self._remember_secret(session_id, secret)
+        return secret
+    
+    def _remember_secret(self, session_id: str, secret: bytes) -> None:
+        self._secrets[session_id] = (secret, time.monotonic() + settings.OTP_SESSION_TTL_SECONDS)
+        self._secrets.move_to_end(session_id)
+        while len(self._secrets) > self.SECRET_CACHE_SIZE:
+            self._secrets.popitem(last=False)
+    
+    async def _get_nonce(self, session_id: str, student_id: str) -> int:
+        nonce = await self.cache.get(self._get_nonce_key(session_id, student_id))
+        return int(nonce) if nonce is not None else 0
+    
+    async def _bump_nonce(self, session_id: str, student_id: str) -> None:
+        await self.cache.incr_with_ttl(
+            self._get_nonce_key(session_id, student_id),
+            1,
+            settings.OTP_SESSION_TTL_SECONDS
+        )
+    
+    # ==================== Generation ====================
+    
+    async def get_or_create_otp(self, session_id: str, student_id: str) -> Tuple[Optional[str], int]:
+        """
+        Get a student's current OTP, generating one if missing.
+        
+        In derived mode the session secret is created only at session start;
+        an unknown or expired session yields (None, 0) rather than a new secret.
+        
+        Returns:
+            Tuple of (otp, remaining_seconds)
+        """
+        if self.mode == "derived":
+            secret = await self._get_session_secret(session_id)
+            if secret is None:
+                return None, 0
+            nonce = await self._get_nonce(session_id, student_id)
+            window, remaining = self._current_window()
+            return self.derive_otp(secret, student_id, window, nonce), remaining
+        
+        key = self._get_otp_key(session_id, student_id)
+        otp = await self.cache.get(key)
+        
+        if otp is None:
+            otp = self.generate_otp()
+            await self.cache.set(key, otp, self.OTP_TTL_SECONDS)
+            return otp, self.OTP_TTL_SECONDS
+        
+        ttl = await self.get_remaining_ttl(session_id, student_id)
+        return otp, ttl if ttl > 0 else self.OTP_TTL_SECONDS
+    
     async def generate_class_otps(
         self,
         session_id: str,
@@ -55,6 +189,16 @@ class OTPService:
         Returns:
             Dictionary mapping student_id to OTP
         """
+        if self.mode == "derived":
+            # One cache write regardless of class size; codes are computed, not stored.
+            # Derived codes are unique per student only with high probability.
+            secret = await self.create_session_secret(session_id)
+            window, _ = self._current_window()
+            return {
+                student_id: self.derive_otp(secret, student_id, window)
+                for student_id in student_ids
+            }
+        
         async with self._lock:
             otps: Dict[str, str] = {}
             used_otps: set = set()
@@ -69,14 +213,13 @@ class OTPService:
                 
                 used_otps.add(otp)
                 otps[student_id] = otp
-                
-                # Store in cache with TTL
-                key = self._get_otp_key(session_id, student_id)
-                await self.cache.set(key, otp, self.OTP_TTL_SECONDS)
-                
-                # Initialize resend counter
-                resend_key = self._get_resend_key(session_id, student_id)
-                await self.cache.set(resend_key, 0, self.OTP_TTL_SECONDS * 10)
+            
+            # Store all OTPs in one round trip. Resend counters start absent (= 0)
+            # and are created by incr_with_ttl on first resend.
+            await self.cache.mset_with_ttl(
+                {self._get_otp_key(session_id, student_id): otp for student_id, otp in otps.items()},
+                self.OTP_TTL_SECONDS
+            )
             
             return otps
     
@@ -109,6 +252,9 @@ class OTPService:
         Returns:
             OTPVerificationResult with validation status
         """
+        if self.mode == "derived":
+            return await self._verify_derived_otp(session_id, student_id, entered_otp)
+        
         key = self._get_otp_key(session_id, student_id)
         stored_otp = await self.cache.get(key)
         
@@ -133,6 +279,40 @@ class OTPService:
             message="Invalid OTP"
         )
     
+    async def _verify_derived_otp(
+        self,
+        session_id: str,
+        student_id: str,
+        entered_otp: str
+    ) -> OTPVerificationResult:
+        """Recompute the expected code; the previous window is accepted as grace."""
+        secret = await self._get_session_secret(session_id)
+        if secret is None:
+            return OTPVerificationResult(
+                valid=False,
+                expired=True,
+                message="OTP has expired or was not generated"
+            )
+        
+        nonce = await self._get_nonce(session_id, student_id)
+        window, _ = self._current_window()
+        entered = str(entered_otp)
+        
+        for candidate_window in (window, window - 1):
+            expected = self.derive_otp(secret, student_id, candidate_window, nonce)
+            if hmac.compare_digest(expected, entered):
+                return OTPVerificationResult(
+                    valid=True,
+                    expired=False,
+                    message="OTP verified successfully"
+                )
+        
+        return OTPVerificationResult(
+            valid=False,
+            expired=False,
+            message="Invalid OTP"
+        )
+    
     async def resend_otp(
         self,
         session_id: str,
@@ -145,16 +325,15 @@ class OTPService:
         Returns:
             Tuple of (success, message, attempts_remaining, expires_at)
         """
+        if self.mode == "derived" and await self._get_session_secret(session_id) is None:
+            return (False, "Session not found or expired", 0, None)
+        
         resend_key = self._get_resend_key(session_id, student_id)
         
-        # Get current resend count
-        resend_count = await self.cache.get(resend_key)
-        if resend_count is None:
-            resend_count = 0
-        else:
-            resend_count = int(resend_count)
+        # Claim a resend slot atomically - concurrent resends can't both pass the limit
+        resend_count = await self.cache.incr_with_ttl(resend_key, 1, self.OTP_TTL_SECONDS * 10)
         
-        if resend_count >= self.MAX_RESEND_ATTEMPTS:
+        if resend_count > self.MAX_RESEND_ATTEMPTS:
             return (
                 False,
                 "Maximum resend attempts reached",
@@ -162,22 +341,23 @@ class OTPService:
                 None
             )
         
-        # Generate new OTP
-        new_otp = self.generate_otp()
-        otp_key = self._get_otp_key(session_id, student_id)
-        
-        # Store new OTP
-        await self.cache.set(otp_key, new_otp, self.OTP_TTL_SECONDS)
-        
-        # Increment resend counter
-        await self.cache.set(resend_key, resend_count + 1, self.OTP_TTL_SECONDS * 10)
+        if self.mode == "derived":
+            # New code = same secret with the next nonce
+            await self._bump_nonce(session_id, student_id)
+        else:
+            # Generate new OTP
+            new_otp = self.generate_otp()
+            otp_key = self._get_otp_key(session_id, student_id)
+            
+            # Store new OTP
+            await self.cache.set(otp_key, new_otp, self.OTP_TTL_SECONDS)
         
         # Update database tracking if session provided
         if db:
             await self._update_resend_tracking(db, session_id, student_id)
         
         expires_at = datetime.utcnow() + timedelta(seconds=self.OTP_TTL_SECONDS)
-        attempts_remaining = self.MAX_RESEND_ATTEMPTS - resend_count - 1
+        attempts_remaining = self.MAX_RESEND_ATTEMPTS - resend_count
         
         return (
             True,
@@ -199,12 +379,21 @@ class OTPService:
     
     async def get_remaining_ttl(self, session_id: str, student_id: str) -> int:
         """Get remaining seconds until OTP expires."""
+        if self.mode == "derived":
+            if await self._get_session_secret(session_id) is None:
+                return 0
+            return self._current_window()[1]
+        
         key = self._get_otp_key(session_id, student_id)
         ttl = await self.cache.ttl(key)
         return max(0, ttl)
     
     async def invalidate_otp(self, session_id: str, student_id: str) -> None:
         """Invalidate OTP after successful verification."""
+        if self.mode == "derived":
+            await self._bump_nonce(session_id, student_id)
+            return
+        
         key = self._get_otp_key(session_id, student_id)
         await self.cache.delete(key)
     
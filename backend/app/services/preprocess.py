@@ -5,70 +5,137 @@ UPDATED: MediaPipe Tasks API (2026-compatible) + CLAHE
 """
 import cv2
 import numpy as np
-from typing import Optional, Tuple, List
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, List
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 import os
 
+from app.services.instance_pool import InstancePool
+
+
+@dataclass
+class FaceLandmarks:
+    """One FaceLandmarker pass over a frame, shared by alignment, blink and smile checks"""
+    points: np.ndarray  # (478, 2) landmark pixel coordinates, FaceMesh topology
+    blendshapes: Dict[str, float] = field(default_factory=dict)  # e.g. eyeBlinkLeft, mouthSmileRight
+    
+    def score(self, *names: str) -> float:
+        """Mean score of the named blendshapes (0.0 for any that are missing)."""
+        if not names:
+            return 0.0
+        return float(sum(self.blendshapes.get(name, 0.0) for name in names) / len(names))
+
+
+# Checked in order (repo root, then backend/ as working directory)
+LANDMARKER_MODEL_PATHS = ('backend/face_landmarker.task', 'face_landmarker.task')
+
+
+def find_landmarker_model() -> Optional[str]:
+    """Path of the face landmarker model, or None if it is not present."""
+    for path in LANDMARKER_MODEL_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def create_face_landmarker(model_path: str, running_mode=None) -> "vision.FaceLandmarker":
+    """
+    Create a single-face landmarker with blendshapes.
+    
+    Args:
+        model_path: face_landmarker.task path
+        running_mode: vision.RunningMode (IMAGE by default; VIDEO tracks across
+            frames and needs increasing timestamps)
+    """
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.FaceLandmarkerOptions(
+        base_options=base_options,
+        running_mode=running_mode or vision.RunningMode.IMAGE,
+        output_face_blendshapes=True,
+        output_facial_transformation_matrixes=False,
+        num_faces=1,
+        min_face_detection_confidence=0.5,
+        min_face_presence_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+    return vision.FaceLandmarker.create_from_options(options)
+
+
+def warm_up_landmarker(landmarker: "vision.FaceLandmarker", running_mode=None) -> None:
+    """Push one blank frame through a new landmarker so graph setup isn't paid by a request."""
+    blank = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.zeros((64, 64, 3), dtype=np.uint8))
+    if running_mode == vision.RunningMode.VIDEO:
+        landmarker.detect_for_video(blank, 0)
+    else:
+        landmarker.detect(blank)
+
+
+def face_landmarks_from_result(
+    result,
+    width: float,
+    height: float,
+    offset: Tuple[float, float] = (0.0, 0.0)
+) -> Optional[FaceLandmarks]:
+    """
+    Convert the first face of a FaceLandmarkerResult to FaceLandmarks.
+    
+    Args:
+        result: Landmarker output for one image
+        width, height: Extent of that image in target pixels (so a crop maps back to the frame)
+        offset: Target pixel position of the image's top-left corner
+    """
+    if not result.face_landmarks:
+        return None
+    
+    landmarks = np.array([
+        [offset[0] + lm.x * width, offset[1] + lm.y * height]
+        for lm in result.face_landmarks[0]
+    ])
+    
+    blendshapes = {}
+    if result.face_blendshapes:
+        blendshapes = {
+            category.category_name: float(category.score)
+            for category in result.face_blendshapes[0]
+        }
+    
+    return FaceLandmarks(points=landmarks, blendshapes=blendshapes)
+
 
 class FacePreprocessor:
     """
     Production-grade face preprocessing with:
     - CLAHE for lighting normalization (Contrast Limited Adaptive Histogram Equalization)
-    - MediaPipe Tasks API for landmark detection (2026-compatible)
+    - MediaPipe Tasks API for landmark detection (2026-compatible), from a
+      pool of landmarkers so inference threads don't share one graph
     - Affine transformation for alignment
     """
     
     def __init__(self):
         # Path to face landmarker model
-        model_path = 'backend/face_landmarker.task'
+        self.model_path = find_landmarker_model()
         
-        # Check if model exists
-        self.face_landmarker = None
-        if not os.path.exists(model_path):
-            print(f"⚠️ Face landmarker model not found at {model_path}")
-            # Try alternative path
-            model_path = 'face_landmarker.task'
-            if not os.path.exists(model_path):
-                print("⚠️ MediaPipe model not found, will use fallback preprocessing")
-                self.face_landmarker = None
-            else:
-                try:
-                    # Initialize MediaPipe Face Landmarker
-                    base_options = python.BaseOptions(model_asset_path=model_path)
-                    options = vision.FaceLandmarkerOptions(
-                        base_options=base_options,
-                        output_face_blendshapes=False,
-                        output_facial_transformation_matrixes=False,
-                        num_faces=1,
-                        min_face_detection_confidence=0.5,
-                        min_face_presence_confidence=0.5,
-                        min_tracking_confidence=0.5
-                    )
-                    self.face_landmarker = vision.FaceLandmarker.create_from_options(options)
-                    print("✓ MediaPipe Face Landmarker initialized")
-                except Exception as e:
-                    print(f"⚠️ Failed to initialize MediaPipe: {e}")
-                    self.face_landmarker = None
+        # MediaPipe graphs are not safe to call concurrently: one landmarker
+        # per inference thread, checked out for each detection
+        self.landmarkers: Optional[InstancePool] = None
+        if self.model_path is None:
+            print("⚠️ MediaPipe model not found, will use fallback preprocessing")
         else:
             try:
                 # Initialize MediaPipe Face Landmarker (Tasks API - 2026 Standard)
-                base_options = python.BaseOptions(model_asset_path=model_path)
-                options = vision.FaceLandmarkerOptions(
-                    base_options=base_options,
-                    output_face_blendshapes=False,
-                    output_facial_transformation_matrixes=False,
-                    num_faces=1,
-                    min_face_detection_confidence=0.5,
-                    min_face_presence_confidence=0.5,
-                    min_tracking_confidence=0.5
+                self.landmarkers = InstancePool(
+                    lambda: create_face_landmarker(self.model_path),
+                    warm_up=warm_up_landmarker,
+                    close=lambda landmarker: landmarker.close()
                 )
-                self.face_landmarker = vision.FaceLandmarker.create_from_options(options)
+                # First instance now, so a missing or broken model shows up at startup
+                self.landmarkers.prewarm(1)
                 print("✓ MediaPipe Face Landmarker initialized")
             except Exception as e:
                 print(f"⚠️ Failed to initialize MediaPipe: {e}")
-                self.face_landmarker = None
+                self.landmarkers = None
         
         # CLAHE for contrast enhancement (handles uneven lighting)
         self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -80,11 +147,23 @@ class FacePreprocessor:
         
         print("✓ FacePreprocessor initialized with CLAHE")
     
-    def preprocess(self, image: np.ndarray) -> Optional[np.ndarray]:
+    def analyze(self, image: np.ndarray) -> Optional[FaceLandmarks]:
+        """
+        Run the landmarker once on a BGR frame.
+        Pass the result to preprocess(), LivenessService.detect_blink_in_frame()
+        and EmotionService.check_smile() so the frame is not analyzed again.
+        
+        Returns: FaceLandmarks or None if no face (or no landmarker)
+        """
+        if image is None or image.size == 0:
+            return None
+        return self._detect(self._to_rgb(image))
+    
+    def preprocess(self, image: np.ndarray, face: Optional[FaceLandmarks] = None) -> Optional[np.ndarray]:
         """
         Complete preprocessing pipeline (2026 Standard):
         1. Convert to RGB
-        2. Detect landmarks with MediaPipe Tasks API
+        2. Detect landmarks with MediaPipe Tasks API (skipped when `face` is given)
         3. Align face using eye positions
         4. Convert to grayscale
         5. Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
@@ -96,22 +175,18 @@ class FacePreprocessor:
             return None
         
         # Step 1: Convert to RGB (MediaPipe expects RGB)
-        if len(image.shape) == 2:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-        elif image.shape[2] == 4:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGB)
-        else:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        rgb_image = self._to_rgb(image)
         
         # Step 2: Detect facial landmarks using MediaPipe Tasks API
-        landmarks = self._detect_landmarks(rgb_image)
-        if landmarks is None:
+        if face is None:
+            face = self._detect(rgb_image)
+        if face is None:
             print("⚠️ No face landmarks detected")
             # Try without alignment
             return self._preprocess_without_alignment(rgb_image)
         
         # Step 3: Align face using eye positions
-        aligned_face = self._align_face(rgb_image, landmarks)
+        aligned_face = self._align_face(rgb_image, face.points)
         if aligned_face is None:
             print("⚠️ Face alignment failed, using unaligned")
             return self._preprocess_without_alignment(rgb_image)
@@ -127,6 +202,14 @@ class FacePreprocessor:
         
         return final_face
     
+    def _to_rgb(self, image: np.ndarray) -> np.ndarray:
+        """Convert a grayscale, BGRA or BGR frame to RGB."""
+        if len(image.shape) == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        elif image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2RGB)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    
     def _preprocess_without_alignment(self, rgb_image: np.ndarray) -> np.ndarray:
         """Fallback preprocessing without alignment - always succeeds."""
         try:
@@ -153,8 +236,16 @@ class FacePreprocessor:
         Detect facial landmarks using MediaPipe Tasks API.
         Returns: Array of landmark coordinates or None
         """
+        face = self._detect(rgb_image)
+        return face.points if face is not None else None
+    
+    def _detect(self, rgb_image: np.ndarray) -> Optional[FaceLandmarks]:
+        """
+        Single landmarker call returning landmarks and blendshape scores.
+        Returns: FaceLandmarks or None
+        """
         # If MediaPipe not available, return None
-        if self.face_landmarker is None:
+        if self.landmarkers is None:
             return None
         
         try:
@@ -162,22 +253,11 @@ class FacePreprocessor:
             mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
             
             # Detect face landmarks
-            detection_result = self.face_landmarker.detect(mp_image)
-            
-            if not detection_result.face_landmarks or len(detection_result.face_landmarks) == 0:
-                return None
-            
-            # Get first face landmarks
-            face_landmarks = detection_result.face_landmarks[0]
+            with self.landmarkers.checkout() as landmarker:
+                detection_result = landmarker.detect(mp_image)
             
-            # Convert to numpy array
             h, w = rgb_image.shape[:2]
-            landmarks = np.array([
-                [lm.x * w, lm.y * h] 
-                for lm in face_landmarks
-            ])
-            
-            return landmarks
+            return face_landmarks_from_result(detection_result, w, h)
             
         except Exception as e:
             print(f"Landmark detection error: {e}")
@@ -240,6 +320,14 @@ class FacePreprocessor:
             print(f"Face alignment error: {e}")
             return None
     
+    def create_video_landmarker(self) -> "vision.FaceLandmarker":
+        """New warmed-up VIDEO-mode landmarker for frame sequences (caller owns and closes it)."""
+        if self.model_path is None:
+            raise RuntimeError("Face landmarker model not found")
+        landmarker = create_face_landmarker(self.model_path, vision.RunningMode.VIDEO)
+        warm_up_landmarker(landmarker, vision.RunningMode.VIDEO)
+        return landmarker
+    
     def preprocess_batch(self, images: List[np.ndarray]) -> List[np.ndarray]:
         """
         Preprocess multiple images (for multi-shot enrollment).
@@ -282,9 +370,9 @@ class FacePreprocessor:
     
     def __del__(self):
         """Cleanup MediaPipe resources."""
-        if hasattr(self, 'face_landmarker') and self.face_landmarker is not None:
+        if hasattr(self, 'landmarkers') and self.landmarkers is not None:
             try:
-                self.face_landmarker.close()
+                self.landmarkers.close()
             except:
                 pass
 
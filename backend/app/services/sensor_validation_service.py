@@ -6,7 +6,9 @@ from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 from enum import Enum
 
+from app.core.config import settings
 from app.services.geofence_service import get_geofence_service
+from app.services.session_reference import SessionReference
 
 
 class SensorType(Enum):
@@ -404,6 +406,34 @@ class SensorValidationService:
             total_sensors_checked=total_checked,
             passed_sensors_count=passed_count
         )
+    
+    def validate_classroom_sensors(
+        self,
+        ble_rssi: Optional[float] = None,
+        ble_beacon_uuid: Optional[str] = None,
+        student_pressure: Optional[float] = None,
+        reference: Optional[SessionReference] = None
+    ) -> MultiSensorValidationResult:
+        """
+        Check BLE proximity and barometric pressure against the session's
+        reference (beacon UUID, teacher pressure), or the configured classroom
+        (CLASSROOM_BEACON_UUID, CLASSROOM_PRESSURE_HPA) when none is given.
+        
+        A sensor is skipped when the device sent no reading or the classroom
+        reference is not configured, so callers should test failed_sensors
+        rather than overall_passed (which is False when nothing was checked).
+        """
+        if reference is None:
+            beacon_uuid, pressure_hpa = settings.CLASSROOM_BEACON_UUID, settings.CLASSROOM_PRESSURE_HPA
+        else:
+            beacon_uuid, pressure_hpa = reference.beacon_uuid, reference.pressure_hpa
+        return self.validate_all_sensors(
+            ble_rssi=ble_rssi,
+            ble_beacon_uuid=ble_beacon_uuid,
+            session_beacon_uuid=beacon_uuid,
+            student_pressure=student_pressure,
+            teacher_pressure=pressure_hpa
+        )
 
 
 # Singleton instance
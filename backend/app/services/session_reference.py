@@ -0,0 +1,171 @@
+"""
+Per-Session Classroom Reference Registry
+Holds the teacher's GPS fix (and its accuracy), the classroom beacon UUID and
+the barometric reference for each attendance session. A reference is written
+once when the session starts and never changes, so besides the shared cache
+entry every worker keeps a short-lived local copy - geofence, BLE and
+barometer checks on /verify are then a dict lookup, not a query. Ending a
+session removes the reference; other workers' copies lapse within
+SESSION_CACHE_TTL_SECONDS, the same bound as their cached session rows.
+
+Sessions started without a reference (or before this registry existed) use
+the CLASSROOM_* settings.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.db.cache import CacheBackend, get_cache
+
+
+@dataclass(frozen=True)
+class SessionReference:
+    """Teacher-side readings that students' sensors are compared against."""
+    session_id: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    gps_accuracy: Optional[float] = None  # meters
+    beacon_uuid: Optional[str] = None
+    pressure_hpa: Optional[float] = None
+    
+    @property
+    def has_location(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+    
+    def geofence_radius(self, radius_meters: float) -> float:
+        """
+        Geofence radius widened by the uncertainty of the teacher's own fix,
+        at most GEOFENCE_MAX_ACCURACY_MARGIN_METERS.
+        """
+        margin = min(self.gps_accuracy or 0.0, settings.GEOFENCE_MAX_ACCURACY_MARGIN_METERS)
+        return radius_meters + margin
+    
+    @classmethod
+    def from_settings(cls, session_id: str) -> "SessionReference":
+        """Reference built from the global CLASSROOM_* settings."""
+        return cls(
+            session_id=session_id,
+            latitude=settings.CLASSROOM_LATITUDE,
+            longitude=settings.CLASSROOM_LONGITUDE,
+            beacon_uuid=settings.CLASSROOM_BEACON_UUID,
+            pressure_hpa=settings.CLASSROOM_PRESSURE_HPA
+        )
+    
+    @classmethod
+    def from_readings(
+        cls,
+        session_id: str,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        gps_accuracy: Optional[float] = None,
+        beacon_uuid: Optional[str] = None,
+        pressure_hpa: Optional[float] = None
+    ) -> "SessionReference":
+        """
+        Reference from the teacher's readings; anything not supplied comes
+        from settings. A location is only taken when both coordinates are given.
+        """
+        defaults = cls.from_settings(session_id)
+        has_fix = latitude is not None and longitude is not None
+        return cls(
+            session_id=session_id,
+            latitude=latitude if has_fix else defaults.latitude,
+            longitude=longitude if has_fix else defaults.longitude,
+            gps_accuracy=gps_accuracy if has_fix else None,
+            beacon_uuid=beacon_uuid or defaults.beacon_uuid,
+            pressure_hpa=pressure_hpa if pressure_hpa is not None else defaults.pressure_hpa
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionReference":
+        return cls(**{field: data.get(field) for field in cls.__dataclass_fields__})
+
+
+class SessionReferenceRegistry:
+    """Session references in the shared cache, fronted by a per-worker LRU."""
+    
+    REFERENCE_CACHE_SIZE = 1024
+    
+    def __init__(
+        self,
+        cache: CacheBackend = None,
+        ttl_seconds: Optional[int] = None,
+        local_ttl_seconds: Optional[int] = None
+    ):
+        self.cache = cache or get_cache()
+        self.ttl_seconds = ttl_seconds or settings.OTP_SESSION_TTL_SECONDS
+        self.local_ttl_seconds = local_ttl_seconds or settings.SESSION_CACHE_TTL_SECONDS
+        # session_id -> (reference, expires_at_monotonic)
+        self._references: "OrderedDict[str, Tuple[SessionReference, float]]" = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def _get_key(self, session_id: str) -> str:
+        """Generate cache key for a session's reference."""
+        return f"session_ref:{session_id}"
+    
+    async def register(self, reference: SessionReference, ttl_seconds: Optional[int] = None) -> None:
+        """Store a session's reference for its lifetime (called when the session starts)."""
+        ttl = ttl_seconds or self.ttl_seconds
+        await self.cache.set(self._get_key(reference.session_id), reference.to_dict(), ttl)
+        self._remember(reference, ttl)
+    
+    async def get(self, session_id: str) -> Optional[SessionReference]:
+        """Registered reference for a session, or None if it has none or has ended."""
+        entry = self._references.get(session_id)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            del self._references[session_id]
+        
+        self.misses += 1
+        stored, ttl = await self.cache.get_with_ttl(self._get_key(session_id))
+        if stored is None:
+            return None
+        
+        reference = SessionReference.from_dict(stored)
+        self._remember(reference, ttl if ttl > 0 else self.ttl_seconds)
+        return reference
+    
+    async def resolve(self, session_id: str) -> SessionReference:
+        """Registered reference, falling back to the CLASSROOM_* settings."""
+        reference = await self.get(session_id)
+        return reference if reference is not None else SessionReference.from_settings(session_id)
+    
+    async def remove(self, session_id: str) -> None:
+        """Forget a session's reference when it ends (other workers' local copies lapse)."""
+        self._references.pop(session_id, None)
+        await self.cache.delete(self._get_key(session_id))
+    
+    def _remember(self, reference: SessionReference, ttl_seconds: int) -> None:
+        lifetime = min(ttl_seconds, self.local_ttl_seconds)
+        self._references[reference.session_id] = (reference, time.monotonic() + lifetime)
+        self._references.move_to_end(reference.session_id)
+        while len(self._references) > self.REFERENCE_CACHE_SIZE:
+            self._references.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._references),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Singleton instance
+_session_reference_registry: Optional[SessionReferenceRegistry] = None
+
+
+def get_session_reference_registry() -> SessionReferenceRegistry:
+    """Get or create session reference registry instance."""
+    global _session_reference_registry
+    if _session_reference_registry is None:
+        _session_reference_registry = SessionReferenceRegistry()
+    return _session_reference_registry
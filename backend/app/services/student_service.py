@@ -28,7 +28,7 @@ class StudentService:
         """
         try:
             response = self.supabase.table("students").select(
-                "*, users(email)"
+                "id, name, student_id_card_number, approval_status, created_at, approved_at, users(email)"
             ).eq("user_id", user_id).execute()
             
             if response.data and len(response.data) > 0:
@@ -63,7 +63,8 @@ class StudentService:
         """
         try:
             query = self.supabase.table("attendance").select(
-                "*, attendance_sessions(session_id, class_id)"
+                "id, session_id, timestamp, verification_status, face_confidence, otp_verified, "
+                "attendance_sessions(session_id, class_id)"
             ).eq("student_id", student_id)
             
             if start_date:
@@ -105,7 +106,9 @@ class StudentService:
         """
         try:
             # Get all attendance records
-            attendance_response = self.supabase.table("attendance").select("*").eq("student_id", student_id).execute()
+            attendance_response = self.supabase.table("attendance").select(
+                "timestamp, verification_status"
+            ).eq("student_id", student_id).execute()
             
             total_attended = len(attendance_response.data)
             verified_count = len([r for r in attendance_response.data if r["verification_status"] == "verified"])
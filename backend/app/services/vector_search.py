@@ -1,25 +1,130 @@
 """
-FAISS Vector Search for Fast Face Matching
-Scales to 10,000+ students with <100ms search time
+Vector Search for Fast Face Matching
+Two interchangeable engines behind one interface:
+- FAISS: per-process in-memory index, scales to 10,000+ students with <100ms search time
+- pgvector: embeddings in a Postgres vector column with an HNSW index, shared by all workers
 """
 import numpy as np
 import faiss
+from abc import ABC, abstractmethod
 from typing import List, Tuple, Optional, Dict
 from dataclasses import dataclass
-import pickle
+import json
 import os
 
+from app.core.config import settings
+
 
 @dataclass
 class SearchResult:
     """Result from vector search."""
     student_id: int
     student_name: str
-    similarity: float
-    distance: float
+    similarity: float  # Cosine similarity rescaled to [0, 1]
+    distance: float  # Cosine distance, 1 - cosine similarity, in [0, 2]
 
 
-class VectorSearchEngine:
+class VectorSearchBackend(ABC):
+    """Abstract vector search interface."""
+    
+    @abstractmethod
+    def add_embedding(self, student_id: int, student_name: str, embedding: np.ndarray):
+        """Add or replace a student embedding."""
+        pass
+    
+    @abstractmethod
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[SearchResult]:
+        """Return the k most similar students, highest similarity first."""
+        pass
+    
+    @abstractmethod
+    def remove_student(self, student_id: int):
+        """Remove a student's embedding."""
+        pass
+    
+    @abstractmethod
+    def save(self):
+        """Persist the index (no-op for database-backed engines)."""
+        pass
+    
+    @abstractmethod
+    def load(self) -> bool:
+        """Load a persisted index. Returns True if one was loaded."""
+        pass
+    
+    @abstractmethod
+    def rebuild_from_database(self, students: List[Tuple[int, str, np.ndarray]]):
+        """Replace all indexed embeddings."""
+        pass
+    
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        """Get index statistics."""
+        pass
+    
+    def row_columns(self, embedding: np.ndarray) -> Dict:
+        """Extra students columns to write with the row (engines that index the table itself)."""
+        return {}
+    
+    def find_best_match(
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.60
+    ) -> Optional[SearchResult]:
+        """
+        Find single best match above threshold.
+        
+        Args:
+            query_embedding: Query face embedding
+            threshold: Minimum similarity threshold
+        
+        Returns:
+            Best match or None if no match above threshold
+        """
+        results = self.search(query_embedding, k=1)
+        
+        if not results:
+            return None
+        
+        best = results[0]
+        if best.similarity >= threshold:
+            return best
+        
+        return None
+    
+    def check_duplicate(
+        self,
+        embedding: np.ndarray,
+        threshold: float = 0.90
+    ) -> Tuple[bool, Optional[SearchResult]]:
+        """
+        Check if embedding is duplicate of existing student.
+        
+        Args:
+            embedding: New student embedding
+            threshold: Duplicate detection threshold (default 0.90)
+        
+        Returns:
+            (is_duplicate, duplicate_info)
+        """
+        result = self.find_best_match(embedding, threshold)
+        
+        if result:
+            return True, result
+        
+        return False, None
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """L2 normalize embedding."""
+        embedding = np.array(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding = embedding / norm
+        return embedding
+
+
+class VectorSearchEngine(VectorSearchBackend):
     """
     FAISS-based vector search for fast face matching.
     
@@ -34,7 +139,7 @@ class VectorSearchEngine:
         self.index: Optional[faiss.Index] = None
         self.student_map: Dict[int, Tuple[int, str]] = {}  # index_id -> (student_id, name)
         self.index_path = "faiss_index.bin"
-        self.map_path = "student_map.pkl"
+        self.map_path = "student_map.json"
         
         # Initialize index
         self._initialize_index()
@@ -121,59 +226,11 @@ class VectorSearchEngine:
                 student_id=student_id,
                 student_name=student_name,
                 similarity=similarity,
-                distance=float(dist)
+                distance=float(1 - dist)
             ))
         
         return results
     
-    def find_best_match(
-        self,
-        query_embedding: np.ndarray,
-        threshold: float = 0.60
-    ) -> Optional[SearchResult]:
-        """
-        Find single best match above threshold.
-        
-        Args:
-            query_embedding: Query face embedding
-            threshold: Minimum similarity threshold
-        
-        Returns:
-            Best match or None if no match above threshold
-        """
-        results = self.search(query_embedding, k=1)
-        
-        if not results:
-            return None
-        
-        best = results[0]
-        if best.similarity >= threshold:
-            return best
-        
-        return None
-    
-    def check_duplicate(
-        self,
-        embedding: np.ndarray,
-        threshold: float = 0.90
-    ) -> Tuple[bool, Optional[SearchResult]]:
-        """
-        Check if embedding is duplicate of existing student.
-        
-        Args:
-            embedding: New student embedding
-            threshold: Duplicate detection threshold (default 0.90)
-        
-        Returns:
-            (is_duplicate, duplicate_info)
-        """
-        result = self.find_best_match(embedding, threshold)
-        
-        if result:
-            return True, result
-        
-        return False, None
-    
     def remove_student(self, student_id: int):
         """
         Remove student from index.
@@ -204,9 +261,13 @@ class VectorSearchEngine:
             # Save FAISS index
             faiss.write_index(self.index, self.index_path)
             
-            # Save student mapping
-            with open(self.map_path, 'wb') as f:
-                pickle.dump(self.student_map, f)
+            # Save student mapping as a JSON sidecar (no pickle on the load path)
+            entries = [
+                [index_id, student_id, name]
+                for index_id, (student_id, name) in self.student_map.items()
+            ]
+            with open(self.map_path, 'w') as f:
+                json.dump({"version": 1, "dimension": self.dimension, "entries": entries}, f)
             
             print(f"✓ Vector index saved ({self.index.ntotal} students)")
         except Exception as e:
@@ -217,11 +278,19 @@ class VectorSearchEngine:
         try:
             if os.path.exists(self.index_path) and os.path.exists(self.map_path):
                 # Load FAISS index
-                self.index = faiss.read_index(self.index_path)
+                index = faiss.read_index(self.index_path)
+                if index.d != self.dimension:
+                    print(f"⚠️ Saved index has dimension {index.d}, expected {self.dimension} - ignoring it")
+                    return False
+                self.index = index
                 
                 # Load student mapping
-                with open(self.map_path, 'rb') as f:
-                    self.student_map = pickle.load(f)
+                with open(self.map_path, 'r') as f:
+                    sidecar = json.load(f)
+                self.student_map = {
+                    int(index_id): (int(student_id), name)
+                    for index_id, student_id, name in sidecar["entries"]
+                }
                 
                 print(f"✓ Vector index loaded ({self.index.ntotal} students)")
                 return True
@@ -253,26 +322,148 @@ class VectorSearchEngine:
             "dimension": self.dimension,
             "index_type": type(self.index).__name__ if self.index else None
         }
+
+
+
+class PgVectorSearchEngine(VectorSearchBackend):
+    """
+    pgvector-backed vector search.
     
-    @staticmethod
-    def _normalize(embedding: np.ndarray) -> np.ndarray:
-        """L2 normalize embedding."""
-        embedding = np.array(embedding, dtype=np.float32)
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        return embedding
+    Features:
+    - Embeddings live in students.facial_embedding_vec (vector(d)) with an HNSW index
+    - search/find_best_match/check_duplicate are one SQL query (match_student_embeddings RPC)
+    - Every API worker sees new enrollments immediately - nothing to save, load or ship
+    
+    See migration_pgvector_search.sql for the column, index and function.
+    """
+    
+    def __init__(self, dimension: int = 128, supabase=None):
+        self.dimension = dimension
+        self._supabase = supabase
+    
+    @property
+    def supabase(self):
+        """Lazily resolve the Supabase client."""
+        if self._supabase is None:
+            from app.db.supabase_client import get_supabase
+            self._supabase = get_supabase()
+        return self._supabase
+    
+    def add_embedding(
+        self,
+        student_id: int,
+        student_name: str,
+        embedding: np.ndarray
+    ):
+        """
+        Store a student embedding in the vector column (backfills; new rows
+        get it from row_columns at insert time).
+        
+        Args:
+            student_id: Unique student ID
+            student_name: Student name (stored on the row already)
+            embedding: Face embedding
+        """
+        self.supabase.table('students').update({
+            'facial_embedding_vec': self._to_vector(embedding)
+        }).eq('id', student_id).execute()
+    
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int = 5
+    ) -> List[SearchResult]:
+        """
+        Search for k most similar faces with one indexed query.
+        
+        Args:
+            query_embedding: Query face embedding
+            k: Number of results to return
+        
+        Returns:
+            List of SearchResult ordered by similarity (highest first)
+        """
+        result = self.supabase.rpc('match_student_embeddings', {
+            'query_embedding': self._to_vector(query_embedding),
+            'match_count': k
+        }).execute()
+        
+        results = []
+        for row in (result.data or []):
+            cosine = float(row['similarity'])
+            results.append(SearchResult(
+                student_id=row['id'],
+                student_name=row['name'],
+                # Same scale as the FAISS engine: cosine [-1, 1] -> [0, 1]
+                similarity=(cosine + 1) / 2,
+                distance=1 - cosine
+            ))
+        
+        return results
+    
+    def row_columns(self, embedding: np.ndarray) -> Dict:
+        """The vector column, so inserts are searchable without a follow-up update."""
+        return {'facial_embedding_vec': self._to_vector(embedding)}
+    
+    def remove_student(self, student_id: int):
+        """Clear a student's vector (deleting the row also removes it)."""
+        self.supabase.table('students').update({
+            'facial_embedding_vec': None
+        }).eq('id', student_id).execute()
+    
+    def save(self):
+        """Nothing to persist - the database is the index."""
+        pass
+    
+    def load(self) -> bool:
+        """Nothing to load - the database is the index."""
+        return True
+    
+    def rebuild_from_database(self, students: List[Tuple[int, str, np.ndarray]]):
+        """
+        Write vectors for the given students (e.g. rows enrolled before the migration).
+        
+        Args:
+            students: List of (student_id, name, embedding) tuples
+        """
+        for student_id, name, embedding in students:
+            self.add_embedding(student_id, name, embedding)
+        
+        print(f"✓ pgvector column populated for {len(students)} students")
+    
+    def get_stats(self) -> Dict:
+        """Get index statistics."""
+        result = self.supabase.table('students').select(
+            'id', count='exact'
+        ).not_.is_('facial_embedding_vec', 'null').limit(1).execute()
+        
+        return {
+            "total_students": result.count or 0,
+            "dimension": self.dimension,
+            "index_type": "pgvector_hnsw"
+        }
+    
+    def _to_vector(self, embedding: np.ndarray) -> str:
+        """Format an embedding as pgvector text input ('[x1,x2,...]')."""
+        embedding = self._normalize(embedding)
+        if len(embedding) != self.dimension:
+            raise ValueError(f"Embedding dimension {len(embedding)} != {self.dimension}")
+        return '[' + ','.join(repr(float(x)) for x in embedding) + ']'
 
 
 # Singleton instance
-_vector_search: Optional[VectorSearchEngine] = None
+_vector_search: Optional[VectorSearchBackend] = None
 
 
-def get_vector_search() -> VectorSearchEngine:
-    """Get or create vector search engine instance."""
+def get_vector_search() -> VectorSearchBackend:
+    """Get or create the configured vector search engine."""
     global _vector_search
     if _vector_search is None:
-        _vector_search = VectorSearchEngine()
-        # Try to load existing index
-        _vector_search.load()
+        if settings.VECTOR_SEARCH_BACKEND == "pgvector":
+            print("✅ Using pgvector similarity search")
+            _vector_search = PgVectorSearchEngine(settings.EMBEDDING_DIMENSION)
+        else:
+            _vector_search = VectorSearchEngine(settings.EMBEDDING_DIMENSION)
+            # Try to load existing index
+            _vector_search.load()
     return _vector_search
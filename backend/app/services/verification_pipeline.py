@@ -21,6 +21,7 @@ from app.services.image_quality_service import ImageQualityService, get_image_qu
 from app.services.otp_service import OTPService, get_otp_service
 from app.services.anomaly_service import AnomalyService, get_anomaly_service
 from app.services.geofence_service import GeofenceService, get_geofence_service
+from app.services.session_reference import SessionReferenceRegistry, get_session_reference_registry
 from app.core.config import settings
 
 
@@ -42,7 +43,8 @@ class VerificationPipeline:
         quality_service: ImageQualityService = None,
         otp_service: OTPService = None,
         anomaly_service: AnomalyService = None,
-        geofence_service: GeofenceService = None
+        geofence_service: GeofenceService = None,
+        session_references: SessionReferenceRegistry = None
     ):
         self.face_service = face_service or get_face_recognition_service()
         self.liveness_service = liveness_service or get_liveness_service()
@@ -50,6 +52,7 @@ class VerificationPipeline:
         self.otp_service = otp_service or get_otp_service()
         self.anomaly_service = anomaly_service or get_anomaly_service()
         self.geofence_service = geofence_service or get_geofence_service()
+        self.session_references = session_references or get_session_reference_registry()
     
     async def verify_image_quality(
         self,
@@ -239,13 +242,15 @@ class VerificationPipeline:
         if not self.geofence_service.validate_coordinates(classroom_lat, classroom_lon):
             return False, 0.0, "Invalid classroom coordinates"
         
-        # Check if within geofence
-        is_within, distance = self.geofence_service.is_within_geofence(
+        # Check if within geofence (radius, or the classroom's polygon zone)
+        is_within, distance, zone = self.geofence_service.check_location(
             student_lat, student_lon,
             classroom_lat, classroom_lon,
             radius_meters
         )
         
+        if zone is not None:
+            return True, distance, f"Within geofence zone '{zone}' ({distance:.1f}m from classroom)"
         if is_within:
             return True, distance, f"Within geofence ({distance:.1f}m from classroom)"
         else:
@@ -295,30 +300,28 @@ class VerificationPipeline:
         attendance_session = session_result.scalar_one_or_none()
         attendance_session_id = attendance_session.id if attendance_session else None
         
-        # Verify Geofence (if GPS coordinates provided)
-        if request.latitude is not None and request.longitude is not None:
-            # TODO: Get classroom coordinates from session/class data
-            # For now, using example coordinates (replace with actual classroom location)
-            classroom_lat = 28.6139  # Example: Delhi
-            classroom_lon = 77.2090
-            
+        # Verify Geofence (if GPS coordinates provided) against the teacher's
+        # location registered when the session started
+        reference = await self.session_references.resolve(request.session_id)
+        if request.latitude is not None and request.longitude is not None and reference.has_location:
             geofence_verified, distance_meters, geofence_message = await self.verify_geofence(
                 student_lat=request.latitude,
                 student_lon=request.longitude,
-                classroom_lat=classroom_lat,
-                classroom_lon=classroom_lon,
-                radius_meters=50
+                classroom_lat=reference.latitude,
+                classroom_lon=reference.longitude,
+                radius_meters=reference.geofence_radius(settings.GEOFENCE_RADIUS_METERS)
             )
             
             if not geofence_verified:
                 messages.append(f"Geofence verification failed: {geofence_message}")
         
-        # Check if session is locked (three-strike policy)
+        # Reserve an attempt (three-strike policy) - refused once the session is locked
+        attempt = 0
+        session_key = f"{request.session_id}:{student_db_id}"
         if student_db_id:
-            session_key = f"{request.session_id}:{student_db_id}"
-            is_locked = await self.anomaly_service.is_session_locked(db, session_key)
+            allowed, attempt = await self.anomaly_service.begin_attempt(db, session_key, student_db_id)
             
-            if is_locked:
+            if not allowed:
                 return VerifyResponse(
                     success=False,
                     factors=FactorResults(
@@ -332,116 +335,122 @@ class VerificationPipeline:
                     attendance_id=None
                 )
         
-        # Verify OTP
-        otp_verified, otp_message = await self.verify_otp(
-            session_id=request.session_id,
-            student_id_card_number=request.student_id,
-            entered_otp=request.otp
-        )
-        
-        if not otp_verified:
-            messages.append(f"OTP verification failed: {otp_message}")
-        
-        # Verify face (only if ID verified)
-        if id_verified and student_db_id:
-            face_result = await self.verify_face(
-                base64_image=request.face_image,
-                student_id=student_db_id,
-                db=db,
-                frames_for_liveness=frames_for_liveness
+        # The reserved attempt is settled as a strike (failure) or a reset
+        # (success); anything else, e.g. an exception, hands it back.
+        attempt_settled = False
+        try:
+            # Verify OTP
+            otp_verified, otp_message = await self.verify_otp(
+                session_id=request.session_id,
+                student_id_card_number=request.student_id,
+                entered_otp=request.otp
             )
             
-            face_verified = face_result.verified
-            face_confidence = face_result.confidence
-            liveness_passed = face_result.liveness_passed
+            if not otp_verified:
+                messages.append(f"OTP verification failed: {otp_message}")
             
-            if not face_verified:
-                messages.append(f"Face verification failed: {face_result.message}")
-            
-            # Check for identity mismatch (OTP correct but face < 0.6)
-            if otp_verified and not face_verified and face_confidence < self.FACE_SIMILARITY_THRESHOLD:
-                await self.anomaly_service.record_identity_mismatch(
-                    db=db,
+            # Verify face (only if ID verified)
+            if id_verified and student_db_id:
+                face_result = await self.verify_face(
+                    base64_image=request.face_image,
                     student_id=student_db_id,
-                    session_id=attendance_session_id,
-                    face_confidence=face_confidence
-                )
-                messages.append("Identity mismatch detected")
-            
-            # Check for proxy attempt
-            if id_result.is_proxy_attempt:
-                await self.anomaly_service.record_proxy_attempt(
                     db=db,
-                    claimed_student_id=student_db_id,
-                    matched_student_id=face_result.student_id,
-                    session_id=attendance_session_id,
-                    face_confidence=face_confidence
+                    frames_for_liveness=frames_for_liveness
                 )
-        
-        # Determine overall success (including geofence)
-        all_factors_passed = face_verified and id_verified and otp_verified and liveness_passed and geofence_verified
-        
-        # Handle failure - increment strike count
-        attendance_id = None
-        if not all_factors_passed and student_db_id:
-            session_key = f"{request.session_id}:{student_db_id}"
-            failure_count = await self.anomaly_service.increment_failure_count(
-                db, session_key, student_db_id
-            )
+                
+                face_verified = face_result.verified
+                face_confidence = face_result.confidence
+                liveness_passed = face_result.liveness_passed
+                
+                if not face_verified:
+                    messages.append(f"Face verification failed: {face_result.message}")
+                
+                # Check for identity mismatch (OTP correct but face < 0.6)
+                if otp_verified and not face_verified and face_confidence < self.FACE_SIMILARITY_THRESHOLD:
+                    await self.anomaly_service.record_identity_mismatch(
+                        db=db,
+                        student_id=student_db_id,
+                        session_id=attendance_session_id,
+                        face_confidence=face_confidence
+                    )
+                    messages.append("Identity mismatch detected")
+                
+                # Check for proxy attempt
+                if id_result.is_proxy_attempt:
+                    await self.anomaly_service.record_proxy_attempt(
+                        db=db,
+                        claimed_student_id=student_db_id,
+                        matched_student_id=face_result.student_id,
+                        session_id=attendance_session_id,
+                        face_confidence=face_confidence
+                    )
             
-            # Check for three-strike lockout
-            if failure_count >= self.anomaly_service.MAX_CONSECUTIVE_FAILURES:
-                await self.anomaly_service.lock_session(
-                    db, session_key, student_db_id, attendance_session_id
-                )
-                messages.append("Session locked after 3 failed attempts")
+            # Determine overall success (including geofence)
+            all_factors_passed = face_verified and id_verified and otp_verified and liveness_passed and geofence_verified
             
-            # Record general verification failure
-            if not any(m.startswith("Identity mismatch") or m.startswith("Proxy") for m in messages):
-                await self.anomaly_service.record_anomaly(
-                    db=db,
+            # Handle failure - the strike was already counted by begin_attempt
+            attendance_id = None
+            if not all_factors_passed and student_db_id:
+                attempt_settled = True
+                await self.anomaly_service.record_failure(session_key, student_db_id, attempt)
+                
+                # Check for three-strike lockout
+                if attempt >= self.anomaly_service.MAX_CONSECUTIVE_FAILURES:
+                    await self.anomaly_service.lock_session(
+                        db, session_key, student_db_id, attendance_session_id
+                    )
+                    messages.append("Session locked after 3 failed attempts")
+                
+                # Record general verification failure
+                if not any(m.startswith("Identity mismatch") or m.startswith("Proxy") for m in messages):
+                    await self.anomaly_service.record_anomaly(
+                        db=db,
+                        student_id=student_db_id,
+                        session_id=attendance_session_id,
+                        reason="; ".join(messages) if messages else "Verification failed",
+                        anomaly_type="verification_failed",
+                        face_confidence=face_confidence
+                    )
+            
+            # Reset failure count on every success, with or without an attendance row
+            if all_factors_passed and student_db_id:
+                attempt_settled = True
+                await self.anomaly_service.reset_failure_count(db, session_key, student_db_id)
+            
+            # Record successful attendance
+            if all_factors_passed and student_db_id and attendance_session_id:
+                # Invalidate OTP after successful use
+                await self.otp_service.invalidate_otp(request.session_id, request.student_id)
+                
+                # Create attendance record
+                attendance = AttendanceORM(
                     student_id=student_db_id,
                     session_id=attendance_session_id,
-                    reason="; ".join(messages) if messages else "Verification failed",
-                    anomaly_type="verification_failed",
-                    face_confidence=face_confidence
+                    verification_status="verified",
+                    face_confidence=face_confidence,
+                    otp_verified=True
                 )
-        
-        # Record successful attendance
-        if all_factors_passed and student_db_id and attendance_session_id:
-            # Reset failure count on success
-            session_key = f"{request.session_id}:{student_db_id}"
-            await self.anomaly_service.reset_failure_count(db, session_key)
-            
-            # Invalidate OTP after successful use
-            await self.otp_service.invalidate_otp(request.session_id, request.student_id)
+                db.add(attendance)
+                await db.flush()
+                attendance_id = attendance.id
             
-            # Create attendance record
-            attendance = AttendanceORM(
-                student_id=student_db_id,
-                session_id=attendance_session_id,
-                verification_status="verified",
-                face_confidence=face_confidence,
-                otp_verified=True
+            return VerifyResponse(
+                success=all_factors_passed,
+                factors=FactorResults(
+                    face_verified=face_verified,
+                    face_confidence=face_confidence,
+                    liveness_passed=liveness_passed,
+                    id_verified=id_verified,
+                    otp_verified=otp_verified,
+                    geofence_verified=geofence_verified,
+                    distance_meters=distance_meters
+                ),
+                message="Verification successful" if all_factors_passed else "; ".join(messages),
+                attendance_id=attendance_id
             )
-            db.add(attendance)
-            await db.flush()
-            attendance_id = attendance.id
-        
-        return VerifyResponse(
-            success=all_factors_passed,
-            factors=FactorResults(
-                face_verified=face_verified,
-                face_confidence=face_confidence,
-                liveness_passed=liveness_passed,
-                id_verified=id_verified,
-                otp_verified=otp_verified,
-                geofence_verified=geofence_verified,
-                distance_meters=distance_meters
-            ),
-            message="Verification successful" if all_factors_passed else "; ".join(messages),
-            attendance_id=attendance_id
-        )
+        finally:
+            if attempt and not attempt_settled:
+                await self.anomaly_service.release_attempt(session_key)
 
 
 # Singleton instance
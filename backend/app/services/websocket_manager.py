@@ -1,53 +1,243 @@
 """
 WebSocket Manager for Real-time Dashboard Updates
 Manages WebSocket connections and broadcasts attendance updates
+
+Each connection has a bounded send queue drained by its own task, so a slow
+dashboard never holds up the others: broadcast only enqueues. When a queue
+is full the slow consumer policy applies - drop its oldest message, or
+disconnect it.
+
+Dashboards subscribe to topics - "class:<id>", "session:<id>", "anomalies" -
+and events go only to sockets subscribed to one of their topics. A socket
+that never subscribes is on the wildcard topic and receives everything.
+"live:<session_id>" carries coalesced session totals instead of individual
+events (see live_session_service).
+
+The broadcast_* helpers publish through the event bus; the manager relays
+bus events to its local sockets, so every worker's dashboards see events
+produced by any worker.
 """
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any, Optional, Set
 from fastapi import WebSocket
 from datetime import datetime
+import asyncio
 import json
 
+from app.core.config import settings
+from app.services.event_bus import EventBus, InProcessEventBus, get_event_bus
+
+
+class _Connection:
+    """One dashboard socket with its send queue and sender task."""
+    
+    __slots__ = ("websocket", "queue", "sender", "topics", "sent", "dropped")
+    
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.topics: Set[str] = set()
+        self.sender: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time dashboard updates."""
     
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    POLICIES = ("drop_oldest", "disconnect")
+    ALL_TOPICS = "*"
+    ANOMALY_TOPIC = "anomalies"
+    TOPIC_PREFIXES = ("class:", "session:", "live:")
+    
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        slow_consumer_policy: Optional[str] = None,
+        send_timeout_seconds: Optional[float] = None,
+        event_bus: Optional[EventBus] = None
+    ):
+        self.active_connections: Dict[WebSocket, _Connection] = {}
+        # topic -> subscribed sockets
+        self._subscribers: Dict[str, Set[WebSocket]] = {}
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.slow_consumer_policy = slow_consumer_policy or settings.WS_SLOW_CONSUMER_POLICY
+        if self.slow_consumer_policy not in self.POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.slow_consumer_policy}")
+        self.send_timeout_seconds = send_timeout_seconds or settings.WS_SEND_TIMEOUT_SECONDS
+        
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.slow_consumers_disconnected = 0
+        
+        # Events published by any worker arrive here and go to local sockets
+        self.event_bus = event_bus or InProcessEventBus()
+        self.event_bus.subscribe(self.publish)
+    
+    async def start_relay(self) -> None:
+        """Start relaying bus events to this worker's sockets."""
+        await self.event_bus.start()
+    
+    async def stop_relay(self) -> None:
+        """Stop relaying bus events."""
+        await self.event_bus.stop()
     
-    async def connect(self, websocket: WebSocket):
-        """Accept and store a new WebSocket connection."""
+    async def connect(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        """Accept and store a new WebSocket connection, optionally subscribed to topics."""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = _Connection(websocket, self.queue_size)
+        connection.sender = asyncio.create_task(self._sender(connection))
+        self.active_connections[websocket] = connection
+        self._add_topics(connection, [self.ALL_TOPICS])
+        if topics:
+            self.subscribe(websocket, topics)
         print(f"✓ WebSocket connected. Total connections: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            self._remove_topics(connection, list(connection.topics))
+            if connection.sender is not None and connection.sender is not asyncio.current_task():
+                connection.sender.cancel()
             print(f"✓ WebSocket disconnected. Total connections: {len(self.active_connections)}")
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send a message to a specific WebSocket connection."""
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            print(f"Error sending personal message: {e}")
-            self.disconnect(websocket)
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, message)
+    
+    # ==================== Topics ====================
+    
+    @classmethod
+    def is_valid_topic(cls, topic: str) -> bool:
+        """Topics are "anomalies" or "class:<id>" / "session:<id>" / "live:<id>"."""
+        if not isinstance(topic, str):
+            return False
+        if topic == cls.ANOMALY_TOPIC:
+            return True
+        return any(topic.startswith(prefix) and len(topic) > len(prefix) for prefix in cls.TOPIC_PREFIXES)
+    
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """
+        Subscribe a socket to topics. The first explicit subscription takes the
+        socket off the wildcard topic.
+        
+        Returns:
+            The socket's topics after the change (invalid topics are ignored)
+        """
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return []
+        valid = [topic for topic in topics if self.is_valid_topic(topic)]
+        if valid:
+            self._remove_topics(connection, [self.ALL_TOPICS])
+            self._add_topics(connection, valid)
+        return sorted(connection.topics)
+    
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """Unsubscribe a socket from topics. Returns the socket's remaining topics."""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return []
+        self._remove_topics(connection, [topic for topic in topics if topic != self.ALL_TOPICS])
+        return sorted(connection.topics)
+    
+    def has_subscribers(self, topic: str) -> bool:
+        """Whether any local socket is subscribed to the topic."""
+        return bool(self._subscribers.get(topic))
+    
+    def _add_topics(self, connection: _Connection, topics: Iterable[str]) -> None:
+        for topic in topics:
+            connection.topics.add(topic)
+            self._subscribers.setdefault(topic, set()).add(connection.websocket)
+    
+    def _remove_topics(self, connection: _Connection, topics: Iterable[str]) -> None:
+        for topic in topics:
+            connection.topics.discard(topic)
+            sockets = self._subscribers.get(topic)
+            if sockets is not None:
+                sockets.discard(connection.websocket)
+                if not sockets:
+                    del self._subscribers[topic]
+    
+    async def publish(self, topics: Iterable[str], message: str):
+        """
+        Send a message to every socket subscribed to any of the topics (plus
+        wildcard sockets). Each socket gets it once; cost is O(subscribers).
+        """
+        recipients: Set[WebSocket] = set(self._subscribers.get(self.ALL_TOPICS, ()))
+        for topic in topics:
+            recipients.update(self._subscribers.get(topic, ()))
+        
+        for websocket in recipients:
+            connection = self.active_connections.get(websocket)
+            if connection is not None:
+                self._enqueue(connection, message)
     
     async def broadcast(self, message: str):
-        """Broadcast a message to all connected WebSocket clients."""
-        disconnected = []
+        """
+        Broadcast a message to all connected WebSocket clients.
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                print(f"Error broadcasting to connection: {e}")
-                disconnected.append(connection)
+        Only enqueues - never waits on a socket, so the cost is one queue
+        put per connection regardless of how slow any client is.
+        """
+        for connection in list(self.active_connections.values()):
+            self._enqueue(connection, message)
+    
+    def _enqueue(self, connection: _Connection, message: str) -> None:
+        """Queue a message, applying the slow consumer policy if the queue is full."""
+        try:
+            connection.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        
+        if self.slow_consumer_policy == "disconnect":
+            self.slow_consumers_disconnected += 1
+            print(f"⚠️ Disconnecting slow WebSocket consumer ({connection.queue.qsize()} messages queued)")
+            self._close(connection)
+            return
         
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+        # drop_oldest: the dashboard falls behind but still gets the latest updates
+        connection.queue.get_nowait()
+        connection.dropped += 1
+        self.messages_dropped += 1
+        connection.queue.put_nowait(message)
+    
+    async def _sender(self, connection: _Connection) -> None:
+        """Drain one connection's queue; a failed or timed-out send drops the connection."""
+        try:
+            while True:
+                message = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout_seconds)
+                connection.sent += 1
+                self.messages_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending to WebSocket connection: {e}")
+            self._close(connection)
+    
+    def _close(self, connection: _Connection) -> None:
+        self.disconnect(connection.websocket)
+        asyncio.create_task(self._close_socket(connection.websocket))
+    
+    @staticmethod
+    async def _close_socket(websocket: WebSocket) -> None:
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _serialize(message_type: str, data: Dict[str, Any]) -> str:
+        """Build the wire message once; every connection gets the same string."""
+        return json.dumps({
+            "type": message_type,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat()
+        })
     
     async def broadcast_attendance_update(
         self,
@@ -57,10 +247,12 @@ class ConnectionManager:
         verification_status: str,
         face_confidence: float,
         is_biometric_mismatch: bool = False,
-        timestamp: datetime = None
+        timestamp: datetime = None,
+        class_id: Optional[int] = None,
+        session_id: Optional[str] = None
     ):
         """
-        Broadcast attendance update to all connected dashboard clients.
+        Send attendance update to dashboards subscribed to its class or session.
         
         Args:
             student_id: Student database ID
@@ -70,25 +262,23 @@ class ConnectionManager:
             face_confidence: Face recognition confidence score
             is_biometric_mismatch: True if OTP correct but face failed
             timestamp: Verification timestamp
+            class_id: Class the session belongs to (topic "class:<id>")
+            session_id: Attendance session ID (topic "session:<id>")
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
         
-        message = {
-            "type": "attendance_update",
-            "data": {
-                "student_id": student_id,
-                "student_name": student_name,
-                "student_id_card": student_id_card,
-                "verification_status": verification_status,
-                "face_confidence": face_confidence,
-                "is_biometric_mismatch": is_biometric_mismatch,
-                "timestamp": timestamp.isoformat()
-            },
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        message = self._serialize("attendance_update", {
+            "student_id": student_id,
+            "student_name": student_name,
+            "student_id_card": student_id_card,
+            "verification_status": verification_status,
+            "face_confidence": face_confidence,
+            "is_biometric_mismatch": is_biometric_mismatch,
+            "timestamp": timestamp.isoformat()
+        })
         
-        await self.broadcast(json.dumps(message))
+        await self.event_bus.publish(self._event_topics(class_id, session_id), message)
         print(f"📡 Broadcasted attendance update for {student_name}")
     
     async def broadcast_anomaly_alert(
@@ -99,10 +289,12 @@ class ConnectionManager:
         reason: str,
         face_confidence: float = None,
         distance_meters: float = None,
-        timestamp: datetime = None
+        timestamp: datetime = None,
+        class_id: Optional[int] = None,
+        session_id: Optional[str] = None
     ):
         """
-        Broadcast anomaly alert to all connected dashboard clients.
+        Send anomaly alert to the anomaly feed and the class/session dashboards.
         
         Args:
             student_id: Student database ID
@@ -112,30 +304,53 @@ class ConnectionManager:
             face_confidence: Face recognition confidence (if applicable)
             distance_meters: Distance from classroom (if geofence violation)
             timestamp: Anomaly timestamp
+            class_id: Class the session belongs to (topic "class:<id>")
+            session_id: Attendance session ID (topic "session:<id>")
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
         
-        message = {
-            "type": "anomaly_alert",
-            "data": {
-                "student_id": student_id,
-                "student_name": student_name,
-                "anomaly_type": anomaly_type,
-                "reason": reason,
-                "face_confidence": face_confidence,
-                "distance_meters": distance_meters,
-                "timestamp": timestamp.isoformat()
-            },
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        message = self._serialize("anomaly_alert", {
+            "student_id": student_id,
+            "student_name": student_name,
+            "anomaly_type": anomaly_type,
+            "reason": reason,
+            "face_confidence": face_confidence,
+            "distance_meters": distance_meters,
+            "timestamp": timestamp.isoformat()
+        })
         
-        await self.broadcast(json.dumps(message))
+        await self.event_bus.publish([self.ANOMALY_TOPIC] + self._event_topics(class_id, session_id), message)
         print(f"🚨 Broadcasted anomaly alert for {student_name}: {anomaly_type}")
     
+    @staticmethod
+    def _event_topics(class_id: Optional[int], session_id: Optional[str]) -> List[str]:
+        topics = []
+        if class_id is not None:
+            topics.append(f"class:{class_id}")
+        if session_id is not None:
+            topics.append(f"session:{session_id}")
+        return topics
+    
     def get_connection_count(self) -> int:
         """Get the number of active WebSocket connections."""
         return len(self.active_connections)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get fan-out statistics (queue depths, drops, slow consumer disconnects)."""
+        depths = [c.queue.qsize() for c in self.active_connections.values()]
+        return {
+            "connections": len(depths),
+            "topics": len(self._subscribers),
+            "wildcard_connections": len(self._subscribers.get(self.ALL_TOPICS, ())),
+            "queue_size": self.queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "messages_sent": self.messages_sent,
+            "messages_dropped": self.messages_dropped,
+            "slow_consumers_disconnected": self.slow_consumers_disconnected
+        }
 
 
 # Singleton instance
@@ -146,5 +361,5 @@ def get_connection_manager() -> ConnectionManager:
     """Get or create the WebSocket connection manager instance."""
     global _manager
     if _manager is None:
-        _manager = ConnectionManager()
+        _manager = ConnectionManager(event_bus=get_event_bus())
     return _manager
@@ -0,0 +1,128 @@
+"""
+Compact Binary Embedding Codec
+Packs face embeddings as a small header plus little-endian float32/float16
+values, stored in students.facial_embedding_bin (bytea).
+
+Layout (8-byte header, keeps the float32 payload 4-byte aligned):
+    magic    4 bytes  b'ISEM'
+    version  uint8    1
+    dtype    uint8    1 = float32, 2 = float16
+    dim      uint16   number of values (little-endian)
+    payload  dim * itemsize bytes, little-endian
+"""
+import struct
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+
+MAGIC = b'ISEM'
+VERSION = 1
+HEADER = struct.Struct('<4sBBH')
+
+DTYPE_CODES = {
+    'float32': 1,
+    'float16': 2,
+}
+CODE_DTYPES = {
+    1: np.dtype('<f4'),
+    2: np.dtype('<f2'),
+}
+
+
+class EmbeddingCodecError(ValueError):
+    """Raised when a binary embedding can't be decoded."""
+
+
+def encode_embedding(embedding: Union[np.ndarray, Sequence[float]], dtype: str = 'float32') -> bytes:
+    """
+    Encode an embedding to header + little-endian payload.
+
+    Args:
+        embedding: 1-D embedding vector
+        dtype: 'float32' (lossless for model output) or 'float16' (half the size)
+
+    Returns:
+        Encoded bytes
+    """
+    if dtype not in DTYPE_CODES:
+        raise EmbeddingCodecError(f"Unsupported embedding dtype: {dtype}")
+
+    code = DTYPE_CODES[dtype]
+    values = np.asarray(embedding).ravel().astype(CODE_DTYPES[code], copy=False)
+    if values.size > 0xFFFF:
+        raise EmbeddingCodecError(f"Embedding too large: {values.size} values")
+
+    return HEADER.pack(MAGIC, VERSION, code, values.size) + values.tobytes()
+
+
+def decode_embedding(data: Union[bytes, bytearray, memoryview, str]) -> np.ndarray:
+    """
+    Decode an encoded embedding.
+
+    float32 payloads are returned as a read-only view over the input buffer
+    (no copy); float16 payloads are widened to float32.
+
+    Args:
+        data: Raw bytes, or the '\\x...' hex text PostgREST returns for bytea
+
+    Returns:
+        1-D float32 array
+    """
+    if isinstance(data, str):
+        data = bytes_from_postgrest(data)
+
+    if len(data) < HEADER.size:
+        raise EmbeddingCodecError("Embedding buffer shorter than header")
+
+    magic, version, code, dim = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise EmbeddingCodecError("Not an encoded embedding (bad magic)")
+    if version != VERSION:
+        raise EmbeddingCodecError(f"Unsupported embedding version: {version}")
+    if code not in CODE_DTYPES:
+        raise EmbeddingCodecError(f"Unknown embedding dtype code: {code}")
+
+    dtype = CODE_DTYPES[code]
+    expected = HEADER.size + dim * dtype.itemsize
+    if len(data) != expected:
+        raise EmbeddingCodecError(f"Embedding length mismatch: expected {expected} bytes, got {len(data)}")
+
+    values = np.frombuffer(data, dtype=dtype, count=dim, offset=HEADER.size)
+    if dtype.itemsize != 4:
+        values = values.astype(np.float32)
+    return values
+
+
+def bytes_from_postgrest(value: str) -> bytes:
+    """Convert PostgREST's bytea text form ('\\x' + hex) to bytes."""
+    if value.startswith('\\x'):
+        value = value[2:]
+    try:
+        return bytes.fromhex(value)
+    except ValueError as e:
+        raise EmbeddingCodecError(f"Invalid bytea hex: {e}")
+
+
+def to_postgrest(data: bytes) -> str:
+    """Format bytes as bytea hex text for inserts/updates through PostgREST."""
+    return '\\x' + data.hex()
+
+
+def embedding_from_row(row: dict) -> Optional[np.ndarray]:
+    """
+    Read a student's embedding, preferring the binary column.
+
+    Falls back to the legacy float8[] facial_embedding list for rows that
+    haven't been migrated yet.
+    """
+    return load_embedding(row.get('facial_embedding_bin'), row.get('facial_embedding'))
+
+
+def load_embedding(binary, legacy) -> Optional[np.ndarray]:
+    """Decode the binary embedding if present, else convert the legacy list."""
+    if binary:
+        return decode_embedding(binary)
+    if legacy is not None:
+        return np.asarray(legacy, dtype=np.float32)
+    return None
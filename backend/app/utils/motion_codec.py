@@ -0,0 +1,140 @@
+"""
+Compact Binary Motion Envelope
+Packs a motion recording as a small header plus little-endian float32
+columns, sent base64-encoded in VerifyRequest.motion_payload instead of
+seven JSON float lists.
+
+Layout (20-byte header, keeps the float32 columns 4-byte aligned):
+    magic      4 bytes  b'ISMO'
+    version    uint8    1
+    flags      uint8    bit 0 = columns are zstd-compressed
+    columns    uint16   7
+    samples    uint32   samples per column (little-endian)
+    base_time  float64  Unix seconds of the first sample
+    payload    7 float32 columns of `samples` values, in order:
+               time offset from base_time (s), accel x/y/z (m/s²), gyro x/y/z (rad/s)
+
+Timestamps are offsets so float32 keeps sub-millisecond resolution; absolute
+Unix seconds would not fit.
+"""
+import base64
+import binascii
+import struct
+from typing import Union
+
+import numpy as np
+
+from app.services.motion_image_correlator import MotionData
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+MAGIC = b'ISMO'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHId')
+FLAG_ZSTD = 0x01
+COLUMNS = 7
+MAX_SAMPLES = 100_000  # ~8 minutes at 200 Hz; bounds decompression
+
+COLUMN_DTYPE = np.dtype('<f4')
+
+
+class MotionCodecError(ValueError):
+    """Raised when a motion envelope can't be decoded."""
+
+
+def encode_motion(motion: MotionData, compress: bool = False) -> bytes:
+    """
+    Encode a motion recording as an envelope.
+
+    Args:
+        motion: Samples (lists or arrays); all columns must be the same length
+        compress: zstd-compress the columns (requires the zstandard package)
+
+    Returns:
+        Encoded bytes
+    """
+    timestamps = np.asarray(motion.timestamps, dtype=np.float64)
+    samples = len(timestamps)
+    if samples > MAX_SAMPLES:
+        raise MotionCodecError(f"Too many motion samples: {samples}")
+
+    base_time = float(timestamps[0]) if samples else 0.0
+    columns = [timestamps - base_time] + [
+        np.asarray(values) for values in (
+            motion.accelerometer_x, motion.accelerometer_y, motion.accelerometer_z,
+            motion.gyroscope_x, motion.gyroscope_y, motion.gyroscope_z
+        )
+    ]
+    if any(len(column) != samples for column in columns):
+        raise MotionCodecError("Motion columns differ in length")
+
+    payload = np.stack(columns).astype(COLUMN_DTYPE).tobytes() if samples else b''
+    flags = 0
+    if compress:
+        if not ZSTD_AVAILABLE:
+            raise MotionCodecError("zstd compression requested but zstandard is not installed")
+        payload = zstandard.ZstdCompressor().compress(payload)
+        flags |= FLAG_ZSTD
+
+    return HEADER.pack(MAGIC, VERSION, flags, COLUMNS, samples, base_time) + payload
+
+
+def decode_motion(data: Union[bytes, bytearray, memoryview, str]) -> MotionData:
+    """
+    Decode a motion envelope.
+
+    Sensor columns are read-only views over the (decompressed) buffer - no
+    per-sample parsing or copy. Timestamps are rebuilt as float64 Unix seconds.
+
+    Args:
+        data: Raw bytes, or the base64 text sent in VerifyRequest.motion_payload
+
+    Returns:
+        MotionData with numpy array columns
+    """
+    if isinstance(data, str):
+        try:
+            data = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise MotionCodecError(f"Invalid base64 motion payload: {e}")
+
+    if len(data) < HEADER.size:
+        raise MotionCodecError("Motion buffer shorter than header")
+
+    magic, version, flags, columns, samples, base_time = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise MotionCodecError("Not a motion envelope (bad magic)")
+    if version != VERSION:
+        raise MotionCodecError(f"Unsupported motion envelope version: {version}")
+    if columns != COLUMNS:
+        raise MotionCodecError(f"Expected {COLUMNS} motion columns, got {columns}")
+    if samples > MAX_SAMPLES:
+        raise MotionCodecError(f"Too many motion samples: {samples}")
+
+    expected = COLUMNS * samples * COLUMN_DTYPE.itemsize
+    payload = memoryview(data)[HEADER.size:]
+    if flags & FLAG_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise MotionCodecError("Compressed motion payload but zstandard is not installed")
+        try:
+            # Refuse frames that declare more than the header allows before allocating
+            if zstandard.frame_content_size(payload) > expected:
+                raise MotionCodecError("Compressed motion payload larger than its header declares")
+            payload = zstandard.ZstdDecompressor().decompress(bytes(payload), max_output_size=expected)
+        except zstandard.ZstdError as e:
+            raise MotionCodecError(f"Invalid zstd motion payload: {e}")
+
+    if len(payload) != expected:
+        raise MotionCodecError(f"Motion payload length mismatch: expected {expected} bytes, got {len(payload)}")
+
+    table = np.frombuffer(payload, dtype=COLUMN_DTYPE).reshape(COLUMNS, samples)
+    return MotionData(
+        base_time + table[0].astype(np.float64),
+        table[1], table[2], table[3],
+        table[4], table[5], table[6]
+    )
@@ -0,0 +1,69 @@
+"""
+Backfill binary embeddings
+Converts students.facial_embedding (float8[]) into the packed
+students.facial_embedding_bin format. Run migration_binary_embeddings.sql first.
+
+Usage:
+    python backfill_binary_embeddings.py [--float16] [--clear-legacy]
+"""
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables before app settings are read
+load_dotenv()
+
+import numpy as np
+
+from app.db.supabase_client import get_supabase
+from app.utils.embedding_codec import encode_embedding, decode_embedding, to_postgrest
+
+BATCH_SIZE = 200
+
+
+def backfill(dtype: str = "float32", clear_legacy: bool = False):
+    """Pack legacy embeddings, one batch of rows at a time."""
+    supabase = get_supabase()
+    
+    converted = 0
+    last_id = 0
+    
+    while True:
+        # Keyset pagination over rows that still need converting
+        response = supabase.table("students").select(
+            "id, facial_embedding"
+        ).is_("facial_embedding_bin", "null").not_.is_("facial_embedding", "null").gt(
+            "id", last_id
+        ).order("id").limit(BATCH_SIZE).execute()
+        
+        rows = response.data or []
+        if not rows:
+            break
+        
+        for row in rows:
+            last_id = row["id"]
+            legacy = np.asarray(row["facial_embedding"], dtype=np.float64)
+            packed = encode_embedding(legacy, dtype)
+            
+            # Round-trip check before touching the row
+            tolerance = 1e-6 if dtype == "float32" else 1e-2
+            if not np.allclose(decode_embedding(packed), legacy, atol=tolerance):
+                print(f"⚠️ Student {row['id']}: round-trip mismatch, skipping")
+                continue
+            
+            update = {"facial_embedding_bin": to_postgrest(packed)}
+            if clear_legacy:
+                update["facial_embedding"] = None
+            supabase.table("students").update(update).eq("id", row["id"]).execute()
+            converted += 1
+        
+        print(f"   ...{converted} converted so far")
+    
+    print(f"✅ Converted {converted} embeddings to {dtype}")
+    return True
+
+
+if __name__ == "__main__":
+    backfill(
+        dtype="float16" if "--float16" in sys.argv else "float32",
+        clear_legacy="--clear-legacy" in sys.argv
+    )
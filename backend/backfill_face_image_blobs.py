@@ -0,0 +1,64 @@
+"""
+Backfill face images into the blob store
+Moves students.face_image_base64 into the content-addressed blob store and
+records the digest in students.face_image_hash.
+Run migration_face_image_blobs.sql first.
+
+Usage:
+    python backfill_face_image_blobs.py [--clear-inline]
+"""
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables before app settings are read
+load_dotenv()
+
+from app.db.supabase_client import get_supabase
+from app.services.blob_store import get_blob_store
+
+BATCH_SIZE = 50
+
+
+def backfill(clear_inline: bool = False):
+    """Copy inline images to the blob store, one batch of rows at a time."""
+    supabase = get_supabase()
+    blob_store = get_blob_store()
+    
+    moved = 0
+    skipped = 0
+    last_id = 0
+    
+    while True:
+        # Keyset pagination keeps each response to BATCH_SIZE images
+        response = supabase.table("students").select(
+            "id, face_image_base64"
+        ).is_("face_image_hash", "null").not_.is_("face_image_base64", "null").gt(
+            "id", last_id
+        ).order("id").limit(BATCH_SIZE).execute()
+        
+        rows = response.data or []
+        if not rows:
+            break
+        
+        for row in rows:
+            last_id = row["id"]
+            digest = blob_store.put_image_base64(row["face_image_base64"])
+            if digest is None:
+                print(f"⚠️ Student {row['id']}: image could not be decoded, skipping")
+                skipped += 1
+                continue
+            
+            update = {"face_image_hash": digest}
+            if clear_inline:
+                update["face_image_base64"] = None
+            supabase.table("students").update(update).eq("id", row["id"]).execute()
+            moved += 1
+        
+        print(f"   ...{moved} moved so far")
+    
+    print(f"✅ Moved {moved} images to {blob_store.root} ({skipped} skipped)")
+    return True
+
+
+if __name__ == "__main__":
+    backfill(clear_inline="--clear-inline" in sys.argv)
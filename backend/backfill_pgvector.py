@@ -0,0 +1,55 @@
+"""
+Backfill pgvector column
+Writes students.facial_embedding_vec for rows the SQL migration couldn't
+convert (embeddings stored only in facial_embedding_bin).
+Run migration_pgvector_search.sql first.
+
+Usage:
+    python backfill_pgvector.py
+"""
+from dotenv import load_dotenv
+
+# Load environment variables before app settings are read
+load_dotenv()
+
+from app.core.config import settings
+from app.db.supabase_client import get_supabase
+from app.services.vector_search import PgVectorSearchEngine
+from app.utils.embedding_codec import embedding_from_row
+
+BATCH_SIZE = 200
+
+
+def backfill():
+    """Copy embeddings into the vector column, one batch of rows at a time."""
+    supabase = get_supabase()
+    engine = PgVectorSearchEngine(settings.EMBEDDING_DIMENSION, supabase=supabase)
+    
+    total = 0
+    last_id = 0
+    
+    while True:
+        response = supabase.table("students").select(
+            "id, name, facial_embedding_bin, facial_embedding"
+        ).is_("facial_embedding_vec", "null").gt("id", last_id).order("id").limit(BATCH_SIZE).execute()
+        
+        rows = response.data or []
+        if not rows:
+            break
+        
+        last_id = rows[-1]["id"]
+        students = []
+        for row in rows:
+            embedding = embedding_from_row(row)
+            if embedding is not None and len(embedding) == settings.EMBEDDING_DIMENSION:
+                students.append((row["id"], row["name"], embedding))
+        
+        engine.rebuild_from_database(students)
+        total += len(students)
+    
+    print(f"✅ Populated facial_embedding_vec for {total} students")
+    return True
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,138 @@
+"""
+Benchmark smile/emotion backends
+Compares the blendshape, ONNX and DeepFace smile checks on latency and on
+agreement with a reference backend (DeepFace when installed).
+
+Usage:
+    python benchmark_emotion.py --images <dir> [--repeat 5] [--onnx-model emotion-ferplus-8.onnx]
+
+<dir> holds face photos (.jpg/.jpeg/.png). Latency is what the smile step
+adds to /verify: the landmark pass is shared with alignment, so it is
+reported separately and not charged to the blendshape or ONNX backends.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables before app settings are read
+load_dotenv()
+
+from app.core.config import settings
+from app.services.emotion_service import EmotionService
+from app.services.preprocess import get_preprocessor
+
+
+def load_images(directory: str) -> List[np.ndarray]:
+    """Readable face photos from a directory (sorted by name)."""
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    images = [cv2.imread(str(p)) for p in paths]
+    return [image for image in images if image is not None]
+
+
+def timed(func: Callable[[], Optional[Dict[str, float]]], repeat: int):
+    """Run func `repeat` times; return its last result and the per-call latencies (ms)."""
+    latencies = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, latencies
+
+
+def run(name: str, backend: Callable, samples, repeat: int) -> dict:
+    """Happy scores and latency for one backend over every sample."""
+    latencies, happy = [], []
+    for image, face in samples:
+        emotions, times = timed(lambda: backend(image, face), repeat)
+        latencies.extend(times)
+        happy.append(np.nan if emotions is None else emotions.get('happy', 0.0))
+    latencies = np.array(latencies)
+    return {
+        "name": name,
+        "happy": np.array(happy),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95))
+    }
+
+
+def agreement(stats: dict, reference: dict, threshold: float) -> str:
+    """Share of images with the same smile decision, and Pearson r of happy scores."""
+    valid = ~np.isnan(stats["happy"]) & ~np.isnan(reference["happy"])
+    if not valid.any():
+        return "no comparable images"
+    same = np.mean((stats["happy"][valid] >= threshold) == (reference["happy"][valid] >= threshold))
+    if np.std(stats["happy"][valid]) > 0 and np.std(reference["happy"][valid]) > 0:
+        r = np.corrcoef(stats["happy"][valid], reference["happy"][valid])[0, 1]
+        return f"smile agreement {same:.1%}   happy-score r {r:+.2f}   ({valid.sum()} images)"
+    return f"smile agreement {same:.1%}   ({valid.sum()} images)"
+
+
+def report(stats: dict):
+    detected = int((~np.isnan(stats["happy"])).sum())
+    print(f"   {stats['name']:<11} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   "
+          f"scored {detected}/{len(stats['happy'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark smile/emotion backends")
+    parser.add_argument("--images", required=True, help="Directory of face photos")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per image and backend")
+    parser.add_argument("--onnx-model", default=settings.EMOTION_ONNX_MODEL)
+    args = parser.parse_args()
+    
+    images = load_images(args.images)
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        return
+    
+    preprocessor = get_preprocessor()
+    service = EmotionService(smile_threshold=settings.SMILE_CONFIDENCE_THRESHOLD, onnx_model_path=args.onnx_model)
+    print(f"📊 {len(images)} images, {args.repeat} runs each, smile threshold {service.smile_threshold}")
+    
+    faces, landmark_ms = [], []
+    for image in images:
+        face, times = timed(lambda: preprocessor.analyze(image), args.repeat)
+        faces.append(face)
+        landmark_ms.extend(times)
+    samples = list(zip(images, faces))
+    print(f"   landmarks   p50 {np.percentile(landmark_ms, 50):8.2f} ms   (shared with alignment, "
+          f"face found in {sum(f is not None for f in faces)}/{len(faces)})")
+    
+    results = []
+    if preprocessor.landmarkers is not None:
+        results.append(run(
+            "blendshape",
+            lambda image, face: service.blendshape_emotions(face) if face is not None and face.blendshapes else None,
+            samples, args.repeat
+        ))
+    if service.backend_ready('onnx'):
+        results.append(run(
+            "onnx",
+            lambda image, face: service.onnx_emotions(preprocessor.preprocess(image, face)) if face is not None else None,
+            samples, args.repeat
+        ))
+    else:
+        print(f"   onnx        skipped (needs onnxruntime and {args.onnx_model})")
+    if service.available:
+        results.append(run("deepface", lambda image, face: service.detect_emotion(image), samples, args.repeat))
+    else:
+        print("   deepface    skipped (not installed)")
+    
+    for stats in results:
+        report(stats)
+    
+    if len(results) > 1:
+        reference = results[-1]
+        print(f"   Agreement with {reference['name']}:")
+        for stats in results[:-1]:
+            print(f"   {stats['name']:<11} {agreement(stats, reference, service.smile_threshold)}")
+
+
+if __name__ == "__main__":
+    main()
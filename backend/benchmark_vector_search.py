@@ -0,0 +1,130 @@
+"""
+Benchmark vector search engines
+Compares the per-process FAISS index with pgvector (HNSW) on search latency
+and top-1 agreement with exact brute-force search.
+
+Usage:
+    python benchmark_vector_search.py [--students 5000] [--queries 200] [--pgvector]
+
+Without --pgvector only FAISS is measured, on synthetic embeddings.
+With --pgvector both engines are measured on the enrolled students'
+embeddings (read-only; run migration_pgvector_search.sql first).
+"""
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables before app settings are read
+load_dotenv()
+
+from app.core.config import settings
+from app.services.vector_search import VectorSearchBackend, VectorSearchEngine, PgVectorSearchEngine
+
+
+def synthetic_students(count: int, dimension: int, seed: int = 0) -> List[Tuple[int, str, np.ndarray]]:
+    """Random unit vectors standing in for enrolled students."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [(i + 1, f"Student {i + 1}", vectors[i]) for i in range(count)]
+
+
+def enrolled_students() -> List[Tuple[int, str, np.ndarray]]:
+    """All enrolled students' embeddings from the database."""
+    from app.db.supabase_client import get_supabase
+    from app.utils.embedding_codec import embedding_from_row
+    
+    rows = get_supabase().table("students").select(
+        "id, name, facial_embedding_bin, facial_embedding"
+    ).execute().data or []
+    
+    students = []
+    for row in rows:
+        embedding = embedding_from_row(row)
+        if embedding is not None and len(embedding) == settings.EMBEDDING_DIMENSION:
+            students.append((row["id"], row["name"], np.asarray(embedding, dtype=np.float32)))
+    return students
+
+
+def make_queries(students, count: int, noise: float = 0.15, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of enrolled embeddings (a re-capture of the same face)."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(students), size=count)
+    base = np.stack([students[i][2] for i in picks])
+    queries = base + noise * rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top1(students, queries: np.ndarray) -> np.ndarray:
+    """Brute-force nearest student id for each query."""
+    matrix = np.stack([s[2] for s in students])
+    matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    ids = np.array([s[0] for s in students])
+    return ids[np.argmax(queries @ matrix.T, axis=1)]
+
+
+def run(engine: VectorSearchBackend, queries: np.ndarray, truth: np.ndarray) -> dict:
+    """Time one search per query and compare top-1 with exact search."""
+    latencies = []
+    agree = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = engine.search(query, k=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if results and results[0].student_id == expected:
+            agree += 1
+    
+    latencies = np.array(latencies)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "top1_agreement": agree / len(queries)
+    }
+
+
+def report(name: str, stats: dict):
+    print(f"   {name:<10} p50 {stats['p50_ms']:8.3f} ms   p95 {stats['p95_ms']:8.3f} ms   "
+          f"p99 {stats['p99_ms']:8.3f} ms   top-1 agreement {stats['top1_agreement']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS vs pgvector search")
+    parser.add_argument("--students", type=int, default=5000, help="Synthetic students (FAISS-only run)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pgvector", action="store_true", help="Also benchmark pgvector on enrolled students")
+    args = parser.parse_args()
+    
+    dimension = settings.EMBEDDING_DIMENSION
+    if args.pgvector:
+        students = enrolled_students()
+        print(f"📊 {len(students)} enrolled students, {args.queries} queries, {dimension}-d")
+    else:
+        students = synthetic_students(args.students, dimension)
+        print(f"📊 {len(students)} synthetic students, {args.queries} queries, {dimension}-d")
+    
+    if not students:
+        print("❌ No embeddings to search")
+        return
+    
+    queries = make_queries(students, args.queries)
+    truth = exact_top1(students, queries)
+    
+    # FAISS: build in memory (nothing written to disk)
+    faiss_engine = VectorSearchEngine(dimension)
+    start = time.perf_counter()
+    faiss_engine.rebuild_from_database(students)
+    print(f"   FAISS index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    report("faiss", run(faiss_engine, queries, truth))
+    
+    if args.pgvector:
+        pg_engine = PgVectorSearchEngine(dimension)
+        print(f"   pgvector: {pg_engine.get_stats()['total_students']} vectors indexed")
+        report("pgvector", run(pg_engine, queries, truth))
+
+
+if __name__ == "__main__":
+    main()
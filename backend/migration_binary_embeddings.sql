@@ -0,0 +1,19 @@
+-- Migration: Compact Binary Embedding Storage
+-- Date: 2026-10-19
+-- Description: Store face embeddings as little-endian float32/float16 bytea with a
+--              version + dimension header (see app/utils/embedding_codec.py)
+
+-- Binary embedding: 8-byte header ('ISEM', version, dtype, dim) + packed values
+ALTER TABLE students
+ADD COLUMN IF NOT EXISTS facial_embedding_bin BYTEA;
+
+-- New enrollments only write the binary column
+ALTER TABLE students
+ALTER COLUMN facial_embedding DROP NOT NULL;
+
+COMMENT ON COLUMN students.facial_embedding_bin IS 'Face embedding, packed little-endian float32/float16 with version and dimension header';
+COMMENT ON COLUMN students.facial_embedding IS 'Legacy float8[] embedding; NULL once converted to facial_embedding_bin';
+
+-- Existing rows are converted by backfill_binary_embeddings.py.
+-- After it finishes (with --clear-legacy), reclaim the float8[] storage:
+--   VACUUM (ANALYZE) students;
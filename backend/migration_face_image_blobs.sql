@@ -0,0 +1,15 @@
+-- Migration: Offload Face Images to Blob Store
+-- Date: 2026-10-19
+-- Description: Replace inline face_image_base64 with a content-addressed blob reference
+
+-- SHA-256 hex digest of the enrollment photo in the blob store
+ALTER TABLE students
+ADD COLUMN IF NOT EXISTS face_image_hash VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_students_face_image_hash ON students(face_image_hash);
+
+COMMENT ON COLUMN students.face_image_hash IS 'SHA-256 digest of the enrollment photo in the blob store (served via /blobs/{digest})';
+
+-- After running backfill_face_image_blobs.py, reclaim the inline image storage:
+--   UPDATE students SET face_image_base64 = NULL WHERE face_image_hash IS NOT NULL;
+--   VACUUM (ANALYZE) students;
@@ -0,0 +1,20 @@
+-- Migration: Polygon Geofences
+-- Date: 2026-10-19
+-- Description: Per-room / per-building geofence polygons stored in geofence_config
+--              (see app/services/geofence_store.py)
+
+-- Polygon rows hold a JSON vertex list, which outgrows VARCHAR(255)
+ALTER TABLE geofence_config
+ALTER COLUMN config_value TYPE TEXT;
+
+-- One row per polygon: key 'polygon:<name>', value a JSON list of
+-- [latitude, longitude] vertices (simple ring, at least 3 points, no holes).
+-- Rooms may sit inside buildings; lookups report the smallest matching polygon.
+-- Example:
+--   INSERT INTO geofence_config (config_key, config_value, description) VALUES
+--       ('polygon:main-building',
+--        '[[28.6135, 77.2085], [28.6135, 77.2095], [28.6143, 77.2095], [28.6143, 77.2085]]',
+--        'Main academic building')
+--   ON CONFLICT (config_key) DO UPDATE SET config_value = EXCLUDED.config_value;
+
+COMMENT ON COLUMN geofence_config.config_value IS 'Setting value, or a JSON [[lat, lon], ...] ring for polygon:<name> keys';
@@ -0,0 +1,42 @@
+-- Migration: pgvector Similarity Search
+-- Date: 2026-10-19
+-- Description: Shared vector index for VECTOR_SEARCH_BACKEND=pgvector, so every API
+--              worker sees new enrollments immediately
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- 128-d DeepFace Facenet embedding (change together with EMBEDDING_DIMENSION)
+ALTER TABLE students
+ADD COLUMN IF NOT EXISTS facial_embedding_vec vector(128);
+
+-- HNSW index for cosine distance (<=>); no training step, good recall at small ef_search
+CREATE INDEX IF NOT EXISTS idx_students_facial_embedding_vec
+ON students USING hnsw (facial_embedding_vec vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+COMMENT ON COLUMN students.facial_embedding_vec IS 'Face embedding for pgvector nearest-neighbour search (HNSW, cosine)';
+
+-- Nearest neighbours in one query; similarity is cosine similarity in [-1, 1]
+CREATE OR REPLACE FUNCTION match_student_embeddings(
+    query_embedding vector(128),
+    match_count INTEGER DEFAULT 5
+)
+RETURNS TABLE (id INTEGER, name TEXT, similarity FLOAT8)
+LANGUAGE sql STABLE
+SET hnsw.ef_search = 64
+AS $$
+    SELECT s.id, s.name::TEXT, 1 - (s.facial_embedding_vec <=> query_embedding)
+    FROM students s
+    WHERE s.facial_embedding_vec IS NOT NULL
+    ORDER BY s.facial_embedding_vec <=> query_embedding
+    LIMIT match_count;
+$$;
+
+-- Populate from legacy float8[] embeddings
+UPDATE students
+SET facial_embedding_vec = facial_embedding::vector(128)
+WHERE facial_embedding_vec IS NULL
+  AND facial_embedding IS NOT NULL
+  AND array_length(facial_embedding, 1) = 128;
+
+-- Rows that only have facial_embedding_bin: run backfill_pgvector.py
@@ -0,0 +1,165 @@
+"""
+Property-Based Tests for Local Token Verification and the User-Profile Cache
+Tests that access tokens are verified without calling Supabase Auth and that
+resolved users are cached per subject until invalidated.
+"""
+import pytest
+import time
+import jwt
+from hypothesis import given, HealthCheck, strategies as st, settings as hypothesis_settings
+
+from app.core.config import settings
+from app.db.cache import InMemoryCache
+from app.services.auth_service import AuthService
+
+
+SECRET = "test-jwt-secret-with-enough-length-for-hs256"
+
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.filters = {}
+    
+    def select(self, columns):
+        return self
+    
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+    
+    def execute(self):
+        self.table.executions += 1
+        rows = [r for r in self.table.rows if all(r.get(k) == v for k, v in self.filters.items())]
+        return type("Result", (), {"data": rows})()
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executions = 0
+
+
+class FakeAuth:
+    def get_user(self, token):
+        raise AssertionError("Supabase Auth must not be called when local verification is configured")
+
+
+class FakeSupabase:
+    def __init__(self, users):
+        self.users = FakeTable(users)
+        self.auth = FakeAuth()
+    
+    def table(self, name):
+        assert name == "users"
+        return FakeQuery(self.users)
+
+
+@pytest.fixture
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr(settings, "SUPABASE_JWT_SECRET", SECRET)
+    return SECRET
+
+
+def make_token(sub, email="user@example.com", expires_in=3600, audience="authenticated", secret=SECRET, **extra_claims):
+    claims = {"sub": sub, "email": email, "aud": audience, "exp": int(time.time()) + expires_in, "role": "authenticated"}
+    claims.update(extra_claims)
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def make_service(users=None):
+    supabase = FakeSupabase(users or [])
+    return AuthService(supabase=supabase, cache=InMemoryCache(max_entries=100)), supabase
+
+
+@given(sub=st.uuids().map(str), email=st.emails())
+@hypothesis_settings(max_examples=50, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@pytest.mark.asyncio
+async def test_valid_token_verified_locally(jwt_secret, sub, email):
+    """
+    Property: For any subject and email, a correctly signed token SHALL be
+    accepted without a call to Supabase Auth and yield the same subject.
+    """
+    service, _ = make_service()
+    
+    token_data = await service.verify_token(make_token(sub, email=email))
+    
+    assert token_data["supabase_user_id"] == sub
+    assert token_data["email"] == email
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("claims, verified", [
+    ({}, False),
+    ({"user_metadata": {"email_verified": True}}, True),
+    ({"email_verified": False, "user_metadata": {"email_verified": True}}, False),
+    ({"email_confirmed_at": "2026-10-19T09:00:00Z"}, True),
+    ({"email_confirmed_at": None}, False),
+])
+async def test_email_unverified_unless_claimed(jwt_secret, claims, verified):
+    """Locally verified tokens SHALL only report a verified email when a claim says so."""
+    service, _ = make_service()
+    
+    token_data = await service.verify_token(make_token("user-1", **claims))
+    
+    assert token_data["email_verified"] is verified
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token_kwargs", [
+    {"expires_in": -120},
+    {"audience": "anon-not-allowed"},
+    {"secret": "some-other-secret-of-sufficient-length"},
+])
+async def test_invalid_tokens_rejected(jwt_secret, token_kwargs):
+    """Expired, wrong-audience and wrongly signed tokens SHALL be rejected."""
+    service, _ = make_service()
+    
+    with pytest.raises(Exception):
+        await service.verify_token(make_token("user-1", **token_kwargs))
+
+
+@pytest.mark.asyncio
+async def test_profile_cached_per_subject():
+    """Repeated lookups of a subject SHALL query the users table once."""
+    service, supabase = make_service([{"id": 1, "supabase_user_id": "user-1", "role": "student"}])
+    
+    first = await service.get_user_by_supabase_id("user-1")
+    second = await service.get_user_by_supabase_id("user-1")
+    
+    assert first == second
+    assert supabase.users.executions == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_profile_not_shared_mutably():
+    """Mutating a returned user (as require_approved_student does) SHALL NOT alter the cache."""
+    service, _ = make_service([{"id": 1, "supabase_user_id": "user-1", "role": "student"}])
+    
+    user = await service.get_user_by_supabase_id("user-1")
+    user["student"] = {"id": 9}
+    
+    assert "student" not in await service.get_user_by_supabase_id("user-1")
+
+
+@pytest.mark.asyncio
+async def test_role_change_visible_after_invalidation():
+    """After invalidate_user the next lookup SHALL see the updated role."""
+    service, supabase = make_service([{"id": 1, "supabase_user_id": "user-1", "role": "student"}])
+    await service.get_user_by_supabase_id("user-1")
+    
+    supabase.users.rows[0]["role"] = "teacher"
+    await service.invalidate_user("user-1")
+    
+    assert (await service.get_user_by_supabase_id("user-1"))["role"] == "teacher"
+
+
+@pytest.mark.asyncio
+async def test_unregistered_user_not_cached():
+    """A missing user SHALL NOT be cached, so registration is visible immediately."""
+    service, supabase = make_service()
+    
+    assert await service.get_user_by_supabase_id("user-1") is None
+    supabase.users.rows.append({"id": 1, "supabase_user_id": "user-1", "role": "student"})
+    
+    assert await service.get_user_by_supabase_id("user-1") is not None
@@ -0,0 +1,119 @@
+"""
+Property-Based Tests for the Face Image Blob Store
+Tests content addressing, thumbnail generation and digest validation.
+"""
+import base64
+import hashlib
+import tempfile
+
+import cv2
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.services.blob_store import LocalBlobStore
+
+
+def encode_image(width: int, height: int, seed: int = 0) -> bytes:
+    """Encode a random BGR image as JPEG bytes."""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', image)
+    assert ok
+    return encoded.tobytes()
+
+
+@given(data=st.binary(min_size=1, max_size=4096))
+@settings(max_examples=50, deadline=None)
+def test_digest_is_sha256_and_round_trips(data):
+    """
+    Property: For any bytes, put SHALL return their SHA-256 digest and get
+    SHALL return the same bytes.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root)
+        
+        digest = store.put(data)
+        
+        assert digest == hashlib.sha256(data).hexdigest()
+        assert store.get(digest) == data
+
+
+@given(
+    width=st.integers(min_value=8, max_value=640),
+    height=st.integers(min_value=8, max_value=640)
+)
+@settings(max_examples=25, deadline=None)
+def test_thumbnail_fits_configured_size(width, height):
+    """
+    Property: For any image, the thumbnail's longest side SHALL NOT exceed
+    the configured size, and SHALL NOT upscale small images.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root, thumbnail_size=96)
+        
+        digest = store.put_image_base64(base64.b64encode(encode_image(width, height)).decode())
+        thumbnail = cv2.imdecode(np.frombuffer(store.get_thumbnail(digest), dtype=np.uint8), cv2.IMREAD_COLOR)
+        
+        assert max(thumbnail.shape[:2]) <= min(96, max(width, height))
+
+
+def test_identical_uploads_share_one_blob():
+    """The same photo enrolled twice SHALL map to the same digest."""
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root)
+        payload = "data:image/jpeg;base64," + base64.b64encode(encode_image(64, 48)).decode()
+        
+        assert store.put_image_base64(payload) == store.put_image_base64(payload)
+
+
+def test_undecodable_image_is_rejected():
+    """Payloads that aren't images SHALL NOT be stored."""
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root)
+        
+        assert store.put_image_base64(base64.b64encode(b"not an image").decode()) is None
+        assert store.put_image_base64("%%%") is None
+
+
+def test_missing_thumbnail_is_regenerated():
+    """A blob written without a thumbnail (e.g. by an older backfill) SHALL still serve one."""
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root)
+        digest = store.put(encode_image(200, 100))
+        
+        assert store.get_thumbnail(digest) is not None
+
+
+@given(digest=st.text(max_size=80))
+@settings(max_examples=100)
+def test_non_digest_keys_never_reach_filesystem(digest):
+    """
+    Property: For any key that isn't a lowercase hex SHA-256, lookups SHALL
+    return None (no path traversal through the blob URL).
+    """
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root=root)
+        
+        if not store.is_valid_digest(digest):
+            assert store.get(digest) is None
+            assert store.get_thumbnail(digest) is None
+
+
+@given(data=st.binary(min_size=1, max_size=256), other=st.binary(min_size=1, max_size=256))
+@settings(max_examples=50)
+def test_signed_urls_only_open_their_own_blob(data, other):
+    """
+    Property: A signature SHALL verify for the digest it was issued for and
+    no other, and SHALL stop verifying once expired or tampered with.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    params = LocalBlobStore.sign(digest, ttl_seconds=60)
+    
+    assert LocalBlobStore.verify(digest, params["expires"], params["sig"])
+    assert not LocalBlobStore.verify(digest, params["expires"] + 1, params["sig"])
+    assert not LocalBlobStore.verify(digest, params["expires"], None)
+    if other != data:
+        assert not LocalBlobStore.verify(hashlib.sha256(other).hexdigest(), params["expires"], params["sig"])
+    
+    expired = LocalBlobStore.sign(digest, ttl_seconds=-1)
+    assert not LocalBlobStore.verify(digest, expired["expires"], expired["sig"])
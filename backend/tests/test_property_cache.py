@@ -0,0 +1,227 @@
+"""
+Property-Based Tests for the In-Memory Cache
+Tests native value storage, monotonic expiry, active sweeping and LRU bounds.
+"""
+import pytest
+import asyncio
+from hypothesis import given, strategies as st, settings
+
+from app.db.cache import InMemoryCache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+values = st.one_of(
+    st.text(max_size=20),
+    st.integers(),
+    st.dictionaries(st.text(max_size=5), st.integers(), max_size=5),
+    st.lists(st.integers(), max_size=5)
+)
+
+
+@given(key=st.text(min_size=1, max_size=30), value=values)
+@settings(max_examples=100)
+def test_values_round_trip_unchanged(key, value):
+    """
+    Property: For any value, get SHALL return exactly what was set - in
+    particular numeric strings like OTP "0123" stay strings.
+    """
+    async def run():
+        cache = InMemoryCache(max_entries=100)
+        await cache.set(key, value, 60)
+        return await cache.get(key)
+    
+    assert run_sync(run()) == value
+
+
+@given(ttl=st.integers(min_value=1, max_value=3600), elapsed=st.floats(min_value=0, max_value=7200))
+@settings(max_examples=100)
+def test_expiry_follows_monotonic_clock(ttl, elapsed):
+    """
+    Property: For any TTL and elapsed time, a key SHALL be visible exactly
+    while elapsed < ttl.
+    """
+    async def run():
+        clock = FakeClock()
+        cache = InMemoryCache(max_entries=100, clock=clock)
+        await cache.set("otp:s:1", "1234", ttl)
+        clock.now += elapsed
+        return await cache.get("otp:s:1")
+    
+    result = run_sync(run())
+    
+    if elapsed < ttl:
+        assert result == "1234"
+    else:
+        assert result is None
+
+
+@given(key_count=st.integers(min_value=1, max_value=500))
+@settings(max_examples=30)
+def test_size_never_exceeds_bound(key_count):
+    """
+    Property: For any number of inserted keys, the cache SHALL hold at most
+    max_entries and count every eviction.
+    """
+    async def run():
+        cache = InMemoryCache(max_entries=64, shards=4)
+        for i in range(key_count):
+            await cache.set(f"key:{i}", i, 60)
+        return cache
+    
+    cache = run_sync(run())
+    
+    assert cache.size() <= 64
+    assert cache.size() + cache.evictions == key_count
+
+
+@pytest.mark.asyncio
+async def test_lru_keeps_recently_read_keys():
+    """Reading a key SHALL protect it from the next eviction."""
+    cache = InMemoryCache(max_entries=2, shards=1)
+    await cache.set("a", 1, 60)
+    await cache.set("b", 2, 60)
+    
+    await cache.get("a")
+    await cache.set("c", 3, 60)
+    
+    assert await cache.get("a") == 1
+    assert await cache.get("b") is None
+
+
+@pytest.mark.asyncio
+async def test_sweep_purges_expired_keys_without_reads():
+    """Expired keys SHALL be removed by the sweep even if never read again."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=1000, clock=clock)
+    for i in range(100):
+        await cache.set(f"otp:session:{i}", "1234", 60)
+    await cache.set("lock:long", "locked", 3600)
+    
+    clock.now += 61
+    removed = await cache.cleanup_expired()
+    
+    assert removed == 100
+    assert cache.size() == 1
+    assert cache.get_stats()["expirations"] == 100
+
+
+@pytest.mark.asyncio
+async def test_overwrite_extends_expiry():
+    """Re-setting a key SHALL replace its expiry; the stale heap item SHALL NOT remove it."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=100, clock=clock)
+    await cache.set("k", "old", 10)
+    clock.now += 5
+    await cache.set("k", "new", 60)
+    
+    clock.now += 10
+    await cache.cleanup_expired()
+    
+    assert await cache.get("k") == "new"
+    assert await cache.ttl("k") == 50
+
+
+@pytest.mark.asyncio
+async def test_background_sweeper_runs():
+    """The sweeper task SHALL purge expired keys on its own."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=100, sweep_interval_seconds=0.01, clock=clock)
+    await cache.set("k", 1, 1)
+    clock.now += 2
+    
+    cache.start_sweeper()
+    await asyncio.sleep(0.05)
+    await cache.stop_sweeper()
+    
+    assert cache.size() == 0
+
+
+@given(items=st.dictionaries(st.text(min_size=1, max_size=10), values, max_size=20),
+       missing=st.text(min_size=1, max_size=10))
+@settings(max_examples=50)
+def test_mset_mget_round_trip(items, missing):
+    """
+    Property: For any batch, mget SHALL return the mset values in key order,
+    with None for keys that were never set.
+    """
+    async def run():
+        cache = InMemoryCache(max_entries=100)
+        await cache.mset_with_ttl(items, 60)
+        keys = list(items) + [missing]
+        return keys, await cache.mget(keys)
+    
+    keys, result = run_sync(run())
+    expected = [items.get(k) for k in keys]
+    assert result == expected
+
+
+@pytest.mark.asyncio
+async def test_incr_keeps_expiry_from_creation():
+    """incr_with_ttl SHALL set the TTL only when it creates the counter."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=100, clock=clock)
+    
+    assert await cache.incr_with_ttl("c", 1, 60) == 1
+    clock.now += 40
+    assert await cache.incr_with_ttl("c", 2, 60) == 3
+    assert await cache.ttl("c") == 20
+    
+    clock.now += 21
+    assert await cache.incr_with_ttl("c", 1, 60) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_incr_loses_no_updates():
+    """Concurrent increments SHALL each be counted exactly once."""
+    cache = InMemoryCache(max_entries=100)
+    
+    results = await asyncio.gather(*(cache.incr_with_ttl("c", 1, 60) for _ in range(50)))
+    
+    assert sorted(results) == list(range(1, 51))
+    assert await cache.get("c") == 50
+
+
+@pytest.mark.asyncio
+async def test_add_only_stores_absent_keys():
+    """add SHALL keep an existing live value and only store once the key is gone."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=100, clock=clock)
+    
+    results = await asyncio.gather(*(cache.add("k", i, 60) for i in range(10)))
+    assert results.count(True) == 1
+    assert await cache.get("k") == results.index(True)
+    
+    clock.now += 61
+    assert await cache.add("k", "new", 60)
+    assert await cache.get("k") == "new"
+
+
+@pytest.mark.asyncio
+async def test_delete_many_counts_existing_keys():
+    """delete_many SHALL remove the keys and report how many existed."""
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=100, clock=clock)
+    await cache.mset_with_ttl({"a": 1, "b": 2}, 60)
+    await cache.set("expired", 3, 1)
+    clock.now += 2
+    
+    assert await cache.delete_many(["a", "b", "expired", "never"]) == 2
+    assert await cache.mget(["a", "b"]) == [None, None]
@@ -0,0 +1,92 @@
+"""
+Property-Based Tests for the Binary Embedding Codec
+Tests round-trips, zero-copy decoding and PostgREST bytea transport.
+"""
+import pytest
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.utils.embedding_codec import (
+    encode_embedding, decode_embedding, to_postgrest,
+    embedding_from_row, EmbeddingCodecError, HEADER
+)
+
+
+embeddings = st.lists(
+    st.floats(min_value=-10.0, max_value=10.0, allow_nan=False, allow_infinity=False),
+    min_size=1, max_size=2622
+)
+
+
+@given(values=embeddings)
+@settings(max_examples=100)
+def test_float32_round_trip_is_exact(values):
+    """
+    Property: For any embedding, float32 encoding SHALL decode to exactly the
+    float32-rounded input with the original dimension.
+    """
+    decoded = decode_embedding(encode_embedding(values))
+    
+    assert decoded.dtype == np.float32
+    assert len(decoded) == len(values)
+    np.testing.assert_array_equal(decoded, np.asarray(values, dtype=np.float32))
+
+
+@given(values=embeddings)
+@settings(max_examples=100)
+def test_float16_round_trip_within_half_precision(values):
+    """
+    Property: For any embedding, float16 encoding SHALL halve the payload and
+    decode to float32 within half-precision error.
+    """
+    packed = encode_embedding(values, 'float16')
+    decoded = decode_embedding(packed)
+    
+    assert len(packed) == HEADER.size + 2 * len(values)
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, values, rtol=1e-3, atol=1e-3)
+
+
+@given(values=embeddings)
+@settings(max_examples=50)
+def test_postgrest_hex_transport(values):
+    """
+    Property: For any embedding, the '\\x' hex text PostgREST returns for
+    bytea SHALL decode to the same vector as the raw bytes.
+    """
+    packed = encode_embedding(values)
+    
+    np.testing.assert_array_equal(decode_embedding(to_postgrest(packed)), decode_embedding(packed))
+
+
+def test_float32_decode_is_zero_copy():
+    """float32 payloads SHALL be a view over the input buffer."""
+    packed = encode_embedding(np.arange(128, dtype=np.float32))
+    
+    decoded = decode_embedding(packed)
+    
+    assert not decoded.flags.owndata
+    assert np.shares_memory(decoded, np.frombuffer(packed, dtype=np.uint8))
+
+
+def test_corrupt_buffers_are_rejected():
+    """Truncated, foreign or wrong-version buffers SHALL raise EmbeddingCodecError."""
+    packed = encode_embedding(np.ones(128))
+    
+    with pytest.raises(EmbeddingCodecError):
+        decode_embedding(packed[:-1])
+    with pytest.raises(EmbeddingCodecError):
+        decode_embedding(b'XXXX' + packed[4:])
+    with pytest.raises(EmbeddingCodecError):
+        decode_embedding(packed[:4] + bytes([99]) + packed[5:])
+    with pytest.raises(EmbeddingCodecError):
+        decode_embedding(packed[:3])
+
+
+def test_row_prefers_binary_column():
+    """Rows with both columns SHALL use the binary embedding; legacy rows still decode."""
+    binary = to_postgrest(encode_embedding(np.full(128, 0.5)))
+    
+    assert embedding_from_row({'facial_embedding_bin': binary, 'facial_embedding': [0.1] * 128})[0] == 0.5
+    assert embedding_from_row({'facial_embedding_bin': None, 'facial_embedding': [0.1] * 128}).dtype == np.float32
+    assert embedding_from_row({}) is None
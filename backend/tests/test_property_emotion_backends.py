@@ -0,0 +1,100 @@
+"""
+Property-Based Tests for Smile/Emotion Backend Selection
+Tests EMOTION_BACKEND ordering and fallback, and the ONNX expression model's
+input tensor and softmax output.
+"""
+import pytest
+from hypothesis import given, strategies as st, settings
+import numpy as np
+
+from app.services.emotion_service import EmotionService, emotions_from_logits, onnx_input
+from app.services.preprocess import FaceLandmarks, get_preprocessor
+
+
+logits = st.lists(
+    st.floats(min_value=-50, max_value=50, allow_nan=False),
+    min_size=len(EmotionService.ONNX_LABELS),
+    max_size=len(EmotionService.ONNX_LABELS)
+)
+
+
+@given(values=logits, shift=st.floats(min_value=-100, max_value=100))
+@settings(max_examples=100)
+def test_onnx_logits_become_probabilities(values, shift):
+    """
+    Property: For any logits, the emotions SHALL sum to 1, keep the argmax,
+    and not change when every logit is shifted by the same amount.
+    """
+    emotions = emotions_from_logits(np.array(values), EmotionService.ONNX_LABELS)
+    shifted = emotions_from_logits(np.array(values) + shift, EmotionService.ONNX_LABELS)
+    
+    assert list(emotions) == EmotionService.ONNX_LABELS
+    assert sum(emotions.values()) == pytest.approx(1.0)
+    assert all(0.0 <= p <= 1.0 for p in emotions.values())
+    assert emotions[EmotionService.ONNX_LABELS[int(np.argmax(values))]] == max(emotions.values())
+    for label in emotions:
+        assert shifted[label] == pytest.approx(emotions[label], abs=1e-9)
+
+
+@given(
+    size=st.integers(min_value=8, max_value=300),
+    channels=st.sampled_from([1, 3]),
+    side=st.sampled_from([48, 64, "height"])
+)
+@settings(max_examples=50)
+def test_onnx_input_is_grayscale_nchw(size, channels, side):
+    """Property: The model input SHALL be a 1x1xHxW float32 tensor of raw intensities."""
+    rng = np.random.default_rng(size)
+    shape = (size, size) if channels == 1 else (size, size, 3)
+    crop = rng.integers(0, 256, shape, dtype=np.uint8)
+    
+    tensor = onnx_input(crop, [1, 1, side, side])
+    
+    expected = 64 if side == "height" else side
+    assert tensor.shape == (1, 1, expected, expected)
+    assert tensor.dtype == np.float32
+    assert 0.0 <= tensor.min() and tensor.max() <= 255.0
+
+
+@given(backend=st.sampled_from(EmotionService.BACKENDS))
+def test_backend_order_prefers_configured_then_fast_then_deepface(backend):
+    """Property: The configured backend SHALL come first and DeepFace SHALL only be a fallback."""
+    order = EmotionService(backend=backend).backend_order()
+    
+    assert order[0] == backend
+    assert sorted(order) == sorted(EmotionService.BACKENDS)
+    if backend != 'deepface':
+        assert order[-1] == 'deepface'
+
+
+def test_unknown_backend_uses_blendshape():
+    assert EmotionService(backend='cnn').backend == 'blendshape'
+
+
+def test_missing_onnx_model_falls_back_to_blendshape():
+    """An onnx backend without its model SHALL score the smile from blendshapes instead."""
+    if get_preprocessor().landmarkers is None:
+        pytest.skip("Face landmarker model not available")
+    service = EmotionService(backend='onnx', onnx_model_path='missing-model.onnx')
+    face = FaceLandmarks(
+        points=np.zeros((478, 2)),
+        blendshapes={'mouthSmileLeft': 0.9, 'mouthSmileRight': 0.8}
+    )
+    
+    assert not service.backend_ready('onnx')
+    assert service.active_backend() == 'blendshape'
+    is_smiling, confidence, _ = service.check_smile(np.zeros((64, 64, 3), dtype=np.uint8), face)
+    assert is_smiling and confidence == pytest.approx(0.85)
+
+
+def test_analyzed_frame_without_face_fails_smile_at_once(monkeypatch):
+    """A caller's landmarker pass that found no face SHALL fail the smile check without detecting again."""
+    preprocessor = get_preprocessor()
+    if preprocessor.landmarkers is None:
+        pytest.skip("Face landmarker model not available")
+    calls = []
+    monkeypatch.setattr(preprocessor, "analyze", lambda image: calls.append(image))
+    service = EmotionService(backend='blendshape')
+    
+    assert service.check_smile(np.zeros((64, 64, 3), dtype=np.uint8), None, analyzed=True) == (False, 0.0, {'neutral': 1.0})
+    assert calls == []
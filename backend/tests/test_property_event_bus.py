@@ -0,0 +1,150 @@
+"""
+Property-Based Tests for the Dashboard Event Bus
+Tests that an event published on any worker reaches the subscribed sockets
+of every worker exactly once.
+"""
+import pytest
+import asyncio
+from hypothesis import given, strategies as st, settings
+
+from app.services.event_bus import InProcessEventBus, RedisEventBus
+from app.services.websocket_manager import ConnectionManager
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.queue = asyncio.Queue()
+    
+    async def subscribe(self, channel):
+        self.server.subscribers.append(self)
+    
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+    
+    async def reset(self):
+        if self in self.server.subscribers:
+            self.server.subscribers.remove(self)
+
+
+class FakeRedisServer:
+    """One pub/sub server shared by every worker's bus."""
+    
+    def __init__(self):
+        self.subscribers = []
+    
+    def pubsub(self):
+        return FakePubSub(self)
+    
+    async def publish(self, channel, data):
+        for subscriber in self.subscribers:
+            subscriber.queue.put_nowait({"type": "message", "data": data})
+        return len(self.subscribers)
+
+
+class FakeRedisEventBus(RedisEventBus):
+    def __init__(self, server):
+        super().__init__("redis://unused")
+        self.server = server
+    
+    async def _get_redis(self):
+        return self.server
+
+
+class FailingServer(FakeRedisServer):
+    async def publish(self, channel, data):
+        raise ConnectionError("redis down")
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, message):
+        self.sent.append(message)
+    
+    async def close(self, code=1000):
+        pass
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@given(
+    workers=st.integers(min_value=1, max_value=4),
+    publisher=st.integers(min_value=0, max_value=3),
+    events=st.integers(min_value=1, max_value=10)
+)
+@settings(max_examples=30, deadline=None)
+def test_events_reach_every_worker_once(workers, publisher, events):
+    """
+    Property: For any number of workers, events published on one worker
+    SHALL reach a subscribed socket on every worker exactly once, in order.
+    """
+    async def run():
+        server = FakeRedisServer()
+        managers = [ConnectionManager(queue_size=100, event_bus=FakeRedisEventBus(server)) for _ in range(workers)]
+        sockets = []
+        for manager in managers:
+            await manager.start_relay()
+            ws = FakeWebSocket()
+            await manager.connect(ws, ["session:a"])
+            sockets.append(ws)
+        await settle()
+        
+        source = managers[publisher % workers]
+        for i in range(events):
+            await source.broadcast_attendance_update(i, f"Student {i}", f"STU{i}", "verified", 0.9, session_id="a")
+        await settle()
+        
+        for manager, ws in zip(managers, sockets):
+            manager.disconnect(ws)
+            await manager.stop_relay()
+        await settle()
+        return sockets
+    
+    sockets = run_sync(run())
+    
+    for ws in sockets:
+        assert len(ws.sent) == events
+        assert [f'"student_id": {i},' in message for i, message in enumerate(ws.sent)] == [True] * events
+
+
+@pytest.mark.asyncio
+async def test_in_process_bus_delivers_locally():
+    """The single-node bus SHALL deliver straight to the local manager."""
+    manager = ConnectionManager(queue_size=10, event_bus=InProcessEventBus())
+    ws = FakeWebSocket()
+    await manager.connect(ws, ["anomalies"])
+    
+    await manager.broadcast_anomaly_alert(1, "Student", "proxy_attempt", "face mismatch")
+    await settle()
+    
+    assert len(ws.sent) == 1
+    manager.disconnect(ws)
+
+
+@pytest.mark.asyncio
+async def test_publish_failure_does_not_raise():
+    """A Redis outage SHALL NOT fail the request publishing the event."""
+    bus = FakeRedisEventBus(FailingServer())
+    manager = ConnectionManager(queue_size=10, event_bus=bus)
+    
+    await manager.broadcast_attendance_update(1, "Student", "STU1", "verified", 0.9)
+    
+    assert bus.publish_failures == 1
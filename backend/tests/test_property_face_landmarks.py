@@ -0,0 +1,130 @@
+"""
+Property-Based Tests for the Shared Face Landmark Pass
+Tests that one FaceLandmarker result (landmarks + blendshapes) drives blink
+detection, the smile check and alignment without running the landmarker again.
+"""
+import pytest
+from hypothesis import given, strategies as st, settings
+import numpy as np
+
+from app.services.preprocess import FaceLandmarks, FacePreprocessor
+from app.services.liveness_service import LivenessService
+from app.services.emotion_service import EmotionService
+
+
+scores = st.floats(min_value=0.0, max_value=1.0, allow_nan=False)
+
+
+class CountingPreprocessor(FacePreprocessor):
+    """Real preprocessor that records every landmarker run."""
+    
+    def __init__(self):
+        super().__init__()
+        self.detections = 0
+    
+    def _detect(self, rgb_image):
+        self.detections += 1
+        return super()._detect(rgb_image)
+
+
+def make_face(width=400, height=400, eye_opening=6.0, blendshapes=None):
+    """478 landmarks with both eyes drawn as 40px-wide ellipses of the given opening."""
+    points = np.tile([width / 2, height / 2], (478, 1)).astype(np.float64)
+    for indices, cx in ((LivenessService.LEFT_EYE_INDICES, width * 0.65),
+                        (LivenessService.RIGHT_EYE_INDICES, width * 0.35)):
+        p1, p2, p3, p4, p5, p6 = indices
+        cy = height * 0.4
+        points[p1] = [cx - 20, cy]
+        points[p4] = [cx + 20, cy]
+        points[p2] = [cx - 7, cy - eye_opening]
+        points[p3] = [cx + 7, cy - eye_opening]
+        points[p6] = [cx - 7, cy + eye_opening]
+        points[p5] = [cx + 7, cy + eye_opening]
+    # Outer eye corners used for alignment
+    points[33] = [width * 0.35 - 20, height * 0.4]
+    points[263] = [width * 0.65 + 20, height * 0.4]
+    return FaceLandmarks(points=points, blendshapes=blendshapes or {})
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return CountingPreprocessor()
+
+
+@given(left=scores, right=scores)
+@settings(max_examples=100)
+def test_blink_follows_eye_blendshapes(left, right):
+    """
+    Property: When blendshapes are present, eyes SHALL count as closed exactly
+    when the mean eyeBlink score reaches the threshold, whatever the EAR says.
+    """
+    service = LivenessService(blink_score_threshold=0.5)
+    face = make_face(eye_opening=6.0, blendshapes={'eyeBlinkLeft': left, 'eyeBlinkRight': right})
+    
+    eyes_closed, left_ear, right_ear = service.detect_blink_in_frame(None, face)
+    
+    assert eyes_closed == ((left + right) / 2 >= 0.5)
+    assert left_ear == pytest.approx(right_ear)
+
+
+@given(opening=st.floats(min_value=0.0, max_value=15.0, allow_nan=False))
+@settings(max_examples=50)
+def test_blink_falls_back_to_ear_without_blendshapes(opening):
+    """Property: Without blendshapes, eyes SHALL count as closed when the EAR is below the threshold."""
+    service = LivenessService(ear_threshold=0.25)
+    face = make_face(eye_opening=opening)
+    
+    eyes_closed, left_ear, right_ear = service.detect_blink_in_frame(None, face)
+    
+    assert left_ear == pytest.approx(opening / 20)
+    assert eyes_closed == ((left_ear + right_ear) / 2 < 0.25)
+
+
+@given(left=scores, right=scores, threshold=st.floats(min_value=0.1, max_value=0.9))
+@settings(max_examples=100)
+def test_smile_follows_mouth_blendshapes(left, right, threshold):
+    """
+    Property: With blendshapes, check_smile SHALL score the mean mouthSmile
+    value against the smile threshold, without DeepFace.
+    """
+    service = EmotionService(smile_threshold=threshold)
+    face = make_face(blendshapes={'mouthSmileLeft': left, 'mouthSmileRight': right})
+    
+    is_smiling, confidence, emotions = service.check_smile(None, face)
+    
+    assert confidence == pytest.approx((left + right) / 2)
+    assert is_smiling == (confidence >= threshold)
+    assert service.get_dominant_emotion(emotions)[0] == ('happy' if confidence >= 0.5 else 'neutral')
+
+
+def test_shared_face_skips_landmarker(preprocessor):
+    """Alignment, blink and smile SHALL reuse a supplied result instead of detecting again."""
+    image = np.random.randint(0, 255, (400, 400, 3), dtype=np.uint8)
+    face = make_face(blendshapes={'eyeBlinkLeft': 0.9, 'eyeBlinkRight': 0.8, 'mouthSmileLeft': 0.8})
+    liveness = LivenessService(preprocessor=preprocessor)
+    preprocessor.detections = 0
+    
+    aligned = preprocessor.preprocess(image, face)
+    eyes_closed, _, _ = liveness.detect_blink_in_frame(image, face)
+    EmotionService().check_smile(image, face)
+    
+    assert aligned.shape == (224, 224, 3)
+    assert eyes_closed
+    assert preprocessor.detections == 0
+
+
+def test_analyze_runs_landmarker_once(preprocessor):
+    """analyze() SHALL be a single landmarker run; a frame without a face yields None."""
+    blank = np.zeros((200, 200, 3), dtype=np.uint8)
+    preprocessor.detections = 0
+    
+    assert preprocessor.analyze(blank) is None
+    assert preprocessor.detections == 1
+    assert LivenessService(preprocessor=preprocessor).detect_blink_in_frame(blank) == (False, 0.0, 0.0)
+    assert preprocessor.detections == 2
+
+
+def test_face_score_ignores_missing_blendshapes():
+    face = FaceLandmarks(points=np.zeros((478, 2)), blendshapes={'eyeBlinkLeft': 0.6})
+    assert face.score('eyeBlinkLeft', 'eyeBlinkRight') == pytest.approx(0.3)
+    assert face.score() == 0.0
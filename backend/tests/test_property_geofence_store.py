@@ -0,0 +1,138 @@
+"""
+Property-Based Tests for the Polygon Geofence Store
+Tests that the grid-indexed lookups (bulk and single point) agree with a
+brute-force ray-cast over every polygon, whatever the cell size, and that
+polygon zones widen the classroom radius check.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+from hypothesis import given, strategies as st, settings
+import numpy as np
+
+from app.services import geofence_store as geofence_store_module
+from app.services.geofence_service import GeofenceService
+from app.services.geofence_store import (
+    GeofencePolygon, PolygonGeofenceStore, parse_polygon, points_in_polygon
+)
+
+
+CAMPUS = np.array([28.6139, 77.2090])
+
+
+class FakeSupabase:
+    """Answers the one geofence_config query the store makes."""
+    
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def table(self, name):
+        assert name == 'geofence_config'
+        return self
+    
+    def select(self, columns):
+        return self
+    
+    def like(self, column, pattern):
+        self.prefix = pattern.rstrip('%')
+        return self
+    
+    def execute(self):
+        return SimpleNamespace(data=[r for r in self.rows if r['config_key'].startswith(self.prefix)])
+
+
+def random_polygons(rng, count):
+    """Star-shaped polygons (rooms, some overlapping) scattered over ~2km."""
+    polygons = []
+    for i in range(count):
+        centre = CAMPUS + rng.uniform(-0.01, 0.01, 2)
+        n = int(rng.integers(3, 10))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+        radii = rng.uniform(0.0001, 0.002, n)
+        vertices = centre + np.column_stack([radii * np.sin(angles), radii * np.cos(angles)])
+        polygons.append(GeofencePolygon(f"room-{i}", vertices))
+    return polygons
+
+
+def brute_force(store, latitudes, longitudes):
+    """Smallest containing polygon by testing every point against every polygon."""
+    x, y = store._project(latitudes, longitudes)
+    expected = np.full(len(x), -1)
+    for index in range(len(store.rings) - 1, -1, -1):
+        expected[points_in_polygon(x, y, store.rings[index])] = index
+    return expected
+
+
+@given(
+    seed=st.integers(min_value=0, max_value=2**32 - 1),
+    count=st.integers(min_value=1, max_value=40),
+    cell_meters=st.sampled_from([5.0, 25.0, 120.0, 1000.0])
+)
+@settings(max_examples=40, deadline=None)
+def test_grid_lookup_matches_brute_force(seed, count, cell_meters):
+    """
+    Property: For any polygons, points and cell size, locate_many and locate
+    SHALL return the same zone as testing every polygon.
+    """
+    rng = np.random.default_rng(seed)
+    store = PolygonGeofenceStore(supabase=object(), cell_meters=cell_meters)
+    store.build(random_polygons(rng, count))
+    latitudes = CAMPUS[0] + rng.uniform(-0.013, 0.013, 500)
+    longitudes = CAMPUS[1] + rng.uniform(-0.013, 0.013, 500)
+    
+    found = store.locate_many(latitudes, longitudes)
+    
+    np.testing.assert_array_equal(found, brute_force(store, latitudes, longitudes))
+    for i in range(0, 500, 25):
+        expected = store.polygons[found[i]].name if found[i] >= 0 else None
+        assert store.locate(latitudes[i], longitudes[i]) == expected
+
+
+def test_smallest_zone_wins_and_outside_is_none():
+    building = GeofencePolygon("building", CAMPUS + np.array([[-0.001, -0.001], [-0.001, 0.001], [0.001, 0.001], [0.001, -0.001]]))
+    room = GeofencePolygon("room-101", CAMPUS + np.array([[0, 0], [0, 0.0002], [0.0002, 0.0002], [0.0002, 0]]))
+    store = PolygonGeofenceStore(supabase=object())
+    store.build([building, room])
+    
+    assert store.locate(*(CAMPUS + 0.0001)) == "room-101"
+    assert store.locate(*(CAMPUS - 0.0005)) == "building"
+    assert store.locate(*(CAMPUS + 0.01)) is None
+    assert list(store.zone_names([CAMPUS[0] + 0.0001, CAMPUS[0] + 0.01], [CAMPUS[1] + 0.0001, CAMPUS[1]])) == ["room-101", ""]
+    assert store.contains_many([], []).shape == (0,)
+
+
+def test_parse_polygon_rows():
+    ring = [[28.0, 77.0], [28.0, 77.001], [28.001, 77.001], [28.0, 77.0]]
+    polygon = parse_polygon("polygon:lab", json.dumps(ring))
+    assert polygon.name == "lab" and len(polygon.vertices) == 3  # closing vertex dropped
+    
+    for bad in ("[[28.0, 77.0], [28.1, 77.1]]", "[[91, 0], [0, 0], [0, 1]]", "{}"):
+        with pytest.raises(ValueError):
+            parse_polygon("polygon:bad", bad)
+
+
+def test_load_skips_bad_rows():
+    square = [[28.0, 77.0], [28.0, 77.001], [28.001, 77.001], [28.001, 77.0]]
+    store = PolygonGeofenceStore(supabase=FakeSupabase([
+        {'config_key': 'polygon:lab', 'config_value': json.dumps(square)},
+        {'config_key': 'polygon:broken', 'config_value': 'not json'},
+        {'config_key': 'max_distance_meters', 'config_value': '100'}
+    ]))
+    
+    assert store.load() == 1
+    assert store.locate(28.0005, 77.0005) == "lab"
+
+
+def test_same_zone_passes_outside_radius(monkeypatch):
+    """A student beyond the radius but in the classroom's building polygon SHALL pass."""
+    store = PolygonGeofenceStore(supabase=object())
+    store.build([GeofencePolygon("library", CAMPUS + np.array([[0, 0], [0, 0.003], [0.003, 0.003], [0.003, 0]]))])
+    monkeypatch.setattr(geofence_store_module, "_geofence_store", store)
+    classroom = CAMPUS + 0.0002
+    
+    within, distance, zone = GeofenceService.check_location(*(CAMPUS + 0.0028), *classroom, 50)
+    assert within and zone == "library" and distance > 50
+    
+    within, _, zone = GeofenceService.check_location(*(CAMPUS - 0.002), *classroom, 50)
+    assert not within and zone is None
@@ -0,0 +1,137 @@
+"""
+Property-Based Tests for the Landmarker Instance Pool
+Tests that a pooled instance is never used by two threads at once, that the
+pool never grows past its size, and that every instance is warmed up before
+its first checkout.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from hypothesis import given, strategies as st, settings
+import numpy as np
+
+from app.services.instance_pool import InstancePool
+from app.services.preprocess import FacePreprocessor
+
+
+class Model:
+    """Stands in for a graph that breaks if entered concurrently."""
+    
+    def __init__(self):
+        self.warm = False
+        self.busy = False
+        self.closed = False
+        self.calls = 0
+    
+    def run(self, hold):
+        assert self.warm, "used before warm-up"
+        assert not self.busy, "entered by two threads"
+        self.busy = True
+        time.sleep(hold)
+        self.calls += 1
+        self.busy = False
+
+
+def warm(model):
+    model.warm = True
+
+
+@given(
+    size=st.integers(min_value=1, max_value=4),
+    threads=st.integers(min_value=1, max_value=8),
+    jobs=st.integers(min_value=1, max_value=40)
+)
+@settings(max_examples=25, deadline=None)
+def test_checkouts_are_exclusive_and_bounded(size, threads, jobs):
+    """
+    Property: For any pool size and thread count, each instance SHALL be held
+    by at most one thread, at most `size` SHALL be created, and every job SHALL run.
+    """
+    created = []
+    
+    def factory():
+        model = Model()
+        created.append(model)
+        return model
+    
+    pool = InstancePool(factory, size=size, warm_up=warm)
+    
+    def job(_):
+        with pool.checkout() as model:
+            model.run(0.001)
+    
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(job, range(jobs)))
+    
+    assert 1 <= len(created) <= min(size, threads, jobs)
+    assert sum(model.calls for model in created) == jobs
+    assert pool.get_stats()["idle"] == len(created)
+    assert pool.get_stats()["checkouts"] == jobs
+
+
+def test_checkout_times_out_when_all_busy():
+    pool = InstancePool(Model, size=1, warm_up=warm)
+    held = pool.acquire()
+    
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+    
+    pool.release(held)
+    assert pool.acquire(timeout=0.01) is held
+
+
+def test_failed_creation_does_not_use_up_capacity():
+    attempts = []
+    
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model failed to load")
+        return Model()
+    
+    pool = InstancePool(factory, size=1, warm_up=warm)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    
+    with pool.checkout(timeout=0.01) as model:
+        model.run(0)
+    assert pool.get_stats()["created"] == 1
+
+
+def test_prewarm_and_close():
+    pool = InstancePool(Model, size=3, warm_up=warm, close=lambda model: setattr(model, "closed", True))
+    assert pool.prewarm() == 3
+    assert pool.prewarm() == 3
+    
+    held = pool.acquire()
+    pool.close()
+    assert pool.get_stats()["idle"] == 0
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    
+    assert not held.closed
+    pool.release(held)
+    assert held.closed
+
+
+def test_preprocessor_landmarkers_run_in_parallel_threads():
+    """Concurrent analyze() calls SHALL each get their own landmarker, up to the pool size."""
+    preprocessor = FacePreprocessor()
+    if preprocessor.landmarkers is None:
+        pytest.skip("Face landmarker model not available")
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    barrier = threading.Barrier(4)
+    
+    def analyze(_):
+        barrier.wait()
+        return preprocessor.analyze(frame)
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(analyze, range(4)))
+    
+    assert results == [None] * 4
+    stats = preprocessor.landmarkers.get_stats()
+    assert 1 <= stats["created"] <= stats["size"]
+    assert stats["idle"] == stats["created"]
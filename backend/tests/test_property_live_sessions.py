@@ -0,0 +1,178 @@
+"""
+Property-Based Tests for Live Session Aggregates
+Tests that session totals match the events folded in, that a burst of
+verifications produces one coalesced delta per tick, and that subscribers
+get a full snapshot first.
+"""
+import pytest
+import asyncio
+import json
+from hypothesis import given, strategies as st, settings
+
+from app.services.websocket_manager import ConnectionManager
+from app.services.live_session_service import LiveSessionService
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+    
+    async def close(self, code=1000):
+        pass
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def no_history(session_id):
+    return None
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+events = st.lists(
+    st.tuples(
+        st.integers(min_value=1, max_value=8),
+        st.sampled_from(["verified", "failed", "anomaly"])
+    ),
+    min_size=1,
+    max_size=40
+)
+
+
+async def emit(manager, student_id, outcome, session_id="abc"):
+    if outcome == "anomaly":
+        await manager.broadcast_anomaly_alert(
+            student_id, f"S{student_id}", "verification_failed", "test",
+            class_id=1, session_id=session_id
+        )
+    else:
+        await manager.broadcast_attendance_update(
+            student_id, f"S{student_id}", f"ID{student_id}", outcome, 0.9,
+            class_id=1, session_id=session_id
+        )
+
+
+@given(ops=events, tick_every=st.integers(min_value=1, max_value=10))
+@settings(max_examples=50, deadline=None)
+def test_deltas_rebuild_the_aggregate(ops, tick_every):
+    """
+    Property: For any sequence of verifications and tick timing, a dashboard
+    applying the snapshot and then every delta SHALL hold the same totals as
+    a direct count, and SHALL receive at most one message per tick.
+    """
+    async def run():
+        manager = ConnectionManager()
+        live = LiveSessionService(manager, recent_events=5, loader=no_history)
+        ws = FakeWebSocket()
+        await manager.connect(ws, ["live:abc"])
+        await live.send_snapshot(ws, "abc")
+        
+        ticks = 0
+        for i, (student_id, outcome) in enumerate(ops):
+            await emit(manager, student_id, outcome)
+            if (i + 1) % tick_every == 0:
+                await live.flush()
+                ticks += 1
+        await live.flush()
+        ticks += 1
+        while manager.get_stats()["queued_messages"]:
+            await asyncio.sleep(0)
+        await settle()
+        manager.disconnect(ws)
+        return ws.sent, ticks
+    
+    messages, ticks = run_sync(run())
+    
+    statuses, anomalies = {}, 0
+    for student_id, outcome in ops:
+        if outcome == "anomaly":
+            anomalies += 1
+        else:
+            statuses[student_id] = outcome
+    
+    assert messages[0]["type"] == "session_snapshot"
+    state = dict(messages[0]["data"])
+    seen = [e["seq"] for e in state["events"]]
+    for message in messages[1:]:
+        assert message["type"] == "session_delta"
+        state.update({k: v for k, v in message["data"].items() if k != "events"})
+        seen.extend(e["seq"] for e in message["data"]["events"])
+    
+    assert len(messages) - 1 <= ticks
+    assert state["present"] == sum(1 for s in statuses.values() if s == "verified")
+    assert state["failed"] == sum(1 for s in statuses.values() if s == "failed")
+    assert state["anomalies"] == anomalies
+    assert seen == list(range(1, len(ops) + 1))
+
+
+@pytest.mark.asyncio
+async def test_live_subscribers_get_no_per_event_messages():
+    """A "live:" subscriber SHALL receive one delta for a burst, not one message per verification."""
+    manager = ConnectionManager()
+    live = LiveSessionService(manager, loader=no_history)
+    ws = FakeWebSocket()
+    await manager.connect(ws, ["live:abc"])
+    
+    for student_id in range(1, 51):
+        await emit(manager, student_id, "verified")
+    await settle()
+    assert ws.sent == []
+    
+    assert await live.flush() == 1
+    await settle()
+    assert len(ws.sent) == 1
+    assert ws.sent[0]["data"]["present"] == 50
+    assert len(ws.sent[0]["data"]["events"]) == 50
+    manager.disconnect(ws)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_seeds_from_stored_totals():
+    """A session first seen mid-way SHALL start from the stored rows, with live events taking precedence."""
+    manager = ConnectionManager()
+    loads = []
+    
+    async def loader(session_id):
+        loads.append(session_id)
+        await asyncio.sleep(0)
+        return {"class_id": 7, "statuses": {1: "verified", 2: "failed"}, "anomalies": 3}
+    
+    live = LiveSessionService(manager, loader=loader)
+    await emit(manager, 2, "verified")
+    
+    first, second = await asyncio.gather(live.snapshot("abc"), live.snapshot("abc"))
+    
+    assert loads == ["abc"]
+    assert first["present"] == 2 and first["failed"] == 0
+    assert first["anomalies"] == 3
+    assert second["present"] == 2
+
+
+@pytest.mark.asyncio
+async def test_unwatched_sessions_send_nothing_and_idle_ones_are_evicted():
+    """Deltas for sessions nobody watches SHALL be skipped; idle sessions SHALL be dropped."""
+    now = [0.0]
+    manager = ConnectionManager()
+    live = LiveSessionService(manager, idle_seconds=60, loader=no_history, clock=lambda: now[0])
+    await emit(manager, 1, "verified")
+    
+    assert await live.flush() == 0
+    now[0] += 61
+    assert live.evict_idle() == 1
+    assert live.get_stats()["sessions"] == 0
@@ -0,0 +1,142 @@
+"""
+Property-Based Tests for Multi-Frame Blink Liveness
+Tests the close-then-open blink state machine, early stopping, the tracking
+window around the face and VIDEO-mode timestamp ordering.
+"""
+import pytest
+from hypothesis import given, strategies as st, settings
+import numpy as np
+
+from app.services.liveness_service import BlinkCounter, LivenessService
+
+
+def reference_detect_blink(closed_flags, consecutive_frames):
+    """Original full-scan loop from LivenessService.detect_blink."""
+    closed_count = 0
+    was_open = False
+    blink_detected = False
+    for eyes_closed in closed_flags:
+        if not eyes_closed:
+            if closed_count >= consecutive_frames:
+                blink_detected = True
+            was_open = True
+            closed_count = 0
+        else:
+            if was_open:
+                closed_count += 1
+    return blink_detected
+
+
+class ScriptedLiveness(LivenessService):
+    """Liveness service whose per-frame eye state is read from the frame itself."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frames_seen = 0
+    
+    def detect_blink_in_frame(self, image, face=None):
+        self.frames_seen += 1
+        return bool(image), 0.3, 0.3
+
+
+class FixedWindowLiveness(LivenessService):
+    """Skips face location so the VIDEO landmarker runs on every frame."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.timestamps = []
+    
+    def _locate_face(self, frame):
+        return 0, 0, min(frame.shape[:2])
+    
+    def _track_frame(self, landmarker, frame, roi, timestamp_ms):
+        self.timestamps.append(timestamp_ms)
+        return super()._track_frame(landmarker, frame, roi, timestamp_ms)
+
+
+flags = st.lists(st.booleans(), min_size=0, max_size=40)
+
+
+@given(closed=flags, consecutive=st.integers(min_value=1, max_value=4))
+@settings(max_examples=200)
+def test_blink_counter_matches_full_scan(closed, consecutive):
+    """
+    Property: For any eye-state sequence, the first frame where BlinkCounter
+    fires SHALL exist exactly when the original full scan reported a blink.
+    """
+    counter = BlinkCounter(consecutive)
+    fired = [counter.update(eyes_closed) for eyes_closed in closed]
+    
+    assert any(fired) == reference_detect_blink(closed, consecutive)
+
+
+@given(closed=flags, consecutive=st.integers(min_value=1, max_value=4))
+@settings(max_examples=100)
+def test_detect_blink_stops_at_first_blink(closed, consecutive):
+    """Property: detect_blink SHALL stop reading frames once a blink is confirmed."""
+    service = ScriptedLiveness(consecutive_frames=consecutive)
+    
+    detected = service.detect_blink(closed)
+    
+    if len(closed) < consecutive + 1:
+        assert detected is False
+        return
+    assert detected == reference_detect_blink(closed, consecutive)
+    if detected:
+        counter = BlinkCounter(consecutive)
+        first = next(i for i, c in enumerate(closed) if counter.update(c)) + 1
+        assert service.frames_seen == first
+    else:
+        assert service.frames_seen == len(closed)
+
+
+@given(
+    width=st.integers(min_value=64, max_value=1920),
+    height=st.integers(min_value=64, max_value=1080),
+    data=st.data()
+)
+@settings(max_examples=100)
+def test_tracking_window_stays_in_frame(width, height, data):
+    """
+    Property: The tracking window SHALL be a square inside the frame that
+    contains the face's centre.
+    """
+    x = data.draw(st.floats(min_value=0, max_value=width - 1))
+    y = data.draw(st.floats(min_value=0, max_value=height - 1))
+    size = data.draw(st.floats(min_value=1, max_value=max(width, height)))
+    points = np.array([[x, y], [min(x + size, width - 1), min(y + size, height - 1)]])
+    
+    x0, y0, side = LivenessService(preprocessor=None)._face_roi(points, (height, width, 3))
+    
+    assert 1 <= side <= min(width, height)
+    assert 0 <= x0 and x0 + side <= width
+    assert 0 <= y0 and y0 + side <= height
+    cx, cy = points.mean(axis=0)
+    assert x0 <= cx <= x0 + side and y0 <= cy <= y0 + side
+
+
+def test_video_timestamps_increase_across_sequences():
+    """Every landmarker call SHALL get a larger timestamp, even when a new sequence restarts at zero."""
+    service = FixedWindowLiveness()
+    if service._trackers is None:
+        pytest.skip("Face landmarker model not available")
+    frames = [np.zeros((240, 320, 3), dtype=np.uint8)] * 4
+    
+    assert service.detect_blink_sequence(frames) == (False, 4)
+    assert service.detect_blink_sequence(frames, timestamps_ms=[0, 40, 40, 20]) == (False, 4)
+    
+    assert len(service.timestamps) == 8
+    assert all(b > a for a, b in zip(service.timestamps, service.timestamps[1:]))
+    service.close()
+
+
+def test_no_face_falls_back_to_no_blink():
+    """A sequence without a face SHALL report no blink after scanning every frame."""
+    service = LivenessService()
+    frames = [np.zeros((240, 320, 3), dtype=np.uint8)] * 5
+    
+    result = service.check_liveness(frames)
+    
+    assert not result.is_live
+    assert result.frames_processed == 5
+    service.close()
@@ -0,0 +1,116 @@
+"""
+Property-Based Tests for Motion Alignment
+Tests that the vectorized timestamp alignment and motion magnitudes give the
+same results as the original per-sample loops, for lists and float32 arrays.
+"""
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.services.motion_image_correlator import MotionImageCorrelator, MotionData
+
+
+TOLERANCE_SEC = MotionImageCorrelator.TIMESTAMP_TOLERANCE_MS / 1000.0
+
+
+def reference_align(flow_magnitudes, flow_timestamps, motion_magnitudes, motion_timestamps):
+    """The original O(F x M) alignment loop."""
+    aligned_flow = []
+    aligned_motion = []
+    for i, flow_ts in enumerate(flow_timestamps):
+        time_diffs = [abs(flow_ts - motion_ts) for motion_ts in motion_timestamps]
+        min_diff_idx = np.argmin(time_diffs)
+        if time_diffs[min_diff_idx] <= TOLERANCE_SEC:
+            aligned_flow.append(flow_magnitudes[i])
+            aligned_motion.append(motion_magnitudes[min_diff_idx])
+    return aligned_flow, aligned_motion
+
+
+def reference_magnitude(motion_data):
+    """The original per-sample magnitude loop."""
+    magnitudes = []
+    for i in range(len(motion_data.timestamps)):
+        accel_mag = np.sqrt(
+            motion_data.accelerometer_x[i]**2 +
+            motion_data.accelerometer_y[i]**2 +
+            motion_data.accelerometer_z[i]**2
+        )
+        gyro_mag = np.sqrt(
+            motion_data.gyroscope_x[i]**2 +
+            motion_data.gyroscope_y[i]**2 +
+            motion_data.gyroscope_z[i]**2
+        )
+        magnitudes.append(float(0.3 * accel_mag + 0.7 * gyro_mag))
+    return magnitudes
+
+
+# Millisecond-grid timestamps produce exact ties and duplicates; offsets keep them near Unix time
+millis = st.integers(min_value=0, max_value=3000)
+timestamps = st.lists(millis, min_size=1, max_size=60).map(lambda ms: [1.7e9 + m / 1000.0 for m in ms])
+
+
+@given(
+    flow_ts=timestamps,
+    motion_ts=timestamps,
+    sort_motion=st.booleans()
+)
+@settings(max_examples=200, deadline=None)
+def test_alignment_matches_reference(flow_ts, motion_ts, sort_motion):
+    """
+    Property: For any flow and motion timestamps (unsorted, duplicated, or
+    tied), the vectorized alignment SHALL pick the same pairs as the loop.
+    """
+    if sort_motion:
+        motion_ts = sorted(motion_ts)
+    flow = [float(i) for i in range(len(flow_ts))]
+    motion = [float(100 + i) for i in range(len(motion_ts))]
+    
+    expected = reference_align(flow, flow_ts, motion, motion_ts)
+    aligned_flow, aligned_motion = MotionImageCorrelator().align_timestamps(flow, flow_ts, motion, motion_ts)
+    
+    assert list(aligned_flow) == expected[0]
+    assert list(aligned_motion) == expected[1]
+
+
+@given(
+    flow_ts=timestamps,
+    motion_ts=timestamps
+)
+@settings(max_examples=100, deadline=None)
+def test_alignment_accepts_float32_magnitudes(flow_ts, motion_ts):
+    """Property: float32 magnitude arrays SHALL align exactly like lists and keep their dtype."""
+    flow = np.arange(len(flow_ts), dtype=np.float32)
+    motion = np.arange(len(motion_ts), dtype=np.float32) + 100
+    
+    expected = reference_align(flow.tolist(), flow_ts, motion.tolist(), motion_ts)
+    aligned_flow, aligned_motion = MotionImageCorrelator().align_timestamps(
+        flow, np.asarray(flow_ts), motion, np.asarray(motion_ts)
+    )
+    
+    assert aligned_flow.dtype == np.float32 and aligned_motion.dtype == np.float32
+    assert aligned_flow.tolist() == expected[0]
+    assert aligned_motion.tolist() == expected[1]
+
+
+axis = st.floats(min_value=-50, max_value=50, allow_nan=False, width=32)
+
+
+@given(
+    samples=st.lists(st.tuples(axis, axis, axis, axis, axis, axis), min_size=1, max_size=200),
+    as_float32=st.booleans()
+)
+@settings(max_examples=100, deadline=None)
+def test_motion_magnitude_matches_reference(samples, as_float32):
+    """Property: array-wide norms SHALL match the per-sample loop (to float32 precision for float32 input)."""
+    columns = [list(column) for column in zip(*samples)]
+    motion = MotionData([float(i) / 100 for i in range(len(samples))], *columns)
+    expected = reference_magnitude(motion)
+    
+    if as_float32:
+        motion = MotionData(
+            np.asarray(motion.timestamps),
+            *(np.asarray(column, dtype=np.float32) for column in columns)
+        )
+    magnitudes, ts = MotionImageCorrelator().calculate_motion_magnitude(motion)
+    
+    assert len(ts) == len(samples)
+    np.testing.assert_allclose(magnitudes, expected, rtol=1e-5 if as_float32 else 1e-12, atol=1e-4 if as_float32 else 0)
@@ -0,0 +1,103 @@
+"""
+Property-Based Tests for the Binary Motion Envelope
+Tests that motion recordings round-trip through the envelope at float32
+precision, that malformed payloads are rejected, and that the envelope is
+much smaller than the JSON lists it replaces.
+"""
+import base64
+import json
+
+import pytest
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.services.motion_image_correlator import MotionData
+from app.utils.motion_codec import (
+    encode_motion, decode_motion, MotionCodecError, ZSTD_AVAILABLE, HEADER
+)
+
+
+axis = st.floats(min_value=-100, max_value=100, allow_nan=False, width=32)
+
+
+def make_motion(samples, start=1.76e9, rate_hz=100):
+    columns = [list(column) for column in zip(*samples)] if samples else [[] for _ in range(6)]
+    timestamps = [start + i / rate_hz for i in range(len(samples))]
+    return MotionData(timestamps, *columns)
+
+
+@given(
+    samples=st.lists(st.tuples(axis, axis, axis, axis, axis, axis), min_size=0, max_size=300),
+    start=st.floats(min_value=1.5e9, max_value=2.0e9)
+)
+@settings(max_examples=100, deadline=None)
+def test_envelope_round_trip(samples, start):
+    """
+    Property: For any recording, decoding the envelope SHALL give the same
+    sensor values (float32) and timestamps to well under a millisecond.
+    """
+    motion = make_motion(samples, start)
+    decoded = decode_motion(base64.b64encode(encode_motion(motion)).decode())
+    
+    assert len(decoded.timestamps) == len(samples)
+    np.testing.assert_allclose(decoded.timestamps, motion.timestamps, rtol=0, atol=1e-4)
+    for field in ("accelerometer_x", "accelerometer_y", "accelerometer_z", "gyroscope_x", "gyroscope_y", "gyroscope_z"):
+        assert getattr(decoded, field).tolist() == pytest.approx(getattr(motion, field))
+
+
+def test_decoded_columns_are_views():
+    """Sensor columns SHALL be read-only views over the payload, not copies."""
+    data = encode_motion(make_motion([(1, 2, 3, 4, 5, 6)] * 50))
+    decoded = decode_motion(data)
+    
+    assert decoded.accelerometer_x.dtype == np.float32
+    assert not decoded.accelerometer_x.flags.writeable
+    assert decoded.gyroscope_z.base is not None
+
+
+@pytest.mark.parametrize("mutate, error", [
+    (lambda d: b"XXXX" + d[4:], "bad magic"),
+    (lambda d: d[:4] + bytes([9]) + d[5:], "version"),
+    (lambda d: d[:-4], "length mismatch"),
+    (lambda d: d[:10], "shorter than header"),
+])
+def test_malformed_envelopes_rejected(mutate, error):
+    """Truncated or foreign payloads SHALL raise MotionCodecError."""
+    data = encode_motion(make_motion([(1, 2, 3, 4, 5, 6)] * 10))
+    with pytest.raises(MotionCodecError, match=error):
+        decode_motion(mutate(data))
+    with pytest.raises(MotionCodecError):
+        decode_motion("not base64!")
+
+
+def test_envelope_much_smaller_than_json():
+    """A 2 s, 200 Hz recording SHALL be several times smaller than the JSON lists."""
+    rng = np.random.default_rng(0)
+    motion = make_motion([tuple(row) for row in rng.normal(0, 3, (400, 6)).tolist()], rate_hz=200)
+    as_json = json.dumps({
+        "motion_timestamps": motion.timestamps,
+        "accelerometer_x": motion.accelerometer_x, "accelerometer_y": motion.accelerometer_y,
+        "accelerometer_z": motion.accelerometer_z, "gyroscope_x": motion.gyroscope_x,
+        "gyroscope_y": motion.gyroscope_y, "gyroscope_z": motion.gyroscope_z
+    })
+    envelope = base64.b64encode(encode_motion(motion))
+    
+    assert len(envelope) * 3 < len(as_json)
+    assert len(encode_motion(motion)) == HEADER.size + 7 * 400 * 4
+
+
+@pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed")
+def test_compressed_envelope_round_trip():
+    """zstd-compressed envelopes SHALL decode to the same values."""
+    motion = make_motion([(0.0, 0.0, 9.81, 0.0, 0.0, 0.0)] * 200)
+    packed = encode_motion(motion, compress=True)
+    
+    assert len(packed) < len(encode_motion(motion))
+    assert decode_motion(packed).accelerometer_z.tolist() == pytest.approx([9.81] * 200)
+
+
+@pytest.mark.skipif(ZSTD_AVAILABLE, reason="zstandard installed")
+def test_compression_unavailable_is_reported():
+    """Without zstandard, compression SHALL fail with a clear error."""
+    with pytest.raises(MotionCodecError, match="zstandard"):
+        encode_motion(make_motion([(1, 2, 3, 4, 5, 6)]), compress=True)
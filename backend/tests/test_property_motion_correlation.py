@@ -5,6 +5,7 @@ Validates Requirements: 5.3, 5.4
 """
 import pytest
 import numpy as np
+import cv2
 from hypothesis import given, strategies as st, assume, settings
 
 from app.services.motion_image_correlator import (
@@ -280,5 +281,76 @@ def test_timestamp_alignment():
     assert len(aligned_flow) == 3, "Should align 3 samples within tolerance"
 
 
+
+def make_panning_frames(n_frames, shift_px, face_shift_px=0):
+    """Textured 640x480 BGR background panning by shift_px per frame, with a 'face' patch moving on its own."""
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur(rng.integers(0, 255, (480, 640 + shift_px * n_frames), dtype=np.uint8), (5, 5), 0)
+    face = rng.integers(0, 255, (160, 160), dtype=np.uint8)
+    frames = []
+    for i in range(n_frames):
+        gray = texture[:, i * shift_px:i * shift_px + 640].copy()
+        y = 160 + i * face_shift_px
+        gray[y:y + 160, 240:400] = face
+        frames.append(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    return frames
+
+
+def test_optical_flow_tracks_background_motion():
+    """Flow follows the panning background, ignores the masked face, and is reported in full-resolution pixels"""
+    correlator = get_motion_image_correlator()
+    frames = make_panning_frames(8, shift_px=4, face_shift_px=12)
+    timestamps = [i / 30 for i in range(8)]
+    
+    magnitudes, flow_timestamps = correlator.extract_optical_flow(frames, timestamps, face_box=(240, 160, 160, 260))
+    
+    assert len(magnitudes) == 7
+    assert flow_timestamps[0] == pytest.approx(1 / 60)
+    for magnitude in magnitudes:
+        assert magnitude == pytest.approx(4.0, abs=0.5)
+
+
+def test_optical_flow_detects_once_and_converts_each_frame_once(monkeypatch):
+    """Features are tracked rather than re-detected per pair; each frame is grayscaled once"""
+    correlator = get_motion_image_correlator()
+    frames = make_panning_frames(10, shift_px=2)
+    calls = {"cvtColor": 0, "goodFeaturesToTrack": 0}
+    
+    for name in calls:
+        original = getattr(cv2, name)
+        
+        def counting(*args, _name=name, _original=original, **kwargs):
+            calls[_name] += 1
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(cv2, name, counting)
+    
+    correlator.extract_optical_flow(frames, [i / 30 for i in range(10)], face_box=(0, 0, 1, 1))
+    
+    assert calls["cvtColor"] == 10
+    assert calls["goodFeaturesToTrack"] < 3
+
+
+def test_verify_liveness_stops_once_decisive():
+    """Matching camera and gyro motion passes, and shuffled motion fails, without processing every frame"""
+    rng = np.random.default_rng(0)
+    shifts = rng.integers(1, 9, 40)
+    texture = cv2.GaussianBlur(rng.integers(0, 255, (480, 650 + int(shifts.sum())), dtype=np.uint8), (5, 5), 0)
+    offsets = np.concatenate([[0], np.cumsum(shifts)])
+    frames = [cv2.cvtColor(texture[:, x:x + 640].copy(), cv2.COLOR_GRAY2BGR) for x in offsets]
+    frame_ts = [1.76e9 + i / 30 for i in range(41)]
+    motion_ts = [(frame_ts[i] + frame_ts[i + 1]) / 2 for i in range(40)]
+    zeros = [0.0] * 40
+    
+    def run(gyro):
+        motion = MotionData(motion_ts, zeros, zeros, zeros, [float(g) for g in gyro], zeros, zeros)
+        return get_motion_image_correlator().verify_liveness(frames, frame_ts, motion, face_box=(0, 0, 1, 1))
+    
+    live = run(shifts)
+    assert live.is_live and live.samples < 40
+    assert live.confidence_interval[0] >= 0.7
+    
+    spoof = run(rng.permutation(shifts))
+    assert not spoof.is_live and spoof.samples < 40
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
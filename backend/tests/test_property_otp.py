@@ -466,3 +466,117 @@ class TestOTPEdgeCases:
         # Verify OTP is gone
         result = await service.verify_otp(session_id, student_id, otp)
         assert not result.valid, "OTP should be invalid after invalidation"
+
+
+class CountingCache(InMemoryCache):
+    """InMemoryCache that counts writes."""
+    
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+    
+    async def set(self, key, value, ttl_seconds):
+        self.writes += 1
+        await super().set(key, value, ttl_seconds)
+    
+    async def add(self, key, value, ttl_seconds):
+        self.writes += 1
+        return await super().add(key, value, ttl_seconds)
+
+
+class TestDerivedOTPProperty:
+    """
+    Property tests for derived (HMAC) OTP mode.
+    
+    **Feature: isavs, Property 10: OTP generation uniqueness per student**
+    **Feature: isavs, Property 11: OTP TTL enforcement**
+    """
+    
+    @pytest.mark.asyncio
+    @given(student_ids=student_id_list_strategy(), session_id=session_id_strategy())
+    @settings(max_examples=30, deadline=5000)
+    async def test_session_start_is_one_write(self, student_ids, session_id):
+        """
+        Session start SHALL write a single cache entry regardless of class size,
+        and every generated code SHALL verify.
+        """
+        cache = CountingCache()
+        service = OTPService(cache, mode="derived")
+        
+        otps = await service.generate_class_otps(session_id, student_ids)
+        
+        assert cache.writes == 1
+        for student_id, otp in otps.items():
+            assert len(otp) == 4 and otp.isdigit()
+            assert (await service.verify_otp(session_id, student_id, otp)).valid
+    
+    @pytest.mark.asyncio
+    async def test_codes_survive_worker_restart(self):
+        """A fresh service instance (new worker) SHALL derive the same codes from the shared cache."""
+        cache = InMemoryCache()
+        first = OTPService(cache, mode="derived")
+        otps = await first.generate_class_otps("session_1", ["STU10001", "STU10002"])
+        
+        restarted = OTPService(cache, mode="derived")
+        
+        for student_id, otp in otps.items():
+            assert (await restarted.verify_otp("session_1", student_id, otp)).valid
+            assert (await restarted.get_or_create_otp("session_1", student_id))[0] == otp
+    
+    @pytest.mark.asyncio
+    async def test_previous_window_accepted_then_expires(self, monkeypatch):
+        """A code SHALL verify in its own and the next window, and fail after that."""
+        import app.services.otp_service as otp_module
+        
+        now = [1_000_020.0]
+        monkeypatch.setattr(otp_module.time, "time", lambda: now[0])
+        service = OTPService(InMemoryCache(), mode="derived")
+        otp = (await service.generate_class_otps("session_1", ["STU10001"]))["STU10001"]
+        
+        now[0] += service.OTP_TTL_SECONDS
+        assert (await service.verify_otp("session_1", "STU10001", otp)).valid
+        
+        now[0] += service.OTP_TTL_SECONDS
+        current, _ = await service.get_or_create_otp("session_1", "STU10001")
+        assert (await service.verify_otp("session_1", "STU10001", otp)).valid == (otp == current)
+    
+    @pytest.mark.asyncio
+    async def test_resend_and_invalidate_change_the_code(self):
+        """Resend and invalidation SHALL bump the nonce so the old code stops working."""
+        service = OTPService(InMemoryCache(), mode="derived")
+        old = (await service.generate_class_otps("session_1", ["STU10001"]))["STU10001"]
+        
+        success, _, remaining, _ = await service.resend_otp("session_1", "STU10001")
+        new, _ = await service.get_or_create_otp("session_1", "STU10001")
+        
+        assert success and remaining == service.MAX_RESEND_ATTEMPTS - 1
+        assert (await service.verify_otp("session_1", "STU10001", new)).valid
+        if new != old:
+            assert not (await service.verify_otp("session_1", "STU10001", old)).valid
+        
+        await service.invalidate_otp("session_1", "STU10001")
+        after, _ = await service.get_or_create_otp("session_1", "STU10001")
+        if after != new:
+            assert not (await service.verify_otp("session_1", "STU10001", new)).valid
+    
+    @pytest.mark.asyncio
+    async def test_unknown_session_is_expired(self):
+        """Verification against a session with no secret SHALL report expired."""
+        service = OTPService(InMemoryCache(), mode="derived")
+        
+        result = await service.verify_otp("missing", "STU10001", "1234")
+        
+        assert not result.valid and result.expired
+        assert await service.get_or_create_otp("missing", "STU10001") == (None, 0)
+        assert await service.cache.get(service._get_secret_key("missing")) is None
+    
+    @pytest.mark.asyncio
+    async def test_racing_workers_share_one_secret(self):
+        """Workers creating the same session's secret SHALL all end up with the stored one."""
+        cache = InMemoryCache()
+        workers = [OTPService(cache, mode="derived") for _ in range(5)]
+        
+        created = await asyncio.gather(*(w.create_session_secret("session_1") for w in workers))
+        
+        assert len(set(created)) == 1
+        assert bytes.fromhex(await cache.get(workers[0]._get_secret_key("session_1"))) == created[0]
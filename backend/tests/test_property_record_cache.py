@@ -0,0 +1,165 @@
+"""
+Property-Based Tests for the Read-Through Record Cache
+Tests that /verify lookups are served from memory after the first read
+and that write-path invalidation forces a fresh read.
+"""
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.db.record_cache import RecordCache
+
+
+class FakeQuery:
+    """Minimal stand-in for the Supabase query builder."""
+    
+    def __init__(self, table):
+        self.table = table
+        self.filters = {}
+    
+    def select(self, columns):
+        self.table.selects.append(columns)
+        return self
+    
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+    
+    def limit(self, n):
+        return self
+    
+    def execute(self):
+        self.table.executions += 1
+        rows = [
+            row for row in self.table.rows
+            if all(row.get(k) == v for k, v in self.filters.items())
+        ]
+        return type("Result", (), {"data": rows})()
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.selects = []
+        self.executions = 0
+
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = {name: FakeTable(rows) for name, rows in tables.items()}
+    
+    def table(self, name):
+        return FakeQuery(self.tables[name])
+
+
+def make_cache(students=None, sessions=None):
+    supabase = FakeSupabase({
+        'students': students or [],
+        'attendance_sessions': sessions or []
+    })
+    return RecordCache(supabase=supabase, student_ttl_seconds=60, session_ttl_seconds=60), supabase
+
+
+def student_row(card="STU10001", embedding=None, status="approved"):
+    return {
+        'id': 1,
+        'name': "Test Student",
+        'student_id_card_number': card,
+        'approval_status': status,
+        'rejection_reason': None,
+        'facial_embedding': embedding if embedding is not None else [0.1] * 128
+    }
+
+
+@given(embedding=st.lists(
+    st.floats(min_value=-1.0, max_value=1.0, allow_nan=False, allow_infinity=False),
+    min_size=128, max_size=128
+))
+@settings(max_examples=50)
+def test_projected_embedding_is_float32(embedding):
+    """
+    Property: For any stored embedding, the cached projection SHALL hold a
+    float32 array of the same length and (float32-rounded) values.
+    """
+    cache, _ = make_cache(students=[student_row(embedding=embedding)])
+    
+    student = cache.get_student("STU10001")
+    
+    assert student['embedding'].dtype == np.float32
+    assert len(student['embedding']) == 128
+    np.testing.assert_allclose(student['embedding'], np.array(embedding, dtype=np.float32))
+
+
+def test_student_lookup_is_served_from_cache():
+    """Second lookup of the same student SHALL NOT hit the database."""
+    cache, supabase = make_cache(students=[student_row()])
+    
+    first = cache.get_student("STU10001")
+    second = cache.get_student("STU10001")
+    
+    assert first is second
+    assert supabase.tables['students'].executions == 1
+
+
+def test_student_lookup_never_selects_star():
+    """The hot path SHALL use an explicit column projection."""
+    cache, supabase = make_cache(students=[student_row()])
+    
+    cache.get_student("STU10001")
+    
+    assert all(columns != '*' for columns in supabase.tables['students'].selects)
+    assert 'face_image_base64' not in supabase.tables['students'].selects[0]
+
+
+def test_missing_student_is_not_cached():
+    """A miss SHALL NOT be cached, so a later enrollment is visible immediately."""
+    cache, supabase = make_cache()
+    
+    assert cache.get_student("STU10001") is None
+    supabase.tables['students'].rows.append(student_row())
+    
+    assert cache.get_student("STU10001") is not None
+
+
+def test_invalidate_by_database_id_forces_reload():
+    """Approve/reject/delete invalidate by database id; the next read SHALL refetch."""
+    cache, supabase = make_cache(students=[student_row(status="pending")])
+    
+    assert cache.get_student("STU10001")['approval_status'] == "pending"
+    
+    supabase.tables['students'].rows[0]['approval_status'] = "approved"
+    cache.invalidate_student(student_id=1)
+    
+    assert cache.get_student("STU10001")['approval_status'] == "approved"
+    assert supabase.tables['students'].executions == 2
+
+
+def test_invalidate_by_card_number_forces_reload():
+    """Enrollment invalidates by ID card number; the next read SHALL refetch."""
+    cache, supabase = make_cache(students=[student_row()])
+    
+    cache.get_student("STU10001")
+    cache.invalidate_student(card_number="STU10001")
+    cache.get_student("STU10001")
+    
+    assert supabase.tables['students'].executions == 2
+
+
+def test_expired_entry_is_refetched():
+    """Entries past their TTL SHALL be refetched."""
+    cache, supabase = make_cache(students=[student_row()])
+    cache.student_ttl_seconds = -1
+    
+    cache.get_student("STU10001")
+    cache.get_student("STU10001")
+    
+    assert supabase.tables['students'].executions == 2
+
+
+def test_primed_session_needs_no_database_read():
+    """A session primed at start SHALL be returned without a query."""
+    cache, supabase = make_cache()
+    
+    cache.put_session({'id': 7, 'session_id': "abc", 'class_id': 1, 'status': 'active', 'expires_at': None})
+    
+    assert cache.get_session("abc")['id'] == 7
+    assert supabase.tables['attendance_sessions'].executions == 0
@@ -186,5 +186,23 @@ def test_rssi_empty_uuid():
     assert result.passed, "Empty UUIDs should match"
 
 
+
+def test_classroom_sensors_use_configured_beacon(monkeypatch):
+    """/verify's cheap stage checks BLE against CLASSROOM_BEACON_UUID and skips unset references"""
+    from app.core.config import settings
+    service = get_sensor_validation_service()
+    monkeypatch.setattr(settings, "CLASSROOM_BEACON_UUID", "room-101")
+    monkeypatch.setattr(settings, "CLASSROOM_PRESSURE_HPA", None)
+    
+    near = service.validate_classroom_sensors(ble_rssi=-50.0, ble_beacon_uuid="room-101", student_pressure=1000.0)
+    assert near.ble_result.passed and near.barometer_result is None
+    assert near.failed_sensors == []
+    
+    other_room = service.validate_classroom_sensors(ble_rssi=-50.0, ble_beacon_uuid="room-102")
+    assert other_room.failed_sensors == ["BLE"]
+    
+    # No reading from the device: nothing checked, nothing failed
+    assert service.validate_classroom_sensors().failed_sensors == []
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
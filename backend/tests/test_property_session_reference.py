@@ -0,0 +1,156 @@
+"""
+Property-Based Tests for the Per-Session Reference Registry
+Tests that a session's teacher location, beacon and pressure survive the
+shared cache, are served from the worker's local copy afterwards, and fall
+back to the CLASSROOM_* settings.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from hypothesis import given, strategies as st, settings
+
+from app.db.cache import InMemoryCache
+from app.services.sensor_validation_service import get_sensor_validation_service
+from app.services.session_reference import SessionReference, SessionReferenceRegistry
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class CountingCache(InMemoryCache):
+    """In-memory cache that counts reads."""
+    
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+    
+    async def get_with_ttl(self, key):
+        self.reads += 1
+        return await super().get_with_ttl(key)
+
+
+references = st.builds(
+    SessionReference,
+    session_id=st.uuids().map(str),
+    latitude=st.one_of(st.none(), st.floats(min_value=-90, max_value=90)),
+    longitude=st.one_of(st.none(), st.floats(min_value=-180, max_value=180)),
+    gps_accuracy=st.one_of(st.none(), st.floats(min_value=0, max_value=200)),
+    beacon_uuid=st.one_of(st.none(), st.uuids().map(str)),
+    pressure_hpa=st.one_of(st.none(), st.floats(min_value=900, max_value=1100))
+)
+
+
+@given(reference=references, lookups=st.integers(min_value=1, max_value=10))
+@settings(max_examples=100)
+def test_reference_is_shared_then_served_locally(reference, lookups):
+    """
+    Property: For any reference, another worker SHALL read back an equal
+    reference from the shared cache once, then answer every later lookup
+    from its local copy.
+    """
+    cache = CountingCache()
+    run_sync(SessionReferenceRegistry(cache=cache).register(reference))
+    worker = SessionReferenceRegistry(cache=cache)
+    
+    found = [run_sync(worker.get(reference.session_id)) for _ in range(lookups)]
+    
+    assert all(item == reference for item in found)
+    assert cache.reads == 1
+    assert worker.get_stats() == {"sessions": 1, "hits": lookups - 1, "misses": 1}
+
+
+@given(
+    latitude=st.one_of(st.none(), st.floats(min_value=-90, max_value=90)),
+    longitude=st.one_of(st.none(), st.floats(min_value=-180, max_value=180)),
+    accuracy=st.floats(min_value=0, max_value=200),
+    radius=st.floats(min_value=1, max_value=500)
+)
+@settings(max_examples=100)
+def test_readings_fall_back_to_settings(latitude, longitude, accuracy, radius):
+    """
+    Property: A location SHALL only come from the teacher when both
+    coordinates are given; otherwise the classroom settings (and no accuracy
+    widening) apply. Widening SHALL never exceed the configured margin.
+    """
+    from app.core.config import settings as app_settings
+    with patch.object(app_settings, "CLASSROOM_LATITUDE", 12.5), \
+            patch.object(app_settings, "CLASSROOM_LONGITUDE", 77.5), \
+            patch.object(app_settings, "CLASSROOM_BEACON_UUID", "room-101"):
+        reference = SessionReference.from_readings(
+            "s1", latitude=latitude, longitude=longitude, gps_accuracy=accuracy
+        )
+    
+    if latitude is not None and longitude is not None:
+        assert (reference.latitude, reference.longitude) == (latitude, longitude)
+        margin = min(accuracy, app_settings.GEOFENCE_MAX_ACCURACY_MARGIN_METERS)
+        assert reference.geofence_radius(radius) == pytest.approx(radius + margin)
+    else:
+        assert (reference.latitude, reference.longitude) == (12.5, 77.5)
+        assert reference.geofence_radius(radius) == radius
+    assert reference.beacon_uuid == "room-101"
+
+
+def test_unregistered_session_resolves_to_settings(monkeypatch):
+    from app.core.config import settings as app_settings
+    monkeypatch.setattr(app_settings, "CLASSROOM_LATITUDE", None)
+    monkeypatch.setattr(app_settings, "CLASSROOM_LONGITUDE", None)
+    registry = SessionReferenceRegistry(cache=InMemoryCache())
+    
+    assert run_sync(registry.get("missing")) is None
+    reference = run_sync(registry.resolve("missing"))
+    assert reference.session_id == "missing" and not reference.has_location
+
+
+def test_removed_reference_is_gone_everywhere(monkeypatch):
+    """Removal SHALL take effect at once locally and once other workers' copies lapse."""
+    from app.services import session_reference as session_reference_module
+    now = [1000.0]
+    monkeypatch.setattr(session_reference_module.time, "monotonic", lambda: now[0])
+    cache = InMemoryCache()
+    registry = SessionReferenceRegistry(cache=cache)
+    other_worker = SessionReferenceRegistry(cache=cache, local_ttl_seconds=120)
+    run_sync(registry.register(SessionReference("s1", latitude=1.0, longitude=2.0)))
+    assert run_sync(other_worker.get("s1")) is not None
+    
+    run_sync(registry.remove("s1"))
+    
+    assert run_sync(registry.get("s1")) is None
+    assert run_sync(SessionReferenceRegistry(cache=cache).get("s1")) is None
+    now[0] += 121
+    assert run_sync(other_worker.get("s1")) is None
+
+
+def test_teacher_accuracy_is_bounded():
+    """Implausible accuracies SHALL be rejected, and stored ones SHALL widen by at most the cap."""
+    from pydantic import ValidationError
+    from app.core.config import settings as app_settings
+    from app.models.schemas import SessionReferenceRequest
+    
+    with pytest.raises(ValidationError):
+        SessionReferenceRequest(latitude=1.0, longitude=2.0, gps_accuracy=5000)
+    reference = SessionReference("s1", latitude=1.0, longitude=2.0, gps_accuracy=10_000)
+    assert reference.geofence_radius(50) == 50 + app_settings.GEOFENCE_MAX_ACCURACY_MARGIN_METERS
+
+
+def test_classroom_sensors_prefer_session_reference(monkeypatch):
+    """BLE and barometer SHALL be checked against the session's beacon and pressure, not the settings."""
+    from app.core.config import settings as app_settings
+    monkeypatch.setattr(app_settings, "CLASSROOM_BEACON_UUID", "room-101")
+    monkeypatch.setattr(app_settings, "CLASSROOM_PRESSURE_HPA", None)
+    service = get_sensor_validation_service()
+    reference = SessionReference("s1", beacon_uuid="room-202", pressure_hpa=1000.0)
+    
+    result = service.validate_classroom_sensors(
+        ble_rssi=-50.0, ble_beacon_uuid="room-202", student_pressure=1000.0, reference=reference
+    )
+    
+    assert result.ble_result.passed and result.barometer_result.passed
+    moved = service.validate_classroom_sensors(ble_rssi=-50.0, ble_beacon_uuid="room-101", reference=reference)
+    assert moved.failed_sensors == ["BLE"]
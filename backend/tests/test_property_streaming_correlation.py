@@ -0,0 +1,103 @@
+"""
+Property-Based Tests for Streaming Motion Correlation
+Tests that the online correlator agrees with scipy's batch Pearson r,
+that its confidence interval behaves, and that it decides early only when
+the evidence is clear.
+"""
+import pytest
+import numpy as np
+from hypothesis import given, strategies as st, settings
+from scipy.stats import pearsonr
+
+from app.services.motion_image_correlator import StreamingCorrelation
+
+
+values = st.floats(min_value=-1e3, max_value=1e3, allow_nan=False)
+
+
+@given(
+    pairs=st.lists(st.tuples(values, values), min_size=3, max_size=80),
+    split=st.integers(min_value=0, max_value=80),
+    offset=st.floats(min_value=-1e6, max_value=1e6)
+)
+@settings(max_examples=200, deadline=None)
+def test_streaming_matches_batch_pearson(pairs, split, offset):
+    """
+    Property: For any pairs (shifted by any offset) fed one at a time, in a
+    batch, or both, r and p SHALL match scipy.stats.pearsonr.
+    """
+    xs = np.array([p[0] for p in pairs]) + offset
+    ys = np.array([p[1] for p in pairs])
+    if np.ptp(xs) < 1e-6 * max(1.0, abs(offset)) or np.ptp(ys) < 1e-6:
+        return  # (near-)constant series: r undefined
+    
+    stream = StreamingCorrelation()
+    split = min(split, len(pairs))
+    for x, y in zip(xs[:split], ys[:split]):
+        stream.update(float(x), float(y))
+    stream.update_many(xs[split:], ys[split:])
+    
+    expected_r, expected_p = pearsonr(xs, ys)
+    assert stream.n == len(pairs)
+    assert stream.r == pytest.approx(expected_r, abs=1e-6)
+    assert stream.p_value() == pytest.approx(expected_p, abs=1e-5)
+
+
+@given(
+    n=st.integers(min_value=4, max_value=500),
+    noise=st.floats(min_value=0.01, max_value=2.0)
+)
+@settings(max_examples=50, deadline=None)
+def test_interval_contains_estimate_and_narrows(n, noise):
+    """Property: the interval SHALL contain r and shrink (on the Fisher z scale) as pairs are added."""
+    rng = np.random.default_rng(n)
+    signal = rng.normal(size=2 * n)
+    stream = StreamingCorrelation()
+    stream.update_many(signal[:n], signal[:n] + rng.normal(0, noise, n))
+    low, high = stream.confidence_interval()
+    
+    assert -1.0 <= low <= stream.r <= high <= 1.0
+    stream.update_many(signal[n:], signal[n:] + rng.normal(0, noise, n))
+    low2, high2 = stream.confidence_interval()
+    # Width in r shrinks or grows with |r|; the z-scale width is 2·z/√(n-3)
+    assert np.arctanh(high2) - np.arctanh(low2) < np.arctanh(high) - np.arctanh(low)
+
+
+def test_decides_early_on_clear_evidence():
+    """A strongly correlated stream SHALL pass, and an uncorrelated one fail, well before 200 pairs."""
+    rng = np.random.default_rng(0)
+    signal = rng.normal(size=200)
+    
+    live, spoof = StreamingCorrelation(min_samples=10), StreamingCorrelation(min_samples=10)
+    live_at = spoof_at = None
+    for i in range(200):
+        live.update(signal[i], signal[i] + rng.normal(0, 0.05))
+        spoof.update(signal[i], rng.normal())
+        if live_at is None and live.decision(0.7) is not None:
+            live_at = (i + 1, live.decision(0.7))
+        if spoof_at is None and spoof.decision(0.7) is not None:
+            spoof_at = (i + 1, spoof.decision(0.7))
+    
+    assert live_at is not None and live_at[1] is True and live_at[0] < 30
+    assert spoof_at is not None and spoof_at[1] is False and spoof_at[0] < 60
+
+
+def test_no_decision_before_min_samples_or_on_borderline():
+    """Fewer than min_samples pairs, or r near the threshold, SHALL stay undecided."""
+    stream = StreamingCorrelation(min_samples=10)
+    for i in range(9):
+        stream.update(float(i), float(i))
+    assert stream.decision(0.7) is None
+    
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=12)
+    borderline = StreamingCorrelation(min_samples=10)
+    borderline.update_many(x, 0.7 * x + np.sqrt(1 - 0.7 ** 2) * rng.normal(size=12))
+    assert borderline.decision(0.7) is None
+
+
+def test_constant_series_has_zero_correlation():
+    """No variance (e.g. a static photo: zero flow) SHALL give r = 0, never NaN."""
+    stream = StreamingCorrelation()
+    stream.update_many(np.zeros(20), np.arange(20.0))
+    assert stream.r == 0.0 and stream.p_value() == 1.0
@@ -0,0 +1,191 @@
+"""
+Property-Based Tests for the Three-Strike Policy
+Tests that strike counts and locks kept in the cache are race-free, and that
+audit writes are queued rather than done inline.
+"""
+import pytest
+import asyncio
+from hypothesis import given, strategies as st, settings
+
+from app.db.cache import InMemoryCache
+from app.services.anomaly_service import AnomalyService
+
+
+class RecordingAnomalyService(AnomalyService):
+    """Captures background audit writes instead of touching a database."""
+    
+    def __init__(self, cache):
+        super().__init__(cache=cache)
+        self.writes = []
+    
+    async def _write_verification_session(self, session_key, student_id, fields):
+        await asyncio.sleep(0)
+        self.writes.append((session_key, student_id, dict(fields)))
+    
+    async def _read_persisted_lock(self, session_key):
+        return self.persisted(session_key).get("locked", False)
+    
+    def persisted(self, session_key):
+        """Audit row as the writes so far would have left it."""
+        row = {}
+        for key, _, fields in self.writes:
+            if key == session_key:
+                row.update(fields)
+        return row
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+    
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class FakeDB:
+    """Answers the one-time persisted-lock lookup."""
+    
+    def __init__(self, locked):
+        self.locked = locked
+        self.queries = 0
+    
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeResult(self.locked)
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@given(
+    prior_failures=st.integers(min_value=0, max_value=5),
+    concurrent=st.integers(min_value=1, max_value=20)
+)
+@settings(max_examples=50, deadline=None)
+def test_racing_attempts_never_exceed_limit(prior_failures, concurrent):
+    """
+    Property: For any number of prior failures and concurrent requests, the
+    total number of attempts allowed SHALL NOT exceed MAX_CONSECUTIVE_FAILURES.
+    """
+    async def run():
+        service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+        for _ in range(prior_failures):
+            await service.begin_attempt(None, "s:1", 1)
+        results = await asyncio.gather(*(
+            service.begin_attempt(None, "s:1", 1) for _ in range(concurrent)
+        ))
+        return sum(1 for allowed, _ in results if allowed)
+    
+    allowed = run_sync(run())
+    
+    assert allowed == max(0, min(concurrent, AnomalyService.MAX_CONSECUTIVE_FAILURES - prior_failures))
+
+
+@pytest.mark.asyncio
+async def test_third_failure_locks_session():
+    """Three failed attempts SHALL lock; further attempts SHALL be refused."""
+    service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+    
+    for expected in range(1, 4):
+        allowed, attempt = await service.begin_attempt(None, "s:1", 1)
+        assert allowed and attempt == expected
+    await service.lock_session(None, "s:1", 1, None)
+    
+    assert await service.is_session_locked(None, "s:1")
+    assert await service.begin_attempt(None, "s:1", 1) == (False, 0)
+
+
+@pytest.mark.asyncio
+async def test_success_resets_strikes():
+    """A successful verification SHALL clear the strike count."""
+    service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+    
+    await service.begin_attempt(None, "s:1", 1)
+    await service.begin_attempt(None, "s:1", 1)
+    await service.reset_failure_count(None, "s:1")
+    
+    assert await service.check_strike_count(None, "s:1") == 0
+    assert await service.begin_attempt(None, "s:1", 1) == (True, 1)
+
+
+@pytest.mark.asyncio
+async def test_released_attempt_is_not_a_strike():
+    """An attempt that errored out SHALL hand its reservation back."""
+    service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+    
+    await service.begin_attempt(None, "s:1", 1)
+    await service.begin_attempt(None, "s:1", 1)
+    await service.release_attempt("s:1")
+    assert await service.check_strike_count(None, "s:1") == 1
+    
+    await service.release_attempt("s:1")
+    await service.release_attempt("s:1")  # count already gone
+    assert await service.check_strike_count(None, "s:1") == 0
+    assert await service.begin_attempt(None, "s:1", 1) == (True, 1)
+
+
+@pytest.mark.asyncio
+async def test_clear_strike_state_unlocks():
+    """Faculty unlock SHALL remove the lock flag and the count."""
+    service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+    await service.lock_session(None, "s:1", 1, None)
+    
+    assert await service.clear_strike_state("s:1") is True
+    assert not await service.is_session_locked(None, "s:1")
+    assert await service.clear_strike_state("s:1") is False
+
+
+@pytest.mark.asyncio
+async def test_persisted_lock_read_once():
+    """A lock in the audit table SHALL be honoured on the first attempt only, then served from cache."""
+    service = AnomalyService(cache=InMemoryCache(max_entries=100), persist=False)
+    db = FakeDB(locked=True)
+    
+    assert await service.begin_attempt(db, "s:1", 1) == (False, 0)
+    assert await service.begin_attempt(db, "s:1", 1) == (False, 0)
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_audit_writes_are_merged_in_order():
+    """Queued audit writes for one key SHALL be merged and end in the latest state."""
+    service = RecordingAnomalyService(InMemoryCache(max_entries=100))
+    
+    for attempt in range(1, 4):
+        await service.record_failure("s:1", 1, attempt)
+    await service.lock_session(None, "s:1", 1, None)
+    await service.flush_pending()
+    
+    final = {}
+    for key, student_id, fields in service.writes:
+        assert key == "s:1" and student_id == 1
+        final.update(fields)
+    assert final["failure_count"] == 3
+    assert final["locked"] is True
+    assert len(service.writes) < 4
+
+
+@pytest.mark.asyncio
+async def test_unlock_right_after_lock_stays_unlocked():
+    """An unlock racing a queued lock write SHALL win, so the session isn't re-locked later."""
+    service = RecordingAnomalyService(InMemoryCache(max_entries=100))
+    for _ in range(3):
+        _, attempt = await service.begin_attempt(None, "s:1", 1)
+        await service.record_failure("s:1", 1, attempt)
+    await service.lock_session(None, "s:1", 1, None)
+    
+    assert await service.unlock_session(None, "s:1", faculty_id=7) is True
+    await service.flush_pending()
+    
+    row = service.persisted("s:1")
+    assert row["locked"] is False and row["failure_count"] == 0 and row["unlocked_by"] == 7
+    # Strike key gone (e.g. expired): the first attempt consults the audit row
+    await service.clear_strike_state("s:1")
+    assert await service.begin_attempt(FakeDB(locked=row["locked"]), "s:1", 1) == (True, 1)
+    assert await service.unlock_session(None, "s:1", faculty_id=7) is False
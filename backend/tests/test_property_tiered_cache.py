@@ -0,0 +1,238 @@
+"""
+Property-Based Tests for the Two-Tier Cache
+Tests that workers sharing one Redis see each other's writes through their
+in-process L1, that L1 never outlives the Redis expiry, and that hot reads
+stay off Redis.
+"""
+import pytest
+import asyncio
+from hypothesis import given, strategies as st, settings
+
+from app.db.cache import InMemoryCache, TieredCache
+
+
+class FakePubSub:
+    def __init__(self, bus):
+        self.bus = bus
+        self.queue = asyncio.Queue()
+    
+    async def subscribe(self, channel):
+        self.bus.subscribers.append(self)
+    
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+    
+    async def reset(self):
+        if self in self.bus.subscribers:
+            self.bus.subscribers.remove(self)
+
+
+class FakeBus:
+    """Stands in for the Redis client's pub/sub side."""
+    
+    def __init__(self):
+        self.subscribers = []
+    
+    def pubsub(self):
+        return FakePubSub(self)
+    
+    async def publish(self, channel, data):
+        for subscriber in self.subscribers:
+            subscriber.queue.put_nowait({"type": "message", "data": data})
+        return len(self.subscribers)
+
+
+class FakeRedis(InMemoryCache):
+    """Shared L2: an in-memory cache that counts reads and exposes the fake bus."""
+    
+    def __init__(self, bus, **kwargs):
+        super().__init__(max_entries=1000, **kwargs)
+        self.bus = bus
+        self.reads = 0
+    
+    async def _get_redis(self):
+        return self.bus
+    
+    async def get_with_ttl(self, key):
+        self.reads += 1
+        return await super().get_with_ttl(key)
+    
+    async def mget(self, keys):
+        self.reads += 1
+        return await super().mget(keys)
+    
+    async def close(self):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+async def drain():
+    """Let listener tasks deliver queued invalidations."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def make_workers(count=2, clock=None, l1_ttl_seconds=5.0):
+    bus = FakeBus()
+    kwargs = {"clock": clock} if clock else {}
+    l2 = FakeRedis(bus, **kwargs)
+    workers = [
+        TieredCache(l2, l1=InMemoryCache(max_entries=100, **kwargs), l1_ttl_seconds=l1_ttl_seconds, **kwargs)
+        for _ in range(count)
+    ]
+    for worker in workers:
+        worker.start_invalidation_listener()
+    await drain()
+    return l2, workers
+
+
+async def stop(workers):
+    for worker in workers:
+        await worker.stop_invalidation_listener()
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+keys = st.sampled_from(["otp:s:1", "otp:s:2", "account_locked:1"])
+operations = st.lists(
+    st.tuples(
+        st.integers(min_value=0, max_value=1),
+        st.sampled_from(["set", "delete", "incr", "get", "ttl"]),
+        keys,
+        st.integers(min_value=0, max_value=9999)
+    ),
+    min_size=1,
+    max_size=30
+)
+
+
+@given(ops=operations)
+@settings(max_examples=50, deadline=None)
+def test_workers_agree_with_redis_after_invalidation(ops):
+    """
+    Property: For any interleaving of writes and reads on two workers, once
+    invalidations are delivered every worker SHALL read what Redis holds.
+    """
+    async def run():
+        l2, workers = await make_workers()
+        try:
+            for worker_index, op, key, value in ops:
+                worker = workers[worker_index]
+                if op == "set":
+                    await worker.set(key, str(value), 60)
+                elif op == "delete":
+                    await worker.delete(key)
+                elif op == "incr":
+                    if not isinstance(await l2.get(key), str):
+                        await worker.incr_with_ttl(key, 1, 60)
+                elif op == "get":
+                    await worker.get(key)
+                else:
+                    await worker.ttl(key)
+                await drain()
+                
+                for k in ["otp:s:1", "otp:s:2", "account_locked:1"]:
+                    expected = await l2.get(k)
+                    for w in workers:
+                        assert await w.get(k) == expected
+        finally:
+            await stop(workers)
+    
+    run_sync(run())
+
+
+@pytest.mark.asyncio
+async def test_hot_reads_stay_in_l1():
+    """Repeated reads of a key SHALL hit Redis once."""
+    l2, (worker,) = await make_workers(count=1)
+    await l2.set("otp:s:1", "0123", 60)
+    
+    for _ in range(10):
+        assert await worker.get("otp:s:1") == "0123"
+    
+    assert l2.reads == 1
+    stats = worker.get_stats()
+    assert stats["l1_hits"] == 9 and stats["l2_hits"] == 1
+    await stop([worker])
+
+
+@pytest.mark.asyncio
+async def test_absent_lock_is_cached_until_another_worker_locks():
+    """A missing lock SHALL be cached, and a lock set elsewhere SHALL be seen after invalidation."""
+    l2, (a, b) = await make_workers()
+    
+    assert await a.ttl("account_locked:1") == -2
+    assert await a.ttl("account_locked:1") == -2
+    assert l2.reads == 1
+    
+    await b.set("account_locked:1", "locked", 3600)
+    await drain()
+    
+    assert await a.ttl("account_locked:1") > 0
+    await stop([a, b])
+
+
+@pytest.mark.asyncio
+async def test_l1_never_outlives_redis_expiry():
+    """An L1 copy SHALL expire no later than the Redis key."""
+    clock = FakeClock()
+    l2, (worker,) = await make_workers(count=1, clock=clock, l1_ttl_seconds=30)
+    await l2.set("otp:s:1", "0123", 5)
+    
+    assert await worker.get("otp:s:1") == "0123"
+    clock.now += 6
+    
+    assert await worker.get("otp:s:1") is None
+    await stop([worker])
+
+
+@pytest.mark.asyncio
+async def test_l1_bypassed_without_subscription():
+    """Without a live invalidation subscription every read SHALL go to Redis."""
+    bus = FakeBus()
+    l2 = FakeRedis(bus)
+    worker = TieredCache(l2, l1=InMemoryCache(max_entries=100), l1_ttl_seconds=5)
+    await l2.set("k", "v", 60)
+    
+    await worker.get("k")
+    await worker.get("k")
+    
+    assert l2.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_read_racing_an_invalidation_is_not_cached():
+    """An L2 read that overlaps an invalidation SHALL NOT fill L1 with the old value."""
+    l2, (a, b) = await make_workers()
+    await l2.set("k", "old", 60)
+    
+    original = l2.get_with_ttl
+    
+    async def slow_read(key):
+        result = await original(key)
+        # Another worker writes while this read is in flight
+        await b.set("k", "new", 60)
+        await drain()
+        return result
+    
+    l2.get_with_ttl = slow_read
+    assert await a.get("k") == "old"
+    l2.get_with_ttl = original
+    
+    assert await a.get("k") == "new"
+    await stop([a, b])
@@ -0,0 +1,101 @@
+"""
+Property-Based Tests for Vector Search Engines
+Tests that the FAISS and pgvector engines agree on the shared interface.
+"""
+import numpy as np
+from hypothesis import given, strategies as st, settings
+
+from app.services.vector_search import VectorSearchEngine, PgVectorSearchEngine
+
+
+class FakeRpc:
+    """Evaluates match_student_embeddings in numpy, like the SQL function."""
+    
+    def __init__(self, rows, params):
+        self.rows = rows
+        self.params = params
+    
+    def execute(self):
+        query = np.array(self.params['query_embedding'].strip('[]').split(','), dtype=np.float64)
+        scored = []
+        for student_id, name, vector in self.rows:
+            cosine = float(np.dot(query, vector) / (np.linalg.norm(query) * np.linalg.norm(vector)))
+            scored.append({'id': student_id, 'name': name, 'similarity': cosine})
+        scored.sort(key=lambda r: r['similarity'], reverse=True)
+        return type("Result", (), {"data": scored[:self.params['match_count']]})()
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+    
+    def rpc(self, name, params):
+        self.calls.append(name)
+        return FakeRpc(self.rows, params)
+
+
+def unit_vectors(count, dimension=128, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimension))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_engines(vectors):
+    students = [(i + 1, f"Student {i + 1}", v) for i, v in enumerate(vectors)]
+    faiss_engine = VectorSearchEngine(128)
+    faiss_engine.rebuild_from_database(students)
+    pg_engine = PgVectorSearchEngine(128, supabase=FakeSupabase(students))
+    return faiss_engine, pg_engine
+
+
+@given(seed=st.integers(min_value=0, max_value=10_000), k=st.integers(min_value=1, max_value=5))
+@settings(max_examples=30, deadline=None)
+def test_engines_return_same_neighbours(seed, k):
+    """
+    Property: For any query, both engines SHALL return the same students in
+    the same order with the same [0, 1] similarity scale and cosine distance.
+    """
+    vectors = unit_vectors(20, seed=seed)
+    faiss_engine, pg_engine = build_engines(vectors)
+    query = unit_vectors(1, seed=seed + 1)[0]
+    
+    faiss_results = faiss_engine.search(query, k=k)
+    pg_results = pg_engine.search(query, k=k)
+    
+    assert [r.student_id for r in faiss_results] == [r.student_id for r in pg_results]
+    for a, b in zip(faiss_results, pg_results):
+        assert abs(a.similarity - b.similarity) < 1e-4
+        assert abs(a.distance - b.distance) < 1e-4
+        assert 0.0 <= b.similarity <= 1.0
+        assert abs(b.distance - 2 * (1 - b.similarity)) < 1e-9
+
+
+def test_pgvector_duplicate_check_is_one_query():
+    """check_duplicate SHALL be answered by a single RPC call."""
+    vectors = unit_vectors(10)
+    _, pg_engine = build_engines(vectors)
+    
+    is_duplicate, match = pg_engine.check_duplicate(vectors[3])
+    
+    assert is_duplicate
+    assert match.student_id == 4
+    assert pg_engine.supabase.calls == ['match_student_embeddings']
+
+
+def test_pgvector_no_match_below_threshold():
+    """find_best_match SHALL return None when nothing clears the threshold."""
+    vectors = unit_vectors(10)
+    _, pg_engine = build_engines(vectors)
+    
+    assert pg_engine.find_best_match(-vectors[0], threshold=0.99) is None
+
+
+def test_pgvector_rows_carry_their_vector():
+    """Only the pgvector engine SHALL add a column to inserted student rows."""
+    faiss_engine, pg_engine = build_engines(unit_vectors(2))
+    embedding = unit_vectors(1, seed=7)[0]
+    
+    assert faiss_engine.row_columns(embedding) == {}
+    vector = pg_engine.row_columns(embedding)['facial_embedding_vec']
+    np.testing.assert_allclose(np.array(vector.strip('[]').split(','), dtype=np.float64), embedding, atol=1e-6)
@@ -0,0 +1,229 @@
+"""
+Property-Based Tests for Dashboard WebSocket Fan-out
+Tests that broadcasts never wait on a slow client, that per-connection
+queues stay bounded under both slow consumer policies, and that order is
+preserved for healthy clients.
+"""
+import pytest
+import asyncio
+from hypothesis import given, strategies as st, settings
+
+from app.services.websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    """Records sent messages; a blocked socket never completes a send."""
+    
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = False
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, message):
+        await self.unblocked.wait()
+        self.sent.append(message)
+    
+    async def close(self, code=1000):
+        self.closed = True
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def run_sync(coro):
+    """Run a coroutine on a private loop, leaving the shared test loop in place."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@given(
+    queue_size=st.integers(min_value=1, max_value=20),
+    message_count=st.integers(min_value=1, max_value=60)
+)
+@settings(max_examples=50, deadline=None)
+def test_drop_oldest_keeps_newest_messages(queue_size, message_count):
+    """
+    Property: For any queue bound and burst size, a stalled client's queue
+    SHALL never exceed the bound and SHALL hold the newest messages, while a
+    healthy client receives every message in order.
+    """
+    async def run():
+        manager = ConnectionManager(queue_size=queue_size, slow_consumer_policy="drop_oldest")
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+        await settle()
+        
+        messages = [f"m{i}" for i in range(message_count)]
+        for message in messages:
+            await manager.broadcast(message)
+            await settle()
+        
+        stats = manager.get_stats()
+        slow.unblocked.set()
+        while manager.get_stats()["queued_messages"]:
+            await asyncio.sleep(0)
+        await settle()
+        for ws in (slow, fast):
+            manager.disconnect(ws)
+        await settle()
+        return messages, slow.sent, fast.sent, stats
+    
+    messages, slow_sent, fast_sent, stats = run_sync(run())
+    
+    assert fast_sent == messages
+    # The stalled sender holds one message in flight plus a full queue
+    assert stats["max_queue_depth"] <= queue_size
+    assert slow_sent == messages[:1] + messages[1:][-queue_size:]
+    assert stats["messages_dropped"] == max(0, message_count - 1 - queue_size)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_drops_slow_client():
+    """With the disconnect policy a client whose queue overflows SHALL be removed and closed."""
+    manager = ConnectionManager(queue_size=2, slow_consumer_policy="disconnect")
+    slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+    await manager.connect(slow)
+    await manager.connect(fast)
+    await settle()
+    
+    for i in range(5):
+        await manager.broadcast(f"m{i}")
+        await settle()
+    
+    assert manager.get_connection_count() == 1
+    assert slow.closed
+    assert fast.sent == [f"m{i}" for i in range(5)]
+    assert manager.get_stats()["slow_consumers_disconnected"] == 1
+    manager.disconnect(fast)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_does_not_wait_for_sockets():
+    """broadcast SHALL return without any socket completing a send."""
+    manager = ConnectionManager(queue_size=10)
+    sockets = [FakeWebSocket(blocked=True) for _ in range(50)]
+    for ws in sockets:
+        await manager.connect(ws)
+    
+    await asyncio.wait_for(manager.broadcast("hello"), timeout=0.1)
+    
+    assert manager.get_stats()["queued_messages"] + sum(len(ws.sent) for ws in sockets) <= 50
+    for ws in sockets:
+        manager.disconnect(ws)
+
+
+@pytest.mark.asyncio
+async def test_failed_send_removes_connection():
+    """A socket whose send raises SHALL be disconnected."""
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, message):
+            raise RuntimeError("connection reset")
+    
+    manager = ConnectionManager(queue_size=10)
+    broken = BrokenWebSocket()
+    await manager.connect(broken)
+    
+    await manager.broadcast("hello")
+    await settle()
+    
+    assert manager.get_connection_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_helpers_serialize_once():
+    """Every connection SHALL receive the identical serialized string."""
+    manager = ConnectionManager(queue_size=10)
+    a, b = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(a)
+    await manager.connect(b)
+    
+    await manager.broadcast_anomaly_alert(1, "Student", "proxy_attempt", "face mismatch")
+    await settle()
+    
+    assert a.sent and a.sent[0] is b.sent[0]
+    manager.disconnect(a)
+    manager.disconnect(b)
+
+
+@given(
+    subscriptions=st.lists(
+        st.sets(st.sampled_from(["class:1", "class:2", "session:a", "session:b", "anomalies"]), max_size=3),
+        min_size=1,
+        max_size=8
+    ),
+    event_topics=st.sets(st.sampled_from(["class:1", "class:2", "session:a", "session:b", "anomalies"]), min_size=1)
+)
+@settings(max_examples=50, deadline=None)
+def test_publish_reaches_exactly_the_subscribers(subscriptions, event_topics):
+    """
+    Property: For any subscriptions, a published event SHALL reach each
+    socket subscribed to at least one of its topics exactly once, every
+    never-subscribed socket, and no other socket.
+    """
+    async def run():
+        manager = ConnectionManager(queue_size=10)
+        sockets = []
+        for topics in subscriptions:
+            ws = FakeWebSocket()
+            await manager.connect(ws, sorted(topics))
+            sockets.append(ws)
+        
+        await manager.publish(sorted(event_topics), "event")
+        await settle()
+        for ws in sockets:
+            manager.disconnect(ws)
+        await settle()
+        return [ws.sent for ws in sockets]
+    
+    received = run_sync(run())
+    
+    for topics, sent in zip(subscriptions, received):
+        expected = 1 if (not topics or topics & event_topics) else 0
+        assert sent == ["event"] * expected
+
+
+@pytest.mark.asyncio
+async def test_subscribe_leaves_wildcard_and_unsubscribe_stops_delivery():
+    """Subscribing SHALL stop unrelated events; unsubscribing SHALL stop that topic."""
+    manager = ConnectionManager(queue_size=10)
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    
+    assert manager.subscribe(ws, ["session:a", "bogus"]) == ["session:a"]
+    await manager.publish(["session:b"], "other")
+    await manager.publish(["session:a"], "mine")
+    assert manager.unsubscribe(ws, ["session:a"]) == []
+    await manager.publish(["session:a"], "after")
+    await settle()
+    
+    assert ws.sent == ["mine"]
+    manager.disconnect(ws)
+    assert manager.get_stats()["topics"] == 0
+
+
+@pytest.mark.asyncio
+async def test_anomaly_alert_goes_to_anomaly_feed():
+    """Anomaly alerts SHALL reach the anomaly feed and the session's dashboards only."""
+    manager = ConnectionManager(queue_size=10)
+    feed, session_a, session_b = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(feed, ["anomalies"])
+    await manager.connect(session_a, ["session:a"])
+    await manager.connect(session_b, ["session:b"])
+    
+    await manager.broadcast_anomaly_alert(1, "Student", "proxy_attempt", "face mismatch", session_id="a")
+    await settle()
+    
+    assert len(feed.sent) == 1 and len(session_a.sent) == 1 and session_b.sent == []
+    for ws in (feed, session_a, session_b):
+        manager.disconnect(ws)
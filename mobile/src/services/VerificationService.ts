@@ -3,6 +3,7 @@
  * Handles sensor data collection and submission to backend
  */
 import {api} from './api';
+import {getMotionSensorManager} from './MotionSensorManager';
 import {
   SensorVerificationRequest,
   SensorVerificationResponse,
@@ -29,6 +30,8 @@ export class VerificationService {
     frameTimestamps: number[]
   ): Promise<SensorVerificationResponse> {
     try {
+      const motionPayload = this.encodeMotion(motionData);
+
       const request: SensorVerificationRequest = {
         student_id: studentId,
         session_id: sessionId,
@@ -40,11 +43,15 @@ export class VerificationService {
         ble_beacon_uuid: beaconData.uuid,
         ble_distance: beaconData.distance,
         
-        // Motion Data
-        accelerometer_data: motionData.accelerometer,
-        gyroscope_data: motionData.gyroscope,
+        // Motion Data (binary envelope; raw sample lists only if it couldn't be built)
         motion_start_time: motionData.startTime,
         motion_end_time: motionData.endTime,
+        ...(motionPayload !== null
+          ? {motion_payload: motionPayload}
+          : {
+              accelerometer_data: motionData.accelerometer,
+              gyroscope_data: motionData.gyroscope,
+            }),
         
         // Location Data
         gps_latitude: locationData.latitude,
@@ -64,6 +71,7 @@ export class VerificationService {
         distance: beaconData.distance,
         pressure: pressureData.pressure,
         motionSamples: motionData.accelerometer.length,
+        motionEncoding: motionPayload !== null ? 'envelope' : 'json',
         frames: videoFrames.length,
       });
 
@@ -84,6 +92,23 @@ export class VerificationService {
     }
   }
 
+  /**
+   * Encode motion data as a binary envelope, or null if the sensor manager
+   * can't (the caller then falls back to the JSON sample lists)
+   */
+  private encodeMotion(motionData: MotionData): string | null {
+    const manager = getMotionSensorManager();
+    if (typeof manager.encodeEnvelope !== 'function') {
+      return null;
+    }
+    try {
+      return manager.encodeEnvelope(motionData);
+    } catch (error) {
+      console.warn('[Verification] Motion envelope encoding failed, sending JSON lists:', error);
+      return null;
+    }
+  }
+
   /**
    * Validate sensor data completeness before submission
    */
@@ -7,6 +7,7 @@ import {
   SensorVerificationRequest,
   SensorVerificationResponse,
   OTPResponse,
+  SessionReference,
   SessionResponse,
   APIError,
 } from '../types';
@@ -116,11 +117,16 @@ class APIClient {
 
   /**
    * Start attendance session (Teacher)
+   * Optional reference: the teacher's GPS fix, beacon UUID and pressure
    */
-  async startSession(classId: string): Promise<SessionResponse> {
+  async startSession(
+    classId: string,
+    reference?: SessionReference,
+  ): Promise<SessionResponse> {
     try {
       const response = await this.client.post<SessionResponse>(
         `/api/v1/session/start/${classId}`,
+        reference,
       );
       return response.data;
     } catch (error) {
@@ -129,6 +135,18 @@ class APIClient {
     }
   }
 
+  /**
+   * End attendance session (Teacher) - also revokes its classroom reference
+   */
+  async endSession(sessionId: string): Promise<void> {
+    try {
+      await this.client.post(`/api/v1/session/${sessionId}/end`);
+    } catch (error) {
+      console.error('[API] End session error:', error);
+      throw error;
+    }
+  }
+
   /**
    * Health check
    */
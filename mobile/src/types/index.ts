@@ -85,6 +85,8 @@ export interface SensorVerificationRequest {
   gyroscope_x?: number[];
   gyroscope_y?: number[];
   gyroscope_z?: number[];
+  // Binary motion envelope (base64) - replaces the lists above
+  motion_payload?: string;
   
   // Frames
   frame_timestamps?: number[];
@@ -123,6 +125,15 @@ export interface OTPResponse {
   student_name: string;
 }
 
+/** Teacher readings students are checked against for the session's lifetime */
+export interface SessionReference {
+  latitude?: number;
+  longitude?: number;
+  gps_accuracy?: number;
+  beacon_uuid?: string;
+  barometric_pressure?: number;
+}
+
 export interface SessionResponse {
   success: boolean;
   session_id: string;